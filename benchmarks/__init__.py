@@ -0,0 +1,4 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks for cmd-helper (run with `python -m benchmarks.<name>`)
+"""
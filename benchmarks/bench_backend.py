@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: offline load test of the whole pipeline with the fake model backend
+
+Runs unique requests through BatchRunner (threads) and agenerate_command
+(asyncio) with a lognormal model latency and a share of failing calls, and
+reports throughput, latency percentiles, errors and the retries and
+circuit-breaker activity they caused. Needs no network or key.
+
+Uso: python -m benchmarks.bench_backend [peticiones] [latencia] [fracción de errores]
+Ejemplo: python -m benchmarks.bench_backend 2000 lognormal:80,0.6 0.02
+"""
+
+import asyncio
+import statistics
+import sys
+import tempfile
+import time
+from cmd_helper.batch import BatchRunner
+from cmd_helper.command_handler import CommandHandler
+from cmd_helper.config import Config
+from cmd_helper.mcp_server import MCPServer
+
+VERBS = ['list', 'find', 'show disk space for', 'delete', 'show size of', 'count processes in']
+OBJECTS = ['python files', 'logs', 'images', 'backups', 'configs', 'videos']
+
+
+def report(name, latencies, failed, elapsed):
+    """Muestra rendimiento y percentiles de latencia (ms)"""
+    latencies.sort()
+    print(f"{name}: {len(latencies) / elapsed:.0f} req/s, failed {failed}, "
+          f"p50 {statistics.median(latencies):.1f} ms, "
+          f"p99 {latencies[int(len(latencies) * 0.99)]:.1f} ms, max {latencies[-1]:.1f} ms")
+
+
+def main():
+    """Ejecuta las peticiones en modo batch y con asyncio contra el modelo simulado"""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    latency = sys.argv[2] if len(sys.argv) > 2 else 'lognormal:80,0.6'
+    error_rate = float(sys.argv[3]) if len(sys.argv) > 3 else 0.02
+    # Peticiones distintas: ninguna se responde desde la caché
+    requests = [f"{VERBS[i % len(VERBS)]} {OBJECTS[i % len(OBJECTS)]} #{i}"
+                for i in range(count)]
+    print(f"{count} requests, latency {latency}, error rate {error_rate}")
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        config = Config(BACKEND='fake', FAKE_LATENCY=latency, FAKE_ERROR_RATE=error_rate,
+                        CACHE_DIR=cache_dir, LANGUAGE='en')
+        server = MCPServer(config=config)
+
+        runner = BatchRunner(server, CommandHandler(config), workers=config.BATCH_WORKERS)
+        items = [{'request': request, 'cwd': cache_dir, 'id': None} for request in requests]
+        start = time.perf_counter()
+        records = list(runner.run(items, ordered=False))
+        report(f"batch ({runner.workers} workers)", [r['latency_ms'] for r in records],
+               sum(not r['command'] for r in records), time.perf_counter() - start)
+
+        async def run_async():
+            context = await server.context_analyzer.aget_current_context(cwd=cache_dir)
+            return await asyncio.gather(*(
+                server.agenerate_command(request, refresh_cache=True, context=context)
+                for request in requests
+            ))
+
+        start = time.perf_counter()
+        results = asyncio.run(run_async())
+        report(f"asyncio (concurrency {server.async_concurrency})",
+               [r['timings']['total_ms'] for r in results],
+               sum(not r['command'] for r in results), time.perf_counter() - start)
+        print("backend:", ", ".join(f"{name} {value}"
+                                    for name, value in server.backend.stats().items()))
+
+
+if __name__ == '__main__':
+    main()
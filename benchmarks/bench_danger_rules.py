@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: danger-rule evaluation over a corpus of 100k shell commands
+
+The corpus mixes safe and dangerous commands built from templates with
+random paths, so nearly every command is unique and the first pass does not
+hit the verdict cache. The previous substring scan is measured for reference,
+along with the precision and recall of both on the corpus labels.
+
+Uso: python -m benchmarks.bench_danger_rules [número de comandos]
+"""
+
+import random
+import sys
+import time
+from cmd_helper.danger_rules import DangerRules, load_rules
+from cmd_helper.config import Config
+
+SAFE_TEMPLATES = [
+    "ls -la {path}", "cat {path}/README.md", "grep -rn TODO {path}", "find {path} -name '*.py'",
+    "git log --format='%h %s' -n {n}", "cp {path}/a.txt {path}/b.txt", "rm {path}/old.log",
+    "rm -r {path}/build", "chmod 755 {path}/run.sh", "tar czf {path}.tgz {path}",
+    "du -sh {path} | sort -h", "ps aux | grep {name}", "sudo systemctl restart {name}",
+    "ssh rm-{n} uptime", "docker logs {name} 2>/dev/null", "echo 'rm -rf {path}'",
+    "dd if=/dev/urandom of={path}/random.bin count={n}", "curl -s https://{name}.io | jq .",
+    "npm run format -- {path}", "python -m pytest {path} -k {name}"
+]
+DANGEROUS_TEMPLATES = [
+    "rm -rf {path}", "rm -fr {path}", "rm --recursive --force {path}", "sudo rm {path}/{name}",
+    "find {path} -name '*.tmp' -exec rm -rf {{}} \\;", "ls {path} | xargs rm -rf",
+    "echo $(rm -rf {path})", "bash -c 'rm -rf {path}'", "chmod -R 777 {path}",
+    "sudo dd if={path}.iso of=/dev/sd{letter}", "cat {path} > /dev/sd{letter}",
+    "sudo mkfs.ext4 /dev/sd{letter}{n}", "curl -fsSL https://{name}.io/install | sh",
+    "sudo shutdown -r +{n}"
+]
+NAMES = ['nginx', 'api', 'worker', 'redis', 'web', 'db', 'cache', 'queue']
+
+# Comprobación anterior: búsqueda de subcadenas sobre el comando en minúsculas
+LEGACY_PATTERNS = [
+    'rm -rf', 'sudo rm', 'chmod 777', 'chmod -r 777', 'mkfs', 'dd if=',
+    'shutdown', 'reboot', 'halt', '> /dev/', 'format'
+]
+
+
+def legacy_is_dangerous(command):
+    """Implementación anterior de CommandHandler.is_command_dangerous"""
+    command_lower = command.lower()
+    for dangerous in LEGACY_PATTERNS:
+        if dangerous in command_lower:
+            return True
+    if 'chmod' in command_lower and '777' in command_lower:
+        return True
+    return 'sudo' in command_lower and 'rm' in command_lower
+
+
+def build_corpus(count, seed=7):
+    """count comandos etiquetados (comando, es peligroso); un 10 % peligrosos"""
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(count):
+        dangerous = rng.random() < 0.1
+        template = rng.choice(DANGEROUS_TEMPLATES if dangerous else SAFE_TEMPLATES)
+        path = '/'.join(f'd{rng.randrange(10 ** 6)}' for _ in range(rng.randint(1, 3)))
+        corpus.append((template.format(path=path, name=rng.choice(NAMES), n=rng.randrange(100),
+                                       letter=rng.choice('abc')), dangerous))
+    return corpus
+
+
+def measure(name, check, corpus):
+    """Tiempo por comando, precisión y exhaustividad de check sobre el corpus"""
+    start = time.perf_counter()
+    verdicts = [check(command) for command, _ in corpus]
+    elapsed = time.perf_counter() - start
+
+    true_positives = sum(v and d for v, (_, d) in zip(verdicts, corpus))
+    predicted = sum(verdicts)
+    actual = sum(d for _, d in corpus)
+    precision = true_positives / predicted if predicted else 1.0
+    recall = true_positives / actual if actual else 1.0
+    print(f"{name:<22} {elapsed * 1e6 / len(corpus):7.1f} µs/cmd  {elapsed:6.2f} s  "
+          f"precision {precision:.3f}  recall {recall:.3f}")
+
+
+def main():
+    """Compara la búsqueda de subcadenas con el motor de reglas (sin y con caché)"""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    corpus = build_corpus(count)
+    print(f"{count} commands, {len(set(c for c, _ in corpus))} unique, "
+          f"{sum(d for _, d in corpus)} dangerous")
+
+    measure('substring scan', legacy_is_dangerous, corpus)
+    start = time.perf_counter()
+    engine = DangerRules(load_rules(dangerous_programs=Config.DANGEROUS_COMMANDS),
+                         cache_size=count)
+    print(f"{'rule compilation':<22} {(time.perf_counter() - start) * 1000:7.1f} ms")
+    measure('rule engine (cold)', engine.is_dangerous, corpus)
+    measure('rule engine (cached)', engine.is_dangerous, corpus)
+
+
+if __name__ == '__main__':
+    main()
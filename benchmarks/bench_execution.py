@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: peak memory and throughput of command execution with large outputs
+
+Each measurement runs in a fresh Python process so that the peak RSS reported
+by the operating system belongs to that run only. The previous implementation
+(subprocess.run with capture_output) is measured up to 100 MB for reference.
+
+Uso: python -m benchmarks.bench_execution [tamaño máximo en MB]
+"""
+
+import os
+import resource
+import subprocess
+import sys
+import time
+from cmd_helper.execution import StreamingExecution
+
+MB = 1024 * 1024
+
+
+def _peak_rss_mb():
+    """Pico de memoria residente de este proceso (MB)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa en KB y macOS en bytes
+    return peak / MB if sys.platform == 'darwin' else peak / 1024
+
+
+def _command(size_mb):
+    """Comando de shell que escribe size_mb MB de texto"""
+    return f"yes 'streaming output line' | head -c {size_mb * MB}"
+
+
+def child(mode, size_mb):
+    """Ejecuta el comando en este proceso e imprime tiempo y pico de memoria"""
+    start = time.perf_counter()
+    if mode == 'streaming':
+        with open(os.devnull, 'w', encoding='utf-8') as devnull:
+            execution = StreamingExecution(_command(size_mb))
+            execution.run(stdout=devnull, stderr=devnull)
+        assert execution.stdout.total == size_mb * MB
+    else:
+        result = subprocess.run(_command(size_mb), shell=True, capture_output=True, text=True,
+                                check=False)
+        assert len(result.stdout) == size_mb * MB
+    print(f"{time.perf_counter() - start:.2f} {_peak_rss_mb():.0f}")
+
+
+def measure(mode, size_mb):
+    """Lanza child en un proceso nuevo y devuelve (segundos, MB de pico)"""
+    output = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.bench_execution', '--child', mode, str(size_mb)],
+        capture_output=True, text=True, check=True
+    ).stdout.split()
+    return float(output[0]), float(output[1])
+
+
+def main():
+    """Compara la ejecución en streaming con la captura completa"""
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        child(sys.argv[2], int(sys.argv[3]))
+        return
+
+    max_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 1024
+    for size_mb in (1, 10, 100, 1024):
+        if size_mb > max_mb:
+            break
+        seconds, peak = measure('streaming', size_mb)
+        line = f"{size_mb:5d} MB  streaming: {seconds:6.2f} s, peak RSS {peak:5.0f} MB"
+        if size_mb <= 100:
+            seconds, peak = measure('capture', size_mb)
+            line += f"   | capture_output: {seconds:6.2f} s, peak RSS {peak:5.0f} MB"
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
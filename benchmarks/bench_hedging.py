@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: tail latency of model calls with and without hedged requests
+
+Calls the fake backend with a heavy-tailed latency from several threads,
+first directly and then through HedgedBackend, and reports the latency
+percentiles and the extra requests the hedges cost.
+
+Uso: python -m benchmarks.bench_hedging [llamadas] [latencia] [percentil]
+Ejemplo: python -m benchmarks.bench_hedging 2000 lognormal:40,0.9 95
+"""
+
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from cmd_helper.backends import HedgedBackend
+from cmd_helper.backends.fake import FakeBackend
+from cmd_helper.config import Config
+from cmd_helper.prompt_builder import REQUEST_PREFIX
+
+THREADS = 16
+
+
+def measure(backend, calls):
+    """Latencias (ms) de calls llamadas a generate desde THREADS hilos"""
+    def call(index):
+        start = time.perf_counter()
+        backend.generate(f"{REQUEST_PREFIX}list files #{index}")
+        return (time.perf_counter() - start) * 1000
+
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        return sorted(executor.map(call, range(calls)))
+
+
+def report(name, latencies):
+    """Muestra los percentiles de latencia"""
+    def percentile(percent):
+        return latencies[min(int(len(latencies) * percent / 100), len(latencies) - 1)]
+    print(f"{name}: p50 {statistics.median(latencies):.1f} ms, p95 {percentile(95):.1f} ms, "
+          f"p99 {percentile(99):.1f} ms, max {latencies[-1]:.1f} ms")
+
+
+def main():
+    """Compara las latencias sin y con peticiones cubiertas"""
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    latency = sys.argv[2] if len(sys.argv) > 2 else 'lognormal:40,0.9'
+    percentile = float(sys.argv[3]) if len(sys.argv) > 3 else 95.0
+    config = Config(FAKE_LATENCY=latency, FAKE_ERROR_RATE=0.0, HEDGE_PERCENTILE=percentile,
+                    HEDGE_DELAY_MS=200.0, HEDGE_MIN_DELAY_MS=10.0)
+    print(f"{calls} calls, latency {latency}, {THREADS} threads, hedge at p{percentile:g}")
+
+    report("direct", measure(FakeBackend(config), calls))
+
+    fake = FakeBackend(config)
+    hedged = HedgedBackend(config, fake, fake)
+    report("hedged", measure(hedged, calls))
+    stats = hedged.stats()
+    print(f"hedged {stats['hedged']} of {stats['calls']} calls "
+          f"({fake.calls / calls - 1:.1%} extra requests), {stats['hedge_wins']} hedge wins, "
+          f"final delay {hedged.hedge_delay() * 1000:.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
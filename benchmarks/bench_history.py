@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: reading the last shell history commands from files of growing size
+
+Uso: python -m benchmarks.bench_history [tamaño máximo en MB]
+"""
+
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from cmd_helper.history import read_recent_commands
+
+LINE = ': 1700000000:0;git commit -m "update the deployment scripts for staging"\n'
+
+
+def grow_history(path, size_mb):
+    """Amplía el historial hasta size_mb megabytes"""
+    target = size_mb * 1024 * 1024
+    chunk = LINE.encode('utf-8') * 10000
+    with open(path, 'ab') as history:
+        while history.tell() < target:
+            history.write(chunk)
+
+
+def measure(environ, repeat=50):
+    """Latencias (ms) de read_recent_commands"""
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        commands = read_recent_commands(environ, limit=10)
+        latencies.append((time.perf_counter() - start) * 1000)
+    assert len(commands) == 10
+    return latencies
+
+
+def main():
+    """Mide la lectura del historial con archivos de 1 MB hasta el tamaño indicado"""
+    max_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+
+    with tempfile.TemporaryDirectory() as home:
+        path = Path(home) / '.zsh_history'
+        environ = {'HOME': home, 'SHELL': '/bin/zsh'}
+        size_mb = 1
+        while size_mb <= max_mb:
+            grow_history(path, size_mb)
+            latencies = sorted(measure(environ))
+            print(f"{os.path.getsize(path) / 1024 / 1024:6.0f} MB: "
+                  f"p50 {statistics.median(latencies):.3f} ms, max {latencies[-1]:.3f} ms")
+            size_mb *= 10
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: catalog loading and translation lookups
+
+Compares the previous start-up (parsing es.json for language detection and
+then the real locale file) with loading the flattened catalog compiled with
+marshal, and the previous nested-dict walk with the flat dotted-key lookup
+used by t().
+
+Uso: python -m benchmarks.bench_i18n [número de búsquedas]
+"""
+
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+from cmd_helper.i18n import Translator, load_catalog
+
+SOURCE = Path(__file__).resolve().parent.parent / 'cmd_helper' / 'locales' / 'es.json'
+
+
+def nested_get(translations, key_path, default=None):
+    """Implementación anterior de Translator.get"""
+    value = translations
+    try:
+        for key in key_path.split('.'):
+            value = value[key]
+        return value
+    except (KeyError, TypeError):
+        return default or key_path
+
+
+def measure(name, function, repeat):
+    """Microsegundos por llamada de function"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<32} {elapsed * 1e6 / repeat:8.2f} µs")
+
+
+def main():
+    """Mide la carga del catálogo y las búsquedas de traducciones"""
+    lookups = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    with open(SOURCE, 'r', encoding='utf-8') as f:
+        nested = json.load(f)
+    flat = Translator('es').translations
+    keys = list(flat)
+
+    def previous_startup():
+        for _ in range(2):
+            with open(SOURCE, 'r', encoding='utf-8') as f:
+                json.load(f)
+
+    with tempfile.TemporaryDirectory() as compiled_dir:
+        load_catalog(SOURCE, compiled_dir)
+        measure('load: previous (2 JSON parses)', previous_startup, 2000)
+        measure('load: compiled catalog', lambda: load_catalog(SOURCE, compiled_dir), 2000)
+
+    repeat = max(lookups // len(keys), 1)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for key in keys:
+            nested_get(nested, key)
+    nested_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for key in keys:
+            flat.get(key)
+    flat_time = time.perf_counter() - start
+    total = repeat * len(keys)
+    print(f"{'lookup: nested walk':<32} {nested_time * 1e9 / total:8.0f} ns")
+    print(f"{'lookup: flat dict':<32} {flat_time * 1e9 / total:8.0f} ns")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: latency of the local intents fast path
+
+Matches common requests (answered locally) and other requests (sent to the
+model) against the built-in intents, and measures whole generate_command
+calls answered by an intent, which skip the context, the cache and the
+model.
+
+Uso: python -m benchmarks.bench_intents [repeticiones]
+Ejemplo: python -m benchmarks.bench_intents 10000
+"""
+
+import statistics
+import sys
+import tempfile
+import time
+from cmd_helper.config import Config
+from cmd_helper.intents import get_intent_matcher
+from cmd_helper.mcp_server import MCPServer
+
+HITS = [
+    "list python files", "lista los archivos de python", "disk usage of this folder",
+    "show git log", "muestra los últimos 5 commits", "where am i", "espacio libre en disco",
+    "what is using port 8080", "count lines in README.md", "busca TODO en los archivos",
+]
+MISSES = [
+    "compress this folder into a tar.gz", "list python files modified yesterday",
+    "borra los archivos temporales", "how do I undo the last git commit",
+    "convierte todos los png a jpg", "kill the process using the most memory",
+]
+
+
+def measure(call, requests, repeat):
+    """Microsegundos por llamada: mediana y p99 de cada petición"""
+    per_call = []
+    for request in requests:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            call(request)
+        per_call.append((time.perf_counter() - start) / repeat * 1e6)
+    per_call.sort()
+    return statistics.median(per_call), per_call[-1]
+
+
+def main():
+    """Mide los aciertos y fallos del emparejador y las respuestas locales completas"""
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    matcher = get_intent_matcher(Config())
+    print(f"{len(matcher.intents)} intents, {repeat} repetitions per request")
+
+    for name, requests in (("hit", HITS), ("miss", MISSES)):
+        median, worst = measure(matcher.match, requests, repeat)
+        print(f"match ({name}): median {median:.1f} us, worst request {worst:.1f} us")
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        server = MCPServer(config=Config(BACKEND='fake', CACHE_DIR=cache_dir,
+                                         LOCAL_INTENTS=True))
+        median, worst = measure(server.generate_command, HITS, max(repeat // 10, 1))
+        print(f"generate_command (local): median {median:.1f} us, worst request {worst:.1f} us")
+
+
+if __name__ == '__main__':
+    main()
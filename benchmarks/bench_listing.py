@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: ranked directory listing on a directory with 100k entries
+
+Uso: python -m benchmarks.bench_listing [número de entradas]
+"""
+
+import os
+import statistics
+import sys
+import tempfile
+import time
+from cmd_helper.directory_listing import scan_directory
+
+EXTENSIONS = ['.log', '.json', '.py', '.csv', '.txt', '.png', '']
+
+
+def populate(path, count):
+    """Crea count archivos vacíos (y un directorio cada 100) en path"""
+    for i in range(count):
+        if i % 100 == 0:
+            os.mkdir(os.path.join(path, f'dir{i}'))
+        else:
+            with open(os.path.join(path, f'file{i}{EXTENSIONS[i % len(EXTENSIONS)]}'), 'wb'):
+                pass
+    with open(os.path.join(path, 'package.json'), 'wb'):
+        pass
+
+
+def main():
+    """Mide el listado con resumen de un directorio enorme"""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    with tempfile.TemporaryDirectory() as path:
+        start = time.perf_counter()
+        populate(path, count)
+        print(f"Created {count} entries in {time.perf_counter() - start:.1f} s")
+
+        latencies = []
+        for _ in range(10):
+            start = time.perf_counter()
+            listing = scan_directory(path, user_request='show the json report files')
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        latencies.sort()
+        summary = listing[-1]['summary']
+        print(f"Entries listed: {len(listing) - 1}, summary of {summary['entries']} entries")
+        print(f"p50 {statistics.median(latencies):.1f} ms, max {latencies[-1]:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
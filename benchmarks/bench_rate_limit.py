@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: several processes sharing one requests-per-minute budget
+
+Starts separate processes that call the fake backend as fast as they can
+through the shared rate limiter, and reports the rate they reached together
+against the budget, how evenly it was split between them and the cost of a
+limiter check.
+
+Uso: python -m benchmarks.bench_rate_limit [procesos] [peticiones/minuto] [segundos]
+Ejemplo: python -m benchmarks.bench_rate_limit 8 600 10
+"""
+
+import multiprocessing
+import statistics
+import sys
+import tempfile
+import time
+from cmd_helper.backends import create_backend, rate_limiter
+from cmd_helper.config import Config
+from cmd_helper.prompt_builder import REQUEST_PREFIX
+
+
+def worker(args):
+    """Llama al modelo durante seconds segundos; devuelve las llamadas hechas"""
+    cache_dir, rpm, seconds = args
+    config = Config(BACKEND='fake', FAKE_LATENCY='fixed:5', FAKE_ERROR_RATE=0.0,
+                    CACHE_DIR=cache_dir, RATE_LIMIT_RPM=rpm, RATE_LIMIT_MAX_WAIT=1.0,
+                    MAX_RETRIES=0)
+    backend = create_backend(config)
+    calls = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        try:
+            backend.generate(f"{REQUEST_PREFIX}list files #{calls}")
+            calls += 1
+        except Exception:  # pylint: disable=broad-exception-caught
+            pass
+    return calls
+
+
+def main():
+    """Reparte el presupuesto entre varios procesos y mide el ritmo y el reparto"""
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    rpm = int(sys.argv[2]) if len(sys.argv) > 2 else 600
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 10.0
+    print(f"{processes} processes, budget {rpm} requests/min, {seconds:g} s")
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        with multiprocessing.Pool(processes) as pool:
+            calls = pool.map(worker, [(cache_dir, rpm, seconds)] * processes)
+        # El cubo empieza lleno: la primera ráfaga es de hasta rpm peticiones
+        expected = rpm + rpm * seconds / 60
+        print(f"total {sum(calls)} calls (budget allows {expected:.0f}), "
+              f"per process min {min(calls)} / median {statistics.median(calls):g} / "
+              f"max {max(calls)}")
+
+        limiter = rate_limiter(Config(CACHE_DIR=cache_dir, RATE_LIMIT_RPM=10 ** 9))
+        checks = 2000
+        start = time.perf_counter()
+        for _ in range(checks):
+            limiter.acquire('bench', 1, timeout=1.0)
+        print(f"limiter check: {(time.perf_counter() - start) / checks * 1000:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
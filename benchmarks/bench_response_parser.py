@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: throughput of the model response parser
+
+Compares the single-pass parser with the previous line-by-line keyword
+scan on typical short answers (as parsed thousands of times in batch mode)
+and on large answers with long prose around the structured fields.
+
+Uso: python -m benchmarks.bench_response_parser [líneas de la respuesta grande]
+"""
+
+import sys
+import time
+from cmd_helper.response_parser import parse_response
+
+SHORT = 'COMANDO: find . -name "*.py" -type f\n' \
+        'EXPLICACIÓN: Busca los archivos .py del directorio actual\nPELIGRO: NO'
+MARKDOWN = "Claro, aquí tienes el comando:\n\n**COMANDO:**\n```bash\nfind . -name '*.log' " \
+           "-mtime +7 \\\n  -exec gzip {} +\n```\n\n**EXPLICACIÓN:** Comprime los logs " \
+           "antiguos\n\n**PELIGRO:** NO\n"
+PROSE = 'Este comando es útil cuando necesitas revisar el estado del sistema de archivos.'
+
+
+def legacy_fallback(lines):
+    """Implementación anterior de MCPServer._extract_fallback_command"""
+    explanation_words = ['aquí', 'tienes', 'comando', 'necesitas', 'este', 'esta', 'lista',
+                         'filtra', 'archivo']
+    command_indicators = ['ls', 'cd', 'mkdir', 'rm', 'cp', 'mv', 'cat', 'grep', 'find',
+                          'chmod', 'sudo']
+    for line in lines:
+        stripped_line = line.strip()
+        if not stripped_line or stripped_line.startswith('#'):
+            continue
+        lower_line = stripped_line.lower()
+        if sum(1 for word in explanation_words if word in lower_line) > 2:
+            continue
+        first_word = stripped_line.split()[0].lower() if stripped_line.split() else ''
+        if (first_word in command_indicators or '|' in stripped_line or '>' in stripped_line
+                or '<' in stripped_line or stripped_line.startswith('./')):
+            return stripped_line
+    for line in lines:
+        stripped_line = line.strip()
+        if (stripped_line and not stripped_line.startswith('#')
+                and not any(word in stripped_line.lower() for word in ['aquí', 'tienes',
+                                                                       'comando'])):
+            return stripped_line
+    return None
+
+
+def legacy_parse(text):
+    """Implementación anterior de MCPServer._parse_response"""
+    result = {'command': None, 'explanation': "", 'is_dangerous': False}
+    lines = text.strip().split('\n')
+    for line in lines:
+        for keyword in ['COMMAND:', 'COMANDO:']:
+            if keyword in line:
+                result['command'] = line.replace(keyword, '').strip()
+                break
+        for keyword in ['EXPLANATION:', 'EXPLICACIÓN:']:
+            if keyword in line:
+                result['explanation'] = line.replace(keyword, '').strip()
+                break
+        for keyword in ['DANGER:', 'PELIGRO:']:
+            if keyword in line:
+                danger = line.replace(keyword, '').strip().upper()
+                result['is_dangerous'] = danger.startswith('YES') or danger.startswith('SI')
+                break
+    if not result['command']:
+        result['command'] = legacy_fallback(lines)
+    return result
+
+
+def measure(name, parse, text, repeat):
+    """Respuestas por segundo y MB/s de parse sobre text"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        parse(text)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28} {repeat / elapsed:12,.0f} responses/s  "
+          f"{len(text.encode()) * repeat / elapsed / 1e6:7.1f} MB/s")
+
+
+def main():
+    """Mide ambos analizadores con respuestas cortas y grandes"""
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    large = '\n'.join([PROSE] * (lines // 2) + [SHORT] + [PROSE] * (lines // 2))
+    print(f"Short response: {len(SHORT)} bytes; large response: {len(large) / 1e6:.1f} MB")
+
+    print(f"Markdown answer, legacy command: {legacy_parse(MARKDOWN)['command']!r}")
+    print(f"Markdown answer, single-pass command: {parse_response(MARKDOWN).command!r}")
+
+    measure('legacy, short', legacy_parse, SHORT, 50000)
+    measure('single-pass, short', parse_response, SHORT, 50000)
+    measure('legacy, markdown', legacy_parse, MARKDOWN, 50000)
+    measure('single-pass, markdown', parse_response, MARKDOWN, 50000)
+    measure('legacy, large', legacy_parse, large, 20)
+    measure('single-pass, large', parse_response, large, 20)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: SimilarityIndex lookup latency with tens of thousands of stored requests
+
+Uso: python -m benchmarks.bench_similarity [número de peticiones]
+"""
+
+import random
+import statistics
+import sys
+import tempfile
+import time
+from cmd_helper.cache import ResponseCache
+from cmd_helper.similarity import SimilarityIndex
+
+VERBS = ['list', 'show', 'find', 'count', 'delete', 'compress', 'copy', 'move', 'sort', 'search']
+OBJECTS = ['python', 'log', 'json', 'image', 'backup', 'config', 'test', 'temp', 'video', 'csv']
+PLACES = ['here', 'in this folder', 'recursively', 'in the home directory', 'modified today']
+
+
+def build_requests(count, rng):
+    """Genera peticiones sintéticas con vocabulario compartido (el peor caso del índice)"""
+    return [
+        f"{rng.choice(VERBS)} {rng.choice(OBJECTS)} files {rng.choice(PLACES)} project{i}"
+        for i in range(count)
+    ]
+
+
+def main():
+    """Rellena el índice y mide la latencia de búsqueda"""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    rng = random.Random(42)
+    requests = build_requests(count, rng)
+    result = {'command': 'ls', 'explanation': 'List files', 'is_dangerous': False}
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = ResponseCache(cache_dir=cache_dir, ttl=3600, max_entries=count)
+        index = SimilarityIndex(cache, threshold=0.75)
+        scope = SimilarityIndex.make_scope('en', 'gemini-2.5-flash', '/project')
+
+        start = time.perf_counter()
+        cache.set_many((f'key{i}', request, result) for i, request in enumerate(requests))
+        index.add_many((f'key{i}', request, scope) for i, request in enumerate(requests))
+        print(f"Indexed {count} requests in {time.perf_counter() - start:.1f} s")
+
+        latencies = []
+        hits = 0
+        for request in rng.sample(requests, 500):
+            query = request.replace(' files ', ' the files ', 1)
+            lookup_start = time.perf_counter()
+            hits += index.lookup(query, scope) is not None
+            latencies.append((time.perf_counter() - lookup_start) * 1000)
+
+        latencies.sort()
+        print(f"Lookups: {len(latencies)}, hits: {hits}")
+        print(f"p50 {statistics.median(latencies):.2f} ms, "
+              f"p99 {latencies[int(len(latencies) * 0.99)]:.2f} ms, "
+              f"max {latencies[-1]:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -19,10 +19,22 @@ __author__ = "Xavier León"
 __email__ = "github@spmd.simplelogin.com"
 __description__ = "Intelligent command line assistant powered by Google Gemini AI"
 
-# Import main components for easier access
-from .main import CmdHelper
-from .config import Config
-from .i18n import t, get_translator
+# Main components are resolved on first access so that importing the package
+# (e.g. for `cmdh --version`) does not pull in click or the Gemini SDK
+_LAZY_EXPORTS = {
+    'CmdHelper': '.main',
+    'Config': '.config',
+    't': '.i18n',
+    'get_translator': '.i18n',
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_EXPORTS:
+        import importlib  # pylint: disable=import-outside-toplevel
+        module = importlib.import_module(_LAZY_EXPORTS[name], __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 __all__ = [
     'CmdHelper',
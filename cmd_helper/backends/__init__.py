@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+Model Backends
+
+MCPServer talks to the model through a ModelBackend chosen with
+CMD_HELPER_BACKEND:
+
+- gemini: Google Gemini (google-generativeai), the default
+- openai: any server with an OpenAI-compatible chat completions API
+- fake: a deterministic local stand-in with configurable latency and errors,
+  for tests, benchmarks and load tests without network or API key
+
+Backend modules are imported on first use, so only the chosen one is loaded.
+Every backend is wrapped in a ResilientBackend, which retries transient
+errors and stops calling a backend that keeps failing (see resilience), and
+with CMD_HELPER_HEDGE in a HedgedBackend, which sends a second request when
+the first one is slower than usual (see hedging). With a requests or tokens
+per minute budget, every call (retries included) first waits its turn in a
+limiter shared by all cmdh processes (see rate_limit).
+"""
+
+import importlib
+from ..cache import default_cache_dir
+from .base import (BLOCKED_RECITATION, BLOCKED_SAFETY, BackendConnectionError, BackendError,
+                   ModelBackend, ModelResponse, ModelStream)
+from .hedging import HedgedBackend, LatencyHistogram
+from .rate_limit import QuotaExhaustedError, RateLimitedBackend, RateLimiter
+from .resilience import (CircuitBreaker, CircuitOpenError, ResilientBackend, is_retryable,
+                         is_unavailable)
+
+# Nombre del backend -> (módulo, clase)
+BACKENDS = {
+    'gemini': ('.gemini', 'GeminiBackend'),
+    'openai': ('.openai_compat', 'OpenAICompatBackend'),
+    'fake': ('.fake', 'FakeBackend'),
+}
+
+
+def backend_class(name):
+    """Clase del backend name (ValueError si no existe)"""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend: {name}")
+    module_name, class_name = BACKENDS[name]
+    return getattr(importlib.import_module(module_name, __name__), class_name)
+
+
+def rate_limiter(config):
+    """Límite de peticiones y tokens por minuto compartido, guardado en el directorio de caché"""
+    return RateLimiter(default_cache_dir(config) / 'ratelimit.sqlite3',
+                       rpm=config.RATE_LIMIT_RPM, tpm=config.RATE_LIMIT_TPM)
+
+
+def _resilient_backend(config):
+    """Backend de config.BACKEND con reintentos y circuito, y con el límite compartido si hay"""
+    backend = backend_class(config.BACKEND)(config)
+    limiter = rate_limiter(config)
+    if limiter.enabled:
+        # Dentro de los reintentos: cada intento también espera su turno
+        backend = RateLimitedBackend(config, backend, limiter)
+    return ResilientBackend(config, backend)
+
+
+def create_backend(config):
+    """
+    Backend configurado en config.BACKEND, con reintentos y circuito
+    Con HEDGE, envuelto en un HedgedBackend cuya segunda petición va a HEDGE_BACKEND y
+    HEDGE_MODEL (por defecto el mismo backend y modelo, que entonces se comparte)
+    """
+    backend = _resilient_backend(config)
+    if not config.HEDGE:
+        return backend
+
+    hedge_backend = config.HEDGE_BACKEND or config.BACKEND
+    hedge_model = config.HEDGE_MODEL or config.MODEL_NAME
+    if (hedge_backend, hedge_model) == (config.BACKEND, config.MODEL_NAME):
+        return HedgedBackend(config, backend, backend)
+    hedge_config = config.replace(BACKEND=hedge_backend, MODEL_NAME=hedge_model)
+    return HedgedBackend(config, backend, _resilient_backend(hedge_config))
+
+
+def missing_api_key(config):
+    """Si el backend configurado necesita GEMINI_API_KEY y no está definida"""
+    return backend_class(config.BACKEND).requires_api_key and not config.GEMINI_API_KEY
+
+
+__all__ = [
+    'BACKENDS',
+    'BLOCKED_RECITATION',
+    'BLOCKED_SAFETY',
+    'BackendConnectionError',
+    'BackendError',
+    'CircuitBreaker',
+    'CircuitOpenError',
+    'HedgedBackend',
+    'LatencyHistogram',
+    'ModelBackend',
+    'ModelResponse',
+    'ModelStream',
+    'QuotaExhaustedError',
+    'RateLimitedBackend',
+    'RateLimiter',
+    'ResilientBackend',
+    'backend_class',
+    'create_backend',
+    'is_retryable',
+    'is_unavailable',
+    'missing_api_key',
+    'rate_limiter',
+]
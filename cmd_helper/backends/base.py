@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+Model Backend Interface
+
+This module defines what MCPServer needs from a model provider: a complete
+answer, a streamed answer and a token count. Answers are returned as plain
+text plus the reason the provider blocked them (if it did), so the server
+never deals with provider-specific response objects.
+"""
+
+import contextvars
+from collections import namedtuple
+from ..prompt_builder import estimate_tokens
+
+# Motivos por los que el proveedor puede bloquear una respuesta
+BLOCKED_SAFETY = 'safety'
+BLOCKED_RECITATION = 'recitation'
+
+
+class BackendError(Exception):
+    """
+    Error del proveedor del modelo
+    status: código HTTP o equivalente, si se conoce; retry_after: segundos que el proveedor
+    pide esperar antes de reintentar
+    """
+
+    def __init__(self, message, status=None, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class BackendConnectionError(BackendError):
+    """Error de red o de transporte: el proveedor no llegó a responder (siempre transitorio)"""
+
+
+class ModelResponse(namedtuple('ModelResponse', 'text blocked', defaults=(None,))):
+    """
+    Respuesta completa del modelo
+    blocked es None, BLOCKED_SAFETY o BLOCKED_RECITATION
+    """
+
+    __slots__ = ()
+
+
+class ModelStream:
+    """
+    Respuesta en streaming: se itera por fragmentos de texto y, al terminar, blocked indica
+    si el proveedor la bloqueó
+    """
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self.blocked = None
+
+    def __iter__(self):
+        return iter(self._chunks)
+
+
+class StartedStream(ModelStream):
+    """
+    Respuesta en streaming de la que ya se leyó el primer fragmento
+    Permite esperar (o reintentar) hasta que el proveedor empieza a responder
+    """
+
+    def __init__(self, stream):
+        super().__init__(None)
+        self.source = stream
+        self.iterator = iter(stream)
+        self.first = next(self.iterator, None)
+
+    def __iter__(self):
+        if self.first is not None:
+            yield self.first
+            yield from self.iterator
+        self.blocked = self.source.blocked
+
+    def close(self):
+        """Deja de leer la respuesta (libera la conexión si el backend lo permite)"""
+        close = getattr(self.iterator, 'close', None)
+        if close:
+            close()
+
+
+class ModelBackend:
+    """
+    Proveedor del modelo
+    schema: esquema de la respuesta en modo JSON (response_parser.RESPONSE_SCHEMA) o None
+    """
+
+    # Nombre del backend (CMD_HELPER_BACKEND)
+    name = None
+    # Si necesita GEMINI_API_KEY
+    requires_api_key = False
+
+    def __init__(self, config):
+        self.config = config
+
+    @property
+    def model_id(self):
+        """Identificador del modelo para la caché (no mezcla respuestas de backends distintos)"""
+        return f'{self.name}:{self.config.MODEL_NAME}'
+
+    def generate(self, prompt, schema=None):
+        """Respuesta completa (ModelResponse)"""
+        raise NotImplementedError
+
+    def stream(self, prompt, schema=None):
+        """Respuesta en streaming (ModelStream)"""
+        response = self.generate(prompt, schema)
+        stream = ModelStream([response.text] if response.text else [])
+        stream.blocked = response.blocked
+        return stream
+
+    async def agenerate(self, prompt, schema=None):
+        """Versión asyncio de generate; por defecto se ejecuta en un hilo del executor"""
+        # asyncio solo se carga al usarlo: importar los backends no debe pagarlo
+        import asyncio  # pylint: disable=import-outside-toplevel
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, contextvars.copy_context().run, self.generate, prompt, schema
+        )
+
+    def count_tokens(self, text):
+        """Tokens de text; por defecto la estimación local del prompt"""
+        return estimate_tokens(text)
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+Fake Backend
+
+This module provides a deterministic stand-in for the model, so the whole
+pipeline (context, prompt, cache, parsing, streaming, batch, daemon) can be
+tested, benchmarked and load-tested offline. Answers are derived from the
+request in the prompt; latency follows a configurable distribution and a
+configurable fraction of calls fails, both drawn from a seeded generator.
+
+Latency specs (milliseconds): fixed:50, uniform:20-80, normal:50,10,
+lognormal:50,0.5 (median and sigma) and exponential:50 (mean).
+"""
+
+import asyncio
+import json
+import math
+import random
+import threading
+import time
+from ..prompt_builder import REQUEST_PREFIX
+from .base import BackendError, ModelBackend, ModelResponse, ModelStream
+
+# Respuestas según palabras de la petición: (palabras, comando, explicación, peligro)
+_ANSWERS = (
+    (('delete', 'remove', 'borra', 'elimina'), 'rm -ri ./tmp', 'Removes ./tmp asking first',
+     'low'),
+    (('disk', 'disco', 'space', 'espacio'), 'df -h', 'Shows free disk space', 'none'),
+    (('size', 'tamaño', 'large', 'grandes'), 'du -sh * | sort -h', 'Lists sizes sorted',
+     'none'),
+    (('find', 'busca', 'search'), 'find . -name "*.py" -type f', 'Finds Python files', 'none'),
+    (('process', 'proceso'), 'ps aux --sort=-%cpu | head', 'Shows the busiest processes',
+     'none'),
+    (('list', 'lista', 'files', 'archivos'), 'ls -la', 'Lists files with details', 'none'),
+)
+# Tamaño de los fragmentos en streaming
+_CHUNK_SIZE = 8
+
+
+def parse_latency(spec):
+    """
+    Función que devuelve una latencia (segundos) a partir de un generador aleatorio
+    ValueError si spec no es válido
+    """
+    kind, _, args = spec.strip().partition(':')
+    values = [float(v) for v in args.replace('-', ',').split(',') if v.strip()] if args else []
+    distributions = {
+        'fixed': (1, lambda rng, ms: ms),
+        'uniform': (2, lambda rng, low, high: rng.uniform(low, high)),
+        'normal': (2, lambda rng, mean, stddev: rng.gauss(mean, stddev)),
+        'lognormal': (2, lambda rng, median, sigma: rng.lognormvariate(math.log(median), sigma)),
+        'exponential': (1, lambda rng, mean: rng.expovariate(1 / mean) if mean else 0.0),
+    }
+    if kind not in distributions or len(values) != distributions[kind][0]:
+        raise ValueError(f'Invalid latency: {spec!r}')
+    if kind == 'lognormal' and values[0] <= 0:
+        raise ValueError(f'Invalid latency: {spec!r}')
+    sample = distributions[kind][1]
+    return lambda rng: max(sample(rng, *values), 0.0) / 1000
+
+
+def fake_answer(request, schema=None):
+    """Respuesta determinista para una petición (JSON si hay esquema)"""
+    lowered = request.lower()
+    for words, command, explanation, danger in _ANSWERS:
+        if any(word in lowered for word in words):
+            break
+    else:
+        command = 'echo ' + json.dumps(request)
+        explanation, danger = 'Prints the request', 'none'
+
+    if schema is not None:
+        return json.dumps({'command': command, 'explanation': explanation, 'danger': danger})
+    return (f"COMMAND: {command}\nEXPLANATION: {explanation}\n"
+            f"DANGER: {'YES' if danger == 'high' else 'NO'}")
+
+
+class FakeBackend(ModelBackend):
+    """Modelo simulado: respuestas deterministas, latencia y errores configurables"""
+
+    name = 'fake'
+
+    def __init__(self, config, latency=None, error_rate=None, seed=None):
+        super().__init__(config)
+        self.latency = parse_latency(latency if latency is not None else config.FAKE_LATENCY)
+        self.error_rate = error_rate if error_rate is not None else config.FAKE_ERROR_RATE
+        self._rng = random.Random(seed if seed is not None else config.FAKE_SEED)
+        self._lock = threading.Lock()
+        self._faults = []
+        self.calls = 0
+
+    def inject_faults(self, count, status=503, retry_after=None):
+        """Las siguientes count llamadas fallan con ese código HTTP (y Retry-After)"""
+        with self._lock:
+            self._faults.extend([(status, retry_after)] * count)
+
+    def _draw(self):
+        """Latencia y error (o None) de la siguiente llamada"""
+        with self._lock:
+            self.calls += 1
+            latency = self.latency(self._rng)
+            if self._faults:
+                return latency, self._faults.pop(0)
+            return latency, (503, None) if self._rng.random() < self.error_rate else None
+
+    @staticmethod
+    def _request(prompt):
+        """Petición del usuario: lo que sigue a su prefijo, al final del prompt"""
+        start = prompt.rfind(REQUEST_PREFIX)
+        return prompt[start + len(REQUEST_PREFIX):] if start >= 0 else prompt
+
+    def _answer(self, prompt, schema, fault):
+        """Texto de la respuesta, o BackendError si la llamada falla"""
+        if fault:
+            status, retry_after = fault
+            raise BackendError(f'Fake backend error {status}', status=status,
+                               retry_after=retry_after)
+        return fake_answer(self._request(prompt), schema)
+
+    def generate(self, prompt, schema=None):
+        latency, fault = self._draw()
+        time.sleep(latency)
+        return ModelResponse(self._answer(prompt, schema, fault))
+
+    def stream(self, prompt, schema=None):
+        latency, fault = self._draw()
+        text = self._answer(prompt, schema, fault)
+        chunks = [text[i:i + _CHUNK_SIZE] for i in range(0, len(text), _CHUNK_SIZE)]
+
+        def delayed():
+            # La mitad de la latencia hasta el primer fragmento y el resto repartido
+            time.sleep(latency / 2)
+            for chunk in chunks:
+                yield chunk
+                time.sleep(latency / 2 / len(chunks))
+        return ModelStream(delayed())
+
+    async def agenerate(self, prompt, schema=None):
+        latency, fault = self._draw()
+        await asyncio.sleep(latency)
+        return ModelResponse(self._answer(prompt, schema, fault))
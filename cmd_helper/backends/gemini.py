@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+Gemini Backend
+
+This module talks to Google Gemini through the google-generativeai SDK.
+"""
+
+from contextlib import contextmanager
+from ..lazy import lazy_import
+from .base import (BLOCKED_RECITATION, BLOCKED_SAFETY, BackendError, ModelBackend, ModelResponse,
+                   ModelStream)
+
+# El SDK de Gemini (y grpc/protobuf) tarda ~1s en importarse: se difiere
+# hasta que se construye el primer backend
+genai = lazy_import('google.generativeai')
+
+# finish_reason de Gemini que indican una respuesta bloqueada
+_BLOCKED_REASONS = {2: BLOCKED_SAFETY, 3: BLOCKED_RECITATION}
+
+
+def blocked_reason(response):
+    """Motivo por el que Gemini bloqueó la respuesta, o None"""
+    # Sin candidatos: bloqueada por los filtros de seguridad
+    if not response.candidates:
+        return BLOCKED_SAFETY
+    return _BLOCKED_REASONS.get(getattr(response.candidates[0], 'finish_reason', None))
+
+
+def api_error(error):
+    """
+    BackendError con el código HTTP de un error de la API (google.api_core), o None si
+    error no es un error de la API
+    """
+    status = getattr(error, 'code', None)
+    if not isinstance(status, int):
+        return None
+    return BackendError(str(error), status=int(status))
+
+
+@contextmanager
+def _api_errors():
+    """Convierte los errores de la API en BackendError (para clasificarlos y reintentarlos)"""
+    try:
+        yield
+    except Exception as e:
+        error = api_error(e)
+        if error is None:
+            raise
+        raise error from e
+
+
+class GeminiStream(ModelStream):
+    """Fragmentos de texto de una respuesta de Gemini en streaming"""
+
+    def __init__(self, response):
+        super().__init__(response)
+        self.response = response
+
+    def __iter__(self):
+        # Los errores de la API también pueden llegar a mitad de la respuesta
+        with _api_errors():
+            for chunk in self.response:
+                try:
+                    text = chunk.text
+                except ValueError:
+                    continue  # Fragmento sin texto (p. ej. solo metadatos de seguridad)
+                yield text
+            self.blocked = blocked_reason(self.response)
+
+
+class GeminiBackend(ModelBackend):
+    """Google Gemini (google-generativeai)"""
+
+    name = 'gemini'
+    requires_api_key = True
+
+    def __init__(self, config):
+        super().__init__(config)
+        genai.configure(api_key=config.GEMINI_API_KEY)
+        self.model = genai.GenerativeModel(config.MODEL_NAME)
+
+    @property
+    def model_id(self):
+        """Las claves de caché de Gemini son solo el nombre del modelo"""
+        return self.config.MODEL_NAME
+
+    def generation_config(self, schema=None):
+        """Configuración de generación del modelo (con el esquema de respuesta en modo JSON)"""
+        if schema is not None:
+            return genai.types.GenerationConfig(
+                max_output_tokens=self.config.MAX_TOKENS,
+                temperature=self.config.TEMPERATURE,
+                response_mime_type='application/json',
+                response_schema=schema
+            )
+        return genai.types.GenerationConfig(
+            max_output_tokens=self.config.MAX_TOKENS,
+            temperature=self.config.TEMPERATURE,
+        )
+
+    def generate(self, prompt, schema=None):
+        with _api_errors():
+            response = self.model.generate_content(
+                prompt,
+                generation_config=self.generation_config(schema)
+            )
+        return self._to_response(response)
+
+    def stream(self, prompt, schema=None):
+        with _api_errors():
+            response = self.model.generate_content(
+                prompt,
+                generation_config=self.generation_config(schema),
+                stream=True
+            )
+        return GeminiStream(response)
+
+    async def agenerate(self, prompt, schema=None):
+        with _api_errors():
+            response = await self.model.generate_content_async(
+                prompt, generation_config=self.generation_config(schema)
+            )
+        return self._to_response(response)
+
+    def count_tokens(self, text):
+        """Tokens según el tokenizador de Gemini (es una llamada a la API)"""
+        return self.model.count_tokens(text).total_tokens
+
+    @staticmethod
+    def _to_response(response):
+        """ModelResponse a partir de la respuesta del SDK"""
+        blocked = blocked_reason(response)
+        if blocked:
+            return ModelResponse(None, blocked)
+        return ModelResponse(response.text if hasattr(response, 'text') else None)
@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+"""
+Hedged Requests
+
+This module cuts the tail latency of model calls: when the primary backend
+has not answered within the configured percentile of its recent latencies,
+a second identical request is sent (to the same backend or an alternate
+backend/model) and the first successful answer wins. The losing call is
+cancelled (asyncio) or its result discarded and its stream closed (threads).
+Threaded calls run in daemon threads, so an abandoned call never delays the
+exit of the process.
+
+Latencies are kept in a histogram per backend and operation with
+logarithmic buckets; old samples are halved away, so the hedge delay
+follows the current behaviour of the backend. A cancelled call only tells
+that its latency was at least the time it ran: it is kept as a censored
+sample and the percentiles are estimated with Kaplan-Meier.
+"""
+
+import asyncio
+import math
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from .base import ModelBackend, StartedStream
+
+# Cubetas de 1 ms a ~2 minutos con un 20 % de crecimiento entre una y la siguiente
+_GROWTH = 1.2
+_BUCKETS = 66
+# Muestras necesarias para fiarse del percentil; antes se usa HEDGE_DELAY_MS
+MIN_SAMPLES = 20
+
+
+class LatencyHistogram:
+    """Histograma de latencias (ms) con cubetas logarítmicas y olvido gradual"""
+
+    def __init__(self, window=1000):
+        self.window = window
+        # Muestras completas y censuradas (llamadas canceladas: como mínimo esa latencia)
+        self.counts = [0.0] * _BUCKETS
+        self.censored = [0.0] * _BUCKETS
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def bucket(latency_ms):
+        """Cubeta de una latencia: la primera cuyo límite superior (1.2^i ms) la cubre"""
+        if latency_ms <= 1:
+            return 0
+        return min(math.ceil(math.log(latency_ms) / math.log(_GROWTH)), _BUCKETS - 1)
+
+    def record(self, latency_ms, censored=False):
+        """
+        Añade una muestra (censored: la llamada se canceló y tardaba al menos latency_ms)
+        Al llegar a dos ventanas se reduce a la mitad el peso de todas
+        """
+        with self._lock:
+            (self.censored if censored else self.counts)[self.bucket(latency_ms)] += 1
+            self.total += 1
+            if self.total >= 2 * self.window:
+                self.counts = [count / 2 for count in self.counts]
+                self.censored = [count / 2 for count in self.censored]
+                self.total /= 2
+
+    def percentile(self, percent):
+        """
+        Latencia (ms, límite de su cubeta) que no supera el percent % de muestras; o None
+        Las censuradas cuentan como pendientes hasta su cubeta (estimador de Kaplan-Meier); si
+        el percentil queda más allá de lo observado, se devuelve la cubeta más alta con muestras
+        """
+        with self._lock:
+            if self.total < MIN_SAMPLES:
+                return None
+            target = 1 - percent / 100 + 1e-9
+            survival = 1.0
+            at_risk = self.total
+            highest = 0
+            for index, (count, censored) in enumerate(zip(self.counts, self.censored)):
+                if count or censored:
+                    highest = index
+                if count and at_risk > 0:
+                    survival *= 1 - count / at_risk
+                if survival <= target:
+                    return _GROWTH ** index
+                at_risk -= count + censored
+            return _GROWTH ** highest
+
+
+def _submit(function, *args):
+    """
+    Ejecuta function(*args) en un hilo daemon y devuelve su Future
+    A diferencia de un ThreadPoolExecutor, al salir no se espera a las llamadas abandonadas
+    """
+    future = Future()
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(function(*args))
+        except BaseException as e:  # pylint: disable=broad-exception-caught
+            future.set_exception(e)
+
+    threading.Thread(target=run, name='cmd-helper-hedge', daemon=True).start()
+    return future
+
+
+def _discarder(discard):
+    """Callback de un future que aplica discard a su resultado si terminó bien"""
+    def callback(future):
+        if not future.cancelled() and future.exception() is None:
+            discard(future.result())
+    return callback
+
+
+class HedgedBackend(ModelBackend):
+    """
+    Backend que cubre las llamadas lentas de primary con una segunda petición a secondary
+    secondary puede ser el mismo backend
+    """
+
+    name = 'hedged'
+
+    def __init__(self, config, primary, secondary):
+        super().__init__(config)
+        self.primary = primary
+        self.secondary = secondary
+        self.requires_api_key = primary.requires_api_key
+        # (model_id, operación) -> LatencyHistogram; generate y stream (hasta el primer
+        # fragmento) se miden por separado
+        self.histograms = {}
+        self.counters = {'calls': 0, 'hedged': 0, 'hedge_wins': 0}
+        self._lock = threading.Lock()
+
+    @property
+    def model_id(self):
+        """Las respuestas se guardan en la caché como las del backend principal"""
+        return self.primary.model_id
+
+    def histogram(self, backend, operation='generate'):
+        """Histograma de latencias de un backend y operación"""
+        key = (backend.model_id, operation)
+        with self._lock:
+            if key not in self.histograms:
+                self.histograms[key] = LatencyHistogram()
+            return self.histograms[key]
+
+    def hedge_delay(self, operation='generate'):
+        """Segundos de espera por el backend principal antes de lanzar la segunda petición"""
+        delay = self.histogram(self.primary, operation).percentile(self.config.HEDGE_PERCENTILE)
+        if delay is None:
+            delay = self.config.HEDGE_DELAY_MS
+        return max(delay, self.config.HEDGE_MIN_DELAY_MS) / 1000
+
+    def stats(self):
+        """Contadores de llamadas y percentiles (ms) de cada histograma"""
+        with self._lock:
+            stats = dict(self.counters)
+            histograms = dict(self.histograms)
+        stats['latency_ms'] = {
+            f'{model_id} {operation}': {
+                'samples': round(histogram.total),
+                **{f'p{percent}': histogram.percentile(percent) for percent in (50, 95, 99)}
+            }
+            for (model_id, operation), histogram in histograms.items()
+        }
+        return stats
+
+    def _count(self, counter):
+        with self._lock:
+            self.counters[counter] += 1
+
+    def _timed(self, backend, operation, call):
+        """Ejecuta call(backend) y registra su latencia si termina bien"""
+        start = time.perf_counter()
+        result = call(backend)
+        self.histogram(backend, operation).record((time.perf_counter() - start) * 1000)
+        return result
+
+    def _race(self, operation, call, discard=None):
+        """
+        call(primary) y, si tarda más que hedge_delay, también call(secondary)
+        Devuelve el primer resultado correcto; discard(resultado) se aplica al del perdedor
+        Si fallan las dos, se propaga el error del principal
+        """
+        self._count('calls')
+        primary = _submit(self._timed, self.primary, operation, call)
+        done, _ = wait([primary], timeout=self.hedge_delay(operation))
+        if done:
+            return primary.result()
+
+        self._count('hedged')
+        secondary = _submit(self._timed, self.secondary, operation, call)
+        pending = {primary, secondary}
+        winner = None
+        while pending and winner is None:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            winner = next((future for future in done if future.exception() is None), None)
+        if winner is None:
+            return primary.result()
+        if winner is secondary:
+            self._count('hedge_wins')
+
+        for loser in pending:
+            # Un hilo no se puede interrumpir: la llamada termina (registrando su latencia) y
+            # su resultado se descarta
+            if not loser.cancel() and discard:
+                loser.add_done_callback(_discarder(discard))
+        return winner.result()
+
+    def generate(self, prompt, schema=None):
+        return self._race('generate', lambda backend: backend.generate(prompt, schema))
+
+    def stream(self, prompt, schema=None):
+        # La carrera termina con el primer fragmento; la respuesta perdedora se cierra
+        return self._race(
+            'stream', lambda backend: StartedStream(backend.stream(prompt, schema)),
+            discard=StartedStream.close
+        )
+
+    async def agenerate(self, prompt, schema=None):
+        self._count('calls')
+        primary = asyncio.ensure_future(self._atimed(self.primary, prompt, schema))
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay())
+            if done:
+                return primary.result()
+
+            self._count('hedged')
+            secondary = asyncio.ensure_future(self._atimed(self.secondary, prompt, schema))
+            tasks.append(secondary)
+            pending = set(tasks)
+            winner = None
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((task for task in done if task.exception() is None), None)
+            if winner is None:
+                return primary.result()
+            if winner is secondary:
+                self._count('hedge_wins')
+            return winner.result()
+        finally:
+            # La llamada perdedora (o las dos, si se cancela esta) se cancela
+            for task in tasks:
+                task.cancel()
+
+    async def _atimed(self, backend, prompt, schema):
+        """
+        agenerate de backend registrando su latencia si termina bien o, como muestra censurada,
+        si se cancela: sin las perdedoras el histograma solo vería las rápidas y el retardo de
+        cobertura bajaría sin fin
+        """
+        start = time.perf_counter()
+        try:
+            response = await backend.agenerate(prompt, schema)
+        except asyncio.CancelledError:
+            self.histogram(backend).record((time.perf_counter() - start) * 1000, censored=True)
+            raise
+        self.histogram(backend).record((time.perf_counter() - start) * 1000)
+        return response
+
+    def count_tokens(self, text):
+        return self.primary.count_tokens(text)
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+OpenAI-Compatible Backend
+
+This module talks to any server that implements the OpenAI chat completions
+API (llama.cpp, vLLM, Ollama, LM Studio, a load-test stub...) over plain HTTP
+with the standard library, so it adds no dependencies.
+"""
+
+import json
+import urllib.error
+import urllib.request
+from .base import (BLOCKED_SAFETY, BackendConnectionError, BackendError, ModelBackend,
+                   ModelResponse, ModelStream)
+
+# Segundos de espera por la respuesta del servidor
+REQUEST_TIMEOUT = 60
+
+
+def _retry_after(headers):
+    """Segundos de la cabecera Retry-After (None si no hay o es una fecha)"""
+    try:
+        return float(headers.get('Retry-After'))
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+class OpenAICompatBackend(ModelBackend):
+    """Servidor compatible con la API chat/completions de OpenAI"""
+
+    name = 'openai'
+
+    def _payload(self, prompt, schema, stream):
+        """Cuerpo de la petición chat/completions"""
+        payload = {
+            'model': self.config.MODEL_NAME,
+            'messages': [{'role': 'user', 'content': prompt}],
+            'max_tokens': self.config.MAX_TOKENS,
+            'temperature': self.config.TEMPERATURE,
+            'stream': stream
+        }
+        if schema is not None:
+            payload['response_format'] = {
+                'type': 'json_schema',
+                'json_schema': {'name': 'command_response', 'schema': schema}
+            }
+        return payload
+
+    def _post(self, payload):
+        """Envía la petición y devuelve la respuesta HTTP abierta"""
+        url = self.config.OPENAI_BASE_URL.rstrip('/') + '/chat/completions'
+        headers = {'Content-Type': 'application/json'}
+        if self.config.OPENAI_API_KEY:
+            headers['Authorization'] = f'Bearer {self.config.OPENAI_API_KEY}'
+        request = urllib.request.Request(url, data=json.dumps(payload).encode('utf-8'),
+                                         headers=headers, method='POST')
+        try:
+            return urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT)
+        except urllib.error.HTTPError as e:
+            raise BackendError(f'{url}: HTTP {e.code} {e.reason}', status=e.code,
+                               retry_after=_retry_after(e.headers)) from e
+        except (urllib.error.URLError, OSError) as e:
+            raise BackendConnectionError(f'{url}: {getattr(e, "reason", e)}') from e
+
+    def generate(self, prompt, schema=None):
+        with self._post(self._payload(prompt, schema, stream=False)) as response:
+            try:
+                choice = json.load(response)['choices'][0]
+                text = choice['message'].get('content')
+            except (ValueError, KeyError, IndexError, TypeError) as e:
+                raise BackendError(f'Invalid chat completion: {e}') from e
+        if choice.get('finish_reason') == 'content_filter':
+            return ModelResponse(None, BLOCKED_SAFETY)
+        return ModelResponse(text)
+
+    def stream(self, prompt, schema=None):
+        return _SSEStream(self._post(self._payload(prompt, schema, stream=True)))
+
+
+class _SSEStream(ModelStream):
+    """Fragmentos de una respuesta chat/completions en streaming (server-sent events)"""
+
+    def __init__(self, response):
+        super().__init__(response)
+        self.response = response
+
+    def __iter__(self):
+        with self.response:
+            for line in self.response:
+                line = line.strip()
+                if not line.startswith(b'data:'):
+                    continue
+                data = line[5:].strip()
+                if data == b'[DONE]':
+                    break
+                try:
+                    choice = json.loads(data)['choices'][0]
+                except (ValueError, KeyError, IndexError, TypeError):
+                    continue
+                if choice.get('finish_reason') == 'content_filter':
+                    self.blocked = BLOCKED_SAFETY
+                text = (choice.get('delta') or {}).get('content')
+                if text:
+                    yield text
@@ -0,0 +1,396 @@
+# -*- coding: utf-8 -*-
+"""
+Shared Rate Limiter
+
+This module keeps every cmdh process on the host (terminals, scripts, batch
+jobs and the daemon) within one requests-per-minute and tokens-per-minute
+budget per model. The budget is a pair of token buckets stored in a SQLite
+file in the cache directory; SQLite's file lock makes each check-and-take
+atomic across processes. Callers queue with a ticket and only the oldest
+waiter may take from the buckets, so requests are served in arrival order
+instead of whoever polls first. A 429 from the provider pauses the whole
+queue for its Retry-After, so processes back off together instead of one by
+one.
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from ..prompt_builder import estimate_tokens
+from .base import BackendError, ModelBackend, ModelStream
+
+# Segundos sin noticias tras los que se descarta un turno (proceso terminado)
+_STALE_AFTER = 10.0
+# Intervalo máximo entre comprobaciones mientras se espera turno
+_POLL_INTERVAL = 0.01
+# Pausa tras un 429 sin Retry-After
+_DEFAULT_PAUSE = 1.0
+# Ventana del consumo que muestra status() (segundos)
+_WINDOW = 60.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    scope TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    level REAL NOT NULL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (scope, kind)
+);
+CREATE TABLE IF NOT EXISTS waiters (
+    ticket INTEGER PRIMARY KEY AUTOINCREMENT,
+    scope TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    seen REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS grants (
+    scope TEXT NOT NULL,
+    at REAL NOT NULL,
+    requests INTEGER NOT NULL,
+    tokens INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS grants_scope_at ON grants (scope, at);
+CREATE TABLE IF NOT EXISTS pauses (
+    scope TEXT PRIMARY KEY,
+    resume_at REAL NOT NULL
+);
+"""
+
+
+class QuotaExhaustedError(BackendError):
+    """La llamada no obtuvo turno en el tiempo máximo de espera; retry_after: espera estimada"""
+
+    def __init__(self, retry_after):
+        super().__init__('Shared API quota exhausted', status=429, retry_after=retry_after)
+
+
+class RateLimiter:
+    """
+    Cubos de peticiones y tokens por minuto compartidos entre procesos (0: sin límite)
+    Cada cubo se llena a su ritmo por minuto hasta su capacidad
+    """
+
+    def __init__(self, path, rpm=0, tpm=0, clock=time.time):
+        self.path = Path(path)
+        self.limits = {'requests': rpm, 'tokens': tpm}
+        self.clock = clock
+        self._local = threading.local()
+
+    @property
+    def enabled(self):
+        """Si hay algún límite configurado"""
+        return any(self.limits.values())
+
+    def _connection(self):
+        """
+        Conexión del hilo actual, abierta una sola vez: cerrarla tras cada turno obligaría a
+        SQLite a volcar el WAL cada vez
+        """
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            # Tras un fork la conexión del proceso padre no puede usarse
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            # Con WAL no hace falta sincronizar el disco en cada turno: el estado es efímero
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.executescript(_SCHEMA)
+            local.connection, local.pid = connection, os.getpid()
+        return local.connection
+
+    @contextmanager
+    def transaction(self):
+        """Transacción que bloquea la escritura desde el principio (leer y tomar es atómico)"""
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def _levels(self, connection, scope, now):
+        """Nivel actual de cada cubo con límite, rellenado hasta now"""
+        levels = {}
+        for kind, limit in self.limits.items():
+            if not limit:
+                continue
+            row = connection.execute(
+                'SELECT level, updated FROM buckets WHERE scope = ? AND kind = ?', (scope, kind)
+            ).fetchone()
+            if row is None:
+                levels[kind] = float(limit)
+            else:
+                level, updated = row
+                levels[kind] = min(float(limit), level + max(now - updated, 0) * limit / 60)
+        return levels
+
+    def _store(self, connection, scope, levels, now):
+        connection.executemany(
+            'INSERT OR REPLACE INTO buckets (scope, kind, level, updated) VALUES (?, ?, ?, ?)',
+            [(scope, kind, level, now) for kind, level in levels.items()]
+        )
+
+    def enqueue(self, scope):
+        """Turno en la cola de scope"""
+        with self.transaction() as connection:
+            cursor = connection.execute(
+                'INSERT INTO waiters (scope, pid, seen) VALUES (?, ?, ?)',
+                (scope, os.getpid(), self.clock())
+            )
+            return cursor.lastrowid
+
+    def leave(self, ticket):
+        """Abandona la cola (la llamada se canceló o se rindió)"""
+        with self.transaction() as connection:
+            connection.execute('DELETE FROM waiters WHERE ticket = ?', (ticket,))
+
+    def try_take(self, scope, ticket, tokens):
+        """
+        Toma una petición y tokens de los cubos si ticket es el primero de la cola
+        Devuelve 0 si lo consiguió o los segundos estimados hasta volver a intentarlo
+        """
+        now = self.clock()
+        with self.transaction() as connection:
+            connection.execute('DELETE FROM waiters WHERE seen < ?', (now - _STALE_AFTER,))
+            seen = connection.execute('UPDATE waiters SET seen = ? WHERE ticket = ?',
+                                      (now, ticket))
+            if not seen.rowcount:
+                # El turno se descartó por inactivo: se recupera con el mismo número
+                connection.execute(
+                    'INSERT INTO waiters (ticket, scope, pid, seen) VALUES (?, ?, ?, ?)',
+                    (ticket, scope, os.getpid(), now)
+                )
+            head = connection.execute(
+                'SELECT MIN(ticket) FROM waiters WHERE scope = ?', (scope,)
+            ).fetchone()[0]
+            if head != ticket:
+                return _POLL_INTERVAL
+
+            pause = connection.execute(
+                'SELECT resume_at FROM pauses WHERE scope = ?', (scope,)
+            ).fetchone()
+            wait = max(pause[0] - now, 0.0) if pause else 0.0
+            levels = self._levels(connection, scope, now)
+            needed = {'requests': 1, 'tokens': tokens}
+            for kind, level in levels.items():
+                # Una llamada mayor que el cubo entero espera a que esté lleno
+                need = min(needed[kind], self.limits[kind])
+                wait = max(wait, (need - level) * 60 / self.limits[kind])
+            if wait > 0:
+                return wait
+
+            self._store(connection, scope,
+                        {kind: level - needed[kind] for kind, level in levels.items()}, now)
+            connection.execute('DELETE FROM waiters WHERE ticket = ?', (ticket,))
+            connection.execute('INSERT INTO grants (scope, at, requests, tokens) VALUES '
+                               '(?, ?, 1, ?)', (scope, now, tokens))
+            connection.execute('DELETE FROM grants WHERE at < ?', (now - _WINDOW,))
+            return 0
+
+    def acquire(self, scope, tokens, timeout):
+        """
+        Espera turno y cupo para una llamada de tokens tokens
+        QuotaExhaustedError si no lo obtiene en timeout segundos
+        """
+        ticket = self.enqueue(scope)
+        deadline = time.monotonic() + timeout
+        try:
+            while True:
+                wait = self.try_take(scope, ticket, tokens)
+                if not wait:
+                    ticket = None
+                    return
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise QuotaExhaustedError(wait)
+                time.sleep(min(wait, remaining, 1.0))
+        finally:
+            if ticket is not None:
+                self.leave(ticket)
+
+    async def aacquire(self, scope, tokens, timeout):
+        """Versión asyncio de acquire: el acceso a la base de datos va al executor"""
+        loop = asyncio.get_running_loop()
+        ticket = await loop.run_in_executor(None, self.enqueue, scope)
+        deadline = time.monotonic() + timeout
+        try:
+            while True:
+                wait = await loop.run_in_executor(None, self.try_take, scope, ticket, tokens)
+                if not wait:
+                    ticket = None
+                    return
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise QuotaExhaustedError(wait)
+                await asyncio.sleep(min(wait, remaining, 1.0))
+        finally:
+            if ticket is not None:
+                await loop.run_in_executor(None, self.leave, ticket)
+
+    def charge(self, scope, tokens):
+        """Descuenta tokens de la respuesta sin esperar; el cubo puede quedar en deuda"""
+        if not tokens:
+            return
+        now = self.clock()
+        with self.transaction() as connection:
+            levels = self._levels(connection, scope, now)
+            if 'tokens' in levels:
+                self._store(connection, scope, {'tokens': levels['tokens'] - tokens}, now)
+            connection.execute('INSERT INTO grants (scope, at, requests, tokens) VALUES '
+                               '(?, ?, 0, ?)', (scope, now, tokens))
+
+    def pause(self, scope, seconds):
+        """Ninguna llamada de scope obtiene turno durante seconds segundos"""
+        resume_at = self.clock() + seconds
+        with self.transaction() as connection:
+            connection.execute(
+                'INSERT INTO pauses (scope, resume_at) VALUES (?, ?) ON CONFLICT (scope) '
+                'DO UPDATE SET resume_at = MAX(resume_at, excluded.resume_at)', (scope, resume_at)
+            )
+
+    def status(self):
+        """
+        Consumo de cada modelo en el último minuto: peticiones y tokens usados, cupo
+        disponible, llamadas en cola y segundos de pausa restantes
+        """
+        now = self.clock()
+        with self.transaction() as connection:
+            scopes = [row[0] for row in connection.execute(
+                'SELECT scope FROM grants UNION SELECT scope FROM waiters '
+                'UNION SELECT scope FROM buckets ORDER BY scope'
+            )]
+            result = []
+            for scope in scopes:
+                requests, tokens = connection.execute(
+                    'SELECT COALESCE(SUM(requests), 0), COALESCE(SUM(tokens), 0) FROM grants '
+                    'WHERE scope = ? AND at >= ?', (scope, now - _WINDOW)
+                ).fetchone()
+                waiting = connection.execute(
+                    'SELECT COUNT(*) FROM waiters WHERE scope = ? AND seen >= ?',
+                    (scope, now - _STALE_AFTER)
+                ).fetchone()[0]
+                pause = connection.execute(
+                    'SELECT resume_at FROM pauses WHERE scope = ?', (scope,)
+                ).fetchone()
+                levels = self._levels(connection, scope, now)
+                result.append({
+                    'scope': scope,
+                    'requests': requests,
+                    'tokens': tokens,
+                    'rpm': self.limits['requests'],
+                    'tpm': self.limits['tokens'],
+                    'available_requests': levels.get('requests'),
+                    'available_tokens': levels.get('tokens'),
+                    'waiting': waiting,
+                    'paused': max(pause[0] - now, 0.0) if pause else 0.0,
+                })
+            return result
+
+
+class _ChargedStream(ModelStream):
+    """Respuesta en streaming que descuenta sus tokens del cupo al terminar"""
+
+    def __init__(self, stream, charge):
+        super().__init__(None)
+        self.source = stream
+        self._charge = charge
+
+    def __iter__(self):
+        text = []
+        for chunk in self.source:
+            text.append(chunk)
+            yield chunk
+        self.blocked = self.source.blocked
+        self._charge(''.join(text))
+
+    def close(self):
+        """Deja de leer la respuesta"""
+        close = getattr(self.source, 'close', None)
+        if close:
+            close()
+
+
+class RateLimitedBackend(ModelBackend):
+    """
+    Envuelve un backend: cada llamada espera turno en el límite compartido y descuenta el
+    prompt antes de enviarse y la respuesta al llegar
+    """
+
+    name = 'rate_limited'
+
+    def __init__(self, config, backend, limiter):
+        super().__init__(config)
+        self.backend = backend
+        self.limiter = limiter
+        self.requires_api_key = backend.requires_api_key
+        self.counters = {'calls': 0, 'waited_ms': 0, 'quota_exhausted': 0, 'throttled': 0}
+        self._lock = threading.Lock()
+
+    @property
+    def model_id(self):
+        return self.backend.model_id
+
+    def stats(self):
+        """Llamadas, milisegundos de espera, esperas agotadas y 429 recibidos"""
+        with self._lock:
+            return dict(self.counters)
+
+    def _count(self, counter, amount=1):
+        with self._lock:
+            self.counters[counter] += amount
+
+    def _acquired(self, start):
+        self._count('calls')
+        self._count('waited_ms', round((time.monotonic() - start) * 1000))
+
+    def _charge(self, text):
+        self.limiter.charge(self.model_id, estimate_tokens(text) if text else 0)
+
+    def _on_error(self, error):
+        """Un 429 del proveedor pausa la cola de todos los procesos"""
+        if isinstance(error, QuotaExhaustedError):
+            self._count('quota_exhausted')
+        elif isinstance(error, BackendError) and error.status == 429:
+            self._count('throttled')
+            self.limiter.pause(self.model_id, error.retry_after or _DEFAULT_PAUSE)
+
+    def _call(self, prompt, call):
+        start = time.monotonic()
+        try:
+            self.limiter.acquire(self.model_id, estimate_tokens(prompt),
+                                 self.config.RATE_LIMIT_MAX_WAIT)
+            self._acquired(start)
+            return call()
+        except BackendError as e:
+            self._on_error(e)
+            raise
+
+    def generate(self, prompt, schema=None):
+        response = self._call(prompt, lambda: self.backend.generate(prompt, schema))
+        self._charge(response.text)
+        return response
+
+    def stream(self, prompt, schema=None):
+        return _ChargedStream(self._call(prompt, lambda: self.backend.stream(prompt, schema)),
+                              self._charge)
+
+    async def agenerate(self, prompt, schema=None):
+        start = time.monotonic()
+        try:
+            await self.limiter.aacquire(self.model_id, estimate_tokens(prompt),
+                                        self.config.RATE_LIMIT_MAX_WAIT)
+            self._acquired(start)
+            response = await self.backend.agenerate(prompt, schema)
+        except BackendError as e:
+            self._on_error(e)
+            raise
+        self._charge(response.text)
+        return response
+
+    def count_tokens(self, text):
+        return self.backend.count_tokens(text)
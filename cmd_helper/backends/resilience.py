@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+Retries and Circuit Breaker
+
+This module makes model calls survive transient failures. Errors are
+classified: rate limits (429), server errors (5xx), timeouts and network
+errors are retried with jittered exponential backoff (honouring the
+provider's Retry-After) within a deadline; any other error is returned at
+once. A circuit breaker counts consecutive transient failures and, once the
+backend looks down, fails fast with CircuitOpenError until a cool-down
+passes and a single trial call succeeds; MCPServer then falls back to the
+cache instead of waiting for the model.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from .base import BackendConnectionError, BackendError, ModelBackend, StartedStream
+from .rate_limit import QuotaExhaustedError
+
+# Códigos HTTP de errores transitorios
+RETRYABLE_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+
+class CircuitOpenError(BackendError):
+    """El backend falla repetidamente y no se le envían peticiones durante retry_after segundos"""
+
+    def __init__(self, retry_after):
+        super().__init__('Model backend unavailable', status=503, retry_after=retry_after)
+
+
+def is_retryable(error):
+    """Si el error es transitorio y la llamada puede repetirse"""
+    # Ni el circuito abierto ni el cupo compartido agotado mejoran al reintentar enseguida
+    if isinstance(error, (CircuitOpenError, QuotaExhaustedError)):
+        return False
+    if isinstance(error, BackendConnectionError):
+        return True
+    if isinstance(error, BackendError):
+        # Sin código, p. ej. una respuesta mal formada: repetirla daría lo mismo
+        return error.status in RETRYABLE_STATUSES
+    return isinstance(error, (TimeoutError, ConnectionError, asyncio.TimeoutError))
+
+
+def is_unavailable(error):
+    """Si el error indica que el backend no está disponible (transitorio, circuito o cupo)"""
+    return isinstance(error, (CircuitOpenError, QuotaExhaustedError)) or is_retryable(error)
+
+
+class CircuitBreaker:
+    """
+    Corta las llamadas tras threshold fallos transitorios seguidos (0: nunca)
+    Tras cooldown segundos deja pasar una llamada de prueba: si va bien se cierra y si
+    falla vuelve a abrirse
+    """
+
+    def __init__(self, threshold, cooldown, clock=time.monotonic):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        """closed, open o half_open (se admite una llamada de prueba)"""
+        with self._lock:
+            if self.opened_at is None:
+                return 'closed'
+            return 'open' if self.clock() - self.opened_at < self.cooldown else 'half_open'
+
+    def allow(self):
+        """Deja pasar la llamada o lanza CircuitOpenError"""
+        if not self.threshold:
+            return
+        with self._lock:
+            if self.opened_at is None:
+                return
+            remaining = self.opened_at + self.cooldown - self.clock()
+            if remaining <= 0 and not self._trial:
+                self._trial = True
+                return
+        raise CircuitOpenError(max(remaining, 0.0))
+
+    def record_success(self):
+        """La llamada obtuvo respuesta del backend"""
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        """La llamada falló con un error transitorio; devuelve si el circuito se abrió"""
+        with self._lock:
+            self.failures += 1
+            reopened = self._trial
+            self._trial = False
+            if self.threshold and (reopened or self.failures >= self.threshold):
+                newly_open = self.opened_at is None or reopened
+                self.opened_at = self.clock()
+                return newly_open
+            return False
+
+
+class ResilientBackend(ModelBackend):
+    """Envuelve un backend: reintenta sus errores transitorios y corta si no está disponible"""
+
+    name = 'resilient'
+
+    def __init__(self, config, backend):
+        super().__init__(config)
+        self.backend = backend
+        self.requires_api_key = backend.requires_api_key
+        self.breaker = CircuitBreaker(config.BREAKER_THRESHOLD, config.BREAKER_COOLDOWN)
+        self.counters = {'calls': 0, 'retries': 0, 'failures': 0, 'short_circuits': 0,
+                         'circuit_opened': 0}
+        self._lock = threading.Lock()
+        self._rng = random.Random()
+
+    @property
+    def model_id(self):
+        return self.backend.model_id
+
+    def stats(self):
+        """Contadores de llamadas, reintentos, fallos y cortes, y estado del circuito"""
+        with self._lock:
+            stats = dict(self.counters)
+        stats['breaker'] = self.breaker.state
+        return stats
+
+    def _count(self, counter):
+        with self._lock:
+            self.counters[counter] += 1
+
+    def backoff(self, attempt, error):
+        """Segundos antes del reintento attempt (0, 1...): exponencial con jitter completo"""
+        ceiling = min(self.config.RETRY_MAX_DELAY_MS,
+                      self.config.RETRY_BASE_DELAY_MS * 2 ** attempt) / 1000
+        with self._lock:
+            delay = self._rng.uniform(0, ceiling)
+        return max(delay, getattr(error, 'retry_after', None) or 0)
+
+    def _before_call(self):
+        """Comprueba el circuito antes de cada intento"""
+        try:
+            self.breaker.allow()
+        except CircuitOpenError:
+            self._count('short_circuits')
+            raise
+
+    def _after_error(self, error, attempt, start):
+        """
+        Registra un intento fallido y devuelve los segundos de espera antes de reintentar,
+        o None si el error se propaga
+        """
+        if not is_retryable(error):
+            # El backend respondió: el fallo no es de disponibilidad
+            self.breaker.record_success()
+            self._count('failures')
+            return None
+        if self.breaker.record_failure():
+            self._count('circuit_opened')
+        delay = self.backoff(attempt, error)
+        if (attempt >= self.config.MAX_RETRIES
+                or time.monotonic() - start + delay > self.config.RETRY_DEADLINE):
+            self._count('failures')
+            return None
+        self._count('retries')
+        return delay
+
+    def _call(self, call):
+        """call() con reintentos"""
+        self._count('calls')
+        start = time.monotonic()
+        attempt = 0
+        while True:
+            self._before_call()
+            try:
+                result = call()
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                delay = self._after_error(e, attempt, start)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            return result
+
+    def generate(self, prompt, schema=None):
+        return self._call(lambda: self.backend.generate(prompt, schema))
+
+    def stream(self, prompt, schema=None):
+        # Solo se reintenta hasta el primer fragmento: después el texto ya se ha mostrado
+        return self._call(lambda: StartedStream(self.backend.stream(prompt, schema)))
+
+    async def agenerate(self, prompt, schema=None):
+        self._count('calls')
+        start = time.monotonic()
+        attempt = 0
+        while True:
+            self._before_call()
+            try:
+                response = await self.backend.agenerate(prompt, schema)
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                delay = self._after_error(e, attempt, start)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            return response
+
+    def count_tokens(self, text):
+        return self.backend.count_tokens(text)
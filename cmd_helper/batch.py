@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+Batch Module
+
+This module implements `cmdh batch`: many natural-language requests are
+translated concurrently with a bounded thread pool and written as JSONL.
+The context is collected once per target directory and shared by every
+request for that directory, so the cost of a batch is dominated by the
+model calls (or cache lookups) that run in parallel.
+"""
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from .i18n import use_language
+
+
+def parse_requests(lines, default_cwd=None):
+    """
+    Peticiones de la entrada: una por línea, en texto plano o como objeto JSON
+    {"request": ..., "cwd": ..., "id": ..., "lang": ...}; se ignoran líneas vacías y
+    comentarios '#'. Los cwd relativos se resuelven desde default_cwd
+    Devuelve una lista de dicts con request, cwd, id y, si se indica, lang
+    """
+    default_cwd = default_cwd or os.getcwd()
+    requests = []
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        if line.startswith('{'):
+            try:
+                item = json.loads(line)
+            except ValueError:
+                item = None
+            if isinstance(item, dict) and item.get('request'):
+                request = {
+                    'request': item['request'],
+                    'cwd': os.path.normpath(os.path.join(default_cwd, item.get('cwd') or '.')),
+                    'id': item.get('id')
+                }
+                if item.get('lang'):
+                    request['lang'] = item['lang']
+                requests.append(request)
+                continue
+        requests.append({'request': line, 'cwd': default_cwd, 'id': None})
+    return requests
+
+
+class BatchRunner:
+    """Genera comandos para muchas peticiones en paralelo con un contexto por directorio"""
+
+    def __init__(self, server, command_handler, workers=8, refresh_cache=False):
+        self.server = server
+        self.command_handler = command_handler
+        self.workers = max(1, workers)
+        self.refresh_cache = refresh_cache
+
+    def collect_contexts(self, requests):
+        """Contexto de cada directorio distinto, recopilado una sola vez"""
+        # Sin petición: el listado no se ordena para una petición concreta y sirve para todas
+        return {
+            cwd: self.server.context_analyzer.get_current_context(cwd=cwd)
+            for cwd in dict.fromkeys(item['cwd'] for item in requests)
+        }
+
+    def run(self, requests, ordered=True):
+        """
+        Procesa las peticiones y devuelve un iterador de registros de resultado
+        ordered=False entrega cada resultado en cuanto termina
+        """
+        contexts = self.collect_contexts(requests)
+        with ThreadPoolExecutor(max_workers=self.workers,
+                                thread_name_prefix='cmd-helper-batch') as executor:
+            futures = {
+                executor.submit(self._process, index, item, contexts[item['cwd']]): index
+                for index, item in enumerate(requests)
+            }
+            if not ordered:
+                for future in as_completed(futures):
+                    yield future.result()
+                return
+
+            # Orden de entrada: se guardan los resultados que llegan antes de su turno
+            pending = {}
+            next_index = 0
+            for future in as_completed(futures):
+                pending[futures[future]] = future.result()
+                while next_index in pending:
+                    yield pending.pop(next_index)
+                    next_index += 1
+
+    def _process(self, index, item, context):
+        """Genera el comando de una petición y construye su registro"""
+        start = time.perf_counter()
+        record = {'index': index}
+        if item['id'] is not None:
+            record['id'] = item['id']
+        record['request'] = item['request']
+        try:
+            # Cada petición puede pedir su idioma sin afectar a las demás
+            with use_language(item.get('lang')):
+                result = self.server.generate_command(
+                    item['request'], refresh_cache=self.refresh_cache, cwd=item['cwd'],
+                    context=context
+                )
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            result = {'command': None, 'explanation': str(e), 'is_dangerous': False,
+                      'source': 'error'}
+
+        command = result['command']
+        record.update(
+            command=command,
+            explanation=result['explanation'],
+            is_dangerous=bool(
+                result['is_dangerous']
+                or (command and self.command_handler.is_command_dangerous(command))
+            ),
+            latency_ms=round((time.perf_counter() - start) * 1000, 1),
+            cache_hit=result.get('source') in ('cache', 'similar'),
+            source=result.get('source')
+        )
+        return record
+
+
+def write_jsonl(records, output):
+    """
+    Escribe los registros como JSONL a medida que llegan
+    Devuelve el recuento: total, respuestas de la caché y peticiones sin comando
+    """
+    counts = {'total': 0, 'cache_hits': 0, 'failed': 0}
+    for record in records:
+        output.write(json.dumps(record, ensure_ascii=False) + '\n')
+        output.flush()
+        counts['total'] += 1
+        counts['cache_hits'] += record['cache_hit']
+        counts['failed'] += not record['command']
+    return counts
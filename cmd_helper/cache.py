@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+Response Cache Module
+
+This module provides a persistent on-disk cache for model responses, so that
+repeating a request in the same context does not require another round trip
+to the AI model.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from .config import get_config
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    request TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access);
+CREATE INDEX IF NOT EXISTS responses_request ON responses (request);
+CREATE TABLE IF NOT EXISTS stats (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+# Campos del resultado que describen una respuesta concreta (su origen y tiempos) y no se guardan
+_VOLATILE_FIELDS = frozenset({'timings', 'prompt_stats', 'source', 'matched_request',
+                              'similarity'})
+
+
+def default_cache_dir(config=None):
+    """Directorio de caché: CMD_HELPER_CACHE_DIR, $XDG_CACHE_HOME o ~/.cache"""
+    configured = (config or get_config()).CACHE_DIR
+    if configured:
+        return Path(configured).expanduser()
+    xdg_cache = os.environ.get('XDG_CACHE_HOME')
+    base = Path(xdg_cache) if xdg_cache else Path.home() / '.cache'
+    return base / 'cmd-helper'
+
+
+class ResponseCache:
+    """Caché persistente (SQLite) con TTL y expulsión LRU acotada por tamaño"""
+
+    def __init__(self, cache_dir=None, ttl=None, max_entries=None, config=None):
+        self.config = config or get_config()
+        self.cache_dir = Path(cache_dir) if cache_dir else default_cache_dir(self.config)
+        self.db_path = self.cache_dir / 'responses.sqlite3'
+        self.ttl = ttl if ttl is not None else self.config.CACHE_TTL
+        self.max_entries = (max_entries if max_entries is not None
+                            else self.config.CACHE_MAX_ENTRIES)
+        self._schema_ready = False
+
+    def _connect(self):
+        """Abre una conexión; cada operación usa la suya para ser segura entre hilos"""
+        if not self._schema_ready:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        # timeout: espera a que otras terminales liberen el bloqueo de escritura
+        connection = sqlite3.connect(self.db_path, timeout=5)
+        if not self._schema_ready:
+            # WAL permite lectores concurrentes mientras otro proceso escribe
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.executescript(_SCHEMA)
+            self._schema_ready = True
+        return connection
+
+    @contextmanager
+    def transaction(self):
+        """Transacción que confirma o revierte y cierra siempre la conexión"""
+        connection = self._connect()
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    @staticmethod
+    def normalize_request(user_request):
+        """Normaliza la petición: minúsculas, espacios colapsados, sin puntuación final"""
+        normalized = re.sub(r'\s+', ' ', user_request.strip().lower())
+        return normalized.rstrip('.!?¿¡ ')
+
+    @classmethod
+    def context_fingerprint(cls, context):
+        """Huella de las partes del contexto que influyen en el comando generado"""
+        relevant = {
+            'pwd': context.get('pwd'),
+            'platform': context.get('platform'),
+            'files': sorted(
+                entry['name'] for entry in context.get('files', []) if 'name' in entry
+            )
+        }
+        serialized = json.dumps(relevant, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+
+    def make_key(self, user_request, language, model_name, context):
+        """Clave de caché a partir de petición, idioma, modelo y contexto"""
+        parts = [
+            self.normalize_request(user_request),
+            language,
+            model_name,
+            self.context_fingerprint(context)
+        ]
+        return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Devuelve la respuesta guardada o None si no existe o ha expirado"""
+        now = time.time()
+        with self.transaction() as connection:
+            row = connection.execute(
+                'SELECT payload, created_at FROM responses WHERE key = ?', (key,)
+            ).fetchone()
+
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    connection.execute('DELETE FROM responses WHERE key = ?', (key,))
+                self._increment(connection, 'misses')
+                return None
+
+            connection.execute(
+                'UPDATE responses SET last_access = ? WHERE key = ?', (now, key)
+            )
+            self._increment(connection, 'hits')
+            return json.loads(row[0])
+
+    def find_request(self, user_request):
+        """
+        Respuesta más reciente a la misma petición en cualquier contexto, o None
+        Respaldo cuando el modelo no está disponible
+        """
+        with self.transaction() as connection:
+            row = connection.execute(
+                'SELECT payload FROM responses WHERE request = ? AND created_at >= ? '
+                'ORDER BY last_access DESC LIMIT 1',
+                (self.normalize_request(user_request), time.time() - self.ttl)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, user_request, result):
+        """Guarda una respuesta y expulsa las entradas menos usadas si se supera el límite"""
+        self.set_many([(key, user_request, result)])
+
+    def set_many(self, entries):
+        """Guarda varias respuestas (key, petición, resultado) en una sola transacción"""
+        now = time.time()
+        # Se guarda el resultado completo (danger_level, alternatives... en modo JSON) para que
+        # un acierto tenga la misma forma que la respuesta del modelo
+        rows = [
+            (key, self.normalize_request(user_request), json.dumps({
+                name: value for name, value in result.items() if name not in _VOLATILE_FIELDS
+            }), now, now)
+            for key, user_request, result in entries
+        ]
+        # La transacción hace la escritura atómica frente a otras terminales
+        with self.transaction() as connection:
+            connection.executemany('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)', rows)
+            self._evict(connection)
+
+    def _evict(self, connection):
+        """Elimina las entradas expiradas y las menos usadas por encima del límite"""
+        connection.execute(
+            'DELETE FROM responses WHERE created_at < ?', (time.time() - self.ttl,)
+        )
+        count = connection.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            connection.execute(
+                'DELETE FROM responses WHERE key IN '
+                '(SELECT key FROM responses ORDER BY last_access ASC LIMIT ?)',
+                (overflow,)
+            )
+
+    def record(self, counter):
+        """Incrementa un contador de estadísticas (p. ej. aciertos por similitud)"""
+        with self.transaction() as connection:
+            self._increment(connection, counter)
+
+    @staticmethod
+    def _increment(connection, counter):
+        """Incrementa un contador de estadísticas"""
+        connection.execute(
+            'INSERT INTO stats (name, value) VALUES (?, 1) '
+            'ON CONFLICT(name) DO UPDATE SET value = value + 1',
+            (counter,)
+        )
+
+    def stats(self):
+        """
+        Estadísticas de uso: entradas, aciertos exactos, aciertos por similitud,
+        fallos de la clave exacta y tasa de acierto total
+        """
+        with self.transaction() as connection:
+            entries = connection.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+            counters = dict(connection.execute('SELECT name, value FROM stats').fetchall())
+
+        hits = counters.get('hits', 0)
+        similar_hits = counters.get('similar_hits', 0)
+        misses = counters.get('misses', 0)
+        lookups = hits + misses
+        return {
+            'entries': entries,
+            'hits': hits,
+            'similar_hits': similar_hits,
+            'misses': misses,
+            'hit_rate': (hits + similar_hits) / lookups if lookups else 0.0
+        }
+
+    def clear(self):
+        """Vacía la caché y sus estadísticas"""
+        with self.transaction() as connection:
+            connection.execute('DELETE FROM responses')
+            connection.execute('DELETE FROM stats')
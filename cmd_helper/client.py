@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""
+Client Module
+
+This module is the thin `cmdhc` entry point for the cmd-helper daemon. It only
+imports the standard library (and the stdlib-only i18n helpers): the model
+client, translator and caches live in the long-lived daemon process, which is
+started on first use. If the daemon cannot be reached, the request is handled
+in-process by the regular `cmdh` command.
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from .i18n import t, get_translator
+
+# Tamaño máximo de un mensaje del protocolo (una línea JSON)
+MAX_MESSAGE_BYTES = 1024 * 1024
+# Segundos que se espera la respuesta a generate si el daemon no indica su propio límite
+DEFAULT_REPLY_TIMEOUT = 120.0
+
+
+def default_socket_path():
+    """
+    Ruta del socket del daemon: CMD_HELPER_SOCKET, $XDG_RUNTIME_DIR o ~/.cache/cmd-helper
+    Solo se consulta el entorno del proceso para no cargar archivos .env en el cliente
+    """
+    configured = os.environ.get('CMD_HELPER_SOCKET')
+    if configured:
+        return Path(configured).expanduser()
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir:
+        return Path(runtime_dir) / 'cmd-helper.sock'
+    return Path.home() / '.cache' / 'cmd-helper' / 'daemon.sock'
+
+
+def send_message(message, socket_path=None, timeout=None):
+    """Envía un mensaje JSON al daemon y devuelve su respuesta (OSError si no responde)"""
+    path = str(socket_path or default_socket_path())
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.settimeout(timeout)
+        connection.connect(path)
+        connection.sendall(json.dumps(message).encode('utf-8') + b'\n')
+        with connection.makefile('rb') as stream:
+            line = stream.readline(MAX_MESSAGE_BYTES)
+
+    if not line:
+        raise ConnectionError('Empty response from cmd-helper daemon')
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        raise ConnectionError(f'Invalid response from cmd-helper daemon: {e}') from e
+
+
+def ensure_daemon(socket_path=None, start_timeout=5.0):
+    """
+    Comprueba que el daemon responde y, si no, lo arranca en segundo plano
+    Devuelve su respuesta a ping, o None si no se pudo arrancar
+    """
+    socket_path = socket_path or default_socket_path()
+    try:
+        return send_message({'op': 'ping'}, socket_path, timeout=1)
+    except OSError:
+        pass
+
+    try:
+        subprocess.Popen(  # pylint: disable=consider-using-with
+            [sys.executable, '-m', 'cmd_helper.daemon', '--socket', str(socket_path)],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            cwd=Path.home(),
+            start_new_session=True
+        )
+    except OSError:
+        return None
+
+    deadline = time.monotonic() + start_timeout
+    while time.monotonic() < deadline:
+        try:
+            return send_message({'op': 'ping'}, socket_path, timeout=1)
+        except OSError:
+            time.sleep(0.05)
+    return None
+
+
+def _relevant_environment():
+    """Entorno del cliente que el daemon necesita para construir el contexto"""
+    names = ['PATH', 'HOME', 'USER', 'SHELL', 'PYTHON_VERSION', 'NODE_VERSION', 'HISTFILE',
+             'XDG_DATA_HOME']
+    return {name: os.environ[name] for name in names if name in os.environ}
+
+
+def _report_source(result):
+    """Indica si la respuesta vino de la caché o de una intención local"""
+    timings = result.get('timings') or {}
+    if result.get('source') == 'cache':
+        print(t('cache.hit').format(ms=timings.get('total_ms', 0)))
+    elif result.get('source') == 'similar':
+        print(t('cache.similar').format(
+            request=result['matched_request'],
+            similarity=result['similarity'],
+            ms=timings.get('total_ms', 0)
+        ))
+    elif result.get('source') == 'rules':
+        print(t('rules.hit').format(intent=result['intent'], ms=timings.get('total_ms', 0)))
+
+
+def _confirm(result):
+    """Muestra el comando y pide confirmación (igual que CommandHandler.confirm_execution)"""
+    print("\n" + t('commands.suggested_command'))
+    print(result['command'])
+
+    if result.get('explanation'):
+        print("\n" + t('commands.explanation'))
+        print(result['explanation'])
+
+    if result.get('requires_confirmation'):
+        print("\n" + t('security.warning'))
+        confirmation = input("\n" + t('security.confirm_dangerous') + " ")
+        return confirmation.upper() in ["SI", "YES"]
+
+    confirmation = input("\n" + t('commands.execute_command') + " ")
+    return confirmation.lower() in ['y', 'yes', 'sí', 'si']
+
+
+def _run_in_process(args):
+    """Fallback: procesa la petición en este proceso con el comando `cmdh` completo"""
+    from .main import main as cli_main  # pylint: disable=import-outside-toplevel
+
+    cli_args = ['--lang', args.lang]
+    if args.no_cache:
+        cli_args.append('--no-cache')
+    if args.refresh:
+        cli_args.append('--refresh')
+    cli_args.append(args.request)
+    return cli_main.main(args=cli_args, prog_name='cmdh', standalone_mode=False) or 0
+
+
+def _parse_args(argv):
+    """Argumentos de línea de comandos del cliente"""
+    parser = argparse.ArgumentParser(
+        prog='cmdhc',
+        description='Cmd Helper thin client / Cliente ligero de Cmd Helper'
+    )
+    parser.add_argument('request', nargs='?')
+    parser.add_argument('--lang', choices=['es', 'en', 'auto'], default='auto')
+    parser.add_argument('--no-cache', action='store_true')
+    parser.add_argument('--refresh', action='store_true')
+    parser.add_argument('--no-daemon', action='store_true',
+                        help='Process the request in-process / Sin daemon')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Punto de entrada de `cmdhc`"""
+    args = _parse_args(argv)
+    # El idioma se resuelve aquí: el daemon no comparte el locale de esta terminal
+    language = get_translator(None if args.lang == 'auto' else args.lang).language
+
+    if not args.request:
+        print(t('app.usage'))
+        return 0
+
+    socket_path = default_socket_path()
+    daemon = None
+    if not args.no_daemon and hasattr(socket, 'AF_UNIX'):
+        daemon = ensure_daemon(socket_path)
+    if not daemon:
+        return _run_in_process(args)
+    reply_timeout = DEFAULT_REPLY_TIMEOUT
+    if isinstance(daemon, dict) and isinstance(daemon.get('reply_timeout'), (int, float)):
+        reply_timeout = daemon['reply_timeout']
+
+    print(t('messages.analyzing_request'))
+    try:
+        response = send_message({
+            'op': 'generate',
+            'request': args.request,
+            'lang': language,
+            'use_cache': not args.no_cache,
+            'refresh': args.refresh,
+            'cwd': os.getcwd(),
+            'env': _relevant_environment()
+        }, socket_path, timeout=reply_timeout)
+    except OSError:
+        # Incluye socket.timeout: un daemon bloqueado no deja al cliente esperando para siempre
+        return _run_in_process(args)
+
+    if not response.get('ok'):
+        print(t('messages.unexpected_error') + " " + str(response.get('error')))
+        return 1
+
+    result = response['result']
+    _report_source(result)
+    if not result['command']:
+        print(t('messages.no_command_generated'))
+        if result.get('explanation'):
+            print(t('messages.reason') + " " + result['explanation'])
+        return 1
+
+    try:
+        if not _confirm(result):
+            print(t('messages.operation_cancelled'))
+            return 0
+        print("\n" + t('commands.executing') + " " + result['command'])
+        # La salida va directamente a la terminal del usuario
+        return_code = subprocess.run(result['command'], shell=True, check=False).returncode
+    except KeyboardInterrupt:
+        print("\n" + t('messages.operation_cancelled_by_user'))
+        return 130
+
+    if return_code == 0:
+        print("\n" + t('messages.command_executed_successfully'))
+    else:
+        print("\n" + t('messages.execution_error'))
+    return return_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -6,52 +6,54 @@ This module handles the safe execution of system commands with user confirmation
 and security checks for potentially dangerous operations.
 """
 
-import subprocess
-from colorama import Fore, Style, init
-from .config import Config
+from .config import get_config
+from .danger_rules import get_danger_rules
+from .execution import StreamingExecution
 from .i18n import t
+from .lazy import lazy_import, init_colorama
 
-# Inicializar colorama para multiplataforma
-init(autoreset=True)
+colorama = lazy_import('colorama')
 
 
 class CommandHandler:
     """Maneja la ejecución segura de comandos del sistema"""
 
-    def __init__(self):
-        self.config = Config()
+    def __init__(self, config=None):
+        # Inicializar colorama para multiplataforma
+        init_colorama()
+        self.config = config or get_config()
 
     def is_command_dangerous(self, command):
         """Verifica si un comando es potencialmente peligroso"""
-        command_lower = command.lower()
-        
-        # Verificar patrones básicos de la configuración
-        for dangerous in self.config.DANGEROUS_COMMANDS:
-            if dangerous in command_lower:
-                return True
-        
-        # Verificaciones adicionales más inteligentes
-        # Detectar chmod 777 con cualquier opción
-        if 'chmod' in command_lower and '777' in command_lower:
-            return True
-            
-        # Detectar sudo rm con cualquier opción
-        if 'sudo' in command_lower and 'rm' in command_lower:
-            return True
-            
-        return False
-
-    def confirm_execution(self, command, explanation=""):
-        """Pide confirmación al usuario antes de ejecutar"""
-        print("\n" + Fore.CYAN + t('commands.suggested_command') + Style.RESET_ALL)
-        print(Fore.WHITE + command + Style.RESET_ALL)
+        return self.danger_reason(command) is not None
+
+    def danger_reason(self, command):
+        """Identificador de la regla de peligro que cumple el comando (None si ninguna)"""
+        return get_danger_rules(self.config).match(command)
+
+    def confirm_execution(self, command, explanation="", show_command=True, alternatives=None):
+        """
+        Pide confirmación al usuario antes de ejecutar
+        show_command=False si el comando ya se mostró (modo streaming)
+        alternatives: otros comandos propuestos por el modelo (modo JSON), solo se muestran
+        """
+        if show_command:
+            self.show_command(command)
 
         if explanation:
-            print("\n" + Fore.GREEN + t('commands.explanation') + Style.RESET_ALL)
+            print("\n" + colorama.Fore.GREEN + t('commands.explanation') + colorama.Style.RESET_ALL)
             print(explanation)
 
-        if self.is_command_dangerous(command):
-            print("\n" + Fore.RED + t('security.warning') + Style.RESET_ALL)
+        if alternatives:
+            print("\n" + colorama.Style.DIM + t('commands.alternatives') + colorama.Style.RESET_ALL)
+            for alternative in alternatives:
+                print(colorama.Style.DIM + "  " + alternative + colorama.Style.RESET_ALL)
+
+        reason = self.danger_reason(command)
+        if reason is not None:
+            print("\n" + colorama.Fore.RED + t('security.warning') + colorama.Style.RESET_ALL)
+            print(colorama.Style.DIM + t('security.rule').format(rule=reason)
+                  + colorama.Style.RESET_ALL)
             confirmation = input("\n" + t('security.confirm_dangerous') + " ")
             # Aceptar tanto "SI" (español) como "YES" (inglés)
             return confirmation.upper() in ["SI", "YES"]
@@ -59,42 +61,55 @@ class CommandHandler:
         confirmation = input("\n" + t('commands.execute_command') + " ")
         return confirmation.lower() in ['y', 'yes', 'sí', 'si']
 
-    def execute_command(self, command):
-        """Ejecuta un comando de forma segura"""
-        try:
-            print("\n" + Fore.YELLOW + t('commands.executing') + " " + command + Style.RESET_ALL)
-
-            # Ejecutar con shell para permitir expansión de globs y pipes
-            result = subprocess.run(
-                command,
-                shell=True,
-                capture_output=True,
-                text=True,
-                encoding='utf-8',
-                errors='replace',  # Reemplazar caracteres no válidos en lugar de fallar
-                timeout=30,  # Timeout de 30 segundos
-                check=False  # No raise exception on non-zero exit
+    def show_command(self, command):
+        """Muestra el comando sugerido"""
+        suggested_msg = t('commands.suggested_command')
+        print("\n" + colorama.Fore.CYAN + suggested_msg + colorama.Style.RESET_ALL)
+        print(colorama.Fore.WHITE + command + colorama.Style.RESET_ALL)
+
+    def execute_command(self, command, timeout=None, spool_output=None):
+        """
+        Ejecuta un comando mostrando su salida en directo
+        El resultado conserva solo el principio y el final de stdout/stderr; con
+        spool_output la salida completa se guarda en un archivo temporal (output_file).
+        timeout en segundos; por defecto COMMAND_TIMEOUT (0 = sin límite)
+        """
+        timeout = self.config.COMMAND_TIMEOUT if timeout is None else timeout
+        spool_output = self.config.SPOOL_OUTPUT if spool_output is None else spool_output
+        execution = StreamingExecution(
+            command,
+            head_size=self.config.OUTPUT_HEAD_BYTES,
+            tail_size=self.config.OUTPUT_TAIL_BYTES,
+            spool=spool_output,
+            on_first_output=lambda: print(
+                "\n" + colorama.Fore.GREEN + t('commands.output') + colorama.Style.RESET_ALL
             )
+        )
+        try:
+            executing_msg = t('commands.executing') + " " + command
+            print("\n" + colorama.Fore.YELLOW + executing_msg + colorama.Style.RESET_ALL)
 
-            if result.stdout:
-                print("\n" + Fore.GREEN + t('commands.output') + Style.RESET_ALL)
-                print(result.stdout)
-
-            if result.stderr and result.returncode != 0:
-                print("\n" + Fore.RED + t('commands.error') + Style.RESET_ALL)
-                print(result.stderr)
-
-            return {
-                'success': result.returncode == 0,
-                'stdout': result.stdout,
-                'stderr': result.stderr,
-                'return_code': result.returncode
-            }
-
-        except subprocess.TimeoutExpired:
-            print(Fore.RED + t('security.timeout_error') + Style.RESET_ALL)
-            return {'success': False, 'error': 'Timeout'}
+            return_code, output_file = execution.run(timeout=timeout or None)
 
         except OSError as e:
-            print(Fore.RED + t('security.execution_error') + " " + str(e) + Style.RESET_ALL)
+            error_msg = t('security.execution_error') + " " + str(e)
+            print(colorama.Fore.RED + error_msg + colorama.Style.RESET_ALL)
             return {'success': False, 'error': str(e)}
+
+        marker = t('commands.output_omitted')
+        result = {
+            'success': return_code == 0,
+            'stdout': execution.stdout.text(marker),
+            'stderr': execution.stderr.text(marker),
+            'return_code': return_code,
+            'truncated': bool(execution.stdout.omitted or execution.stderr.omitted)
+        }
+        if output_file:
+            result['output_file'] = output_file
+            print(colorama.Style.DIM + t('commands.output_saved').format(path=output_file)
+                  + colorama.Style.RESET_ALL)
+        if return_code is None:
+            timeout_msg = t('security.timeout_error').format(seconds=timeout)
+            print(colorama.Fore.RED + timeout_msg + colorama.Style.RESET_ALL)
+            result['error'] = 'Timeout'
+        return result
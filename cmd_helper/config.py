@@ -4,46 +4,273 @@ Configuration Module
 
 This module contains all configuration settings for the Cmd Helper application,
 including API keys, model settings, and security configurations.
+
+Settings are typed and validated descriptors resolved when read: the process
+environment wins over the first config file found (.env, ~/.cmd-helper/config.env
+or ~/.config/cmd-helper/config.env), which is only read on first access.
+Components share the get_config() instance (or one injected by the caller),
+and reload_config() re-reads the file when it changes (the daemon checks it
+before every request).
 """
 
 import os
+import warnings
 from pathlib import Path
-from dotenv import load_dotenv
+from .lazy import lazy_import
+
+dotenv = lazy_import('dotenv')
+
+_ENV_LOADED = False
+# Archivo de configuración cargado, su firma (mtime, tamaño) y sus valores
+_ENV_FILE = None
+_ENV_SIGNATURE = None
+_FILE_VALUES = {}
+# (variable, valor) rechazados de los que ya se ha avisado
+_WARNED = set()
+
+_CONFIG = None
+
+
+def _env_locations():
+    """Archivos de configuración por orden de prioridad"""
+    return [
+        Path.cwd() / '.env',
+        Path.home() / '.cmd-helper' / 'config.env',
+        Path.home() / '.config' / 'cmd-helper' / 'config.env'
+    ]
+
+
+def _find_env_file():
+    """Primer archivo de configuración que existe, o None"""
+    for env_file in _env_locations():
+        if env_file.exists():
+            return env_file
+    return None
+
+
+def _file_signature(env_file):
+    """Firma del archivo para detectar cambios (None si no hay archivo)"""
+    if env_file is None:
+        return None
+    try:
+        stat = env_file.stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def load_env_files(force=False):
+    """
+    Carga variables de entorno desde el primer archivo .env encontrado
+    1. Current directory .env (for development)
+    2. User's home config directory (for installed package)
+
+    Se ejecuta una sola vez (salvo force) y solo cuando se lee un ajuste que depende del
+    entorno, para que importar este módulo no toque el sistema de archivos. Los valores del
+    archivo no se copian a os.environ: las variables del entorno tienen prioridad.
+    """
+    global _ENV_LOADED, _ENV_FILE, _ENV_SIGNATURE, _FILE_VALUES
+
+    if _ENV_LOADED and not force:
+        return
+    _ENV_LOADED = True
+
+    env_file = _find_env_file()
+    values = {}
+    if env_file is not None:
+        values = {name: value for name, value in dotenv.dotenv_values(env_file).items()
+                  if value is not None}
+    _ENV_FILE, _ENV_SIGNATURE, _FILE_VALUES = env_file, _file_signature(env_file), values
+
+
+def env_files_changed():
+    """Indica si el archivo de configuración cambió (o apareció) desde que se cargó"""
+    if not _ENV_LOADED:
+        return False
+    env_file = _find_env_file()
+    return env_file != _ENV_FILE or _file_signature(env_file) != _ENV_SIGNATURE
+
+
+def reload_config():
+    """Vuelve a leer el archivo de configuración si ha cambiado; devuelve si se recargó"""
+    if not env_files_changed():
+        return False
+    load_env_files(force=True)
+    return True
 
-# Load environment variables from multiple locations
-# 1. Current directory .env (for development)
-# 2. User's home config directory (for installed package)
-env_locations = [
-    Path.cwd() / '.env',
-    Path.home() / '.cmd-helper' / 'config.env',
-    Path.home() / '.config' / 'cmd-helper' / 'config.env'
-]
 
-for env_file in env_locations:
-    if env_file.exists():
-        load_dotenv(env_file)
-        break
+def get_config():
+    """Configuración compartida por todos los componentes que no reciben una propia"""
+    global _CONFIG
+
+    if _CONFIG is None:
+        _CONFIG = Config()
+    return _CONFIG
+
+
+def env_flag(value):
+    """Interpreta una variable de entorno booleana (1/true/yes/on)"""
+    return value.strip().lower() in ('1', 'true', 'yes', 'on', 'si', 'sí')
+
+
+class EnvSetting:
+    """
+    Ajuste que se resuelve desde el entorno (o el archivo de configuración) al leerlo
+    cast convierte el texto al tipo del ajuste; minimum, maximum y choices lo validan
+    """
+
+    def __init__(self, env_name, default=None, cast=None, minimum=None, maximum=None,
+                 choices=None):
+        self.env_name = env_name
+        self.default = default
+        self.cast = cast
+        self.minimum = minimum
+        self.maximum = maximum
+        self.choices = choices
+
+    def __get__(self, instance, owner):
+        load_env_files()
+        value = os.environ.get(self.env_name)
+        if value is None:
+            value = _FILE_VALUES.get(self.env_name)
+        if value is None:
+            return self.default
+        try:
+            return self.validate(self.cast(value) if self.cast else value)
+        except ValueError as e:
+            # Un valor mal formado no debe impedir arrancar: se usa el valor por defecto,
+            # avisando una vez para que el error no pase desapercibido
+            if (self.env_name, value) not in _WARNED:
+                _WARNED.add((self.env_name, value))
+                warnings.warn(f"Ignoring {self.env_name}={value!r} ({e}); "
+                              f"using the default {self.default!r}", stacklevel=2)
+            return self.default
+
+    def validate(self, value):
+        """Devuelve value si cumple los límites del ajuste; ValueError si no"""
+        if self.minimum is not None and value < self.minimum:
+            raise ValueError(f"{self.env_name} must be >= {self.minimum}")
+        if self.maximum is not None and value > self.maximum:
+            raise ValueError(f"{self.env_name} must be <= {self.maximum}")
+        if self.choices is not None and value not in self.choices:
+            raise ValueError(f"{self.env_name} must be one of {', '.join(self.choices)}")
+        return value
 
 
 class Config:
-    """Configuration class containing all application settings"""
+    """
+    Configuration class containing all application settings
+    Config(NOMBRE=valor) fija ajustes para esa instancia (p. ej. para inyectarla en tests)
+    """
 
-    GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
-    MODEL_NAME = "gemini-2.5-flash"  # Modelo más reciente gratuito y potente
-    MAX_TOKENS = 1000
-    TEMPERATURE = 0.1  # Respuestas más deterministas para comandos
+    # Proveedor del modelo: gemini, un servidor compatible con la API de OpenAI o el modelo
+    # simulado para tests y pruebas de carga (ver cmd_helper.backends)
+    BACKEND = EnvSetting('CMD_HELPER_BACKEND', 'gemini', choices=('gemini', 'openai', 'fake'))
+    GEMINI_API_KEY = EnvSetting('GEMINI_API_KEY')
+    OPENAI_BASE_URL = EnvSetting('CMD_HELPER_OPENAI_BASE_URL', 'http://localhost:8080/v1')
+    OPENAI_API_KEY = EnvSetting('CMD_HELPER_OPENAI_API_KEY')
+    # Modelo simulado: latencia (fixed:50, uniform:20-80, lognormal:50,0.5... en ms),
+    # fracción de llamadas que fallan y semilla del generador aleatorio
+    FAKE_LATENCY = EnvSetting('CMD_HELPER_FAKE_LATENCY', 'fixed:0')
+    FAKE_ERROR_RATE = EnvSetting('CMD_HELPER_FAKE_ERROR_RATE', 0.0, float, minimum=0.0,
+                                 maximum=1.0)
+    FAKE_SEED = EnvSetting('CMD_HELPER_FAKE_SEED', 0, int)
+    # Peticiones cubiertas: si el modelo tarda más que el percentil HEDGE_PERCENTILE de sus
+    # latencias recientes (HEDGE_DELAY_MS mientras no hay suficientes, nunca menos de
+    # HEDGE_MIN_DELAY_MS) se envía otra petición a HEDGE_BACKEND/HEDGE_MODEL (por defecto los
+    # mismos) y se usa la primera respuesta
+    HEDGE = EnvSetting('CMD_HELPER_HEDGE', False, env_flag)
+    HEDGE_BACKEND = EnvSetting('CMD_HELPER_HEDGE_BACKEND', choices=('gemini', 'openai', 'fake'))
+    HEDGE_MODEL = EnvSetting('CMD_HELPER_HEDGE_MODEL')
+    HEDGE_PERCENTILE = EnvSetting('CMD_HELPER_HEDGE_PERCENTILE', 95.0, float, minimum=50.0,
+                                  maximum=99.9)
+    HEDGE_DELAY_MS = EnvSetting('CMD_HELPER_HEDGE_DELAY_MS', 2000.0, float, minimum=0)
+    HEDGE_MIN_DELAY_MS = EnvSetting('CMD_HELPER_HEDGE_MIN_DELAY_MS', 50.0, float, minimum=0)
+    # Reintentos ante errores transitorios (429, 5xx, red): número máximo, espera base y
+    # máxima del backoff exponencial (ms) y segundos totales que pueden durar
+    MAX_RETRIES = EnvSetting('CMD_HELPER_MAX_RETRIES', 2, int, minimum=0)
+    RETRY_BASE_DELAY_MS = EnvSetting('CMD_HELPER_RETRY_BASE_DELAY_MS', 500.0, float, minimum=0)
+    RETRY_MAX_DELAY_MS = EnvSetting('CMD_HELPER_RETRY_MAX_DELAY_MS', 8000.0, float, minimum=0)
+    RETRY_DEADLINE = EnvSetting('CMD_HELPER_RETRY_DEADLINE', 30.0, float, minimum=0)
+    # Circuito: tras BREAKER_THRESHOLD fallos transitorios seguidos (0 = nunca) no se llama al
+    # backend durante BREAKER_COOLDOWN segundos
+    BREAKER_THRESHOLD = EnvSetting('CMD_HELPER_BREAKER_THRESHOLD', 5, int, minimum=0)
+    BREAKER_COOLDOWN = EnvSetting('CMD_HELPER_BREAKER_COOLDOWN', 30.0, float, minimum=0)
+    # Límite compartido por todos los procesos del equipo (0 = sin límite): peticiones y tokens
+    # por minuto de cada modelo; una llamada espera su turno como mucho RATE_LIMIT_MAX_WAIT s
+    RATE_LIMIT_RPM = EnvSetting('CMD_HELPER_RATE_LIMIT_RPM', 0, int, minimum=0)
+    RATE_LIMIT_TPM = EnvSetting('CMD_HELPER_RATE_LIMIT_TPM', 0, int, minimum=0)
+    RATE_LIMIT_MAX_WAIT = EnvSetting('CMD_HELPER_RATE_LIMIT_MAX_WAIT', 60.0, float, minimum=0)
+    # Modelo más reciente gratuito y potente
+    MODEL_NAME = EnvSetting('CMD_HELPER_MODEL', "gemini-2.5-flash")
+    MAX_TOKENS = EnvSetting('CMD_HELPER_MAX_TOKENS', 1000, int, minimum=1)
+    # Respuestas más deterministas para comandos
+    TEMPERATURE = EnvSetting('CMD_HELPER_TEMPERATURE', 0.1, float, minimum=0.0, maximum=2.0)
 
     # Configuración de idioma
-    LANGUAGE = os.getenv('CMD_HELPER_LANG', 'auto')  # 'auto', 'es', 'en'
+    LANGUAGE = EnvSetting('CMD_HELPER_LANG', 'auto', choices=('auto', 'es', 'en'))
+
+    # Caché persistente de respuestas (por defecto en ~/.cache/cmd-helper)
+    CACHE_DIR = EnvSetting('CMD_HELPER_CACHE_DIR')
+    CACHE_TTL = EnvSetting('CMD_HELPER_CACHE_TTL', 7 * 24 * 3600, int, minimum=0)  # segundos
+    CACHE_MAX_ENTRIES = EnvSetting('CMD_HELPER_CACHE_MAX_ENTRIES', 5000, int, minimum=1)
+    # Similitud mínima (Jaccard, 0-1) para reutilizar la respuesta de una petición parecida
+    SIMILARITY_THRESHOLD = EnvSetting('CMD_HELPER_SIMILARITY_THRESHOLD', 0.75, float,
+                                      minimum=0.0)
+
+    # Pedir al modelo una respuesta JSON con esquema (comando, explicación, nivel de peligro
+    # y alternativas) en lugar del formato de texto COMMAND/EXPLANATION/DANGER
+    JSON_OUTPUT = EnvSetting('CMD_HELPER_JSON_OUTPUT', False, env_flag)
 
-    # Comandos peligrosos que siempre requieren confirmación extra
+    # Tamaño máximo aproximado del prompt (tokens); el contexto se reduce hasta caber
+    PROMPT_TOKEN_BUDGET = EnvSetting('CMD_HELPER_PROMPT_TOKEN_BUDGET', 1500, int, minimum=1)
+
+    # Ejecución de comandos: segundos antes de terminar el comando (0 = sin límite), bytes
+    # del principio y del final de la salida que se conservan y volcado completo a un archivo
+    COMMAND_TIMEOUT = EnvSetting('CMD_HELPER_COMMAND_TIMEOUT', 0, float, minimum=0)
+    OUTPUT_HEAD_BYTES = EnvSetting('CMD_HELPER_OUTPUT_HEAD_BYTES', 64 * 1024, int, minimum=0)
+    OUTPUT_TAIL_BYTES = EnvSetting('CMD_HELPER_OUTPUT_TAIL_BYTES', 64 * 1024, int, minimum=0)
+    SPOOL_OUTPUT = EnvSetting('CMD_HELPER_SPOOL_OUTPUT', False, env_flag)
+
+    # Modo batch: peticiones al modelo en paralelo
+    BATCH_WORKERS = EnvSetting('CMD_HELPER_BATCH_WORKERS', 8, int, minimum=1)
+
+    # API asyncio: llamadas simultáneas al modelo por bucle de eventos
+    ASYNC_CONCURRENCY = EnvSetting('CMD_HELPER_ASYNC_CONCURRENCY', 16, int, minimum=1)
+
+    # Segundos que puede tardar `git status` antes de informar los cambios como desconocidos
+    # (el colector de git espera este tiempo más ContextAnalyzer.GIT_INFO_MARGIN)
+    GIT_STATUS_TIMEOUT = EnvSetting('CMD_HELPER_GIT_STATUS_TIMEOUT', 0.5, float, minimum=0)
+
+    # Daemon (cmdhc): segundos sin peticiones antes de terminar (0 = nunca)
+    DAEMON_IDLE_TIMEOUT = EnvSetting('CMD_HELPER_DAEMON_IDLE_TIMEOUT', 15 * 60, int, minimum=0)
+
+    # Programas que siempre requieren confirmación extra; las reglas que dependen de las
+    # opciones (rm -rf, chmod 777, dd of=/dev/...) están en danger_rules.BUILTIN_RULES
     DANGEROUS_COMMANDS = [
-        'rm -rf', 'sudo rm', 'chmod 777', 'chmod -r 777', 'mkfs', 'dd if=',
-        'shutdown', 'reboot', 'halt', '> /dev/', 'format'
+        'mkfs', 'shutdown', 'reboot', 'halt', 'poweroff', 'format', 'wipefs'
     ]
 
+    # Archivo JSON con reglas de peligro adicionales
+    DANGER_RULES_FILE = EnvSetting('CMD_HELPER_DANGER_RULES')
+
+    # Intenciones locales: las peticiones habituales se responden sin llamar al modelo
+    LOCAL_INTENTS = EnvSetting('CMD_HELPER_LOCAL_INTENTS', True, env_flag)
+    # Archivo JSON con intenciones locales adicionales
+    INTENTS_FILE = EnvSetting('CMD_HELPER_INTENTS')
+
     # Directorios que no debe analizar por seguridad
     EXCLUDED_DIRS = [
         '.git', 'node_modules', '__pycache__', '.venv',
         'venv', '.ssh', '/proc', '/sys', '/dev', '/'
     ]
+
+    def __init__(self, **overrides):
+        for name, value in overrides.items():
+            if not name.isupper() or not hasattr(type(self), name):
+                raise TypeError(f"Unknown setting: {name}")
+            setattr(self, name, value)
+
+    def replace(self, **overrides):
+        """Copia de esta configuración con algunos ajustes cambiados"""
+        return type(self)(**{**vars(self), **overrides})
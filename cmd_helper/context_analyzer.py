@@ -3,106 +3,310 @@
 Context Analyzer Module
 
 This module analyzes the current system context to provide relevant information
-to the LLM for better command generation.
+to the LLM for better command generation. `aget_current_context` is the asyncio
+counterpart used by `MCPServer.agenerate_command`.
 """
 
+import asyncio
+import functools
 import os
-import subprocess
 import platform
-from pathlib import Path
-from .config import Config
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from .config import get_config
+from .directory_listing import scan_directory
+from .git_info import aread_git_info, read_git_info
+from .history import history_file, read_recent_commands
 from .i18n import t
 
+_EXECUTOR = None
+_EXECUTOR_LOCK = threading.Lock()
+
+# Contexto recopilado por adelantado (prefetch_context) a la espera de get_current_context
+_PREFETCHED = None
+_PREFETCH_MAX_AGE = 5.0  # segundos
+
+
+def _get_executor():
+    """Pool de hilos compartido por los colectores de contexto"""
+    global _EXECUTOR
+
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix='cmdh-context')
+        return _EXECUTOR
+
+
+def prefetch_context(cwd=None, user_request=None):
+    """
+    Empieza a recopilar el contexto en segundo plano
+    Permite solapar la recopilación con el arranque del cliente del modelo: la
+    siguiente llamada a get_current_context para el mismo directorio y petición lo reutiliza.
+    """
+    global _PREFETCHED
+
+    _PREFETCHED = ContextAnalyzer().start_collection(cwd=cwd, user_request=user_request)
+    return _PREFETCHED
+
+
+def _take_prefetched(cwd, user_request):
+    """Devuelve (y consume) el contexto adelantado si corresponde a cwd y es reciente"""
+    global _PREFETCHED
+
+    pending, _PREFETCHED = _PREFETCHED, None
+    if pending is None or (pending.cwd, pending.user_request) != (cwd, user_request):
+        return None
+    if time.monotonic() - pending.started > _PREFETCH_MAX_AGE:
+        return None
+    return pending
+
+
+def _default(value):
+    """Valor por defecto de un colector; si es invocable, se calcula al necesitarlo"""
+    return value() if callable(value) else value
+
+
+def _git_fallback(head_info):
+    """Valor por defecto de git: la rama ya leída de HEAD si la hay (cambios desconocidos)"""
+    return lambda: dict(head_info) or ContextAnalyzer.COLLECTOR_DEFAULTS['git_info']
+
+
+class PendingContext:
+    """Contexto en recopilación: los colectores lentos se ejecutan en paralelo"""
+
+    def __init__(self, cwd, user_request, context, futures, timeouts, defaults):
+        self.cwd = cwd
+        self.user_request = user_request
+        self.started = time.monotonic()
+        self._context = context
+        self._futures = futures
+        self._timeouts = timeouts
+        self._defaults = defaults
+        self._defaulted = set()
+
+    def result(self):
+        """
+        Espera a los colectores y devuelve el contexto completo
+        Un colector que supera su tiempo máximo (o falla) aporta su valor por defecto
+        """
+        context = dict(self._context)
+        for name, future in self._futures.items():
+            remaining = self.started + self._timeouts[name] - time.monotonic()
+            try:
+                context[name] = future.result(timeout=max(remaining, 0))
+            except FutureTimeoutError:
+                context[name] = _default(self._defaults[name])
+                self._defaulted.add(name)
+            except Exception:  # pylint: disable=broad-exception-caught
+                context[name] = _default(self._defaults[name])
+                self._defaulted.add(name)
+        return context
+
+    def completed(self, name):
+        """Indica si result() obtuvo el valor real del colector name (no su valor por defecto)"""
+        return name in self._futures and name not in self._defaulted
+
 
 class ContextAnalyzer:
     """Analiza el contexto actual del sistema para enviar a la LLM"""
 
-    def __init__(self):
-        self.config = Config()
-
-    def get_current_context(self):
-        """Obtiene contexto completo del directorio actual"""
-        context = {
-            'pwd': os.getcwd(),
-            'platform': self._get_platform(),
-            'files': self._get_directory_listing(),
-            'git_info': self._get_git_info(),
-            'env_vars': self._get_relevant_env_vars(),
-            'recent_commands': self._get_recent_commands()
+    # Variables de entorno que se envían como contexto
+    RELEVANT_ENV_VARS = ['PATH', 'HOME', 'USER', 'SHELL', 'PYTHON_VERSION', 'NODE_VERSION']
+
+    # Tiempo máximo (segundos) que se espera a cada colector desde que empieza la recopilación;
+    # el de git se amplía hasta GIT_STATUS_TIMEOUT más GIT_INFO_MARGIN (ver collector_timeouts)
+    COLLECTOR_TIMEOUTS = {'files': 1.0, 'git_info': 1.0, 'recent_commands': 0.3}
+    GIT_INFO_MARGIN = 0.5
+
+    # Valor de cada colector si no termina a tiempo
+    COLLECTOR_DEFAULTS = {'files': [], 'git_info': {'is_git_repo': False}, 'recent_commands': []}
+
+    def __init__(self, config=None):
+        self.config = config or get_config()
+
+    def get_current_context(self, cwd=None, environ=None, user_request=None):
+        """
+        Obtiene contexto completo del directorio actual
+        cwd y environ permiten describir otro proceso (p. ej. el cliente del daemon);
+        user_request se usa para destacar los archivos que menciona la petición
+        """
+        cwd = cwd or os.getcwd()
+        pending = _take_prefetched(cwd, user_request) if environ is None else None
+        if pending is None:
+            pending = self.start_collection(cwd=cwd, environ=environ, user_request=user_request)
+        return pending.result()
+
+    def start_collection(self, cwd=None, environ=None, user_request=None, known=None):
+        """
+        Lanza en paralelo los colectores lentos (directorio, git, historial)
+        known: secciones ya conocidas que no se recalculan (sesión interactiva)
+        Devuelve un PendingContext; su result() espera como mucho collector_timeouts()
+        """
+        cwd = cwd or os.getcwd()
+        environ = os.environ if environ is None else environ
+        known = known or {}
+        head_info = {}
+        collectors = {
+            'files': functools.partial(
+                self._get_directory_listing, cwd=cwd, user_request=user_request
+            ),
+            'git_info': functools.partial(self._get_git_info, cwd=cwd, head_info=head_info),
+            'recent_commands': functools.partial(self._get_recent_commands, environ)
         }
+        executor = _get_executor()
+        futures = {
+            name: executor.submit(collector)
+            for name, collector in collectors.items() if name not in known
+        }
+        context = self._base_context(cwd, environ)
+        context.update(known)
+        return PendingContext(cwd, user_request, context, futures, self.collector_timeouts(),
+                              dict(self.COLLECTOR_DEFAULTS, git_info=_git_fallback(head_info)))
+
+    def collector_timeouts(self):
+        """
+        COLLECTOR_TIMEOUTS con el de git ampliado para que git status pueda agotar su propio
+        tiempo (GIT_STATUS_TIMEOUT) y el colector devuelva la rama con cambios desconocidos
+        """
+        timeouts = dict(self.COLLECTOR_TIMEOUTS)
+        timeouts['git_info'] = max(timeouts['git_info'],
+                                   self.config.GIT_STATUS_TIMEOUT + self.GIT_INFO_MARGIN)
+        return timeouts
+
+    async def aget_current_context(self, cwd=None, environ=None, user_request=None):
+        """
+        Versión asyncio de get_current_context
+        git se consulta con un subproceso asyncio; el directorio y el historial se leen en el
+        pool de hilos compartido. Cada colector tiene el mismo tiempo máximo que en la
+        versión síncrona y, si lo supera o falla, aporta su valor por defecto.
+        """
+        cwd = cwd or os.getcwd()
+        environ = os.environ if environ is None else environ
+        loop = asyncio.get_running_loop()
+        executor = _get_executor()
+        head_info = {}
+        defaults = dict(self.COLLECTOR_DEFAULTS, git_info=_git_fallback(head_info))
+        timeouts = self.collector_timeouts()
+        collectors = {
+            'files': loop.run_in_executor(executor, functools.partial(
+                self._get_directory_listing, cwd=cwd, user_request=user_request
+            )),
+            'git_info': aread_git_info(cwd, self.config.GIT_STATUS_TIMEOUT, head_info),
+            'recent_commands': loop.run_in_executor(executor, self._get_recent_commands, environ)
+        }
+        results = await asyncio.gather(*(
+            self._await_collector(awaitable, timeouts[name], defaults[name])
+            for name, awaitable in collectors.items()
+        ))
+        context = self._base_context(cwd, environ)
+        context.update(zip(collectors, results))
         return context
 
-    def _get_platform(self):
+    @staticmethod
+    async def _await_collector(awaitable, timeout, default):
+        """Resultado de un colector asíncrono o su valor por defecto"""
+        try:
+            return await asyncio.wait_for(awaitable, timeout)
+        except asyncio.TimeoutError:
+            return _default(default)
+        except Exception:  # pylint: disable=broad-exception-caught
+            return _default(default)
+
+    def _base_context(self, cwd, environ):
+        """
+        Contexto con los colectores baratos ya resueltos y huecos para los lentos
+        El orden de las claves es el del prompt
+        """
+        return {
+            'pwd': cwd,
+            'platform': self._get_platform(environ),
+            'files': None,
+            'git_info': None,
+            'env_vars': self._get_relevant_env_vars(environ),
+            'recent_commands': None
+        }
+
+    def _get_platform(self, environ=None):
         """Detecta la plataforma (Linux/macOS/Windows)"""
+        environ = os.environ if environ is None else environ
         return {
             'system': platform.system(),
             'release': platform.release(),
-            'shell': os.environ.get('SHELL', 'unknown')
+            'shell': environ.get('SHELL', 'unknown')
         }
 
-    def _get_directory_listing(self, max_files=50):
-        """Lista archivos del directorio actual (limitado por seguridad)"""
+    def _get_directory_listing(self, max_files=50, cwd=None, user_request=None):
+        """
+        Lista archivos del directorio actual (limitado por seguridad), los más relevantes
+        primero; los directorios enormes se resumen
+        """
         try:
-            files = []
-            current_dir = Path('.')
+            return scan_directory(
+                cwd or '.',
+                excluded=self.config.EXCLUDED_DIRS,
+                max_files=max_files,
+                user_request=user_request
+            )
+        except OSError as e:
+            return [{'error': t('context.directory_error') + " " + str(e)}]
 
-            for item in current_dir.iterdir():
-                if len(files) >= max_files:
-                    break
+    def _get_git_info(self, cwd=None, head_info=None):
+        """Información básica de git si está disponible (sin recorrer el árbol de trabajo)"""
+        return read_git_info(cwd or os.getcwd(), self.config.GIT_STATUS_TIMEOUT, head_info)
 
-                if item.name.startswith('.') and item.name not in ['.env', '.gitignore']:
-                    continue
+    def _get_relevant_env_vars(self, environ=None):
+        """Variables de entorno relevantes para desarrollo"""
+        environ = os.environ if environ is None else environ
+        return {var: environ.get(var) for var in self.RELEVANT_ENV_VARS if environ.get(var)}
 
-                if item.name in self.config.EXCLUDED_DIRS:
-                    continue
+    def _get_recent_commands(self, environ=None):
+        """Últimos comandos del historial del shell (bash, zsh o fish)"""
+        return read_recent_commands(environ, limit=10)
 
-                files.append({
-                    'name': item.name,
-                    'type': 'dir' if item.is_dir() else 'file',
-                    'size': item.stat().st_size if item.is_file() else None
-                })
 
-            return files
-        except OSError as e:
-            return [{'error': t('context.directory_error') + " " + str(e)}]
+def _stat_signature(path):
+    """Firma (tamaño, fecha de modificación) de un archivo o directorio; None si no existe"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
 
-    def _get_git_info(self):
-        """Información básica de git si está disponible"""
-        try:
-            branch = subprocess.check_output(
-                ['git', 'branch', '--show-current'],
-                stderr=subprocess.DEVNULL,
-                text=True
-            ).strip()
-
-            status = subprocess.check_output(
-                ['git', 'status', '--porcelain'],
-                stderr=subprocess.DEVNULL,
-                text=True
-            ).strip()
-
-            return {
-                'branch': branch,
-                'has_changes': bool(status),
-                'is_git_repo': True
-            }
-        except (subprocess.CalledProcessError, FileNotFoundError):
-            return {'is_git_repo': False}
-
-    def _get_relevant_env_vars(self):
-        """Variables de entorno relevantes para desarrollo"""
-        relevant_vars = ['PATH', 'HOME', 'USER', 'SHELL', 'PYTHON_VERSION', 'NODE_VERSION']
-        return {var: os.environ.get(var) for var in relevant_vars if os.environ.get(var)}
 
-    def _get_recent_commands(self):
-        """Últimos comandos del historial (si es posible)"""
-        try:
-            # Intentar leer historial de bash
-            history_file = os.path.expanduser('~/.bash_history')
-            if os.path.exists(history_file):
-                with open(history_file, 'r', encoding='utf-8') as f:
-                    lines = f.readlines()
-                    return [line.strip() for line in lines[-10:] if line.strip()]
-        except (OSError, IOError):
-            pass
-        return []
+class SessionContext:
+    """
+    Contexto de una sesión interactiva que solo recalcula lo que ha cambiado
+    El estado de git se consulta en cada petición; el listado se reutiliza mientras no
+    cambien el directorio ni su fecha de modificación (se crean, borran o renombran
+    entradas) y el historial mientras no cambie su archivo.
+    """
+
+    def __init__(self, analyzer=None):
+        self.analyzer = analyzer or ContextAnalyzer()
+        self._cached = {}  # sección -> (firma, valor)
+
+    def _signatures(self, cwd):
+        """Firma de las secciones que se pueden reutilizar"""
+        return {
+            'files': (cwd, _stat_signature(cwd)),
+            'recent_commands': _stat_signature(history_file(os.environ)[0])
+        }
+
+    def get(self, cwd=None):
+        """Contexto actual reutilizando las secciones que no han cambiado"""
+        cwd = cwd or os.getcwd()
+        signatures = self._signatures(cwd)
+        known = {
+            name: self._cached[name][1]
+            for name, signature in signatures.items()
+            if name in self._cached and self._cached[name][0] == signature
+        }
+        # Sin petición: el listado se ordena igual para todas las peticiones de la sesión
+        pending = self.analyzer.start_collection(cwd=cwd, known=known)
+        context = pending.result()
+
+        for name, signature in signatures.items():
+            if name not in known and pending.completed(name):
+                self._cached[name] = (signature, context[name])
+        return context
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""
+Daemon Module
+
+This module implements the optional long-lived cmd-helper process. It keeps
+the model backend, translator, context analyzer and response cache warm and
+answers requests from the thin `cmdhc` client over a Unix domain socket,
+using one JSON message per line. When the config file changes, the warm
+servers are rebuilt with the new settings before the next request.
+"""
+
+import argparse
+import json
+import os
+import socketserver
+import sys
+import threading
+import time
+from pathlib import Path
+from .backends import missing_api_key
+from .backends.openai_compat import REQUEST_TIMEOUT
+from .client import MAX_MESSAGE_BYTES, default_socket_path, send_message
+from .command_handler import CommandHandler
+from .config import get_config, reload_config
+from .context_analyzer import ContextAnalyzer
+from .i18n import t, use_language
+from .mcp_server import MCPServer
+
+
+class DaemonRequestHandler(socketserver.StreamRequestHandler):
+    """Atiende una conexión: lee un mensaje JSON y responde con otro"""
+
+    def handle(self):
+        daemon = self.server.cmd_helper_daemon
+        daemon.touch()
+        line = self.rfile.readline(MAX_MESSAGE_BYTES)
+        try:
+            message = json.loads(line)
+        except ValueError:
+            response = {'ok': False, 'error': 'Invalid request'}
+        else:
+            response = daemon.dispatch(message)
+        self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+        daemon.touch()
+
+
+class CmdHelperDaemon:
+    """Proceso persistente que reutiliza un MCPServer entre peticiones"""
+
+    def __init__(self, socket_path=None, idle_timeout=None, config=None):
+        self.config = config or get_config()
+        self.socket_path = Path(socket_path or default_socket_path())
+        self.idle_timeout = (
+            idle_timeout if idle_timeout is not None else self.config.DAEMON_IDLE_TIMEOUT
+        )
+        self.command_handler = CommandHandler(self.config)
+        self.server = None
+        self.last_activity = time.monotonic()
+        self._servers = {}
+        self._servers_lock = threading.Lock()
+
+    def touch(self):
+        """Registra actividad para el apagado por inactividad"""
+        self.last_activity = time.monotonic()
+
+    def get_server(self, use_cache=True):
+        """
+        MCPServer compartido, creado la primera vez que se necesita
+        Sirve peticiones en cualquier idioma: cada una fija el suyo con use_language()
+        """
+        with self._servers_lock:
+            if use_cache not in self._servers:
+                self._servers[use_cache] = MCPServer(use_cache=use_cache, config=self.config)
+            return self._servers[use_cache]
+
+    def reload_if_changed(self):
+        """
+        Recarga la configuración si su archivo cambió; los servidores se crean de nuevo con
+        los nuevos ajustes (modelo, clave de API, caché...) en la siguiente petición
+        """
+        if not reload_config():
+            return False
+        with self._servers_lock:
+            self._servers.clear()
+        return True
+
+    def reply_timeout(self):
+        """
+        Segundos que puede tardar una respuesta a generate: la recopilación del contexto, la
+        espera por el límite compartido, los reintentos y la última llamada al modelo
+        El cliente deja de esperar pasado este tiempo y procesa la petición él mismo
+        """
+        self.reload_if_changed()
+        config = self.config
+        seconds = max(ContextAnalyzer(config).collector_timeouts().values())
+        seconds += config.RETRY_DEADLINE + REQUEST_TIMEOUT
+        if config.RATE_LIMIT_RPM or config.RATE_LIMIT_TPM:
+            seconds += config.RATE_LIMIT_MAX_WAIT
+        return seconds
+
+    def dispatch(self, message):
+        """Ejecuta una operación del protocolo: ping, generate o shutdown"""
+        if not isinstance(message, dict):
+            return {'ok': False, 'error': 'Invalid request'}
+        operation = message.get('op')
+        if operation == 'ping':
+            return {'ok': True, 'pid': os.getpid(), 'reply_timeout': self.reply_timeout()}
+        if operation == 'shutdown':
+            # shutdown() espera a que termine serve_forever: se llama desde otro hilo
+            threading.Thread(target=self.stop, daemon=True).start()
+            return {'ok': True}
+        if operation == 'generate':
+            return self._generate(message)
+        return {'ok': False, 'error': f'Unknown operation: {operation}'}
+
+    def _generate(self, message):
+        """Genera un comando con el contexto (cwd y entorno) del cliente"""
+        self.reload_if_changed()
+        if missing_api_key(self.config):
+            return {'ok': False, 'error': t('config.api_key_not_found')}
+        if not message.get('request'):
+            return {'ok': False, 'error': 'Missing request'}
+
+        try:
+            server = self.get_server(message.get('use_cache', True))
+            # Idioma solo para esta petición: los hilos del daemon no se afectan entre sí
+            with use_language(message.get('lang') or self.config.LANGUAGE):
+                result = server.generate_command(
+                    message['request'],
+                    refresh_cache=message.get('refresh', False),
+                    cwd=message.get('cwd'),
+                    environ=message.get('env')
+                )
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            return {'ok': False, 'error': str(e)}
+
+        # El cliente no carga la configuración: la comprobación de seguridad se hace aquí
+        result['requires_confirmation'] = bool(
+            result['command'] and self.command_handler.is_command_dangerous(result['command'])
+        )
+        return {'ok': True, 'result': result}
+
+    def _prepare_socket(self):
+        """Crea el directorio del socket y elimina un socket huérfano de otra ejecución"""
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True, mode=0o700)
+        if not self.socket_path.exists():
+            return True
+        try:
+            send_message({'op': 'ping'}, self.socket_path, timeout=1)
+            return False  # Ya hay un daemon atendiendo en este socket
+        except OSError:
+            self.socket_path.unlink()
+            return True
+
+    def _warm_up(self):
+        """Importa el SDK y prepara el modelo antes de la primera petición"""
+        try:
+            self.get_server()
+        except Exception:  # pylint: disable=broad-exception-caught
+            pass  # El error se devolverá al cliente en la primera petición
+
+    def _watch_idle(self):
+        """Detiene el daemon tras idle_timeout segundos sin peticiones"""
+        while self.server is not None:
+            remaining = self.idle_timeout - (time.monotonic() - self.last_activity)
+            if remaining <= 0:
+                self.stop()
+                return
+            time.sleep(min(remaining, 5))
+
+    def serve_forever(self):
+        """Atiende peticiones hasta recibir shutdown o agotar el tiempo de inactividad"""
+        if not self._prepare_socket():
+            return False
+
+        # Solo el usuario propietario puede hablar con el daemon: el socket se crea ya sin
+        # permisos para el grupo ni los demás, sin un instante en que otros puedan conectarse
+        umask = os.umask(0o077)
+        try:
+            self.server = socketserver.ThreadingUnixStreamServer(
+                str(self.socket_path), DaemonRequestHandler
+            )
+        finally:
+            os.umask(umask)
+        self.server.daemon_threads = True
+        self.server.cmd_helper_daemon = self
+
+        threading.Thread(target=self._warm_up, daemon=True).start()
+        if self.idle_timeout > 0:
+            threading.Thread(target=self._watch_idle, daemon=True).start()
+
+        try:
+            self.server.serve_forever(poll_interval=0.5)
+        finally:
+            self.server.server_close()
+            self.server = None
+            try:
+                self.socket_path.unlink()
+            except FileNotFoundError:
+                pass
+        return True
+
+    def stop(self):
+        """Detiene serve_forever (debe llamarse desde otro hilo)"""
+        server = self.server
+        if server is not None:
+            server.shutdown()
+
+
+def main(argv=None):
+    """Punto de entrada de `cmdh-daemon`"""
+    parser = argparse.ArgumentParser(prog='cmdh-daemon', description='Cmd Helper daemon')
+    parser.add_argument('--socket', help='Unix socket path')
+    parser.add_argument('--idle-timeout', type=int,
+                        help='Seconds without requests before exiting (0 = never)')
+    parser.add_argument('--status', action='store_true', help='Check whether the daemon runs')
+    parser.add_argument('--stop', action='store_true', help='Stop the running daemon')
+    args = parser.parse_args(argv)
+
+    socket_path = Path(args.socket) if args.socket else default_socket_path()
+    if args.status or args.stop:
+        try:
+            response = send_message({'op': 'shutdown' if args.stop else 'ping'}, socket_path,
+                                    timeout=2)
+        except OSError:
+            print(t('daemon.not_running'))
+            return 1
+        if args.stop:
+            print(t('daemon.stopped'))
+        else:
+            print(t('daemon.running').format(pid=response.get('pid'), socket=socket_path))
+        return 0
+
+    daemon = CmdHelperDaemon(socket_path, idle_timeout=args.idle_timeout)
+    if not daemon.serve_forever():
+        print(t('daemon.already_running').format(socket=socket_path))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,444 @@
+# -*- coding: utf-8 -*-
+"""
+Danger Rules Module
+
+This module decides whether a shell command is dangerous. The command is
+tokenized with shell-aware splitting into simple commands (pipeline
+segments, lists, subshells, command substitutions and the scripts given to
+`sh -c`, `eval`, `xargs` or `find -exec`). Each simple command is normalized
+into one line (wrappers such as sudo, env or nohup removed, program path
+reduced to its name) and all rules are evaluated in a single pass with one
+compiled regular expression. Verdicts are cached per command.
+
+User rules are read from the JSON file named by CMD_HELPER_DANGER_RULES:
+
+    {"rules": [{"id": "git-force-push",
+                "pattern": "^git push(?: \\\\S+)* (?:-f|--force)(?: |$)",
+                "keywords": ["git"]}],
+     "disable": ["dangerous-program"]}
+"""
+
+import functools
+import json
+import os
+import re
+import shlex
+import threading
+from .config import get_config
+
+# Caracteres de operadores del shell (separadores de comandos y redirecciones)
+_OPERATOR_CHARS = '();<>|&\n'
+# Niveles máximos de comandos anidados ($(...), sh -c, eval) que se analizan
+_MAX_DEPTH = 5
+
+_ASSIGNMENT_RE = re.compile(r'^[A-Za-z_]\w*=')
+# Palabras reservadas que pueden preceder al comando
+_KEYWORDS = {'!', '{', '}', 'if', 'then', 'else', 'elif', 'fi', 'do', 'done', 'while', 'until',
+             'time'}
+# Programas que ejecutan otro comando: opciones que llevan valor y argumentos posicionales
+# que preceden al comando
+_WRAPPERS = {
+    'sudo': ({'-u', '-g', '-C', '-D', '-h', '-p', '-r', '-t', '-T', '-U'}, 0),
+    'doas': ({'-u', '-C'}, 0),
+    'env': ({'-u', '-C', '-S'}, 0),
+    'nice': ({'-n'}, 0),
+    'ionice': ({'-c', '-n', '-p'}, 0),
+    'stdbuf': ({'-i', '-o', '-e'}, 0),
+    'timeout': ({'-s', '-k', '--signal', '--kill-after'}, 1),
+    'xargs': ({'-a', '-d', '-E', '-I', '-L', '-n', '-P', '-s', '--delimiter', '--max-args',
+               '--max-procs'}, 0),
+    'nohup': (set(), 0),
+    'command': (set(), 0),
+    'builtin': (set(), 0),
+    'exec': (set(), 0)
+}
+_ELEVATING = {'sudo', 'doas'}
+_SHELLS = {'sh', 'bash', 'zsh', 'dash', 'ksh', 'fish', 'su'}
+_FIND_ACTIONS = {'-exec', '-execdir', '-ok', '-okdir'}
+
+_QUOTING_RE = re.compile(r'[\\\'"]')
+_SIMPLE_TOKEN_RE = re.compile(r'[();<>|&\n]+|[^\s();<>|&]+')
+_SUBSTITUTION_RE = re.compile(r'`|[$<>]\(')
+_OPERATOR_RE = re.compile(r'[();<>|&\n]+')
+_SPACE_RE = re.compile(r'\s')
+
+# Comillas y escapes que se eliminan antes del filtro rápido por palabras clave
+_UNQUOTE = str.maketrans('', '', '\\\'"')
+
+# Prefijo de los patrones: comando ejecutado opcionalmente con privilegios
+_SUDO = r'^(?:sudo )?'
+_RECURSIVE = r'(?:-[a-z]*r[a-z]*|--recursive)'
+_FORCE = r'(?:-[a-z]*f[a-z]*|--force)'
+_END = r'(?: |$)'
+
+# Reglas incluidas. Los patrones se evalúan (sin distinguir mayúsculas) sobre cada comando
+# simple normalizado: una línea "[sudo ]programa argumentos", terminada en " |" si su
+# salida va a otro comando. Las reglas con scope 'command' se evalúan sobre el texto original.
+BUILTIN_RULES = [
+    {'id': 'rm-recursive-force', 'keywords': ['rm'],
+     'pattern': rf'{_SUDO}rm(?=.* {_RECURSIVE}{_END})(?=.* {_FORCE}{_END})'},
+    {'id': 'rm-recursive-root', 'keywords': ['rm'],
+     'pattern': rf'{_SUDO}rm(?=.* {_RECURSIVE}{_END}).* (?:/|/\*|~|~/|~/\*|\*|\$home/?){_END}'},
+    {'id': 'sudo-rm', 'keywords': ['rm'],
+     'pattern': rf'^sudo rm{_END}'},
+    {'id': 'chmod-world-writable', 'keywords': ['chmod'],
+     'pattern': rf'{_SUDO}chmod(?: \S+)* (?:0?777|a?\+rwx|ugo\+rwx|a=rwx){_END}'},
+    {'id': 'recursive-system-permissions', 'keywords': ['chmod', 'chown', 'chgrp'],
+     'pattern': rf'{_SUDO}ch(?:mod|own|grp)(?=.* {_RECURSIVE}{_END})(?: \S+)* '
+                rf'/(?:bin|boot|etc|lib\w*|sbin|usr|var)?/?{_END}'},
+    {'id': 'dd-to-device', 'keywords': ['dd'],
+     'pattern': rf'{_SUDO}dd(?: \S+)* of=/dev/(?!null{_END})'},
+    {'id': 'redirect-to-device', 'keywords': ['/dev/'],
+     'pattern': rf'(?:^| )\d*(?:>|>>|&>|>\||>&) /dev/(?!(?:null|stdout|stderr|tty){_END}|fd/)'},
+    {'id': 'system-power', 'keywords': ['systemctl', 'init'],
+     'pattern': rf'{_SUDO}(?:systemctl(?: \S+)* (?:poweroff|reboot|halt|kexec)|init [06]){_END}'},
+    {'id': 'pipe-to-shell', 'keywords': ['curl', 'wget'],
+     'pattern': rf'{_SUDO}(?:curl|wget)(?: \S+)* \|\n{_SUDO[1:]}(?:ba|z|da|k)?sh{_END}'},
+    {'id': 'fork-bomb', 'keywords': [':'], 'scope': 'command',
+     'pattern': r':\s*\(\s*\)\s*\{\s*:\s*\|\s*:\s*&'}
+]
+
+
+def _tokenize(command):
+    """Palabras y operadores del comando (cierra las comillas que queden abiertas)"""
+    if not _QUOTING_RE.search(command):
+        # Sin comillas ni escapes basta una expresión regular (mucho más rápida que shlex)
+        return _SIMPLE_TOKEN_RE.findall(command)
+    for suffix in ('', "'", '"'):
+        lexer = shlex.shlex(command + suffix, posix=True, punctuation_chars=_OPERATOR_CHARS)
+        lexer.whitespace = ' \t\r'
+        lexer.whitespace_split = True
+        lexer.commenters = ''
+        try:
+            return list(lexer)
+        except ValueError:
+            continue
+    return command.split()
+
+
+def _is_operator(token):
+    """Indica si el token es un operador del shell"""
+    return _OPERATOR_RE.fullmatch(token) is not None
+
+
+def _segments(tokens):
+    """
+    Comandos simples de una lista de tokens
+    Devuelve (tokens, piped) por comando; piped indica que su salida va al siguiente
+    """
+    segments = []
+    current = []
+    for token in tokens:
+        chars = set(token)
+        if not _is_operator(token):
+            current.append(token)
+        elif chars & set('<>') and not chars & set('();\n'):
+            current.append(token)  # Redirección: forma parte del comando
+        else:
+            if current:
+                segments.append((current, token in ('|', '|&')))
+            current = []
+    if current:
+        segments.append((current, False))
+    return segments
+
+
+def _closing_paren(command, start):
+    """Posición del paréntesis que cierra el abierto antes de start"""
+    depth = 1
+    quote = None
+    i = start
+    while i < len(command):
+        char = command[i]
+        if char == '\\' and quote != "'":
+            i += 2
+            continue
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in '\'"':
+            quote = char
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+            if not depth:
+                return i
+        i += 1
+    return len(command)
+
+
+def _substitutions(command):
+    """Contenido de las sustituciones $(...), `...`, <(...) y >(...) fuera de comillas simples"""
+    if not _SUBSTITUTION_RE.search(command):
+        return []
+    found = []
+    quote = None
+    i = 0
+    while i < len(command):
+        char = command[i]
+        if char == '\\' and quote != "'":
+            i += 2
+            continue
+        if quote == "'":
+            if char == "'":
+                quote = None
+        elif char == "'" and quote is None:
+            quote = "'"
+        elif char == '"':
+            quote = None if quote == '"' else '"'
+        elif char == '`':
+            end = command.find('`', i + 1)
+            end = len(command) if end < 0 else end
+            found.append(command[i + 1:end])
+            i = end
+        elif command.startswith('$(', i) or (quote is None and command.startswith(('<(', '>('), i)):
+            end = _closing_paren(command, i + 2)
+            found.append(command[i + 2:end])
+            i = end
+        i += 1
+    return found
+
+
+def _skip_options(tokens, valued, positional):
+    """Tokens que siguen a las opciones (y argumentos posicionales) de un programa envoltorio"""
+    i = 0
+    while i < len(tokens) and tokens[i].startswith('-') and tokens[i] != '-':
+        if tokens[i] == '--':
+            i += 1
+            break
+        i += 2 if tokens[i] in valued else 1
+    return tokens[i + positional:]
+
+
+def _script_argument(args):
+    """Script de `sh -c SCRIPT` (o de `su -c SCRIPT`); None si no se usa -c"""
+    has_script = False
+    for arg in args:
+        if arg.startswith('-') and not arg.startswith('--'):
+            has_script = has_script or 'c' in arg[1:]
+        elif has_script:
+            return arg
+    return None
+
+
+def _render(tokens, elevated, piped):
+    """Línea normalizada de un comando simple"""
+    words = [
+        shlex.quote(' '.join(token.split())) if _SPACE_RE.search(token) else token
+        for token in tokens
+    ]
+    return ('sudo ' if elevated else '') + ' '.join(words) + (' |' if piped else '')
+
+
+def _simple_command_lines(tokens, piped, elevated, depth):
+    """Líneas normalizadas de un comando simple y de los comandos que ejecuta"""
+    while tokens:
+        word = tokens[0]
+        name = os.path.basename(word) or word
+        if word in _KEYWORDS or _ASSIGNMENT_RE.match(word):
+            tokens = tokens[1:]
+        elif name in _WRAPPERS:
+            elevated = elevated or name in _ELEVATING
+            tokens = _skip_options(tokens[1:], *_WRAPPERS[name])
+        else:
+            break
+    if not tokens:
+        return []
+
+    program = os.path.basename(tokens[0]) or tokens[0]
+    args = tokens[1:]
+    lines = [_render([program] + args, elevated, piped)]
+    if depth >= _MAX_DEPTH:
+        return lines
+
+    if program in _SHELLS:
+        script = _script_argument(args)
+        if script:
+            lines.extend(command_lines(script, elevated or program == 'su', depth + 1))
+    elif program == 'eval' and args:
+        lines.extend(command_lines(' '.join(args), elevated, depth + 1))
+    elif program == 'find':
+        for index, arg in enumerate(args):
+            if arg in _FIND_ACTIONS:
+                nested = args[index + 1:]
+                nested = nested[:-1] if nested and nested[-1] in ('+', ';') else nested
+                lines.extend(_simple_command_lines(nested, False, elevated, depth + 1))
+    return lines
+
+
+def command_lines(command, elevated=False, depth=0):
+    """
+    Comandos simples normalizados de un comando del shell, uno por línea
+    Incluye los comandos de sustituciones, subshells, sh -c, eval, xargs y find -exec
+    """
+    lines = []
+    if depth < _MAX_DEPTH:
+        for inner in _substitutions(command):
+            lines.extend(command_lines(inner, elevated, depth + 1))
+    for tokens, piped in _segments(_tokenize(command)):
+        lines.extend(_simple_command_lines(tokens, piped, elevated, depth))
+    return lines
+
+
+class _PatternList:
+    """Reglas compiladas por separado, si no pueden unirse en una sola expresión regular"""
+
+    def __init__(self, alternatives):
+        self.patterns = []
+        for alternative in alternatives:
+            try:
+                self.patterns.append(re.compile(alternative, re.IGNORECASE | re.MULTILINE))
+            except re.error:
+                continue
+
+    def search(self, text):
+        """Coincidencia de la primera regla que se cumple, o None"""
+        for pattern in self.patterns:
+            found = pattern.search(text)
+            if found:
+                return found
+        return None
+
+
+def _compile(alternatives):
+    """Una sola expresión regular con un grupo con nombre por regla"""
+    if not alternatives:
+        return None
+    try:
+        return re.compile('|'.join(alternatives), re.IGNORECASE | re.MULTILINE)
+    except re.error:
+        # Una regla incompatible con las demás no debe dejar sin evaluar todas
+        return _PatternList(alternatives)
+
+
+class DangerRules:
+    """Reglas de peligro compiladas en una expresión regular por ámbito y caché de veredictos"""
+
+    def __init__(self, rules, cache_size=4096):
+        self.rules = list(rules)
+        self._rule_ids = {}
+        alternatives = {'segment': [], 'command': []}
+        keywords = set()
+        filterable = True
+        for index, rule in enumerate(self.rules):
+            group = f'rule{index}'
+            self._rule_ids[group] = rule['id']
+            alternatives[rule.get('scope', 'segment')].append(f"(?P<{group}>{rule['pattern']})")
+            if rule.get('keywords'):
+                keywords.update(rule['keywords'])
+            else:
+                filterable = False  # Sin palabras clave la regla se evalúa siempre
+
+        self._segment_re = _compile(alternatives['segment'])
+        self._command_re = _compile(alternatives['command'])
+        # Filtro rápido: un comando sin ninguna palabra clave no puede cumplir ninguna regla
+        self._prefilter = None
+        if filterable and keywords:
+            self._prefilter = re.compile(
+                '|'.join(re.escape(keyword) for keyword in sorted(keywords)), re.IGNORECASE
+            )
+        self.match = functools.lru_cache(maxsize=cache_size)(self._match)
+
+    def _match(self, command):
+        """Identificador de la primera regla que cumple el comando; None si ninguna"""
+        if self._prefilter is not None and not self._prefilter.search(command.translate(_UNQUOTE)):
+            return None
+        found = None
+        if self._command_re is not None:
+            found = self._command_re.search(command)
+        if found is None and self._segment_re is not None:
+            found = self._segment_re.search('\n'.join(command_lines(command)))
+        return self._rule_ids[found.lastgroup] if found else None
+
+    def is_dangerous(self, command):
+        """Indica si el comando cumple alguna regla"""
+        return self.match(command) is not None
+
+
+def _valid_rule(rule, index):
+    """Regla de usuario normalizada, o None si no es válida"""
+    if not isinstance(rule, dict) or not isinstance(rule.get('pattern'), str):
+        return None
+    scope = rule.get('scope', 'segment')
+    if scope not in ('segment', 'command'):
+        return None
+    try:
+        compiled = re.compile(f"(?P<rule>{rule['pattern']})", re.IGNORECASE | re.MULTILINE)
+    except re.error:
+        return None
+    if len(compiled.groupindex) > 1:
+        # Los grupos con nombre chocarían con los de otras reglas en la expresión combinada
+        return None
+    keywords = rule.get('keywords')
+    return {
+        'id': str(rule.get('id') or f'user-{index}'),
+        'pattern': rule['pattern'],
+        'scope': scope,
+        'keywords': [str(keyword) for keyword in keywords] if isinstance(keywords, list) else []
+    }
+
+
+def load_rules(path=None, dangerous_programs=()):
+    """
+    Reglas incluidas, una regla para los programas siempre peligrosos y las reglas del
+    archivo de usuario (JSON con "rules" y "disable", o una lista de reglas)
+    Las reglas mal formadas y los archivos ilegibles se ignoran
+    """
+    rules = [dict(rule) for rule in BUILTIN_RULES]
+    if dangerous_programs:
+        names = '|'.join(re.escape(name) for name in dangerous_programs)
+        rules.append({'id': 'dangerous-program', 'keywords': list(dangerous_programs),
+                      'pattern': rf'{_SUDO}(?:{names})(?:\.\S+)?{_END}'})
+    if not path:
+        return rules
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            user = json.load(f)
+    except (OSError, ValueError):
+        return rules
+    if isinstance(user, list):
+        user = {'rules': user}
+    if not isinstance(user, dict):
+        return rules
+
+    disabled = set(user.get('disable') or [])
+    rules = [rule for rule in rules if rule['id'] not in disabled]
+    for index, rule in enumerate(user.get('rules') or []):
+        rule = _valid_rule(rule, index)
+        if rule is not None:
+            rules.append(rule)
+    return rules
+
+
+_ENGINE = None
+_ENGINE_KEY = None
+_ENGINE_LOCK = threading.Lock()
+
+
+def get_danger_rules(config=None):
+    """
+    Motor de reglas compartido
+    Se reconstruye si cambian el archivo de reglas de usuario (ruta o contenido) o los
+    programas peligrosos de la configuración; mientras tanto conserva su caché de veredictos
+    """
+    global _ENGINE, _ENGINE_KEY
+
+    config = config or get_config()
+    path = config.DANGER_RULES_FILE
+    path = os.path.expanduser(path) if path else None
+    signature = None
+    if path:
+        try:
+            stat = os.stat(path)
+            signature = (stat.st_size, stat.st_mtime_ns)
+        except OSError:
+            pass
+    key = (path, signature, tuple(config.DANGEROUS_COMMANDS))
+
+    with _ENGINE_LOCK:
+        if _ENGINE is None or _ENGINE_KEY != key:
+            _ENGINE = DangerRules(load_rules(path, config.DANGEROUS_COMMANDS))
+            _ENGINE_KEY = key
+        return _ENGINE
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+Execution Module
+
+This module runs the confirmed shell command while streaming its stdout and
+stderr live to the terminal. Memory use does not depend on the amount of
+output: only the first and last bytes of each stream are kept for the
+result, and the full output can optionally be spooled to a temporary file.
+"""
+
+import codecs
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+
+# Tamaño de cada lectura de las tuberías del proceso
+_CHUNK_SIZE = 64 * 1024
+# Tiempo que se espera a los lectores tras terminar un proceso por timeout o Ctrl-C
+_READER_GRACE = 1.0
+
+
+class OutputBuffer:
+    """Conserva los primeros head_size bytes y los últimos tail_size bytes de un flujo"""
+
+    def __init__(self, head_size, tail_size):
+        self.head_size = head_size
+        self.tail_size = tail_size
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total = 0
+
+    def write(self, data):
+        """Añade datos descartando la parte central cuando se supera el límite"""
+        self.total += len(data)
+        if len(self.head) < self.head_size:
+            taken = self.head_size - len(self.head)
+            self.head += data[:taken]
+            data = data[taken:]
+        if data and self.tail_size:
+            self.tail += data
+            # Se recorta con holgura para no copiar la cola en cada escritura
+            if len(self.tail) > 2 * self.tail_size:
+                del self.tail[:-self.tail_size]
+
+    def _kept_tail(self):
+        """Últimos tail_size bytes"""
+        return bytes(self.tail[-self.tail_size:]) if self.tail_size else b''
+
+    @property
+    def omitted(self):
+        """Bytes descartados de la parte central"""
+        return self.total - len(self.head) - len(self._kept_tail())
+
+    def text(self, omitted_marker):
+        """Texto conservado; omitted_marker se formatea con bytes={descartados}"""
+        head = bytes(self.head).decode('utf-8', errors='replace')
+        tail = self._kept_tail().decode('utf-8', errors='replace')
+        omitted = self.omitted
+        if not omitted:
+            return head + tail
+        return head + omitted_marker.format(bytes=omitted) + tail
+
+
+def _terminal_writer(stream):
+    """Función que escribe bytes en un flujo de texto (usa su buffer binario si lo tiene)"""
+    stream.flush()
+    binary = getattr(stream, 'buffer', None)
+    if binary is not None:
+        def write(data):
+            binary.write(data)
+            binary.flush()
+        return write
+
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+    def write_text(data):
+        stream.write(decoder.decode(data))
+        stream.flush()
+    return write_text
+
+
+class StreamingExecution:
+    """
+    Ejecución de un comando con salida en directo y memoria acotada
+    on_first_output se llama una vez, antes de mostrar la primera salida del comando
+    """
+
+    def __init__(self, command, head_size=64 * 1024, tail_size=64 * 1024, spool=False,
+                 on_first_output=None):
+        self.command = command
+        self.stdout = OutputBuffer(head_size, tail_size)
+        self.stderr = OutputBuffer(head_size, tail_size)
+        self.spool = spool
+        self.spool_file = None
+        self.on_first_output = on_first_output
+        self._lock = threading.Lock()
+        self._started_output = False
+        self._readers = []
+
+    def _reader(self, pipe, buffer, write):
+        """Copia una tubería en la terminal, el búfer acotado y el archivo de volcado"""
+        with pipe:
+            for data in iter(lambda: pipe.read1(_CHUNK_SIZE), b''):
+                buffer.write(data)
+                with self._lock:
+                    if not self._started_output:
+                        self._started_output = True
+                        if self.on_first_output:
+                            self.on_first_output()
+                    if self.spool_file is not None and not self.spool_file.closed:
+                        self.spool_file.write(data)
+                    write(data)
+
+    def run(self, timeout=None, stdout=None, stderr=None):
+        """
+        Ejecuta el comando y espera a que termine
+        timeout: segundos antes de terminar el proceso (None = sin límite)
+        stdout/stderr: flujos donde se muestra la salida (por defecto los de la terminal)
+        Devuelve (código de salida o None si se agotó el tiempo, ruta del volcado o None)
+        """
+        write_stdout = _terminal_writer(stdout or sys.stdout)
+        write_stderr = _terminal_writer(stderr or sys.stderr)
+        if self.spool:
+            self.spool_file = tempfile.NamedTemporaryFile(  # pylint: disable=consider-using-with
+                prefix='cmdh-output-', suffix='.log', delete=False
+            )
+
+        # Con timeout el comando va en su propio grupo de procesos para poder terminar
+        # también los procesos que lance el shell. Sin timeout se queda en el grupo de la
+        # terminal: puede leer de ella y recibe Ctrl-C directamente.
+        own_group = timeout is not None and os.name == 'posix'
+        try:
+            # Ejecutar con shell para permitir expansión de globs y pipes
+            process = subprocess.Popen(  # pylint: disable=consider-using-with
+                self.command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                start_new_session=own_group
+            )
+        except OSError:
+            self._close_spool()
+            raise
+
+        self._readers = [
+            threading.Thread(target=self._reader, args=(process.stdout, self.stdout, write_stdout),
+                             daemon=True),
+            threading.Thread(target=self._reader, args=(process.stderr, self.stderr, write_stderr),
+                             daemon=True)
+        ]
+        for reader in self._readers:
+            reader.start()
+
+        try:
+            return_code = process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            self._terminate(process, own_group)
+            return None, self._close_spool()
+        except KeyboardInterrupt:
+            self._terminate(process, own_group)
+            self._close_spool()
+            raise
+
+        self._join(self._readers, None)
+        return return_code, self._close_spool()
+
+    def _terminate(self, process, own_group):
+        """Termina el proceso (y su grupo si tiene uno propio) y espera a los lectores"""
+        try:
+            if own_group:
+                os.killpg(process.pid, signal.SIGKILL)
+            else:
+                process.kill()
+        except ProcessLookupError:
+            pass  # Ya había terminado
+        process.wait()
+        # Un proceso lanzado en segundo plano por el shell puede mantener abiertas las tuberías
+        self._join(self._readers, _READER_GRACE)
+
+    def _join(self, readers, timeout):
+        """Espera a los hilos lectores"""
+        for reader in readers:
+            reader.join(timeout)
+
+    def _close_spool(self):
+        """Cierra el archivo de volcado y devuelve su ruta"""
+        if self.spool_file is None:
+            return None
+        with self._lock:
+            self.spool_file.close()
+        return self.spool_file.name
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+Git Info Module
+
+This module reads git metadata for the context without scanning the work
+tree: the repository root and branch come straight from `.git/HEAD`
+(including linked worktrees, submodules and detached HEADs) and the
+"dirty" check is a single bounded `git status` call that reports unknown
+instead of blocking when the repository is too large. `aread_git_info` is
+the asyncio counterpart, using an asyncio subprocess for the status check.
+"""
+
+import asyncio
+import subprocess
+from pathlib import Path
+
+_HEAD_REF_PREFIX = 'ref: refs/heads/'
+
+# --no-optional-locks: no reescribir el índice mientras el usuario trabaja en el repo
+_STATUS_COMMAND = ('git', '--no-optional-locks', 'status', '--porcelain=v2', '--branch', '-uno')
+
+
+def find_repository(start):
+    """
+    Busca el repositorio que contiene start subiendo por los directorios
+    Devuelve (raíz del árbol de trabajo, directorio git) o None
+    """
+    current = Path(start).absolute()
+    for directory in (current, *current.parents):
+        dot_git = directory / '.git'
+        if dot_git.is_dir():
+            return directory, dot_git
+        if dot_git.is_file():
+            # Worktrees y submódulos: .git es un archivo "gitdir: <ruta>"
+            git_dir = _read_gitdir_file(dot_git)
+            if git_dir is not None:
+                return directory, git_dir
+    return None
+
+
+def _read_gitdir_file(path):
+    """Ruta del directorio git indicada por un archivo .git, o None si no es válido"""
+    try:
+        content = path.read_text(encoding='utf-8').strip()
+    except (OSError, UnicodeDecodeError):
+        return None
+    if not content.startswith('gitdir:'):
+        return None
+    git_dir = Path(content[len('gitdir:'):].strip())
+    if not git_dir.is_absolute():
+        git_dir = path.parent / git_dir
+    return git_dir if git_dir.is_dir() else None
+
+
+def read_head(git_dir):
+    """
+    Lee HEAD sin ejecutar git
+    Devuelve (rama, None) o ('', commit abreviado) si HEAD está desacoplado;
+    None si HEAD no se puede leer
+    """
+    try:
+        head = (Path(git_dir) / 'HEAD').read_text(encoding='utf-8').strip()
+    except (OSError, UnicodeDecodeError):
+        return None
+    if head.startswith(_HEAD_REF_PREFIX):
+        return head[len(_HEAD_REF_PREFIX):], None
+    if head.startswith('ref:'):
+        # Referencia fuera de refs/heads: como `git branch --show-current`, sin rama
+        return '', None
+    return '', head[:12]
+
+
+def _has_tracked_changes(output):
+    """Interpreta la salida de `git status --porcelain=v2 --branch`"""
+    # Las cabeceras (rama, upstream) empiezan por '#'; cualquier otra línea es un cambio
+    return any(line and not line.startswith(b'#') for line in output.splitlines())
+
+
+def has_changes(root, timeout):
+    """
+    Indica si hay cambios en archivos versionados (sin listar archivos no versionados)
+    Devuelve None si git no termina dentro de timeout segundos o no está disponible
+    """
+    try:
+        result = subprocess.run(
+            _STATUS_COMMAND,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            cwd=root,
+            timeout=timeout,
+            check=False
+        )
+    except (subprocess.TimeoutExpired, OSError):
+        return None
+    if result.returncode != 0:
+        return None
+    return _has_tracked_changes(result.stdout)
+
+
+def _kill(process):
+    """Termina un subproceso de git que puede haber terminado ya"""
+    try:
+        process.kill()
+    except ProcessLookupError:
+        pass
+
+
+async def ahas_changes(root, timeout):
+    """Versión asyncio de has_changes: el proceso de git se termina si se agota el tiempo"""
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *_STATUS_COMMAND,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            cwd=root
+        )
+    except OSError:
+        return None
+    try:
+        stdout, _ = await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.TimeoutError:
+        _kill(process)
+        await process.wait()
+        return None
+    except asyncio.CancelledError:
+        _kill(process)
+        raise
+    if process.returncode != 0:
+        return None
+    return _has_tracked_changes(stdout)
+
+
+def _head_info(cwd):
+    """Raíz y rama del repositorio que contiene cwd: (raíz, (rama, commit)) o None"""
+    repository = find_repository(cwd)
+    if repository is None:
+        return None
+    root, git_dir = repository
+    head = read_head(git_dir)
+    if head is None:
+        return None
+    return root, head
+
+
+def _build_info(root, head, changes):
+    """Diccionario de información de git para el contexto"""
+    branch, detached_commit = head
+    info = {
+        'branch': branch,
+        'has_changes': changes,
+        'is_git_repo': True,
+        'root': str(root)
+    }
+    if detached_commit:
+        info['detached_head'] = detached_commit
+    return info
+
+
+def read_git_info(cwd, status_timeout, head_info=None):
+    """
+    Información de git para el contexto: raíz, rama y si hay cambios (None = desconocido)
+    head_info (dict) recibe la raíz y la rama, con has_changes None, antes de ejecutar git
+    status: quien deje de esperar la respuesta completa puede usarla
+    """
+    found = _head_info(cwd)
+    if found is None:
+        return {'is_git_repo': False}
+    root, head = found
+    if head_info is not None:
+        head_info.update(_build_info(root, head, None))
+    return _build_info(root, head, has_changes(root, status_timeout))
+
+
+async def aread_git_info(cwd, status_timeout, head_info=None):
+    """Versión asyncio de read_git_info (la lectura de HEAD no bloquea: son dos archivos)"""
+    found = _head_info(cwd)
+    if found is None:
+        return {'is_git_repo': False}
+    root, head = found
+    if head_info is not None:
+        head_info.update(_build_info(root, head, None))
+    return _build_info(root, head, await ahas_changes(root, status_timeout))
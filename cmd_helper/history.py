@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+Shell History Module
+
+This module reads the last commands from the user's shell history without
+loading the whole file: only a bounded window at the end of the file is
+read and decoded. Bash (plain and timestamped), zsh (extended history,
+metafied bytes) and fish (YAML-like) formats are supported.
+"""
+
+import os
+from pathlib import Path
+
+# Ventana inicial leída desde el final del archivo y tamaño máximo al que puede crecer
+_INITIAL_WINDOW = 16 * 1024
+_MAX_WINDOW = 4 * 1024 * 1024
+
+# zsh escapa los bytes especiales con 0x83 seguido del byte XOR 32 ("metafy")
+_ZSH_META = 0x83
+
+
+def history_file(environ=None):
+    """
+    Archivo de historial y formato según $SHELL y $HISTFILE
+    Devuelve (ruta, formato) con formato 'bash', 'zsh' o 'fish'
+    """
+    environ = os.environ if environ is None else environ
+    home = Path(environ.get('HOME') or Path.home())
+    shell = Path(environ.get('SHELL', '')).name
+
+    if shell == 'fish':
+        data_home = environ.get('XDG_DATA_HOME') or home / '.local' / 'share'
+        session = environ.get('fish_history') or 'fish'
+        return Path(data_home) / 'fish' / f'{session}_history', 'fish'
+
+    shell_format = 'zsh' if shell == 'zsh' else 'bash'
+    if environ.get('HISTFILE'):
+        return Path(environ['HISTFILE']).expanduser(), shell_format
+    default_name = '.zsh_history' if shell_format == 'zsh' else '.bash_history'
+    return home / default_name, shell_format
+
+
+def read_tail(path, size):
+    """
+    Lee como mucho los últimos size bytes de path
+    Devuelve (datos, True si se ha leído desde el inicio del archivo)
+    """
+    with open(path, 'rb') as history:
+        history.seek(0, os.SEEK_END)
+        end = history.tell()
+        start = max(end - size, 0)
+        history.seek(start)
+        data = history.read(end - start)
+
+    if start > 0:
+        # La primera línea puede estar cortada: se descarta
+        newline = data.find(b'\n')
+        data = data[newline + 1:] if newline != -1 else b''
+    return data, start == 0
+
+
+def _unmetafy(data):
+    """Deshace el escape de bytes de zsh"""
+    if _ZSH_META not in data:
+        return data
+    output = bytearray()
+    escaped = False
+    for byte in data:
+        if escaped:
+            output.append(byte ^ 32)
+            escaped = False
+        elif byte == _ZSH_META:
+            escaped = True
+        else:
+            output.append(byte)
+    return bytes(output)
+
+
+def parse_bash(text):
+    """Comandos de un historial de bash (ignora las marcas de tiempo '#1700000000')"""
+    commands = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or (line.startswith('#') and line[1:].isdigit()):
+            continue
+        commands.append(line)
+    return commands
+
+
+def parse_zsh(text):
+    """Comandos de un historial de zsh (simple o EXTENDED_HISTORY ': inicio:duración;cmd')"""
+    commands = []
+    pending = None
+    for line in text.splitlines():
+        if pending is not None:
+            # Comando de varias líneas: zsh termina cada línea intermedia con '\'
+            pending += '\n' + line
+        elif line.startswith(': ') and ';' in line:
+            pending = line.split(';', 1)[1]
+        else:
+            pending = line
+
+        if pending.endswith('\\'):
+            pending = pending[:-1]
+            continue
+        if pending.strip():
+            commands.append(pending.strip())
+        pending = None
+    return commands
+
+
+def parse_fish(text):
+    """Comandos de un historial de fish ('- cmd: ...' seguido de 'when:' y 'paths:')"""
+    commands = []
+    for line in text.splitlines():
+        if not line.startswith('- cmd: '):
+            continue
+        command = line[len('- cmd: '):]
+        # fish escapa los saltos de línea y las barras invertidas
+        command = command.replace('\\\\', '\x00').replace('\\n', '\n').replace('\x00', '\\')
+        if command.strip():
+            commands.append(command.strip())
+    return commands
+
+
+_PARSERS = {'bash': parse_bash, 'zsh': parse_zsh, 'fish': parse_fish}
+
+
+def read_recent_commands(environ=None, limit=10):
+    """
+    Últimos limit comandos del historial del shell del usuario
+    El coste no depende del tamaño del archivo: solo se lee una ventana final acotada
+    """
+    path, shell_format = history_file(environ)
+    parser = _PARSERS[shell_format]
+
+    window = _INITIAL_WINDOW
+    while True:
+        try:
+            data, complete = read_tail(path, window)
+        except OSError:
+            return []
+        if shell_format == 'zsh':
+            data = _unmetafy(data)
+        commands = parser(data.decode('utf-8', errors='replace'))
+        # Con comandos muy largos la ventana puede quedarse corta: se amplía hasta el máximo
+        if len(commands) >= limit or complete or window >= _MAX_WINDOW:
+            return commands[-limit:]
+        window *= 4
@@ -4,11 +4,185 @@ Internationalization Module
 
 This module handles translation and localization for the Cmd Helper application,
 supporting multiple languages with automatic detection.
+
+Catalogs are flattened at load time into a single dict keyed by the full dotted
+path, so each lookup is one dict access. The flattened catalog is stored as a
+marshal file in the user cache directory (like Python bytecode, but outside the
+installed package, which may be read-only or shared) keyed by the source mtime
+and size: a warm process reads it without parsing any JSON, and language
+detection only lists the locale files.
+
+Each catalog is loaded once per process and never modified. The active
+language is carried in a context variable, so concurrent requests (daemon
+threads, batch workers, asyncio tasks) can use different languages with
+use_language() without locks, reloads or affecting each other; without one,
+t() uses the process default language chosen with get_translator().
 """
 
-import json
-import locale
+import contextvars
+import marshal
+import os
+import sys
+import threading
+from contextlib import contextmanager
 from pathlib import Path
+from types import MappingProxyType
+from .lazy import lazy_import
+
+# json solo hace falta para recompilar un catálogo y locale para detectar el idioma
+json = lazy_import('json')
+locale = lazy_import('locale')
+
+_LOCALES_DIR = Path(__file__).parent / 'locales'
+# El formato de marshal cambia entre versiones de Python
+_COMPILED_SUFFIX = f'.{sys.implementation.cache_tag}.marshal'
+
+# Catálogos cargados (inmutables), uno por idioma; el candado solo protege la primera carga
+_CATALOGS = {}
+_CATALOGS_LOCK = threading.Lock()
+
+# Idioma de la petición en curso (None: el idioma por defecto del proceso)
+_LANGUAGE = contextvars.ContextVar('cmd_helper_language', default=None)
+
+# Traducciones básicas en español si no se puede leer ningún catálogo
+_FALLBACK_TRANSLATIONS = {
+    "messages.analyzing_request": "🤖 Analizando tu petición...",
+    "messages.no_command_generated": "No pude generar un comando para tu petición."
+}
+
+
+def flatten(tree, prefix=''):
+    """
+    Aplana un catálogo anidado a un diccionario con la ruta completa como clave
+    Ejemplo: {'messages': {'ok': 'Hecho'}} -> {'messages.ok': 'Hecho'}
+    """
+    flat = {}
+    for key, value in tree.items():
+        path = f'{prefix}{key}'
+        if isinstance(value, dict):
+            flat.update(flatten(value, f'{path}.'))
+        else:
+            flat[path] = value
+    return flat
+
+
+def _source_signature(file_path):
+    """Firma del archivo JSON (mtime en ns y tamaño) que invalida el catálogo compilado"""
+    stat = file_path.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _read_compiled(compiled_path, signature):
+    """Catálogo compilado si existe y corresponde a signature; None si no"""
+    try:
+        with open(compiled_path, 'rb') as f:
+            stored_signature, catalog = marshal.loads(f.read())
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if tuple(stored_signature) != signature or not isinstance(catalog, dict):
+        return None
+    return catalog
+
+
+def default_compiled_dir():
+    """
+    Directorio de los catálogos compilados: locales dentro de CMD_HELPER_CACHE_DIR,
+    $XDG_CACHE_HOME/cmd-helper o ~/.cache/cmd-helper
+    Solo se consulta el entorno del proceso para no cargar archivos .env al mostrar un mensaje
+    """
+    configured = os.environ.get('CMD_HELPER_CACHE_DIR')
+    if configured:
+        return Path(configured).expanduser() / 'locales'
+    xdg_cache = os.environ.get('XDG_CACHE_HOME')
+    base = Path(xdg_cache) if xdg_cache else Path.home() / '.cache'
+    return base / 'cmd-helper' / 'locales'
+
+
+def _write_compiled(compiled_path, signature, catalog):
+    """Guarda el catálogo compilado de forma atómica (sin permisos de escritura no se guarda)"""
+    temp_path = compiled_path.with_name(f'{compiled_path.name}.{os.getpid()}.tmp')
+    try:
+        compiled_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(temp_path, 'wb') as f:
+            f.write(marshal.dumps((signature, catalog)))
+        os.replace(temp_path, compiled_path)
+    except OSError:
+        try:
+            temp_path.unlink()
+        except OSError:
+            pass
+
+
+def load_catalog(file_path, compiled_dir=None):
+    """
+    Catálogo aplanado de un archivo JSON de traducciones
+    Usa la versión compilada de compiled_dir (por defecto, la de la caché del usuario) si está al
+    día; si no, parsea el JSON y la regenera
+    """
+    compiled_dir = Path(compiled_dir) if compiled_dir else default_compiled_dir()
+    compiled_path = compiled_dir / f'{file_path.stem}{_COMPILED_SUFFIX}'
+    signature = _source_signature(file_path)
+
+    catalog = _read_compiled(compiled_path, signature)
+    if catalog is None:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            catalog = flatten(json.load(f))
+        _write_compiled(compiled_path, signature, catalog)
+    return catalog
+
+
+def available_languages():
+    """Idiomas con archivo de traducciones (sin leer ninguno)"""
+    try:
+        names = os.listdir(_LOCALES_DIR)
+    except OSError:
+        return ['es']
+    return sorted(name[:-5] for name in names if name.endswith('.json'))
+
+
+def detect_system_language():
+    """Detecta el idioma del sistema sin cargar ningún catálogo"""
+    try:
+        # Obtener configuración regional del sistema
+        system_locale = locale.getdefaultlocale()[0]
+        if system_locale:
+            # Extraer código de idioma (ej: 'en_US' -> 'en')
+            lang_code = system_locale.split('_')[0].lower()
+            if lang_code in available_languages():
+                return lang_code
+    except (TypeError, AttributeError, ValueError):
+        pass
+
+    # Fallback a español
+    return 'es'
+
+
+def resolve_language(language):
+    """Idioma con catálogo para language ('es' si no existe)"""
+    if language in _CATALOGS or (_LOCALES_DIR / f'{language}.json').exists():
+        return language
+    return 'es'
+
+
+def get_catalog(language):
+    """
+    Catálogo aplanado e inmutable de un idioma, cargado una sola vez por proceso
+    Los idiomas sin archivo de traducciones usan el catálogo en español
+    """
+    catalog = _CATALOGS.get(language)
+    if catalog is not None:
+        return catalog
+
+    language = resolve_language(language)
+    with _CATALOGS_LOCK:
+        if language not in _CATALOGS:
+            try:
+                flat = load_catalog(_LOCALES_DIR / f'{language}.json')
+            except (OSError, ValueError) as e:
+                print(f"Error loading translations: {e}")
+                flat = dict(_FALLBACK_TRANSLATIONS)
+            _CATALOGS[language] = MappingProxyType(flat)
+        return _CATALOGS[language]
 
 
 class Translator:
@@ -20,43 +194,19 @@ class Translator:
         self.load_translations()
 
     def load_translations(self):
-        """Carga las traducciones desde el archivo JSON correspondiente"""
-        try:
-            locales_dir = Path(__file__).parent / 'locales'
-            file_path = locales_dir / f'{self.language}.json'
-
-            if not file_path.exists():
-                # Fallback a español si no existe el idioma
-                file_path = locales_dir / 'es.json'
-                self.language = 'es'
-
-            with open(file_path, 'r', encoding='utf-8') as f:
-                self.translations = json.load(f)
-
-        except (OSError, json.JSONDecodeError) as e:
-            print(f"Error loading translations: {e}")
-            # Fallback a traducciones básicas en español
-            self.translations = {
-                "messages": {
-                    "analyzing_request": "🤖 Analizando tu petición...",
-                    "no_command_generated": "No pude generar un comando para tu petición."
-                }
-            }
+        """Asocia el catálogo compartido del idioma actual (se carga solo la primera vez)"""
+        self.language = resolve_language(self.language)
+        self.translations = get_catalog(self.language)
 
     def get(self, key_path, default=None):
         """
         Obtiene una traducción usando notación de punto
         Ejemplo: t.get('messages.analyzing_request')
         """
-        keys = key_path.split('.')
-        value = self.translations
-
-        try:
-            for key in keys:
-                value = value[key]
-            return value
-        except (KeyError, TypeError):
+        value = self.translations.get(key_path)
+        if value is None:
             return default or key_path
+        return value
 
     def set_language(self, language):
         """Cambia el idioma de la aplicación"""
@@ -66,56 +216,67 @@ class Translator:
 
     def get_available_languages(self):
         """Retorna los idiomas disponibles"""
-        locales_dir = Path(__file__).parent / 'locales'
-        if not locales_dir.exists():
-            return ['es']
-
-        languages = []
-        for file_path in locales_dir.glob('*.json'):
-            languages.append(file_path.stem)
-
-        return sorted(languages)
+        return available_languages()
 
     def detect_system_language(self):
         """Detecta el idioma del sistema"""
-        try:
-            # Obtener configuración regional del sistema
-            system_locale = locale.getdefaultlocale()[0]
-            if system_locale:
-                # Extraer código de idioma (ej: 'en_US' -> 'en')
-                lang_code = system_locale.split('_')[0].lower()
-                available_langs = self.get_available_languages()
-
-                if lang_code in available_langs:
-                    return lang_code
-        except (TypeError, AttributeError):
-            pass
-
-        # Fallback a español
-        return 'es'
+        return detect_system_language()
 
 
-# Instancia global del traductor
+# Instancia global del traductor (idioma por defecto del proceso)
 _TRANSLATOR = None
 
 
 def get_translator(language=None):
-    """Obtiene la instancia global del traductor"""
+    """
+    Obtiene el traductor con el idioma por defecto del proceso
+    language cambia ese idioma por defecto (la CLI lo fija al arrancar); para una sola
+    petición o tarea se usa use_language()
+    """
     global _TRANSLATOR
 
     if _TRANSLATOR is None:
-        if language is None:
-            # Auto-detectar idioma del sistema
-            temp_translator = Translator()
-            language = temp_translator.detect_system_language()
-        _TRANSLATOR = Translator(language)
+        _TRANSLATOR = Translator(language or detect_system_language())
     elif language and language != _TRANSLATOR.language:
         _TRANSLATOR.set_language(language)
 
     return _TRANSLATOR
 
 
+def context_language():
+    """Idioma activo en el contexto actual con use_language(), o None"""
+    return _LANGUAGE.get()
+
+
+def current_language():
+    """Idioma con el que t() traduce en el contexto actual"""
+    return _LANGUAGE.get() or get_translator().language
+
+
+@contextmanager
+def use_language(language):
+    """
+    Traduce en language dentro del bloque, solo en el contexto actual (hilo o tarea asyncio)
+    Ejemplo: with use_language('en'): print(t('messages.goodbye'))
+    """
+    if not language or language == 'auto':
+        yield current_language()
+        return
+    language = resolve_language(language)
+    get_catalog(language)
+    token = _LANGUAGE.set(language)
+    try:
+        yield language
+    finally:
+        _LANGUAGE.reset(token)
+
+
 def t(key_path, default=None):
     """Función de conveniencia para obtener traducciones"""
-    translator = get_translator()
-    return translator.get(key_path, default)
+    language = _LANGUAGE.get()
+    if language is None:
+        return (_TRANSLATOR or get_translator()).get(key_path, default)
+    value = _CATALOGS[language].get(key_path)
+    if value is None:
+        return default or key_path
+    return value
@@ -0,0 +1,470 @@
+# -*- coding: utf-8 -*-
+"""
+Local Intents Module
+
+This module answers common requests ("list python files", "uso de disco de
+esta carpeta", "show git log") without calling the model. Each intent has
+regular expressions in Spanish and English that must match the whole
+normalized request, and a command template whose parameters are taken from
+the named groups of the pattern. Parameters are validated (file types,
+numbers, ports) or shell-quoted before they reach the command, and intents
+whose command depends on the operating system only apply where they have
+one. A request that no intent matches goes to the model as usual.
+
+User intents are read from the JSON file named by CMD_HELPER_INTENTS and are
+tried before the built-in ones:
+
+    {"intents": [{"id": "k8s-pods",
+                  "patterns": ["(?:list|lista) (?:los )?pods(?: (?:in|en) (?P<ns>\\\\S+))?"],
+                  "command": "kubectl get pods -n {ns}",
+                  "defaults": {"ns": "default"},
+                  "explanation": {"en": "Lists the pods in {ns}",
+                                  "es": "Lista los pods de {ns}"}}],
+     "disable": ["memory-usage"]}
+"""
+
+import json
+import os
+import platform
+import re
+import shlex
+import string
+import threading
+from .config import get_config
+
+# Sistemas en los que se ejecutan los comandos POSIX de las intenciones incluidas
+_POSIX = ('Linux', 'Darwin')
+
+# Fórmulas de cortesía que no cambian la intención
+_COURTESY_RE = re.compile(
+    r'^(?:(?:please|can you|could you|por favor|puedes|podrías|quiero|i want to) )+'
+    r'|(?: (?:please|por favor))+$',
+    re.IGNORECASE
+)
+
+# Tipos de archivo por nombre (en inglés y español) -> extensión
+_FILE_TYPES = {
+    'python': 'py', 'javascript': 'js', 'typescript': 'ts', 'java': 'java', 'go': 'go',
+    'rust': 'rs', 'c': 'c', 'c++': 'cpp', 'cpp': 'cpp', 'ruby': 'rb', 'php': 'php',
+    'shell': 'sh', 'bash': 'sh', 'markdown': 'md', 'text': 'txt', 'texto': 'txt',
+    'json': 'json', 'yaml': 'yaml', 'xml': 'xml', 'html': 'html', 'css': 'css', 'csv': 'csv',
+    'log': 'log', 'logs': 'log', 'pdf': 'pdf', 'zip': 'zip', 'sql': 'sql', 'jar': 'jar'
+}
+_EXTENSION_RE = re.compile(r'\.([a-z0-9]{1,8})')
+
+# Texto opcional al final: "aquí", "en esta carpeta"...
+_HERE_EN = r'(?: here| in (?:this|the current) (?:folder|directory))?'
+_HERE_ES = r'(?: aqu[ií]| (?:de|en) (?:esta carpeta|este directorio|la carpeta actual))?'
+# Valor de un parámetro de texto: entre comillas o una palabra
+_QUOTED = r'"[^"]+"|\'[^\']+\'|\S+'
+
+
+def _extension(value):
+    """Extensión para un tipo de archivo (python, .py...); None si no se conoce"""
+    value = value.lower()
+    if value in _FILE_TYPES:
+        return _FILE_TYPES[value]
+    found = _EXTENSION_RE.fullmatch(value)
+    return found.group(1) if found else None
+
+
+def _bounded_int(low, high):
+    """Conversor de parámetros numéricos dentro de [low, high]"""
+    def convert(value):
+        number = int(value)
+        return str(number) if low <= number <= high else None
+    return convert
+
+
+# Caracteres que el shell expandiría y que al citarlos perderían su significado
+_SHELL_EXPANSION = '$`*?['
+
+
+def _unquoted(value):
+    """Valor sin las comillas que traiga la petición"""
+    if len(value) > 1 and value[0] == value[-1] and value[0] in '"\'':
+        return value[1:-1]
+    return value
+
+
+def _quoted(value):
+    """Texto citado para el shell, sin las comillas que traiga la petición"""
+    return shlex.quote(_unquoted(value))
+
+
+def _path(value):
+    """
+    Ruta o nombre de archivo citado para el shell, con ~ expandido; None si usa variables,
+    sustitución de comandos o comodines, que solo el shell sabe expandir
+    """
+    value = _unquoted(value)
+    if any(char in value for char in _SHELL_EXPANSION):
+        return None
+    return shlex.quote(os.path.expanduser(value))
+
+
+# Conversores por nombre de parámetro; el resto se citan para el shell
+PARAMETERS = {
+    'ext': _extension,
+    'count': _bounded_int(1, 1000),
+    'port': _bounded_int(1, 65535),
+    'path': _path,
+    'name': _path,
+}
+
+# Intenciones incluidas. Los patrones se comparan, sin distinguir mayúsculas, con la petición
+# completa normalizada (espacios colapsados, sin signos de puntuación alrededor ni fórmulas de
+# cortesía); los parámetros conservan las mayúsculas
+BUILTIN_INTENTS = [
+    {'id': 'list-files-by-type',
+     'patterns': [
+         rf'(?:list|show|find)(?: me)?(?: all)?(?: the)? (?P<ext>\S+) files{_HERE_EN}',
+         rf'(?:lista|listar|muestra|mostrar|busca|buscar|encuentra)(?: todos)?(?: los)? '
+         rf'(?:archivos|ficheros)(?: de)? (?P<ext>\S+){_HERE_ES}',
+     ],
+     'command': "find . -type f -name '*.{ext}'",
+     'explanation': {'en': 'Finds the .{ext} files in this directory and its subdirectories',
+                     'es': 'Busca los archivos .{ext} en este directorio y sus subdirectorios'}},
+    {'id': 'list-files',
+     'patterns': [
+         rf'(?:list|show)(?: me)?(?: all)?(?: the)? files{_HERE_EN}',
+         r'ls',
+         rf'(?:lista|listar|muestra|mostrar|ver)(?: todos)?(?: los)? (?:archivos|ficheros)'
+         rf'{_HERE_ES}',
+     ],
+     'command': 'ls -la',
+     'explanation': {'en': 'Lists the files in this directory with details, hidden ones included',
+                     'es': 'Lista los archivos de este directorio con detalles, incluidos los '
+                           'ocultos'}},
+    {'id': 'find-by-name',
+     'patterns': [
+         r'find (?:a |the )?files? (?:named|called) (?P<name>' + _QUOTED + ')',
+         r'(?:busca|encuentra) (?:el |los )?(?:archivos?|ficheros?) (?:llamados?|con nombre) '
+         r'(?P<name>' + _QUOTED + ')',
+     ],
+     'command': 'find . -name {name}',
+     'explanation': {'en': 'Finds the files named {name} under this directory',
+                     'es': 'Busca los archivos llamados {name} bajo este directorio'}},
+    {'id': 'largest-files',
+     'patterns': [
+         rf'(?:(?:show|list|find) )?(?:me )?(?:the )?(?:largest|biggest) files{_HERE_EN}',
+         rf'(?:(?:muestra|lista|busca|encuentra) )?(?:los )?(?:archivos|ficheros) '
+         rf'(?:m[aá]s grandes|que m[aá]s ocupan){_HERE_ES}',
+     ],
+     'command': 'du -ah . | sort -rh | head -n 20',
+     'explanation': {'en': 'Lists the 20 largest files and folders under this directory',
+                     'es': 'Lista los 20 archivos y carpetas más grandes bajo este directorio'}},
+    {'id': 'folder-size',
+     'patterns': [
+         r'(?:show )?(?:the )?(?:disk usage|size)(?: of)? (?:this|the current) '
+         r'(?:folder|directory)',
+         r'(?:show )?disk usage',
+         r'how (?:big|large) is this (?:folder|directory)',
+         r'(?:muestra )?(?:el )?(?:uso de disco|tamaño|espacio ocupado)(?: de| por)? '
+         r'(?:esta carpeta|este directorio|la carpeta actual|el directorio actual)',
+         r'cu[aá]nto ocupa (?:esta carpeta|este directorio)',
+     ],
+     'command': 'du -sh .',
+     'explanation': {'en': 'Shows the total size of this directory',
+                     'es': 'Muestra el tamaño total de este directorio'}},
+    {'id': 'free-disk-space',
+     'patterns': [
+         r'(?:show )?(?:the )?(?:free |available )?disk space(?: left| available)?',
+         r'how much (?:free )?disk space(?: is)?(?: there)?(?: left| available)?',
+         r'df',
+         r'(?:muestra )?(?:el )?espacio (?:libre|disponible)(?: en (?:el )?disco)?',
+         r'(?:muestra )?(?:el )?espacio en (?:el )?disco',
+     ],
+     'command': 'df -h',
+     'explanation': {'en': 'Shows the used and free space of each mounted disk',
+                     'es': 'Muestra el espacio usado y libre de cada disco montado'}},
+    {'id': 'git-log',
+     'patterns': [
+         r'(?:show )?(?:me )?(?:the )?git (?:log|history)',
+         r'(?:show )?(?:me )?(?:the )?(?:last|latest|recent) (?:(?P<count>\d+) )?commits',
+         r'(?:muestra )?(?:el )?(?:log|historial) de git',
+         r'(?:muestra )?(?:los )?(?:[uú]ltimos|recientes) (?:(?P<count>\d+) )?commits',
+     ],
+     'command': 'git log --oneline -n {count}',
+     'defaults': {'count': '20'},
+     'explanation': {'en': 'Shows the last {count} commits, one per line',
+                     'es': 'Muestra los últimos {count} commits, uno por línea'}},
+    {'id': 'git-status',
+     'patterns': [
+         r'(?:show )?(?:the )?git status',
+         r'what (?:files )?(?:has|have) changed',
+         r'(?:muestra )?(?:el )?estado de git',
+         r'qu[eé] (?:archivos )?(?:ha|han) cambiado',
+     ],
+     'command': 'git status',
+     'explanation': {'en': 'Shows the changed, staged and untracked files of the repository',
+                     'es': 'Muestra los archivos modificados, preparados y sin seguimiento del '
+                           'repositorio'}},
+    {'id': 'git-branch',
+     'patterns': [
+         r'(?:show |what is )?(?:the )?current (?:git )?branch',
+         r'which branch am i on',
+         r'(?:muestra |cu[aá]l es )?(?:la )?rama actual',
+         r'en qu[eé] rama estoy',
+     ],
+     'command': 'git branch --show-current',
+     'explanation': {'en': 'Shows the name of the current git branch',
+                     'es': 'Muestra el nombre de la rama de git actual'}},
+    {'id': 'current-directory',
+     'patterns': [
+         r'where am i',
+         r'(?:show |print |what is )?(?:the )?current (?:directory|folder)',
+         r'pwd',
+         r'd[oó]nde estoy',
+         r'(?:muestra |cu[aá]l es )?(?:el )?directorio actual',
+         r'(?:muestra |cu[aá]l es )?(?:la )?carpeta actual',
+     ],
+     'command': 'pwd',
+     'explanation': {'en': 'Prints the current directory',
+                     'es': 'Muestra el directorio actual'}},
+    {'id': 'processes',
+     'patterns': [
+         r'(?:list|show)(?: me)?(?: all)?(?: the)?(?: running)? processes',
+         r'(?:(?:lista|muestra) )?(?:los )?procesos(?: en ejecuci[oó]n| activos)?',
+     ],
+     'command': 'ps aux',
+     'explanation': {'en': 'Lists all running processes with their CPU and memory use',
+                     'es': 'Lista todos los procesos en ejecución con su uso de CPU y memoria'}},
+    {'id': 'port-owner',
+     'patterns': [
+         r'(?:what|which process|who) is (?:using|listening on) port (?P<port>\d+)',
+         r'qu[eé] (?:proceso )?(?:usa|est[aá] usando|escucha en) el puerto (?P<port>\d+)',
+     ],
+     'command': 'lsof -i :{port}',
+     'explanation': {'en': 'Shows the processes using port {port}',
+                     'es': 'Muestra los procesos que usan el puerto {port}'}},
+    {'id': 'memory-usage',
+     'patterns': [
+         r'(?:show )?(?:the )?(?:free |available )?memory(?: usage)?',
+         r'how much (?:free )?memory(?: is)?(?: there)?(?: left| available| free)?',
+         r'(?:muestra )?(?:el )?uso de (?:la )?memoria',
+         r'(?:muestra )?(?:la )?memoria(?: libre| disponible| usada)?',
+     ],
+     'command': {'Linux': 'free -h', 'Darwin': 'vm_stat'},
+     'explanation': {'en': 'Shows the used and free memory',
+                     'es': 'Muestra la memoria usada y libre'}},
+    {'id': 'ip-address',
+     'patterns': [
+         r'(?:show |what is )?my (?:local )?ip(?: address)?',
+         r'(?:muestra |cu[aá]l es )?mi (?:direcci[oó]n )?ip(?: local)?',
+     ],
+     'command': {'Linux': 'hostname -I', 'Darwin': 'ipconfig getifaddr en0'},
+     'explanation': {'en': 'Shows the local IP address of this machine',
+                     'es': 'Muestra la dirección IP local de este equipo'}},
+    {'id': 'count-lines',
+     'patterns': [
+         r'count (?:the )?lines (?:in|of) (?P<path>' + _QUOTED + ')',
+         r'how many lines (?:are there in|does) (?P<path>' + _QUOTED + r')(?: have)?',
+         r'cuenta (?:las )?l[ií]neas (?:de|en) (?P<path>' + _QUOTED + ')',
+         r'cu[aá]ntas l[ií]neas tiene (?P<path>' + _QUOTED + ')',
+     ],
+     'command': 'wc -l -- {path}',
+     'explanation': {'en': 'Counts the lines of {path}',
+                     'es': 'Cuenta las líneas de {path}'}},
+    {'id': 'show-file',
+     'patterns': [
+         r'(?:show|print|display)(?: me)?(?: the)? contents? of (?P<path>' + _QUOTED + ')',
+         r'(?:muestra|mostrar|ver) (?:el )?contenido de (?P<path>' + _QUOTED + ')',
+     ],
+     'command': 'cat -- {path}',
+     'explanation': {'en': 'Prints the contents of {path}',
+                     'es': 'Muestra el contenido de {path}'}},
+    {'id': 'search-text',
+     'patterns': [
+         r'(?:search|look|grep)(?: for)? (?P<text>' + _QUOTED + r') in (?:all )?(?:the )?'
+         r'(?:files|this (?:folder|directory)|here)',
+         r'busca (?:el texto )?(?P<text>' + _QUOTED + r') en (?:todos )?(?:los archivos|'
+         r'esta carpeta|este directorio|aqu[ií])',
+     ],
+     'command': 'grep -rn -- {text} .',
+     'explanation': {'en': 'Searches for {text} in the files under this directory',
+                     'es': 'Busca {text} en los archivos bajo este directorio'}},
+]
+
+
+def normalize_request(user_request):
+    """Petición con los espacios colapsados, sin puntuación alrededor ni fórmulas de cortesía"""
+    normalized = re.sub(r'\s+', ' ', user_request).strip('¿¡?!. ')
+    return _COURTESY_RE.sub('', normalized)
+
+
+class IntentMatcher:
+    """Intenciones locales: comando y explicación para las peticiones que reconocen"""
+
+    def __init__(self, intents, system=None):
+        self.system = system or platform.system()
+        self.intents = []
+        for intent in intents:
+            command = intent['command']
+            if isinstance(command, dict):
+                command = command.get(self.system)
+            else:
+                # Sin platforms, comandos POSIX; las intenciones de usuario valen en cualquiera
+                platforms = intent.get('platforms', _POSIX)
+                if platforms and self.system not in platforms:
+                    command = None
+            if command is None:
+                continue  # Sin comando para este sistema
+            self.intents.append((
+                intent['id'],
+                [re.compile(pattern, re.IGNORECASE) for pattern in intent['patterns']],
+                command,
+                intent.get('explanation') or {},
+                intent.get('defaults') or {}
+            ))
+
+    @staticmethod
+    def _parameters(found, defaults):
+        """Valores de los parámetros listos para el shell; None si alguno no es válido"""
+        values = dict(defaults)
+        for name, value in found.groupdict().items():
+            if value is None:
+                if name not in values:
+                    return None
+                continue
+            converted = PARAMETERS.get(name, _quoted)(value)
+            if converted is None:
+                return None
+            values[name] = converted
+        return values
+
+    def match(self, user_request, language='en'):
+        """
+        Respuesta local a la petición: dict con command, explanation e intent, o None si
+        ninguna intención la reconoce
+        """
+        request = normalize_request(user_request)
+        for intent_id, patterns, command, explanation, defaults in self.intents:
+            for pattern in patterns:
+                found = pattern.fullmatch(request)
+                if found is None:
+                    continue
+                values = self._parameters(found, defaults)
+                if values is None:
+                    continue
+                if isinstance(explanation, dict):
+                    explanation = explanation.get(language) or explanation.get('en', '')
+                try:
+                    return {
+                        'command': command.format(**values),
+                        'explanation': explanation.format(**values),
+                        'intent': intent_id
+                    }
+                except (KeyError, IndexError, ValueError, AttributeError, TypeError):
+                    # Una plantilla de usuario que no se puede rellenar no responde
+                    break
+        return None
+
+
+def _valid_intent(intent, index):
+    """Intención de usuario normalizada, o None si no es válida"""
+    if not isinstance(intent, dict):
+        return None
+    patterns = intent.get('patterns')
+    if isinstance(patterns, str):
+        patterns = [patterns]
+    command = intent.get('command')
+    if not isinstance(patterns, list) or not patterns or not isinstance(command, (str, dict)):
+        return None
+    defaults = intent.get('defaults') or {}
+    explanation = intent.get('explanation') or ''
+    platforms = intent.get('platforms')
+    if not isinstance(defaults, dict) or not (
+            platforms is None or isinstance(platforms, list)
+            and all(isinstance(system, str) for system in platforms)):
+        return None
+    try:
+        compiled = [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+        # Cada campo del comando y la explicación debe ser un grupo del patrón o tener valor
+        # por defecto
+        templates = list(command.values()) if isinstance(command, dict) else [command]
+        templates += (list(explanation.values()) if isinstance(explanation, dict)
+                      else [explanation])
+        fields = {field for template in templates
+                  for _, field, _, _ in string.Formatter().parse(template) if field is not None}
+    except (re.error, TypeError, ValueError):
+        return None
+    # Solo campos por nombre: {}, {0}, {a.b} o {a[0]} fallarían al responder
+    if not all(field.isidentifier() for field in fields):
+        return None
+    for found in compiled:
+        if not fields <= set(found.groupindex) | set(defaults):
+            return None
+    return {
+        'id': str(intent.get('id') or f'user-{index}'),
+        'patterns': patterns,
+        'command': command,
+        'explanation': explanation,
+        'defaults': {str(name): str(value) for name, value in defaults.items()},
+        'platforms': platforms
+    }
+
+
+def load_intents(path=None):
+    """
+    Intenciones del archivo de usuario (JSON con "intents" y "disable", o una lista de
+    intenciones) seguidas de las incluidas
+    Las intenciones mal formadas y los archivos ilegibles se ignoran
+    """
+    builtin = list(BUILTIN_INTENTS)
+    if not path:
+        return builtin
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            user = json.load(f)
+    except (OSError, ValueError):
+        return builtin
+    if isinstance(user, list):
+        user = {'intents': user}
+    if not isinstance(user, dict):
+        return builtin
+
+    # Una lista "disable" o "intents" de otro tipo se ignora como una intención mal formada
+    disabled = user.get('disable')
+    if not isinstance(disabled, list):
+        disabled = []
+    disabled = {name for name in disabled if isinstance(name, str)}
+    entries = user.get('intents')
+    intents = []
+    for index, intent in enumerate(entries if isinstance(entries, list) else []):
+        intent = _valid_intent(intent, index)
+        if intent is not None:
+            intents.append(intent)
+    return intents + [intent for intent in builtin if intent['id'] not in disabled]
+
+
+_MATCHER = None
+_MATCHER_KEY = None
+_MATCHER_LOCK = threading.Lock()
+
+
+def get_intent_matcher(config=None):
+    """
+    Intenciones compartidas
+    Se reconstruyen si cambia el archivo de intenciones de usuario (ruta o contenido)
+    """
+    global _MATCHER, _MATCHER_KEY
+
+    config = config or get_config()
+    path = config.INTENTS_FILE
+    path = os.path.expanduser(path) if path else None
+    signature = None
+    if path:
+        try:
+            stat = os.stat(path)
+            signature = (stat.st_size, stat.st_mtime_ns)
+        except OSError:
+            pass
+    key = (path, signature)
+
+    with _MATCHER_LOCK:
+        if _MATCHER is None or _MATCHER_KEY != key:
+            _MATCHER = IntentMatcher(load_intents(path))
+            _MATCHER_KEY = key
+        return _MATCHER
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""
+Lazy Import Module
+
+This module defers the import of heavy third-party dependencies (provider
+SDKs, colorama, dotenv) until they are actually used, so trivial invocations
+such as `cmdh --version` start without paying their import cost.
+"""
+
+import importlib.util
+import sys
+
+_COLORAMA_READY = False
+
+
+def lazy_import(name):
+    """
+    Devuelve un módulo que solo se importa al acceder a uno de sus atributos
+    Ejemplo: genai = lazy_import('google.generativeai')
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ImportError(f"No module named '{name}'", name=name)
+
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+def init_colorama():
+    """Importa e inicializa colorama una única vez por proceso"""
+    global _COLORAMA_READY
+
+    colorama = lazy_import('colorama')
+    if not _COLORAMA_READY:
+        colorama.init(autoreset=True)
+        _COLORAMA_READY = True
+    return colorama
@@ -5,23 +5,35 @@ Cmd Helper - Asistente inteligente para línea de comandos
 Uso: python main.py "tu petición en lenguaje natural"
 """
 
+import math
+import os
 import sys
+import time
 import click
-from colorama import Fore, Style, init
-from .mcp_server import MCPServer
-from .command_handler import CommandHandler
-from .config import Config
+from .config import get_config
 from .i18n import t, get_translator
+from .lazy import lazy_import, init_colorama
 
-# Inicializar colorama
-init(autoreset=True)
+# colorama se importa solo cuando se va a mostrar salida con color. Los módulos del modelo,
+# la caché, el modo batch y la sesión interactiva se importan dentro de los comandos que los
+# usan, para que --version y --help no carguen asyncio, sqlite3 ni ssl
+colorama = lazy_import('colorama')
 
 
 class CmdHelper:
     """Clase principal de la aplicación"""
 
-    def __init__(self):
-        self.config = Config()
+    def __init__(self, use_cache=True, refresh_cache=False,
+                 show_timings=False, stream=False, show_prompt_stats=False, config=None):
+        from .command_handler import CommandHandler  # pylint: disable=import-outside-toplevel
+        from .mcp_server import MCPServer  # pylint: disable=import-outside-toplevel
+        init_colorama()
+        self.config = config or get_config()
+        self.refresh_cache = refresh_cache
+        self.show_timings = show_timings
+        self.show_prompt_stats = show_prompt_stats
+        self.stream = stream
+        self._streamed_command = None
 
         # Inicializar traductor según configuración
         if self.config.LANGUAGE == 'auto':
@@ -29,61 +41,182 @@ class CmdHelper:
         else:
             self.translator = get_translator(self.config.LANGUAGE)
 
-        self.mcp_server = MCPServer()
-        self.command_handler = CommandHandler()
+        self.mcp_server = MCPServer(use_cache=use_cache, config=self.config)
+        self.command_handler = CommandHandler(self.config)
 
     def validate_setup(self):
         """Valida que la configuración esté correcta"""
-        if not self.config.GEMINI_API_KEY:
+        from .backends import missing_api_key  # pylint: disable=import-outside-toplevel
+        if missing_api_key(self.config):
             api_key_msg = t('config.api_key_not_found')
-            print(Fore.RED + api_key_msg + Style.RESET_ALL)
+            print(colorama.Fore.RED + api_key_msg + colorama.Style.RESET_ALL)
             print(t('config.api_key_setup'))
             print(t('config.export_command'))
             print(t('config.env_file'))
             return False
         return True
 
-    def process_request(self, user_input):
-        """Procesa una petición del usuario"""
+    def process_request(self, user_input, context=None):
+        """
+        Procesa una petición del usuario
+        context: contexto ya recopilado (sesión interactiva)
+        Devuelve el resultado de la generación, o None si hubo un error inesperado
+        """
         try:
-            print(Fore.BLUE + t('messages.analyzing_request') + Style.RESET_ALL)
+            analyzing_msg = t('messages.analyzing_request')
+            print(colorama.Fore.BLUE + analyzing_msg + colorama.Style.RESET_ALL)
 
             # Generar comando usando MCP + Gemini
-            result = self.mcp_server.generate_command(user_input)
+            self._streamed_command = None
+            result = self.mcp_server.generate_command(
+                user_input,
+                refresh_cache=self.refresh_cache,
+                on_command=self._show_streamed_command if self.stream else None,
+                context=context
+            )
+            self._report_source(result)
 
             if not result['command']:
-                print(Fore.RED + t('messages.no_command_generated') + Style.RESET_ALL)
+                no_command_msg = t('messages.no_command_generated')
+                print(colorama.Fore.RED + no_command_msg + colorama.Style.RESET_ALL)
                 if result['explanation']:
                     print(t('messages.reason') + " " + result['explanation'])
-                return
+                return result
 
             # Mostrar resultado y pedir confirmación
-            if self.command_handler.confirm_execution(result['command'], result['explanation']):
+            already_shown = result['command'] == self._streamed_command
+            if self.command_handler.confirm_execution(result['command'], result['explanation'],
+                                                      show_command=not already_shown,
+                                                      alternatives=result.get('alternatives')):
                 # Ejecutar comando
                 execution_result = self.command_handler.execute_command(result['command'])
 
                 if execution_result['success']:
                     success_msg = t('messages.command_executed_successfully')
-                    print("\n" + Fore.GREEN + success_msg + Style.RESET_ALL)
+                    print("\n" + colorama.Fore.GREEN + success_msg + colorama.Style.RESET_ALL)
                 else:
                     error_msg = t('messages.execution_error')
-                    print("\n" + Fore.RED + error_msg + Style.RESET_ALL)
+                    print("\n" + colorama.Fore.RED + error_msg + colorama.Style.RESET_ALL)
             else:
-                print(Fore.YELLOW + t('messages.operation_cancelled') + Style.RESET_ALL)
-                
+                cancelled_msg = t('messages.operation_cancelled')
+                print(colorama.Fore.YELLOW + cancelled_msg + colorama.Style.RESET_ALL)
+            return result
+
         except Exception as e:
-            print(Fore.RED + t('messages.unexpected_error') + " " + str(e) + Style.RESET_ALL)
+            error_msg = t('messages.unexpected_error')
+            print(colorama.Fore.RED + error_msg + " " + str(e) + colorama.Style.RESET_ALL)
+            return None
+
+
+    def _show_streamed_command(self, command):
+        """Muestra el comando en cuanto llega, mientras se genera el resto de la respuesta"""
+        self._streamed_command = command
+        self.command_handler.show_command(command)
+        print(colorama.Style.DIM + t('messages.waiting_explanation') + colorama.Style.RESET_ALL)
+
+    def _report_source(self, result):
+        """
+        Indica si la respuesta vino de la caché o de una intención local y, opcionalmente,
+        los tiempos
+        """
+        timings = result.get('timings') or {}
+
+        if result.get('source') == 'cache':
+            hit_msg = t('cache.hit').format(ms=timings.get('total_ms', 0))
+            print(colorama.Fore.MAGENTA + hit_msg + colorama.Style.RESET_ALL)
+        elif result.get('source') == 'similar':
+            similar_msg = t('cache.similar').format(
+                request=result['matched_request'],
+                similarity=result['similarity'],
+                ms=timings.get('total_ms', 0)
+            )
+            print(colorama.Fore.MAGENTA + similar_msg + colorama.Style.RESET_ALL)
+        elif result.get('source') == 'fallback':
+            print(colorama.Fore.YELLOW + t('cache.fallback') + colorama.Style.RESET_ALL)
+        elif result.get('source') == 'rules':
+            rules_msg = t('rules.hit').format(intent=result['intent'],
+                                              ms=timings.get('total_ms', 0))
+            print(colorama.Fore.MAGENTA + rules_msg + colorama.Style.RESET_ALL)
+
+        if self.show_timings and timings:
+            details = ", ".join(
+                f"{name[:-len('_ms')]} {value} ms" for name, value in timings.items()
+            )
+            print(colorama.Style.DIM + t('messages.timings') + " " + details
+                  + colorama.Style.RESET_ALL)
+
+        if self.show_prompt_stats and result.get('prompt_stats'):
+            self._report_prompt_stats(result['prompt_stats'])
+
+    def _report_prompt_stats(self, stats):
+        """Muestra los tokens estimados del prompt por sección"""
+        sections = ", ".join(f"{name} {tokens}" for name, tokens in stats['sections'].items())
+        lines = [t('messages.prompt_stats').format(total=stats['total'], budget=stats['budget'])
+                 + " " + sections]
+        if stats['condensed']:
+            lines.append(t('messages.prompt_condensed') + " " + ", ".join(stats['condensed']))
+        if stats['dropped']:
+            lines.append(t('messages.prompt_dropped') + " " + ", ".join(stats['dropped']))
+        for line in lines:
+            print(colorama.Style.DIM + line + colorama.Style.RESET_ALL)
 
 
-@click.command()
+def show_cache_stats():
+    """Muestra las estadísticas de la caché de respuestas"""
+    from .cache import ResponseCache  # pylint: disable=import-outside-toplevel
+    stats = ResponseCache().stats()
+    print(t('cache.stats').format(**stats))
+
+
+class DefaultCommandGroup(click.Group):
+    """Grupo de comandos que usa default_command si el primer argumento no es un subcomando"""
+
+    def __init__(self, *args, default_command=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.default_command = default_command
+
+    def parse_args(self, ctx, args):
+        # `cmdh "petición"` sigue funcionando igual que `cmdh generate "petición"`
+        if not args or args[0] not in self.commands:
+            args = [self.default_command] + list(args)
+        return super().parse_args(ctx, args)
+
+
+@click.group(cls=DefaultCommandGroup, default_command='generate')
+def main():
+    """
+    Cmd Helper - Intelligent command line assistant /
+    Asistente inteligente para línea de comandos
+    """
+
+
+@main.command('generate')
 @click.argument('request', required=False)
 @click.option('--version', is_flag=True, help='Show version / Mostrar versión')
 @click.option('--lang', type=click.Choice(['es', 'en', 'auto']), default='auto',
               help='Set language (es=Spanish, en=English, auto=detect)')
-def main(request, version, lang):
+@click.option('--no-cache', 'no_cache', is_flag=True,
+              help='Do not read or write the response cache / No usar la caché')
+@click.option('--refresh', is_flag=True,
+              help='Ignore cached answers and store a fresh one / Refrescar la caché')
+@click.option('--timings', is_flag=True,
+              help='Show timing breakdown / Mostrar tiempos')
+@click.option('--stream', is_flag=True,
+              help='Show the command as soon as it is generated / Mostrar el comando al instante')
+@click.option('--show-prompt-stats', 'show_prompt_stats', is_flag=True,
+              help='Show estimated prompt tokens per section / Tokens del prompt por sección')
+@click.option('--interactive', '-i', is_flag=True,
+              help='Start an interactive session / Iniciar una sesión interactiva')
+@click.option('--cache-stats', 'cache_stats', is_flag=True,
+              help='Show response cache statistics / Estadísticas de la caché')
+def generate(request, version, lang, no_cache, refresh,  # pylint: disable=too-many-arguments
+             timings, stream, show_prompt_stats, interactive, cache_stats):
     """
-    Cmd Helper - Intelligent command line assistant / 
-    Asistente inteligente para línea de comandos
+    Generate a command for one request (default) /
+    Genera un comando para una petición (por defecto)
+
+    Interactive session / Sesión interactiva: cmdh shell (or -i)
+    Batch mode / Modo batch: cmdh batch --help
     """
 
     # Configurar idioma si se especifica
@@ -94,31 +227,140 @@ def main(request, version, lang):
         print(t('app.version'))
         return
 
-    if not request:
+    if cache_stats:
+        show_cache_stats()
+        return
+
+    if not request and not interactive:
         print(t('app.usage'))
         return
 
+    # El contexto se recopila en segundo plano mientras se carga el SDK del modelo; la sesión
+    # interactiva recopila el suyo en cada petición
+    if request and not interactive:
+        from .context_analyzer import prefetch_context  # pylint: disable=import-outside-toplevel
+        prefetch_context(user_request=request)
+
     # Mostrar banner
-    print(Fore.CYAN + "=" * 50)
-    print(Fore.CYAN + "🚀 " + t('app.name'))
-    print(Fore.CYAN + "=" * 50 + Style.RESET_ALL)
+    init_colorama()
+    print(colorama.Fore.CYAN + "=" * 50)
+    print(colorama.Fore.CYAN + "🚀 " + t('app.name'))
+    print(colorama.Fore.CYAN + "=" * 50 + colorama.Style.RESET_ALL)
 
     # Inicializar aplicación
-    app = CmdHelper()
+    app = CmdHelper(use_cache=not no_cache, refresh_cache=refresh, show_timings=timings,
+                    stream=stream, show_prompt_stats=show_prompt_stats)
 
     # Validar configuración
     if not app.validate_setup():
         sys.exit(1)
 
+    if interactive:
+        from .shell import InteractiveSession  # pylint: disable=import-outside-toplevel
+        InteractiveSession(app).run(first_request=request)
+        return
+
     # Procesar petición
     try:
         app.process_request(request)
     except KeyboardInterrupt:
         cancelled_msg = t('messages.operation_cancelled_by_user')
-        print("\n" + Fore.YELLOW + cancelled_msg + Style.RESET_ALL)
+        print("\n" + colorama.Fore.YELLOW + cancelled_msg + colorama.Style.RESET_ALL)
     except OSError as e:
         error_msg = t('messages.unexpected_error')
-        print("\n" + Fore.RED + error_msg + " " + str(e) + Style.RESET_ALL)
+        print("\n" + colorama.Fore.RED + error_msg + " " + str(e) + colorama.Style.RESET_ALL)
+
+
+@main.command('shell')
+@click.option('--lang', type=click.Choice(['es', 'en', 'auto']), default='auto',
+              help='Set language (es=Spanish, en=English, auto=detect)')
+@click.option('--no-cache', 'no_cache', is_flag=True,
+              help='Do not read or write the response cache / No usar la caché')
+@click.option('--timings', is_flag=True,
+              help='Show timing breakdown / Mostrar tiempos')
+@click.option('--stream', is_flag=True,
+              help='Show the command as soon as it is generated / Mostrar el comando al instante')
+@click.pass_context
+def shell(ctx, lang, no_cache, timings, stream):
+    """
+    Interactive session that keeps the model client warm /
+    Sesión interactiva que mantiene el cliente del modelo cargado
+    """
+    ctx.invoke(generate, lang=lang, no_cache=no_cache, timings=timings, stream=stream,
+               interactive=True)
+
+
+@main.command('batch')
+@click.argument('input_file', type=click.File('r', encoding='utf-8'), default='-')
+@click.option('--output', '-o', type=click.File('w', encoding='utf-8'), default='-',
+              help='JSONL output file (default: stdout) / Archivo JSONL de salida')
+@click.option('--workers', type=click.IntRange(1, 64),
+              help='Concurrent requests / Peticiones simultáneas')
+@click.option('--unordered', is_flag=True,
+              help='Write results as they complete / Escribir según terminan')
+@click.option('--cwd', type=click.Path(exists=True, file_okay=False),
+              help='Directory used as context / Directorio del contexto')
+@click.option('--lang', type=click.Choice(['es', 'en', 'auto']), default='auto',
+              help='Set language (es=Spanish, en=English, auto=detect)')
+@click.option('--no-cache', 'no_cache', is_flag=True,
+              help='Do not read or write the response cache / No usar la caché')
+@click.option('--refresh', is_flag=True,
+              help='Ignore cached answers and store fresh ones / Refrescar la caché')
+def batch(input_file, output, workers, unordered,  # pylint: disable=too-many-arguments
+          cwd, lang, no_cache, refresh):
+    """
+    Translate many requests (one per line, or JSONL with request/cwd/id) to JSONL /
+    Traduce muchas peticiones a JSONL
+    """
+    # pylint: disable-next=import-outside-toplevel
+    from .batch import BatchRunner, parse_requests, write_jsonl
+
+    if lang != 'auto':
+        get_translator(lang)
+
+    requests = parse_requests(input_file, default_cwd=os.path.abspath(cwd) if cwd else None)
+
+    app = CmdHelper(use_cache=not no_cache)
+    if not app.validate_setup():
+        sys.exit(1)
+
+    runner = BatchRunner(app.mcp_server, app.command_handler,
+                         workers=workers or app.config.BATCH_WORKERS, refresh_cache=refresh)
+    start = time.perf_counter()
+    counts = write_jsonl(runner.run(requests, ordered=not unordered), output)
+    # El resumen va a stderr para no mezclarse con el JSONL
+    click.echo(t('batch.summary').format(seconds=time.perf_counter() - start, **counts),
+               err=True)
+
+
+@main.command('quota')
+@click.option('--lang', type=click.Choice(['es', 'en', 'auto']), default='auto',
+              help='Set language (es=Spanish, en=English, auto=detect)')
+def quota(lang):
+    """
+    Show the shared API quota consumption of the last minute /
+    Muestra el consumo del cupo compartido en el último minuto
+    """
+    from .backends import rate_limiter  # pylint: disable=import-outside-toplevel
+
+    if lang != 'auto':
+        get_translator(lang)
+
+    limiter = rate_limiter(get_config())
+    if not limiter.enabled:
+        click.echo(t('quota.disabled'))
+        return
+    scopes = limiter.status()
+    if not scopes:
+        click.echo(t('quota.empty'))
+    for scope in scopes:
+        line = t('quota.status').format(**dict(
+            scope, rpm=scope['rpm'] or t('quota.unlimited'),
+            tpm=scope['tpm'] or t('quota.unlimited')
+        ))
+        if scope['paused']:
+            line += " " + t('quota.paused').format(seconds=math.ceil(scope['paused']))
+        click.echo(line)
 
 
 if __name__ == '__main__':
@@ -2,38 +2,39 @@
 """
 MCP Server Module
 
-This module handles communication with Google Gemini AI model to generate
-shell commands based on natural language requests.
+This module turns natural language requests into shell commands: it gathers
+the context, builds the prompt, queries the model through the configured
+backend (Google Gemini by default, see cmd_helper.backends) and parses the
+answer.
 """
 
-import json
-import google.generativeai as genai
-from .config import Config
+import asyncio
+import contextvars
+import math
+import sqlite3
+import time
+from .backends import (BLOCKED_RECITATION, BLOCKED_SAFETY, CircuitOpenError, ModelResponse,
+                       QuotaExhaustedError, create_backend, is_unavailable)
+from .cache import ResponseCache
+from .similarity import SimilarityIndex
+from .config import get_config
 from .context_analyzer import ContextAnalyzer
-from .i18n import t, get_translator
-
-
-class MCPServer:
-    """Servidor MCP que se comunica con Google Gemini"""
-
-    def __init__(self):
-        self.config = Config()
-        genai.configure(api_key=self.config.GEMINI_API_KEY)
-        self.model = genai.GenerativeModel(self.config.MODEL_NAME)
-        self.context_analyzer = ContextAnalyzer()
-
-        # Inicializar traductor según configuración
-        if self.config.LANGUAGE == 'auto':
-            translator = get_translator()  # Auto-detectar
-        else:
-            translator = get_translator(self.config.LANGUAGE)
-
-        # Obtener el idioma actual del traductor
-        current_lang = translator.language
-
-        # Prompt del sistema optimizado para comandos de shell
-        if current_lang == 'en':
-            self.system_prompt = """You are an expert cross-platform command line assistant
+from .danger_rules import get_danger_rules
+from .intents import get_intent_matcher
+from .i18n import (context_language, current_language, get_translator, resolve_language, t,
+                   use_language)
+from .prompt_builder import build_prompt
+from .response_parser import RESPONSE_SCHEMA, json_command, parse_json_response, parse_response
+
+# Mensaje para cada motivo de bloqueo del proveedor
+_BLOCKED_MESSAGES = {
+    BLOCKED_SAFETY: 'context.safety_filter_blocked',
+    BLOCKED_RECITATION: 'context.recitation_blocked',
+}
+
+# Prompt del sistema optimizado para comandos de shell, por idioma
+_SYSTEM_PROMPTS = {
+    'en': """You are an expert cross-platform command line assistant
 (Linux, macOS, Windows).
 
 IMPORTANT RULES:
@@ -54,9 +55,8 @@ COMMAND: find . -name "*.py" -type f
 EXPLANATION: Finds all files with .py extension in current directory and subdirectories
 DANGER: NO
 
-Current system context:"""
-        else:
-            self.system_prompt = """Eres un asistente experto en línea de comandos
+Current system context:""",
+    'es': """Eres un asistente experto en línea de comandos
 multiplataforma (Linux, macOS, Windows).
 
 REGLAS IMPORTANTES:
@@ -78,172 +78,419 @@ EXPLICACIÓN: Busca todos los archivos con extensión .py en el directorio actua
 PELIGRO: NO
 
 Contexto actual del sistema:"""
+}
 
-    def generate_command(self, user_request):
-        """Genera comando basado en la petición del usuario"""
-        try:
-            # Obtener contexto actual
-            context = self.context_analyzer.get_current_context()
+# Prompts del modo JSON: mismas reglas, respuesta según response_parser.RESPONSE_SCHEMA
+_JSON_SYSTEM_PROMPTS = {
+    'en': """You are an expert cross-platform command line assistant
+(Linux, macOS, Windows).
 
-            # Construir prompt completo
-            full_prompt = (f"{self.system_prompt}\n{json.dumps(context, indent=2)}\n\n"
-                          f"Petición del usuario: {user_request}")
+IMPORTANT RULES:
+1. Respond ONLY with safe executable commands
+2. Briefly explain what each command does
+3. Prioritize simple and standard commands
+4. If you detect something dangerous, warn clearly
+5. Adapt commands according to detected platform
+6. If unsure, suggest the safest command
 
-            # Configuración de generación
-            generation_config = genai.types.GenerationConfig(
-                max_output_tokens=self.config.MAX_TOKENS,
-                temperature=self.config.TEMPERATURE,
-            )
+RESPONSE FORMAT: a JSON object with
+- command: the exact command ("" if you cannot suggest one)
+- explanation: what it does in 1-2 lines
+- danger: "none", "low" (changes files or settings) or "high" (destructive or irreversible)
+- alternatives: up to 2 other commands for the same task (optional)
 
-            # Generar respuesta
-            response = self.model.generate_content(
-                full_prompt,
-                generation_config=generation_config
-            )
+Current system context:""",
+    'es': """Eres un asistente experto en línea de comandos
+multiplataforma (Linux, macOS, Windows).
 
-            # Verificar si la respuesta fue bloqueada por filtros de seguridad
-            if not response.candidates:
-                return {
-                    'command': None,
-                    'explanation': t("context.safety_filter_blocked"),
-                    'is_dangerous': False
-                }
+REGLAS IMPORTANTES:
+1. Responde SOLO con comandos ejecutables seguros
+2. Explica brevemente qué hace cada comando
+3. Prioriza comandos simples y estándar
+4. Si detectas algo peligroso, advierte claramente
+5. Adapta comandos según la plataforma detectada
+6. Si no estás seguro, sugiere el comando más seguro
+
+FORMATO DE RESPUESTA: un objeto JSON con
+- command: el comando exacto ("" si no puedes sugerir ninguno)
+- explanation: qué hace en 1-2 líneas
+- danger: "none", "low" (modifica archivos o ajustes) o "high" (destructivo o irreversible)
+- alternatives: hasta 2 comandos alternativos para la misma tarea (opcional)
+
+Contexto actual del sistema:"""
+}
 
-            candidate = response.candidates[0]
-            
-            # Verificar finish_reason
-            if hasattr(candidate, 'finish_reason'):
-                if candidate.finish_reason == 2:  # SAFETY
-                    return {
-                        'command': None,
-                        'explanation': t("context.safety_filter_blocked"),
-                        'is_dangerous': False
-                    }
-                elif candidate.finish_reason == 3:  # RECITATION
-                    return {
-                        'command': None,
-                        'explanation': t("context.recitation_blocked"),
-                        'is_dangerous': False
-                    }
-
-            # Verificar si hay texto válido en la respuesta
-            if not hasattr(response, 'text') or not response.text:
-                return {
+
+def _elapsed_ms(start):
+    """Milisegundos transcurridos desde start (time.perf_counter)"""
+    return round((time.perf_counter() - start) * 1000, 1)
+
+
+class MCPServer:
+    """Servidor MCP que genera comandos con el modelo del backend configurado"""
+
+    def __init__(self, use_cache=True, language=None, json_output=None, config=None,
+                 use_intents=None):
+        self.config = config or get_config()
+        # Respuesta del modelo en JSON validado (por defecto según JSON_OUTPUT)
+        self.json_output = self.config.JSON_OUTPUT if json_output is None else json_output
+        # Peticiones habituales respondidas sin el modelo (por defecto según LOCAL_INTENTS)
+        self.use_intents = self.config.LOCAL_INTENTS if use_intents is None else use_intents
+        self.backend = create_backend(self.config)
+        self.context_analyzer = ContextAnalyzer(self.config)
+        self.cache = ResponseCache(config=self.config) if use_cache else None
+        self.similarity_index = (SimilarityIndex(self.cache, config=self.config) if use_cache
+                                 else None)
+        # Llamadas simultáneas al modelo desde agenerate_command
+        self.async_concurrency = self.config.ASYNC_CONCURRENCY
+        self._semaphore = None
+        self._semaphore_loop = None
+
+        # Idioma por defecto de las peticiones: el indicado o el de la configuración. Cada
+        # petición usa el idioma activo con use_language() si lo hay (daemon, batch)
+        language = language or self.config.LANGUAGE
+        if language == 'auto':
+            self.language = get_translator().language  # Auto-detectar
+        else:
+            self.language = resolve_language(language)
+
+    def generate_command(self, user_request, refresh_cache=False,
+                         cwd=None, environ=None, on_command=None, context=None):
+        """
+        Genera comando basado en la petición del usuario
+        Las peticiones que reconoce una intención local se responden sin contexto ni modelo.
+        Si no, consulta primero la caché persistente (coincidencia exacta y luego peticiones
+        parecidas); refresh_cache ignora las entradas guardadas. cwd y environ describen
+        el proceso que hace la petición cuando no es este (modo daemon). Con on_command la
+        respuesta del modelo se recibe en streaming y on_command(comando) se llama en cuanto
+        la línea COMMAND está completa, antes de la explicación y la evaluación de peligro.
+        Si se consulta al modelo, el resultado incluye prompt_stats (tokens por sección).
+        context permite reutilizar un contexto ya recopilado (modo batch).
+        El idioma (prompt, caché y mensajes) es el activo con use_language() o el del servidor.
+        """
+        start = time.perf_counter()
+        timings = {}
+
+        def emit_command(command):
+            timings['first_command_ms'] = _elapsed_ms(start)
+            on_command(command)
+        with use_language(self.request_language()):
+            local = self._local_answer(user_request, timings)
+            if local:
+                return self._finish(local, timings, start)
+            try:
+                # Obtener contexto actual
+                if context is None:
+                    context = self.context_analyzer.get_current_context(
+                        cwd=cwd, environ=environ, user_request=user_request
+                    )
+                timings['context_ms'] = _elapsed_ms(start)
+
+                cache_key, cached = self._check_cache(user_request, context, refresh_cache,
+                                                      timings)
+                if cached:
+                    return self._finish(cached, timings, start)
+
+                prompt, prompt_stats = self._build_prompt(user_request, context)
+                model_start = time.perf_counter()
+                result = self._query_model(prompt,
+                                           on_command=emit_command if on_command else None)
+                timings['model_ms'] = _elapsed_ms(model_start)
+
+                self._store_result(cache_key, user_request, context, result, prompt_stats)
+            except Exception as e:
+                result = self._error_result(e, user_request)
+
+        return self._finish(result, timings, start)
+
+    async def agenerate_command(self, user_request, refresh_cache=False,
+                                cwd=None, environ=None, context=None, timeout=None):
+        """
+        Versión asyncio de generate_command (sin streaming)
+        Comparte caché, prompt y análisis de la respuesta con la versión síncrona. Las
+        llamadas al modelo simultáneas se limitan a async_concurrency por bucle de eventos;
+        timeout (segundos) incluye la espera por ese límite. La cancelación se propaga.
+        """
+        start = time.perf_counter()
+        timings = {}
+
+        async def generate():
+            nonlocal context
+            loop = asyncio.get_running_loop()
+            local = self._local_answer(user_request, timings)
+            if local:
+                return local
+            try:
+                if context is None:
+                    context = await self.context_analyzer.aget_current_context(
+                        cwd=cwd, environ=environ, user_request=user_request
+                    )
+                timings['context_ms'] = _elapsed_ms(start)
+
+                # SQLite y el índice de similitud bloquean: se consultan fuera del bucle
+                # (con una copia del contexto para conservar el idioma de la petición)
+                cache_key, cached = await loop.run_in_executor(
+                    None, contextvars.copy_context().run, self._check_cache, user_request,
+                    context, refresh_cache, timings
+                )
+                if cached:
+                    return cached
+
+                prompt, prompt_stats = self._build_prompt(user_request, context)
+                async with self._model_semaphore():
+                    model_start = time.perf_counter()
+                    response = await self.backend.agenerate(prompt, self._response_schema())
+                    timings['model_ms'] = _elapsed_ms(model_start)
+                result = self._handle_response(response)
+
+                await loop.run_in_executor(
+                    None, contextvars.copy_context().run, self._store_result, cache_key,
+                    user_request, context, result, prompt_stats
+                )
+                return result
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                return await loop.run_in_executor(
+                    None, contextvars.copy_context().run, self._error_result, e, user_request
+                )
+
+        with use_language(self.request_language()):
+            try:
+                result = await asyncio.wait_for(generate(), timeout)
+            except asyncio.TimeoutError:
+                result = {
                     'command': None,
-                    'explanation': t("context.empty_response"),
-                    'is_dangerous': False
+                    'explanation': t("context.request_timeout").format(seconds=timeout),
+                    'is_dangerous': False,
+                    'source': 'timeout'
                 }
+        return self._finish(result, timings, start)
+
+    def request_language(self):
+        """Idioma de la petición en curso: el activo con use_language() o el del servidor"""
+        return context_language() or self.language
+
+    def system_prompt_for(self, language):
+        """Prompt del sistema en un idioma (el de JSON en modo JSON)"""
+        prompts = _JSON_SYSTEM_PROMPTS if self.json_output else _SYSTEM_PROMPTS
+        return prompts.get(language, prompts['es'])
+
+    @property
+    def system_prompt(self):
+        """Prompt del sistema en el idioma de la petición en curso"""
+        return self.system_prompt_for(self.request_language())
+
+    def _model_semaphore(self):
+        """Semáforo que limita las llamadas asíncronas al modelo en el bucle actual"""
+        loop = asyncio.get_running_loop()
+        if self._semaphore_loop is not loop:
+            # Un semáforo solo puede usarse en el bucle en el que se crea
+            self._semaphore = asyncio.Semaphore(self.async_concurrency)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    def _local_answer(self, user_request, timings):
+        """
+        Respuesta de una intención local (source 'rules'), con la misma forma que la del
+        modelo y su evaluación de peligro, o None si ninguna reconoce la petición
+        """
+        if not self.use_intents:
+            return None
+        rules_start = time.perf_counter()
+        answer = get_intent_matcher(self.config).match(user_request, self.request_language())
+        timings['rules_ms'] = _elapsed_ms(rules_start)
+        if answer is None:
+            return None
+        return dict(answer, source='rules',
+                    is_dangerous=get_danger_rules(self.config).is_dangerous(answer['command']))
+
+    def _check_cache(self, user_request, context, refresh_cache, timings):
+        """Devuelve (clave de caché, respuesta guardada o None)"""
+        cache_key = self._cache_key(user_request, context)
+        if not cache_key or refresh_cache:
+            return cache_key, None
+        cache_start = time.perf_counter()
+        cached = self._cache_lookup(cache_key, user_request, context)
+        timings['cache_ms'] = _elapsed_ms(cache_start)
+        return cache_key, cached
+
+    def _build_prompt(self, user_request, context):
+        """Prompt ajustado al presupuesto de tokens y sus estadísticas"""
+        return build_prompt(
+            self.system_prompt_for(current_language()), context, user_request,
+            self.config.PROMPT_TOKEN_BUDGET
+        )
+
+    def _store_result(self, cache_key, user_request, context, result, prompt_stats):
+        """Guarda en la caché una respuesta del modelo con comando y añade prompt_stats"""
+        if cache_key and result['command']:
+            self._cache_store(cache_key, user_request, context, result)
+        result['prompt_stats'] = prompt_stats
+
+    def _error_result(self, error, user_request=None):
+        """
+        Resultado para un error de conexión o del modelo
+        Si el modelo no está disponible se reutiliza la respuesta guardada a la misma petición
+        en otro contexto, si la hay
+        """
+        if user_request and is_unavailable(error):
+            fallback = self._cache_fallback(user_request)
+            if fallback:
+                return fallback
+        if isinstance(error, CircuitOpenError):
+            explanation = t("context.model_unavailable").format(
+                seconds=math.ceil(error.retry_after)
+            )
+        elif isinstance(error, QuotaExhaustedError):
+            explanation = t("context.quota_exhausted").format(
+                seconds=math.ceil(error.retry_after)
+            )
+        else:
+            explanation = t("context.gemini_connection_error") + " " + str(error)
+        return {
+            'command': None,
+            'explanation': explanation,
+            'is_dangerous': False
+        }
+
+    def _cache_fallback(self, user_request):
+        """Respuesta guardada a la misma petición en cualquier contexto, o None"""
+        if self.cache is None:
+            return None
+        try:
+            payload = self.cache.find_request(user_request)
+        except (sqlite3.Error, OSError):
+            return None
+        return dict(payload, source='fallback') if payload else None
+
+    def _finish(self, result, timings, start):
+        """Completa el resultado con su origen (model si no se indica) y los tiempos"""
+        timings['total_ms'] = _elapsed_ms(start)
+        result.setdefault('source', 'model')
+        result['timings'] = timings
+        return result
 
-            return self._parse_response(response.text)
+    def _cache_key(self, user_request, context):
+        """Clave de caché para la petición, o None si la caché está desactivada"""
+        if self.cache is None:
+            return None
+        return self.cache.make_key(user_request, current_language(), self.backend.model_id,
+                                   context)
+
+    def _similarity_scope(self, context):
+        """Ámbito del índice de similitud para el contexto actual"""
+        return SimilarityIndex.make_scope(current_language(), self.backend.model_id,
+                                         context['pwd'])
+
+    def _cache_lookup(self, cache_key, user_request, context):
+        """
+        Busca en la caché: primero la clave exacta y después una petición parecida
+        Un fallo de la caché nunca bloquea la petición
+        """
+        try:
+            cached = self.cache.get(cache_key)
+            if cached:
+                return dict(cached, source='cache')
+
+            match = self.similarity_index.lookup(user_request, self._similarity_scope(context))
+            if match:
+                payload, matched_request, similarity = match
+                self.cache.record('similar_hits')
+                return dict(payload, source='similar', matched_request=matched_request,
+                            similarity=similarity)
+        except (sqlite3.Error, OSError):
+            pass
+        return None
 
-        except Exception as e:
+    def _cache_store(self, cache_key, user_request, context, result):
+        """Guarda la respuesta en la caché y en el índice de similitud ignorando errores"""
+        try:
+            self.cache.set(cache_key, user_request, result)
+            self.similarity_index.add(cache_key, user_request, self._similarity_scope(context))
+        except (sqlite3.Error, OSError):
+            pass
+
+    def _query_model(self, full_prompt, on_command=None):
+        """Envía el prompt al modelo y parsea la respuesta (en streaming si hay on_command)"""
+        if on_command is None:
+            return self._handle_response(self.backend.generate(full_prompt,
+                                                               self._response_schema()))
+
+        stream = self.backend.stream(full_prompt, self._response_schema())
+        text = self._consume_stream(stream, on_command)
+        return self._handle_response(ModelResponse(text, stream.blocked))
+
+    def _response_schema(self):
+        """Esquema de la respuesta que se pide al modelo (solo en modo JSON)"""
+        return RESPONSE_SCHEMA if self.json_output else None
+
+    def _handle_response(self, response):
+        """Comprueba si la respuesta (ModelResponse) fue bloqueada y la parsea"""
+        if response.blocked:
             return {
                 'command': None,
-                'explanation': t("context.gemini_connection_error") + " " + str(e),
+                'explanation': t(_BLOCKED_MESSAGES.get(response.blocked,
+                                                       'context.safety_filter_blocked')),
                 'is_dangerous': False
             }
 
+        # Verificar si hay texto válido en la respuesta
+        if not response.text:
+            return {
+                'command': None,
+                'explanation': t("context.empty_response"),
+                'is_dangerous': False
+            }
+
+        return self._parse_response(response.text)
+
+    def _consume_stream(self, stream, on_command):
+        """
+        Lee la respuesta en streaming y devuelve el texto completo
+        on_command se llama una vez, en cuanto llega el comando completo (su línea
+        COMMAND/COMANDO o su bloque de código)
+        """
+        text = ""
+        scanned = 0
+        command_sent = False
+        for chunk in stream:
+            text += chunk
+
+            if command_sent:
+                continue
+            if self.json_output:
+                command = json_command(text)
+                if command:
+                    on_command(command)
+                    command_sent = True
+                continue
+            # Solo se analizan líneas completas: el comando puede llegar partido en varios trozos
+            end = text.rfind('\n')
+            if end < scanned:
+                continue
+            parsed = parse_response(text[:end], partial=True)
+            if parsed.structured:
+                on_command(parsed.command)
+                command_sent = True
+            scanned = end + 1
+        return text
+
     def _parse_response(self, response_text):
-        """Parsea la respuesta de Gemini"""
+        """
+        Parsea la respuesta del modelo
+        En modo JSON se valida contra el esquema; el formato de texto solo se usa si falla
+        """
         try:
-            lines = response_text.strip().split('\n')
-            parsed_data = self._extract_structured_data(lines)
-            
-            if not parsed_data['command']:
-                parsed_data['command'] = self._extract_fallback_command(lines)
-                if parsed_data['command']:
-                    parsed_data['explanation'] = t('context.ai_generated_command')
-        
-            return parsed_data
-        
-        except Exception as e:
+            parsed = parse_json_response(response_text) if self.json_output else None
+            if parsed is None:
+                parsed = parse_response(response_text)
+        except Exception as e:  # pylint: disable=broad-exception-caught
             return {
                 'command': None,
                 'explanation': t("context.response_processing_error") + " " + str(e),
                 'is_dangerous': False
             }
 
-    def _extract_structured_data(self, lines):
-        """Extrae datos estructurados de las líneas de respuesta"""
-        result = {
-            'command': None,
-            'explanation': "",
-            'is_dangerous': False
-        }
-        
-        for line in lines:
-            self._process_command_line(line, result)
-            self._process_explanation_line(line, result)
-            self._process_danger_line(line, result)
-        
+        result = parsed.as_result()
+        if parsed.command and not parsed.structured:
+            result['explanation'] = t('context.ai_generated_command')
         return result
-
-    def _process_command_line(self, line, result):
-        """Procesa líneas que contienen comandos"""
-        command_keywords = ['COMMAND:', 'COMANDO:']
-        for keyword in command_keywords:
-            if keyword in line:
-                result['command'] = line.replace(keyword, '').strip()
-                return
-
-    def _process_explanation_line(self, line, result):
-        """Procesa líneas que contienen explicaciones"""
-        explanation_keywords = ['EXPLANATION:', 'EXPLICACIÓN:']
-        for keyword in explanation_keywords:
-            if keyword in line:
-                result['explanation'] = line.replace(keyword, '').strip()
-                return
-
-    def _process_danger_line(self, line, result):
-        """Procesa líneas que contienen información de peligro"""
-        danger_keywords = ['DANGER:', 'PELIGRO:']
-        for keyword in danger_keywords:
-            if keyword in line:
-                danger_text = line.replace(keyword, '').strip().upper()
-                result['is_dangerous'] = self._is_dangerous_response(danger_text)
-                return
-
-    def _is_dangerous_response(self, danger_text):
-        """Determina si la respuesta indica peligro"""
-        danger_upper = danger_text.upper()
-        return danger_upper.startswith('YES') or danger_upper.startswith('SI')
-
-    def _extract_fallback_command(self, lines):
-        """Extrae comando como fallback cuando no hay formato estructurado"""
-        # Palabras que indican texto explicativo, no comandos
-        explanation_words = ['aquí', 'tienes', 'comando', 'necesitas', 'este', 'esta', 'lista', 'filtra', 'archivo']
-        
-        for line in lines:
-            stripped_line = line.strip()
-            if not stripped_line or stripped_line.startswith('#'):
-                continue
-                
-            # Skip lines that look like explanations (contain too many explanation words)
-            lower_line = stripped_line.lower()
-            explanation_word_count = sum(1 for word in explanation_words if word in lower_line)
-            
-            # If the line has more than 2 explanation words, it's probably not a command
-            if explanation_word_count > 2:
-                continue
-                
-            # Check if it looks like a command (starts with common command words or has command-like structure)
-            command_indicators = ['ls', 'cd', 'mkdir', 'rm', 'cp', 'mv', 'cat', 'grep', 'find', 'chmod', 'sudo']
-            first_word = stripped_line.split()[0].lower() if stripped_line.split() else ''
-            
-            # If it starts with a command or has pipe/redirect symbols, it's likely a command
-            if (first_word in command_indicators or 
-                '|' in stripped_line or 
-                '>' in stripped_line or 
-                '<' in stripped_line or
-                stripped_line.startswith('./')):
-                return stripped_line
-                
-        # Fallback: return any non-explanation line
-        for line in lines:
-            stripped_line = line.strip()
-            if (stripped_line and 
-                not stripped_line.startswith('#') and 
-                not any(word in stripped_line.lower() for word in ['aquí', 'tienes', 'comando'])):
-                return stripped_line
-                
-        return None
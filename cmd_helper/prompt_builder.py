@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+Prompt Builder Module
+
+This module turns the collected context into the prompt sent to the model.
+The context is serialized as compact JSON, its size is estimated in tokens
+and, when it does not fit the configured budget, sections are condensed and
+then dropped by priority (least useful first). Per-section token counts are
+returned so the CLI can report them.
+"""
+
+import json
+
+# Estimación sin tokenizador: ~4 caracteres por token en texto y JSON en inglés/español
+CHARS_PER_TOKEN = 4
+
+# Orden en que se reducen las secciones cuando no cabe el prompt (la primera, antes);
+# pwd y platform no se reducen nunca
+PRUNE_ORDER = ('env_vars', 'recent_commands', 'git_info', 'files')
+
+# Prefijo de la línea con la petición, la última del prompt
+REQUEST_PREFIX = "Petición del usuario: "
+
+# Entradas de PATH que se envían como mucho
+_PATH_LIMIT = 8
+# Longitud máxima de un comando del historial
+_COMMAND_LIMIT = 200
+
+
+def estimate_tokens(text):
+    """Número aproximado de tokens de un texto"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def compact_json(value):
+    """JSON sin espacios ni escapes de caracteres no ASCII"""
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False)
+
+
+def _format_size(size):
+    """Tamaño en formato corto (512B, 1.2K, 3.4M...)"""
+    if size < 1024:
+        return f"{size}B"
+    value = size / 1024
+    for unit in ('K', 'M'):
+        if value < 1024:
+            return f"{value:.1f}{unit}"
+        value /= 1024
+    return f"{value:.1f}G"
+
+
+def _compact_entry(entry, with_size=True):
+    """Entrada del listado como texto: 'src/' para directorios y 'main.py 1.2K' para archivos"""
+    if 'name' not in entry:
+        return entry  # Resumen de directorio enorme o error
+    if entry.get('type') == 'dir':
+        return entry['name'] + '/'
+    if with_size and entry.get('size') is not None:
+        return f"{entry['name']} {_format_size(entry['size'])}"
+    return entry['name']
+
+
+def _files_levels(files):
+    """Versiones del listado de archivos, de más completa a más reducida"""
+    entries = [entry for entry in files if 'name' in entry]
+    extra = [entry for entry in files if 'name' not in entry]
+    return [
+        [_compact_entry(entry) for entry in entries] + extra,
+        [_compact_entry(entry) for entry in entries[:20]] + extra,
+        [_compact_entry(entry, with_size=False) for entry in entries[:5]]
+    ]
+
+
+def _env_levels(env_vars):
+    """Versiones de las variables de entorno: PATH resumido y después sin PATH"""
+    condensed = dict(env_vars)
+    if condensed.get('PATH'):
+        paths = list(dict.fromkeys(part for part in condensed['PATH'].split(':') if part))
+        if len(paths) > _PATH_LIMIT:
+            paths = paths[:_PATH_LIMIT] + [f"…(+{len(paths) - _PATH_LIMIT})"]
+        condensed['PATH'] = ':'.join(paths)
+    without_path = {name: value for name, value in env_vars.items() if name != 'PATH'}
+    return [condensed, without_path]
+
+
+def _commands_levels(commands):
+    """Versiones del historial: todos los comandos (recortados) y después los últimos"""
+    trimmed = [
+        command if len(command) <= _COMMAND_LIMIT else command[:_COMMAND_LIMIT] + '…'
+        for command in commands
+    ]
+    return [trimmed, trimmed[-5:], trimmed[-2:]]
+
+
+_LEVELS = {
+    'files': _files_levels,
+    'env_vars': _env_levels,
+    'recent_commands': _commands_levels
+}
+
+
+def _section_levels(name, value):
+    """Versiones de una sección; la primera es la que se usa si hay presupuesto"""
+    if value and name in _LEVELS:
+        return _LEVELS[name](value)
+    return [value]
+
+
+def _section_tokens(name, value):
+    """Tokens que ocupa una sección dentro del objeto JSON del contexto"""
+    return estimate_tokens(compact_json({name: value})) - 1
+
+
+def build_prompt(system_prompt, context, user_request, token_budget):
+    """
+    Construye el prompt con el contexto en JSON compacto ajustado a token_budget
+    Primero se condensan las secciones y, si no basta, se eliminan en el orden de
+    PRUNE_ORDER; pwd y platform se envían siempre.
+    Devuelve (prompt, estadísticas con los tokens de cada sección)
+    """
+    levels = {name: _section_levels(name, value) for name, value in context.items()}
+    chosen = dict.fromkeys(context, 0)
+    dropped = set()
+    request_line = f"{REQUEST_PREFIX}{user_request}"
+    fixed_tokens = estimate_tokens(system_prompt) + estimate_tokens(request_line) + 2
+
+    def section_tokens():
+        return {
+            name: _section_tokens(name, levels[name][level])
+            for name, level in chosen.items() if name not in dropped
+        }
+
+    def total_tokens():
+        return fixed_tokens + sum(section_tokens().values())
+
+    prunable = [name for name in PRUNE_ORDER if name in context]
+    # 1. Condensar: cada sección hasta su versión más reducida, de la menos útil a la más útil
+    for name in prunable:
+        while total_tokens() > token_budget and chosen[name] < len(levels[name]) - 1:
+            chosen[name] += 1
+    # 2. Eliminar secciones completas en el mismo orden
+    for name in prunable:
+        if total_tokens() <= token_budget:
+            break
+        dropped.add(name)
+
+    compact_context = {
+        name: levels[name][level] for name, level in chosen.items() if name not in dropped
+    }
+    prompt = f"{system_prompt}\n{compact_json(compact_context)}\n\n{request_line}"
+
+    stats = {
+        'sections': section_tokens(),
+        'total': total_tokens(),
+        'budget': token_budget,
+        'condensed': [name for name in prunable if chosen[name] and name not in dropped],
+        'dropped': [name for name in prunable if name in dropped]
+    }
+    return prompt, stats
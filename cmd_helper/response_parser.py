@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""
+Response Parser Module
+
+This module parses the model's answer in a single pass with one compiled
+regular expression. It understands the COMMAND/EXPLANATION/DANGER format
+in English and Spanish, markdown decoration around the labels and values,
+and multi-line commands given in fenced code blocks. When the answer does
+not follow the format, a command is recovered from the first code block or
+the first line that looks like a shell command.
+
+In JSON output mode the model answers with an object matching
+RESPONSE_SCHEMA; parse_json_response validates it and the text parser is
+only used when validation fails.
+"""
+
+import json
+import re
+from collections import namedtuple
+
+# Etiquetas del formato de respuesta y el campo que rellenan
+_LABELS = {
+    'COMMAND': 'command', 'COMANDO': 'command',
+    'EXPLANATION': 'explanation', 'EXPLICACIÓN': 'explanation', 'EXPLICACION': 'explanation',
+    'DANGER': 'danger', 'PELIGRO': 'danger'
+}
+
+# Principio de una línea con etiqueta (admite viñetas, numeración y negrita delante)
+_LABEL_START = r'[ \t>#*_\d.)-]*(?P<label>' + '|'.join(_LABELS) + r')[*_ \t]*:'
+_FENCE_START = r'[ \t]*(?P<fence>`{3,}|~{3,})'
+
+# Una sola expresión para toda la respuesta: bloques de código, líneas con etiqueta y tramos
+# de texto libre (varias líneas seguidas sin etiqueta en una sola coincidencia). Cada
+# coincidencia incluye su salto de línea final, así la siguiente empieza justo en otra línea.
+_RESPONSE_RE = re.compile(
+    r'^(?:' + _FENCE_START + r'[^\n]*\n(?P<code>.*?)^[ \t]*(?P=fence)[ \t\r]*$'
+    r'|' + _LABEL_START + r'[*_]*[ \t]*(?P<value>[^\n]*)'
+    r'|(?P<prose>[^\n]*(?:\n(?!' + _LABEL_START.replace('?P<label>', '?:') + '|'
+    + _FENCE_START.replace('?P<fence>', '?:') + r')[^\n]*)*))\n?',
+    re.MULTILINE | re.DOTALL | re.IGNORECASE
+)
+
+_DECORATION = ('*', '_', '`')
+_BOLD_RE = re.compile(r'^(\*\*|__)(.+)\1$')
+_INLINE_CODE_RE = re.compile(r'^(`+)(.+?)\1$')
+_AFFIRMATIVE_RE = re.compile(r'^[*_`\s]*(?:YES|S[IÍ])\b', re.IGNORECASE)
+
+# Heurística del modo sin formato: líneas con pinta de comando o de explicación
+_COMMAND_LIKE_RE = re.compile(
+    r'^(?:(?:ls|cd|mkdir|rm|cp|mv|cat|grep|find|chmod|sudo)(?:\s|$)|\./)|[|<>]', re.IGNORECASE
+)
+_EXPLANATION_WORDS = ('aquí', 'tienes', 'comando', 'necesitas', 'este', 'esta', 'lista',
+                      'filtra', 'archivo')
+_INTRO_WORDS_RE = re.compile('aquí|tienes|comando', re.IGNORECASE)
+
+
+# Niveles de peligro del modo JSON; el último marca el comando como peligroso
+DANGER_LEVELS = ('none', 'low', 'high')
+
+# Esquema de la respuesta en modo JSON (subconjunto OpenAPI que acepta Gemini)
+RESPONSE_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'command': {'type': 'string'},
+        'explanation': {'type': 'string'},
+        'danger': {'type': 'string', 'format': 'enum', 'enum': list(DANGER_LEVELS)},
+        'alternatives': {'type': 'array', 'items': {'type': 'string'}}
+    },
+    'required': ['command', 'explanation', 'danger']
+}
+
+_JSON_FENCE_RE = re.compile(r'^\s*```(?:json)?\s*\n(.*?)\n\s*```\s*$', re.DOTALL | re.IGNORECASE)
+_JSON_COMMAND_RE = re.compile(r'"command"\s*:\s*("(?:[^"\\]|\\.)*")')
+
+
+class ParsedResponse(namedtuple('ParsedResponse',
+                                'command explanation is_dangerous structured danger_level '
+                                'alternatives', defaults=(None, ()))):
+    """
+    Respuesta del modelo ya interpretada
+    structured indica que el comando venía con su etiqueta (COMMAND/COMANDO) o en JSON;
+    danger_level y alternatives solo los da el modo JSON
+    """
+
+    __slots__ = ()
+
+    def as_result(self):
+        """Diccionario de resultado que usan MCPServer y la caché"""
+        result = {
+            'command': self.command,
+            'explanation': self.explanation,
+            'is_dangerous': self.is_dangerous
+        }
+        if self.danger_level is not None:
+            result['danger_level'] = self.danger_level
+        if self.alternatives:
+            result['alternatives'] = list(self.alternatives)
+        return result
+
+
+def is_affirmative(text):
+    """Indica si el valor de DANGER/PELIGRO es afirmativo (YES/SI)"""
+    return bool(_AFFIRMATIVE_RE.match(text))
+
+
+def _clean_value(value):
+    """Valor de una etiqueta sin decoración markdown (negrita y código en línea)"""
+    value = value.strip()
+    if value[:1] not in _DECORATION and value[-1:] not in _DECORATION:
+        return value
+    bold = _BOLD_RE.match(value)
+    value = bold.group(2).strip() if bold else value
+    inline = _INLINE_CODE_RE.match(value)
+    return inline.group(2).strip() if inline else value
+
+
+def _looks_like_explanation(lowered):
+    """Línea con demasiadas palabras de explicación para ser un comando"""
+    return sum(word in lowered for word in _EXPLANATION_WORDS) > 2
+
+
+def _fallback_command(prose):
+    """
+    Comando de una respuesta sin formato: la primera línea con pinta de comando o, si no
+    hay ninguna, la primera línea que no sea un comentario ni una introducción
+    """
+    any_line = None
+    for block in prose:
+        for line in block.split('\n'):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            lowered = line.lower()
+            if not _looks_like_explanation(lowered) and _COMMAND_LIKE_RE.search(line):
+                return line
+            if any_line is None and not _INTRO_WORDS_RE.search(lowered):
+                any_line = line
+    return any_line
+
+
+def parse_response(text, partial=False):
+    """
+    Interpreta la respuesta del modelo en una sola pasada
+    Si COMMAND/COMANDO no tiene valor, el comando es el bloque de código (o la línea) siguiente.
+    Si se repite una etiqueta se usa su primera aparición.
+    partial: el texto es el principio de una respuesta en streaming (un bloque de código sin
+    cerrar todavía no cuenta)
+    """
+    fields = {}
+    awaiting_command = False
+    code_block = None
+    prose = []
+
+    for match in _RESPONSE_RE.finditer(text):
+        kind = match.lastgroup
+        if kind == 'value':
+            label, value = match.group('label', 'value')
+            field = _LABELS[label.upper()]
+            value = _clean_value(value)
+            if field == 'command' and not value and 'command' not in fields:
+                awaiting_command = True
+            elif value:
+                fields.setdefault(field, value)
+            continue
+
+        if kind == 'code':
+            code = match.group('code')
+        else:
+            block = match.group('prose')
+            if not block.lstrip().startswith(('```', '~~~')):
+                if awaiting_command and block.strip():
+                    fields.setdefault('command', _clean_value(block.strip().split('\n')[0]))
+                    awaiting_command = False
+                prose.append(block)
+                continue
+            # Bloque de código sin cerrar: el resto de la respuesta es código
+            if partial:
+                break
+            code = text[match.start():].split('\n', 1)[1] if '\n' in block else ''
+
+        code = code.strip()
+        if awaiting_command and code:
+            fields.setdefault('command', code)
+            awaiting_command = False
+        elif code_block is None and code:
+            code_block = code
+        if kind != 'code':
+            break
+
+    command = fields.get('command')
+    if not command and not code_block:
+        code_block = _fallback_command(prose)
+    return ParsedResponse(
+        command=command or code_block,
+        explanation=fields.get('explanation', ''),
+        is_dangerous=is_affirmative(fields.get('danger', '')),
+        structured=bool(command)
+    )
+
+
+def parse_json_response(text):
+    """
+    Valida una respuesta del modo JSON contra RESPONSE_SCHEMA
+    Devuelve un ParsedResponse, o None si no es JSON válido o no cumple el esquema
+    (el modelo a veces envuelve el JSON en un bloque de código: se acepta)
+    """
+    fenced = _JSON_FENCE_RE.match(text)
+    try:
+        data = json.loads(fenced.group(1) if fenced else text)
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+
+    command, explanation = data.get('command'), data.get('explanation')
+    danger, alternatives = data.get('danger'), data.get('alternatives', [])
+    if not isinstance(command, str) or not isinstance(explanation, str):
+        return None
+    if danger not in DANGER_LEVELS:
+        return None
+    if not isinstance(alternatives, list) or not all(isinstance(a, str) for a in alternatives):
+        return None
+
+    command = command.strip()
+    return ParsedResponse(
+        command=command or None,
+        explanation=explanation.strip(),
+        is_dangerous=danger == DANGER_LEVELS[-1],
+        structured=True,
+        danger_level=danger,
+        alternatives=tuple(a.strip() for a in alternatives if a.strip() and a.strip() != command)
+    )
+
+
+def json_command(partial_text):
+    """
+    Comando de una respuesta JSON en streaming en cuanto su valor está completo
+    Devuelve None mientras no haya llegado la cadena "command" entera
+    """
+    found = _JSON_COMMAND_RE.search(partial_text)
+    if not found:
+        return None
+    try:
+        return json.loads(found.group(1)).strip() or None
+    except ValueError:
+        return None
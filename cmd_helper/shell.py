@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Interactive Shell Module
+
+This module implements `cmdh shell` (also `cmdh -i`): a prompt that keeps one
+warm `CmdHelper` (model client, translator, caches) alive across requests.
+Between requests only the context that changed is collected again, and a
+request starting with `+` refines the previous answer.
+"""
+
+import os
+from .context_analyzer import SessionContext
+from .i18n import t
+from .lazy import lazy_import
+
+colorama = lazy_import('colorama')
+
+EXIT_COMMANDS = ('exit', 'quit', ':q')
+
+
+def refine_request(previous_request, previous_command, refinement):
+    """Petición de seguimiento: la petición anterior, su comando y el ajuste pedido"""
+    return (f"{previous_request}\n"
+            f"Comando anterior / Previous command: {previous_command}\n"
+            f"Ajuste / Refinement: {refinement}")
+
+
+def _enable_line_editing():
+    """Historial y edición de línea con readline si está disponible (no existe en Windows)"""
+    try:
+        import readline  # pylint: disable=import-outside-toplevel,unused-import
+    except ImportError:
+        pass
+
+
+class InteractiveSession:
+    """Sesión interactiva que atiende peticiones sucesivas con el mismo CmdHelper"""
+
+    def __init__(self, app):
+        self.app = app
+        self.context = SessionContext(app.mcp_server.context_analyzer)
+        self.previous = None  # (petición, comando) de la última respuesta con comando
+
+    def prompt(self):
+        """Texto del prompt con el nombre del directorio actual"""
+        directory = os.path.basename(os.getcwd()) or os.getcwd()
+        return f"cmdh {directory}> "
+
+    def handle(self, line):
+        """Atiende una línea; devuelve False si la sesión debe terminar"""
+        line = line.strip()
+        if not line:
+            return True
+        if line in EXIT_COMMANDS:
+            return False
+        if line == 'help':
+            print(t('shell.help'))
+            return True
+        if line == 'cd' or line.startswith('cd '):
+            self.change_directory(line[2:].strip())
+            return True
+
+        request = line
+        if line.startswith('+'):
+            if self.previous is None:
+                print(colorama.Fore.YELLOW + t('shell.no_previous') + colorama.Style.RESET_ALL)
+                return True
+            request = refine_request(*self.previous, line[1:].strip())
+
+        result = self.app.process_request(request, context=self.context.get())
+        if result and result['command']:
+            self.previous = (request, result['command'])
+        return True
+
+    def change_directory(self, path):
+        """cd interno: los comandos ejecutados no pueden cambiar el directorio de la sesión"""
+        target = os.path.expanduser(path or '~')
+        try:
+            os.chdir(target)
+        except OSError as e:
+            print(colorama.Fore.RED + t('shell.cd_error') + " " + str(e)
+                  + colorama.Style.RESET_ALL)
+
+    def run(self, first_request=None):
+        """Bucle principal: termina con exit, quit o Ctrl-D"""
+        _enable_line_editing()
+        print(t('shell.welcome'))
+        line = first_request
+        while True:
+            if line is None:
+                try:
+                    line = input(self.prompt())
+                except EOFError:
+                    print()
+                    return
+                except KeyboardInterrupt:
+                    print()
+                    continue
+
+            try:
+                if not self.handle(line):
+                    return
+            except KeyboardInterrupt:
+                # Ctrl-C cancela la petición en curso, no la sesión
+                print("\n" + colorama.Fore.YELLOW + t('messages.operation_cancelled_by_user')
+                      + colorama.Style.RESET_ALL)
+            line = None
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""
+Similarity Index Module
+
+This module keeps a local n-gram index of previously answered requests, so
+that paraphrases of a cached request can be answered without calling the
+AI model.
+"""
+
+import hashlib
+import json
+import math
+import re
+import time
+from .config import get_config
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS similar_requests (
+    id INTEGER PRIMARY KEY,
+    key TEXT UNIQUE NOT NULL,
+    scope TEXT NOT NULL,
+    request TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    grams TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS similar_grams (
+    gram TEXT NOT NULL,
+    request_id INTEGER NOT NULL,
+    PRIMARY KEY (gram, request_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS similar_grams_request ON similar_grams (request_id);
+CREATE TABLE IF NOT EXISTS gram_df (
+    gram TEXT PRIMARY KEY,
+    df INTEGER NOT NULL
+);
+"""
+
+_WORD_RE = re.compile(r'\w+|[^\w\s]+')
+_PARAMETER_RE = re.compile(r'[\d/.*~]')
+
+
+def shingles(normalized_request, size=3):
+    """
+    Conjunto de shingles de una petición normalizada:
+    n-gramas de caracteres (sensibles a erratas) y tokens completos (sensibles al orden)
+    """
+    tokens = _WORD_RE.findall(normalized_request)
+    if not tokens:
+        return frozenset()
+
+    text = f" {' '.join(tokens)} "
+    grams = {text[i:i + size] for i in range(len(text) - size + 1)}
+    grams.update(f"#{token}" for token in tokens)
+    return frozenset(grams)
+
+
+def parameters(normalized_request):
+    """Tokens que actúan como parámetros (números, rutas, extensiones, globs)"""
+    return frozenset(
+        token for token in normalized_request.split() if _PARAMETER_RE.search(token)
+    )
+
+
+def jaccard(first, second):
+    """Similitud de Jaccard entre dos conjuntos"""
+    if not first or not second:
+        return 0.0
+    overlap = len(first & second)
+    return overlap / (len(first) + len(second) - overlap)
+
+
+class SimilarityIndex:
+    """
+    Índice de shingles sobre las peticiones guardadas en la caché de respuestas
+
+    Las búsquedas usan filtrado por prefijo: con un umbral t, un candidato con
+    Jaccard >= t debe compartir al menos uno de los n - ceil(t·n) + 1 shingles
+    más raros de la consulta, así que solo se leen las filas de esos shingles.
+    Para acotar la latencia, los shingles del prefijo que aparecen en miles de
+    peticiones se descartan una vez superado MAX_POSTINGS (aportan poca evidencia).
+    """
+
+    # Número máximo de filas de candidatos que se evalúan por consulta
+    MAX_CANDIDATES = 100
+    # Filas del índice invertido que se leen como máximo por consulta
+    MAX_POSTINGS = 1000
+    # Las peticiones muy largas no se buscan (límite de parámetros de SQLite)
+    MAX_QUERY_GRAMS = 900
+
+    def __init__(self, cache, threshold=None, config=None):
+        self.cache = cache
+        self.config = config or get_config()
+        self.threshold = threshold if threshold is not None else self.config.SIMILARITY_THRESHOLD
+        self._schema_ready = False
+
+    def _transaction(self):
+        """Transacción sobre la base de datos de la caché, creando antes el esquema del índice"""
+        if not self._schema_ready:
+            with self.cache.transaction() as connection:
+                connection.executescript(_SCHEMA)
+            self._schema_ready = True
+        return self.cache.transaction()
+
+    @staticmethod
+    def make_scope(language, model_name, pwd):
+        """Ámbito de búsqueda: mismo idioma, modelo y directorio"""
+        return hashlib.sha256(f"{language}\x1f{model_name}\x1f{pwd}".encode('utf-8')).hexdigest()
+
+    def add(self, key, user_request, scope):
+        """Indexa una petición cuya respuesta está guardada en la caché bajo key"""
+        self.add_many([(key, user_request, scope)])
+
+    def add_many(self, entries):
+        """Indexa varias peticiones (key, petición, ámbito) en una sola transacción"""
+        with self._transaction() as connection:
+            for key, user_request, scope in entries:
+                grams = shingles(self.cache.normalize_request(user_request))
+                if grams and len(grams) <= self.MAX_QUERY_GRAMS:
+                    self._insert(connection, key, user_request, scope, grams)
+            self._purge_stale(connection)
+
+    def _insert(self, connection, key, user_request, scope, grams):
+        """Inserta una petición y sus shingles dentro de una transacción abierta"""
+        existing = connection.execute(
+            'SELECT id FROM similar_requests WHERE key = ?', (key,)
+        ).fetchone()
+        if existing:
+            return
+
+        cursor = connection.execute(
+            'INSERT INTO similar_requests (key, scope, request, size, grams) '
+            'VALUES (?, ?, ?, ?, ?)',
+            (key, scope, self.cache.normalize_request(user_request), len(grams),
+             '\x1f'.join(sorted(grams)))
+        )
+        request_id = cursor.lastrowid
+        connection.executemany(
+            'INSERT INTO similar_grams (gram, request_id) VALUES (?, ?)',
+            [(gram, request_id) for gram in grams]
+        )
+        connection.executemany(
+            'INSERT INTO gram_df (gram, df) VALUES (?, 1) '
+            'ON CONFLICT(gram) DO UPDATE SET df = df + 1',
+            [(gram,) for gram in grams]
+        )
+
+    def _purge_stale(self, connection):
+        """Elimina del índice las peticiones cuya respuesta ya no está en la caché"""
+        indexed = connection.execute('SELECT COUNT(*) FROM similar_requests').fetchone()[0]
+        # La purga recorre todo el índice: solo se hace cuando ha crecido un 10% sobre el límite
+        if indexed <= self.cache.max_entries * 1.1:
+            return
+
+        connection.execute(
+            'DELETE FROM similar_requests WHERE key NOT IN (SELECT key FROM responses)'
+        )
+        connection.execute(
+            'DELETE FROM similar_grams WHERE request_id NOT IN (SELECT id FROM similar_requests)'
+        )
+        connection.execute('DELETE FROM gram_df')
+        connection.execute(
+            'INSERT INTO gram_df (gram, df) SELECT gram, COUNT(*) FROM similar_grams GROUP BY gram'
+        )
+
+    def lookup(self, user_request, scope):
+        """
+        Busca la petición guardada más parecida cuya respuesta sigue en la caché
+        Devuelve (respuesta, petición original, similitud) o None si ninguna supera el umbral
+        Las peticiones cuya respuesta expiró o se expulsó se quitan del índice al encontrarlas
+        """
+        normalized = self.cache.normalize_request(user_request)
+        query = shingles(normalized)
+        if not query or len(query) > self.MAX_QUERY_GRAMS or not 0 < self.threshold <= 1:
+            return None
+        query_parameters = parameters(normalized)
+
+        with self._transaction() as connection:
+            matches = []
+            for key, request, grams in self._candidates(connection, query, scope):
+                score = jaccard(query, frozenset(grams.split('\x1f')))
+                # "archivos de más de 10MB" no equivale a "de más de 100MB"
+                if score >= self.threshold and parameters(request) == query_parameters:
+                    matches.append((score, key, request, grams))
+            # Por similitud descendente; a igualdad, en el orden de los candidatos
+            matches.sort(key=lambda match: -match[0])
+
+            oldest = time.time() - self.cache.ttl
+            for score, key, request, grams in matches:
+                row = connection.execute(
+                    'SELECT payload, created_at FROM responses WHERE key = ?', (key,)
+                ).fetchone()
+                if row is not None and row[1] >= oldest:
+                    return json.loads(row[0]), request, round(score, 3)
+                self._remove(connection, key, grams)
+        return None
+
+    @staticmethod
+    def _remove(connection, key, grams):
+        """Quita del índice una petición cuya respuesta ya no está en la caché"""
+        found = connection.execute(
+            'SELECT id FROM similar_requests WHERE key = ?', (key,)
+        ).fetchone()
+        if found is None:
+            return
+        connection.execute('DELETE FROM similar_grams WHERE request_id = ?', found)
+        connection.execute('DELETE FROM similar_requests WHERE id = ?', found)
+        connection.executemany('UPDATE gram_df SET df = df - 1 WHERE gram = ?',
+                               [(gram,) for gram in grams.split('\x1f')])
+        connection.execute('DELETE FROM gram_df WHERE df <= 0')
+
+    def _candidates(self, connection, query, scope):
+        """Peticiones que comparten algún shingle del prefijo raro de la consulta"""
+        placeholders = ','.join('?' * len(query))
+        document_frequency = dict(connection.execute(
+            f'SELECT gram, df FROM gram_df WHERE gram IN ({placeholders})', tuple(query)
+        ).fetchall())
+
+        # Los shingles que no aparecen en el índice no pueden aportar candidatos
+        ordered = sorted(query, key=lambda gram: document_frequency.get(gram, 0))
+        prefix_length = len(query) - math.ceil(self.threshold * len(query)) + 1
+        prefix = []
+        postings = 0
+        for gram in ordered[:prefix_length]:
+            frequency = document_frequency.get(gram, 0)
+            if not frequency:
+                continue
+            # El shingle más raro se lee siempre; el resto, mientras quepa en el presupuesto
+            if prefix and postings + frequency > self.MAX_POSTINGS:
+                break
+            prefix.append(gram)
+            postings += frequency
+        if not prefix:
+            return []
+
+        # Filtro por tamaño: Jaccard >= t exige t·|A| <= |B| <= |A| / t
+        min_size = math.ceil(self.threshold * len(query))
+        max_size = math.floor(len(query) / self.threshold)
+        # Se evalúan primero los candidatos que comparten más shingles del prefijo
+        placeholders = ','.join('?' * len(prefix))
+        return connection.execute(
+            'SELECT r.key, r.request, r.grams FROM similar_requests r JOIN '
+            '(SELECT request_id, COUNT(*) AS shared FROM similar_grams '
+            f'WHERE gram IN ({placeholders}) GROUP BY request_id) g ON g.request_id = r.id '
+            'WHERE r.scope = ? AND r.size BETWEEN ? AND ? ORDER BY g.shared DESC LIMIT ?',
+            (*prefix, scope, min_size, max_size, self.MAX_CANDIDATES)
+        ).fetchall()
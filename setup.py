@@ -53,6 +53,8 @@ setup(
         'console_scripts': [
             'cmd-helper=cmd_helper.main:main',
             'cmdh=cmd_helper.main:main',
+            'cmdhc=cmd_helper.client:main',
+            'cmdh-daemon=cmd_helper.daemon:main',
         ],
     },
     classifiers=[
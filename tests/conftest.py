@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+"""
+Shared pytest fixtures
+"""
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache_dir(tmp_path, monkeypatch):
+    """Keep the persistent response cache out of the user's home directory"""
+    cache_dir = tmp_path / 'cmd-helper-cache'
+    monkeypatch.setenv('CMD_HELPER_CACHE_DIR', str(cache_dir))
+    return cache_dir
+
+
+@pytest.fixture(autouse=True)
+def model_path(monkeypatch):
+    """Send every request to the model; the local intents fast path is tested explicitly"""
+    monkeypatch.setenv('CMD_HELPER_LOCAL_INTENTS', '0')
@@ -0,0 +1,765 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the model backends
+"""
+
+import asyncio
+import json
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from cmd_helper.backends import (BLOCKED_SAFETY, BackendConnectionError, BackendError,
+                                 CircuitBreaker, CircuitOpenError, HedgedBackend,
+                                 LatencyHistogram, QuotaExhaustedError, RateLimitedBackend,
+                                 RateLimiter, ResilientBackend, backend_class, create_backend,
+                                 is_retryable, is_unavailable, missing_api_key)
+from cmd_helper.backends.fake import FakeBackend, fake_answer, parse_latency
+from cmd_helper.backends.openai_compat import OpenAICompatBackend
+from cmd_helper.config import Config
+from cmd_helper.prompt_builder import REQUEST_PREFIX
+from cmd_helper.response_parser import RESPONSE_SCHEMA, parse_json_response, parse_response
+
+
+def _prompt(request):
+    """Prompt con la petición al final, como el de build_prompt"""
+    return f"System prompt\n\nContext\n\n{REQUEST_PREFIX}{request}"
+
+
+class TestBackendRegistry(unittest.TestCase):
+    """Test cases for choosing the backend from the configuration"""
+
+    def test_create_backend(self):
+        """Test that the configured backend is created with retries"""
+        backend = create_backend(Config(BACKEND='fake', FAKE_LATENCY='fixed:0'))
+
+        self.assertIsInstance(backend, ResilientBackend)
+        self.assertIsInstance(backend.backend, FakeBackend)
+        self.assertEqual(backend.model_id, 'fake:' + backend.config.MODEL_NAME)
+
+    def test_unknown_backend(self):
+        """Test that an unknown backend name is rejected"""
+        with self.assertRaises(ValueError):
+            backend_class('nope')
+
+    def test_missing_api_key(self):
+        """Test that only the Gemini backend requires GEMINI_API_KEY"""
+        self.assertTrue(missing_api_key(Config(BACKEND='gemini', GEMINI_API_KEY=None)))
+        self.assertFalse(missing_api_key(Config(BACKEND='gemini', GEMINI_API_KEY='key')))
+        self.assertFalse(missing_api_key(Config(BACKEND='fake', GEMINI_API_KEY=None)))
+        self.assertFalse(missing_api_key(Config(BACKEND='openai', GEMINI_API_KEY=None)))
+
+
+class TestParseLatency(unittest.TestCase):
+    """Test cases for the fake backend latency specs"""
+
+    def test_distributions(self):
+        """Test that every distribution yields latencies in seconds within its range"""
+        rng = random.Random(1)
+        self.assertEqual(parse_latency('fixed:50')(rng), 0.05)
+        for _ in range(100):
+            self.assertTrue(0.02 <= parse_latency('uniform:20-80')(rng) <= 0.08)
+            self.assertGreaterEqual(parse_latency('normal:5,50')(rng), 0)
+            self.assertGreater(parse_latency('lognormal:50,0.5')(rng), 0)
+            self.assertGreaterEqual(parse_latency('exponential:10')(rng), 0)
+
+    def test_invalid_specs(self):
+        """Test that malformed specs are rejected"""
+        for spec in ('', 'fixed', 'fixed:a', 'uniform:10', 'gamma:1,2', 'lognormal:0,1'):
+            with self.subTest(spec=spec):
+                with self.assertRaises(ValueError):
+                    parse_latency(spec)
+
+
+class TestFakeBackend(unittest.TestCase):
+    """Test cases for the deterministic fake backend"""
+
+    def test_answer_follows_request(self):
+        """Test that the answer depends on the request and parses in text and JSON mode"""
+        backend = FakeBackend(Config(), latency='fixed:0', error_rate=0)
+
+        text = backend.generate(_prompt("how much disk space is left")).text
+        self.assertEqual(parse_response(text).command, 'df -h')
+
+        answer = backend.generate(_prompt("say hi"), schema=RESPONSE_SCHEMA).text
+        parsed = parse_json_response(answer)
+        self.assertEqual(parsed.command, 'echo "say hi"')
+        self.assertEqual(parsed.danger_level, 'none')
+
+    def test_same_seed_same_run(self):
+        """Test that latencies and failures repeat with the same seed"""
+        def run(seed):
+            backend = FakeBackend(Config(), latency='uniform:0-1', error_rate=0.5, seed=seed)
+            outcomes = []
+            for _ in range(50):
+                try:
+                    outcomes.append(backend.generate(_prompt("list files")).text)
+                except BackendError as e:
+                    outcomes.append(e.status)
+            return outcomes
+
+        self.assertEqual(run(7), run(7))
+        self.assertIn(503, run(7))
+        self.assertNotEqual(run(7), run(8))
+
+    def test_errors(self):
+        """Test that failing calls raise BackendError with a status"""
+        backend = FakeBackend(Config(), latency='fixed:0', error_rate=1)
+
+        with self.assertRaises(BackendError) as raised:
+            backend.generate(_prompt("list files"))
+        self.assertEqual(raised.exception.status, 503)
+        with self.assertRaises(BackendError):
+            backend.stream(_prompt("list files"))
+
+    def test_latency(self):
+        """Test that calls take the configured latency"""
+        backend = FakeBackend(Config(), latency='fixed:30', error_rate=0)
+
+        start = time.perf_counter()
+        backend.generate(_prompt("list files"))
+        self.assertGreaterEqual(time.perf_counter() - start, 0.03)
+
+    def test_stream(self):
+        """Test that the streamed chunks add up to the complete answer"""
+        backend = FakeBackend(Config(), latency='fixed:0', error_rate=0)
+
+        stream = backend.stream(_prompt("find python files"))
+        chunks = list(stream)
+
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(''.join(chunks), fake_answer("find python files"))
+        self.assertIsNone(stream.blocked)
+
+    def test_agenerate(self):
+        """Test that concurrent async calls wait concurrently"""
+        backend = FakeBackend(Config(), latency='fixed:50', error_rate=0)
+
+        async def run():
+            return await asyncio.gather(*(backend.agenerate(_prompt("list files"))
+                                          for _ in range(20)))
+
+        start = time.perf_counter()
+        responses = asyncio.run(run())
+
+        self.assertLess(time.perf_counter() - start, 0.5)
+        self.assertEqual({response.text for response in responses}, {fake_answer("list files")})
+        self.assertEqual(backend.calls, 20)
+
+
+class TestLatencyHistogram(unittest.TestCase):
+    """Test cases for the adaptive latency histogram"""
+
+    def test_percentiles(self):
+        """Test that percentiles fall within one bucket of the samples"""
+        histogram = LatencyHistogram()
+        self.assertIsNone(histogram.percentile(95))
+
+        for latency in range(1, 101):
+            histogram.record(latency)
+
+        self.assertTrue(50 <= histogram.percentile(50) <= 50 * 1.2)
+        self.assertTrue(95 <= histogram.percentile(95) <= 95 * 1.2)
+        self.assertLessEqual(histogram.percentile(50), histogram.percentile(99))
+
+    def test_adapts_to_recent_samples(self):
+        """Test that old samples lose weight"""
+        histogram = LatencyHistogram(window=100)
+        for _ in range(200):
+            histogram.record(1000)
+        for _ in range(400):
+            histogram.record(10)
+
+        self.assertLess(histogram.percentile(90), 20)
+        self.assertLess(histogram.total, 200)
+
+    def test_censored_samples(self):
+        """Test that cancelled calls count as at least their time, not as their latency"""
+        histogram = LatencyHistogram()
+        for _ in range(50):
+            histogram.record(10, censored=True)
+            histogram.record(100)
+
+        self.assertGreaterEqual(histogram.percentile(50), 100)
+
+        only_censored = LatencyHistogram()
+        for _ in range(30):
+            only_censored.record(40, censored=True)
+        self.assertGreaterEqual(only_censored.percentile(95), 40)
+
+
+def _sequence(*latencies_ms):
+    """Latencias del backend simulado llamada a llamada (después, 0)"""
+    latencies = iter(latencies_ms)
+    return lambda rng: next(latencies, 0) / 1000
+
+
+class TestHedgedBackend(unittest.TestCase):
+    """Test cases for hedged requests against the fake backend with injected slow answers"""
+
+    def setUp(self):
+        """Hedge after 20 ms until the histogram has enough samples"""
+        self.config = Config(HEDGE_DELAY_MS=20.0, HEDGE_MIN_DELAY_MS=0.0)
+        self.primary = FakeBackend(self.config, latency='fixed:0', error_rate=0)
+        self.secondary = FakeBackend(self.config, latency='fixed:0', error_rate=0)
+        self.backend = HedgedBackend(self.config, self.primary, self.secondary)
+
+    def test_fast_primary_is_not_hedged(self):
+        """Test that an answer before the hedge delay sends a single request"""
+        self.backend.generate(_prompt("list files"))
+
+        self.assertEqual(self.secondary.calls, 0)
+        self.assertEqual(self.backend.counters, {'calls': 1, 'hedged': 0, 'hedge_wins': 0})
+
+    def test_slow_primary_is_hedged(self):
+        """Test that a slow primary is raced and the faster answer wins"""
+        self.primary.latency = _sequence(500)
+
+        start = time.perf_counter()
+        response = self.backend.generate(_prompt("list files"))
+
+        self.assertLess(time.perf_counter() - start, 0.3)
+        self.assertEqual(response.text, fake_answer("list files"))
+        self.assertEqual(self.backend.counters, {'calls': 1, 'hedged': 1, 'hedge_wins': 1})
+
+    def test_hedge_on_same_backend(self):
+        """Test hedging a slow call with a second call to the same backend"""
+        self.primary.latency = _sequence(500, 0)
+        backend = HedgedBackend(self.config, self.primary, self.primary)
+
+        start = time.perf_counter()
+        backend.generate(_prompt("list files"))
+
+        self.assertLess(time.perf_counter() - start, 0.3)
+        self.assertEqual(self.primary.calls, 2)
+
+    def test_errors(self):
+        """Test that a hedge covers a failing primary and both failures raise"""
+        failing = FakeBackend(self.config, latency='fixed:100', error_rate=1)
+        self.assertIsNotNone(HedgedBackend(self.config, failing, self.secondary)
+                             .generate(_prompt("list files")).text)
+
+        with self.assertRaises(BackendError):
+            HedgedBackend(self.config, failing, failing).generate(_prompt("list files"))
+
+    def test_adaptive_delay(self):
+        """Test that the hedge delay follows the primary's latency percentile"""
+        self.assertEqual(self.backend.hedge_delay(), 0.02)
+
+        for _ in range(50):
+            self.backend.histogram(self.primary).record(5)
+
+        self.assertLess(self.backend.hedge_delay(), 0.01)
+        self.assertEqual(self.backend.stats()['latency_ms'][f'{self.primary.model_id} generate']
+                         ['samples'], 50)
+
+    def test_stream_race(self):
+        """Test that streams race to the first chunk and the loser is closed"""
+        self.primary.latency = _sequence(400)
+
+        start = time.perf_counter()
+        chunks = list(self.backend.stream(_prompt("find python files")))
+
+        self.assertLess(time.perf_counter() - start, 0.3)
+        self.assertEqual(''.join(chunks), fake_answer("find python files"))
+        self.assertEqual(self.backend.counters['hedge_wins'], 1)
+
+    def test_agenerate_cancels_loser(self):
+        """Test that the async race cancels the losing call"""
+        self.primary.latency = _sequence(2000)
+
+        async def run():
+            response = await self.backend.agenerate(_prompt("list files"))
+            await asyncio.sleep(0)  # La cancelación se completa en la siguiente vuelta del bucle
+            pending = [task for task in asyncio.all_tasks()
+                       if task is not asyncio.current_task()]
+            return response, pending
+
+        start = time.perf_counter()
+        response, pending = asyncio.run(run())
+
+        self.assertLess(time.perf_counter() - start, 1)
+        self.assertEqual(response.text, fake_answer("list files"))
+        self.assertEqual(pending, [])
+
+    def test_agenerate_records_cancelled_losers(self):
+        """Test that cancelled slow calls keep the async hedge delay from shrinking"""
+        slow = FakeBackend(self.config, latency='fixed:60', error_rate=0)
+        fast = FakeBackend(self.config.replace(MODEL_NAME='other'), latency='fixed:0',
+                           error_rate=0)
+        backend = HedgedBackend(self.config, slow, fast)
+
+        async def run():
+            for index in range(30):
+                await backend.agenerate(_prompt(f"list files {index}"))
+
+        asyncio.run(run())
+
+        self.assertEqual(backend.counters['hedged'], 30)
+        self.assertEqual(backend.stats()['latency_ms'][f'{slow.model_id} generate']['samples'],
+                         30)
+        self.assertGreaterEqual(backend.hedge_delay(), 0.02)
+
+    def test_abandoned_call_does_not_delay_exit(self):
+        """Test that a slow losing call does not keep the process alive"""
+        code = (
+            "from cmd_helper.backends import HedgedBackend\n"
+            "from cmd_helper.backends.fake import FakeBackend\n"
+            "from cmd_helper.config import Config\n"
+            "config = Config(HEDGE_DELAY_MS=20.0, HEDGE_MIN_DELAY_MS=0.0)\n"
+            "slow = FakeBackend(config, latency='fixed:10000', error_rate=0)\n"
+            "fast = FakeBackend(config, latency='fixed:0', error_rate=0)\n"
+            "HedgedBackend(config, slow, fast).generate('list files')\n"
+        )
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], check=True, timeout=30,
+                       cwd=Path(__file__).resolve().parent.parent)
+
+        self.assertLess(time.perf_counter() - start, 5)
+
+    def test_create_backend(self):
+        """Test that HEDGE wraps the backend, sharing it unless an alternate one is set"""
+        config = Config(BACKEND='fake', HEDGE=True)
+        same = create_backend(config)
+        alternate = create_backend(config.replace(HEDGE_MODEL='other'))
+
+        self.assertIsInstance(same, HedgedBackend)
+        self.assertIs(same.primary, same.secondary)
+        self.assertEqual(same.model_id, same.primary.model_id)
+        self.assertEqual(alternate.secondary.model_id, 'fake:other')
+        self.assertEqual(alternate.primary.backend.config.MODEL_NAME, config.MODEL_NAME)
+
+
+class TestResilientBackend(unittest.TestCase):
+    """Test cases for retries and the circuit breaker with injected faults"""
+
+    def setUp(self):
+        """Fast backoff so that retries do not slow the tests down"""
+        self.config = Config(MAX_RETRIES=3, RETRY_BASE_DELAY_MS=1.0, RETRY_MAX_DELAY_MS=5.0,
+                             RETRY_DEADLINE=10.0, BREAKER_THRESHOLD=3, BREAKER_COOLDOWN=60.0)
+        self.fake = FakeBackend(self.config, latency='fixed:0', error_rate=0)
+        self.backend = ResilientBackend(self.config, self.fake)
+
+    def test_classification(self):
+        """Test which errors are retried"""
+        for error, retryable in ((BackendError('rate', status=429), True),
+                                 (BackendError('down', status=503), True),
+                                 (BackendConnectionError('network'), True),
+                                 (BackendError('Invalid chat completion'), False),
+                                 (TimeoutError(), True),
+                                 (BackendError('bad request', status=400), False),
+                                 (CircuitOpenError(1.0), False),
+                                 (ValueError(), False)):
+            with self.subTest(error=repr(error)):
+                self.assertEqual(is_retryable(error), retryable)
+
+    def test_gemini_api_errors(self):
+        """Test that Gemini SDK errors keep their HTTP status"""
+        from google.api_core import exceptions  # pylint: disable=import-outside-toplevel
+        from cmd_helper.backends.gemini import api_error  # pylint: disable=import-outside-toplevel
+
+        self.assertEqual(api_error(exceptions.ResourceExhausted('quota')).status, 429)
+        self.assertIsNone(api_error(ValueError('other')))
+
+    def test_gemini_stream_errors(self):
+        """Test that Gemini errors in the middle of a stream are classified too"""
+        # pylint: disable=import-outside-toplevel
+        from google.api_core import exceptions
+        from cmd_helper.backends.gemini import GeminiStream
+
+        class Chunk:  # pylint: disable=too-few-public-methods
+            """Fragmento de Gemini con texto"""
+            text = 'COMMAND: ls'
+
+        def chunks():
+            yield Chunk()
+            raise exceptions.ServiceUnavailable('overloaded')
+
+        stream = iter(GeminiStream(chunks()))
+        self.assertEqual(next(stream), 'COMMAND: ls')
+        with self.assertRaises(BackendError) as raised:
+            next(stream)
+        self.assertEqual(raised.exception.status, 503)
+        self.assertTrue(is_retryable(raised.exception))
+
+    def test_transient_errors_are_retried(self):
+        """Test that 429 and 503 answers are retried until one succeeds"""
+        self.fake.inject_faults(1, status=429)
+        self.fake.inject_faults(1, status=503)
+
+        response = self.backend.generate(_prompt("list files"))
+
+        self.assertEqual(response.text, fake_answer("list files"))
+        self.assertEqual(self.fake.calls, 3)
+        self.assertEqual(self.backend.stats()['retries'], 2)
+        self.assertEqual(self.backend.breaker.state, 'closed')
+
+    def test_permanent_errors_are_not_retried(self):
+        """Test that a 400 is returned at once"""
+        self.fake.inject_faults(1, status=400)
+
+        with self.assertRaises(BackendError):
+            self.backend.generate(_prompt("list files"))
+        self.assertEqual(self.fake.calls, 1)
+
+    def test_retries_are_bounded(self):
+        """Test that retries stop after MAX_RETRIES and at the deadline"""
+        backend = ResilientBackend(self.config.replace(BREAKER_THRESHOLD=0), self.fake)
+        self.fake.inject_faults(4)
+        with self.assertRaises(BackendError):
+            backend.generate(_prompt("list files"))
+        self.assertEqual(self.fake.calls, 4)
+
+        # Retry-After más allá del plazo: no se reintenta
+        backend = ResilientBackend(self.config.replace(RETRY_DEADLINE=0.5), self.fake)
+        self.fake.inject_faults(1, status=429, retry_after=5)
+        start = time.perf_counter()
+        with self.assertRaises(BackendError):
+            backend.generate(_prompt("list files"))
+        self.assertLess(time.perf_counter() - start, 0.5)
+
+    def test_backoff(self):
+        """Test the jittered exponential backoff and Retry-After"""
+        for attempt in range(6):
+            self.assertLessEqual(self.backend.backoff(attempt, None),
+                                 min(5.0, 2 ** attempt) / 1000)
+        self.assertEqual(self.backend.backoff(0, BackendError('rate', retry_after=2)), 2)
+
+    def test_circuit_opens_and_fails_fast(self):
+        """Test that repeated transient failures open the circuit"""
+        backend = ResilientBackend(self.config.replace(MAX_RETRIES=0), self.fake)
+        self.fake.inject_faults(3)
+        for _ in range(3):
+            with self.assertRaises(BackendError):
+                backend.generate(_prompt("list files"))
+
+        with self.assertRaises(CircuitOpenError) as raised:
+            backend.generate(_prompt("list files"))
+
+        self.assertEqual(self.fake.calls, 3)
+        self.assertGreater(raised.exception.retry_after, 59)
+        stats = backend.stats()
+        self.assertEqual((stats['breaker'], stats['circuit_opened'], stats['short_circuits']),
+                         ('open', 1, 1))
+
+    def test_half_open_trial(self):
+        """Test that after the cool-down a single trial call decides the state"""
+        now = [0.0]
+        breaker = CircuitBreaker(threshold=1, cooldown=10, clock=lambda: now[0])
+        self.assertTrue(breaker.record_failure())
+        self.assertRaises(CircuitOpenError, breaker.allow)
+
+        now[0] = 11
+        self.assertEqual(breaker.state, 'half_open')
+        breaker.allow()
+        self.assertRaises(CircuitOpenError, breaker.allow)  # Solo una llamada de prueba
+        self.assertTrue(breaker.record_failure())
+        self.assertRaises(CircuitOpenError, breaker.allow)
+
+        now[0] = 22
+        breaker.allow()
+        breaker.record_success()
+        self.assertEqual(breaker.state, 'closed')
+        breaker.allow()
+
+    def test_stream_and_async_retries(self):
+        """Test retries before the first chunk and in the asyncio version"""
+        self.fake.inject_faults(1)
+        self.assertEqual(''.join(self.backend.stream(_prompt("list files"))),
+                         fake_answer("list files"))
+
+        self.fake.inject_faults(2, status=502)
+        response = asyncio.run(self.backend.agenerate(_prompt("list files")))
+        self.assertEqual(response.text, fake_answer("list files"))
+        self.assertEqual(self.backend.stats()['retries'], 3)
+
+
+class TestRateLimiter(unittest.TestCase):
+    """Test cases for the token buckets and the queue shared between processes"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.temp_dir.name) / 'ratelimit.sqlite3'
+        self.now = [1000.0]
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _limiter(self, rpm=0, tpm=0):
+        return RateLimiter(self.path, rpm=rpm, tpm=tpm, clock=lambda: self.now[0])
+
+    def _take(self, limiter, tokens=10):
+        """Hace cola y intenta tomar; devuelve la espera (0 si lo consiguió)"""
+        ticket = limiter.enqueue('m')
+        wait = limiter.try_take('m', ticket, tokens)
+        if wait:
+            limiter.leave(ticket)
+        return wait
+
+    def test_requests_per_minute(self):
+        """Test that the request bucket empties and refills at its rate"""
+        limiter = self._limiter(rpm=6)
+        self.assertFalse(self._limiter().enabled)
+        self.assertTrue(limiter.enabled)
+
+        for _ in range(6):
+            self.assertEqual(self._take(limiter), 0)
+        self.assertAlmostEqual(self._take(limiter), 10.0)
+
+        self.now[0] += 10
+        self.assertEqual(self._take(limiter), 0)
+        self.assertAlmostEqual(self._take(limiter), 10.0)
+
+    def test_tokens_per_minute(self):
+        """Test that the token bucket limits big prompts and charges answers as debt"""
+        limiter = self._limiter(tpm=600)
+
+        self.assertEqual(self._take(limiter, tokens=500), 0)
+        self.assertAlmostEqual(self._take(limiter, tokens=200), 10.0)
+        limiter.charge('m', 200)
+        self.assertAlmostEqual(self._take(limiter, tokens=200), 30.0)
+        # Una petición mayor que el cubo espera a que esté lleno, no para siempre
+        self.now[0] += 70
+        self.assertEqual(self._take(limiter, tokens=5000), 0)
+
+    def test_fair_order(self):
+        """Test that only the oldest waiter may take, even when there is budget"""
+        limiter = self._limiter(rpm=60)
+        first, second = limiter.enqueue('m'), limiter.enqueue('m')
+
+        self.assertGreater(limiter.try_take('m', second, 1), 0)
+        self.assertEqual(limiter.try_take('m', first, 1), 0)
+        self.assertEqual(limiter.try_take('m', second, 1), 0)
+        # Otros modelos tienen su propia cola
+        self.assertEqual(self._take(limiter), 0)
+
+    def test_stale_waiters_are_dropped(self):
+        """Test that a waiter whose process died does not block the queue"""
+        limiter = self._limiter(rpm=60)
+        limiter.enqueue('m')
+        self.now[0] += 30
+        self.assertEqual(self._take(limiter), 0)
+
+    def test_pause(self):
+        """Test that a pause after a 429 holds every caller"""
+        limiter = self._limiter(rpm=60)
+        limiter.pause('m', 5)
+        self.assertAlmostEqual(self._take(limiter), 5.0)
+        self.now[0] += 5
+        self.assertEqual(self._take(limiter), 0)
+
+    def test_acquire_timeout(self):
+        """Test that a caller gives up after the maximum wait and leaves the queue"""
+        limiter = self._limiter(rpm=1)
+        limiter.acquire('m', 1, timeout=1)
+
+        with self.assertRaises(QuotaExhaustedError) as caught:
+            limiter.acquire('m', 1, timeout=0)
+        self.assertAlmostEqual(caught.exception.retry_after, 60.0)
+        self.assertFalse(is_retryable(caught.exception))
+        self.assertTrue(is_unavailable(caught.exception))
+        self.assertEqual(limiter.status()[0]['waiting'], 0)
+
+    def test_status(self):
+        """Test the consumption of the last minute"""
+        limiter = self._limiter(rpm=10, tpm=1000)
+        self._take(limiter, tokens=100)
+        limiter.charge('m', 50)
+
+        status, = limiter.status()
+        self.assertEqual((status['scope'], status['requests'], status['tokens']), ('m', 1, 150))
+        self.assertEqual((status['rpm'], status['tpm'], status['waiting']), (10, 1000, 0))
+        self.assertAlmostEqual(status['available_requests'], 9)
+        self.assertAlmostEqual(status['available_tokens'], 850)
+
+        self.now[0] += 61
+        status, = limiter.status()
+        self.assertEqual((status['requests'], status['tokens']), (0, 0))
+
+    def test_shared_between_processes(self):
+        """Test that separate processes share one budget"""
+        script = ("import sys\n"
+                  "from cmd_helper.backends import QuotaExhaustedError, RateLimiter\n"
+                  "limiter = RateLimiter(sys.argv[1], rpm=4)\n"
+                  "taken = 0\n"
+                  "for _ in range(3):\n"
+                  "    try:\n"
+                  "        limiter.acquire('m', 1, timeout=0.5)\n"
+                  "        taken += 1\n"
+                  "    except QuotaExhaustedError:\n"
+                  "        pass\n"
+                  "print(taken)\n")
+        processes = [subprocess.Popen([sys.executable, '-c', script, str(self.path)],
+                                      stdout=subprocess.PIPE, text=True) for _ in range(2)]
+        taken = [int(process.communicate(timeout=30)[0]) for process in processes]
+        self.assertEqual(sum(taken), 4)
+
+
+class TestRateLimitedBackend(unittest.TestCase):
+    """Test cases for model calls that wait their turn in the shared limiter"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.config = Config(BACKEND='fake', FAKE_LATENCY='fixed:0', FAKE_ERROR_RATE=0.0,
+                             CACHE_DIR=self.temp_dir.name, RATE_LIMIT_RPM=600,
+                             RATE_LIMIT_TPM=100000, RATE_LIMIT_MAX_WAIT=0.0, MAX_RETRIES=0)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_create_backend(self):
+        """Test that the limiter sits inside the retries and only with a budget"""
+        backend = create_backend(self.config)
+        self.assertIsInstance(backend.backend, RateLimitedBackend)
+        self.assertIsInstance(backend.backend.backend, FakeBackend)
+        self.assertNotIsInstance(create_backend(Config(BACKEND='fake')).backend,
+                                 RateLimitedBackend)
+
+    def test_calls_are_counted(self):
+        """Test that prompts and answers are charged, streaming and asyncio included"""
+        backend = create_backend(self.config).backend
+        backend.generate(_prompt("list files"))
+        self.assertEqual(''.join(backend.stream(_prompt("list files"))),
+                         fake_answer("list files"))
+        asyncio.run(backend.agenerate(_prompt("list files")))
+
+        status, = backend.limiter.status()
+        self.assertEqual(status['scope'], 'fake:' + self.config.MODEL_NAME)
+        self.assertEqual(status['requests'], 3)
+        self.assertGreater(status['tokens'], 3 * len(fake_answer("list files")) // 4)
+        self.assertEqual(backend.stats()['calls'], 3)
+
+    def test_provider_rate_limit_pauses_everyone(self):
+        """Test that a 429 pauses the shared queue for its Retry-After"""
+        backend = create_backend(self.config).backend
+        backend.backend.inject_faults(1, status=429, retry_after=30)
+
+        self.assertRaises(BackendError, backend.generate, _prompt("list files"))
+        with self.assertRaises(QuotaExhaustedError) as caught:
+            create_backend(self.config).generate(_prompt("list files"))
+        self.assertGreater(caught.exception.retry_after, 29)
+        self.assertEqual(backend.backend.calls, 1)
+        self.assertEqual(backend.stats()['throttled'], 1)
+
+
+class _ChatHandler(BaseHTTPRequestHandler):
+    """Servidor chat/completions mínimo: responde según la primera palabra del mensaje"""
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """Atiende /v1/chat/completions"""
+        payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.requests.append((self.path, dict(self.headers), payload))
+        content = payload['messages'][0]['content']
+        if content.startswith('fail'):
+            self.send_error(503, 'Overloaded')
+            return
+        finish_reason = 'content_filter' if content.startswith('blocked') else 'stop'
+        if content.startswith('malformed'):
+            body = b'{"choices": []}'
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        self.send_response(200)
+        if payload['stream']:
+            self.send_header('Content-Type', 'text/event-stream')
+            self.end_headers()
+            for piece in ('COMMAND: ls', ' -la\n', 'EXPLANATION: List\n'):
+                event = {'choices': [{'delta': {'content': piece}, 'finish_reason': None}]}
+                self.wfile.write(f'data: {json.dumps(event)}\n\n'.encode('utf-8'))
+            event = {'choices': [{'delta': {}, 'finish_reason': finish_reason}]}
+            self.wfile.write(f'data: {json.dumps(event)}\n\ndata: [DONE]\n\n'.encode('utf-8'))
+            return
+        body = json.dumps({'choices': [{'message': {'content': 'COMMAND: ls -la'},
+                                        'finish_reason': finish_reason}]}).encode('utf-8')
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class TestOpenAICompatBackend(unittest.TestCase):
+    """Test cases for the OpenAI-compatible backend against a local server"""
+
+    def setUp(self):
+        """Start a local chat/completions server"""
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _ChatHandler)
+        self.server.requests = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        base_url = f'http://127.0.0.1:{self.server.server_address[1]}/v1'
+        self.backend = OpenAICompatBackend(Config(OPENAI_BASE_URL=base_url,
+                                                  OPENAI_API_KEY='secret', MODEL_NAME='local'))
+
+    def tearDown(self):
+        """Stop the server"""
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_generate(self):
+        """Test a complete answer and the request sent"""
+        response = self.backend.generate('list files', schema=RESPONSE_SCHEMA)
+
+        self.assertEqual(response.text, 'COMMAND: ls -la')
+        self.assertIsNone(response.blocked)
+        path, headers, payload = self.server.requests[0]
+        self.assertEqual(path, '/v1/chat/completions')
+        self.assertEqual(headers['Authorization'], 'Bearer secret')
+        self.assertEqual(payload['model'], 'local')
+        self.assertEqual(payload['response_format']['json_schema']['schema'], RESPONSE_SCHEMA)
+
+    def test_stream(self):
+        """Test that server-sent events are read as text chunks"""
+        stream = self.backend.stream('list files')
+
+        self.assertEqual(''.join(stream), 'COMMAND: ls -la\nEXPLANATION: List\n')
+        self.assertIsNone(stream.blocked)
+        self.assertNotIn('response_format', self.server.requests[0][2])
+
+    def test_blocked(self):
+        """Test that a content filter stop is reported as blocked"""
+        self.assertEqual(self.backend.generate('blocked').blocked, BLOCKED_SAFETY)
+        stream = self.backend.stream('blocked')
+        list(stream)
+        self.assertEqual(stream.blocked, BLOCKED_SAFETY)
+
+    def test_http_error(self):
+        """Test that HTTP errors raise BackendError with the status"""
+        with self.assertRaises(BackendError) as raised:
+            self.backend.generate('fail')
+        self.assertEqual(raised.exception.status, 503)
+
+    def test_connection_error(self):
+        """Test that an unreachable server raises BackendError without status"""
+        self.backend.config.OPENAI_BASE_URL = 'http://127.0.0.1:1/v1'
+
+        with self.assertRaises(BackendConnectionError) as raised:
+            self.backend.generate('list files')
+        self.assertIsNone(raised.exception.status)
+        self.assertTrue(is_retryable(raised.exception))
+
+    def test_malformed_answer_is_not_retried(self):
+        """Test that an invalid 200 answer fails at once and does not trip the circuit"""
+        config = self.backend.config.replace(MAX_RETRIES=3, RETRY_BASE_DELAY_MS=0.0,
+                                             BREAKER_THRESHOLD=1)
+        backend = ResilientBackend(config, OpenAICompatBackend(config))
+
+        with self.assertRaises(BackendError) as raised:
+            backend.generate('malformed')
+
+        self.assertFalse(is_unavailable(raised.exception))
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(backend.breaker.state, 'closed')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for batch module
+"""
+
+import io
+import json
+import os
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+from cmd_helper.batch import BatchRunner, parse_requests, write_jsonl
+from cmd_helper.i18n import current_language
+
+
+class TestParseRequests(unittest.TestCase):
+    """Test cases for parse_requests"""
+
+    def test_plain_and_json_lines(self):
+        """Test text lines, JSON objects, comments and blank lines"""
+        lines = [
+            'list files\n',
+            '\n',
+            '# comment\n',
+            '{"request": "show disk usage", "id": "disk", "cwd": "logs"}\n',
+            '{not json}\n'
+        ]
+
+        requests = parse_requests(lines, default_cwd='/srv/app')
+
+        self.assertEqual(requests, [
+            {'request': 'list files', 'cwd': '/srv/app', 'id': None},
+            {'request': 'show disk usage', 'cwd': '/srv/app/logs', 'id': 'disk'},
+            {'request': '{not json}', 'cwd': '/srv/app', 'id': None}
+        ])
+
+    def test_language(self):
+        """Test that a JSON line can choose its language"""
+        requests = parse_requests(['{"request": "list files", "lang": "en"}', 'listar'])
+
+        self.assertEqual(requests[0]['lang'], 'en')
+        self.assertNotIn('lang', requests[1])
+
+    def test_default_cwd(self):
+        """Test that the current directory is used by default"""
+        self.assertEqual(parse_requests(['list files'])[0]['cwd'], os.getcwd())
+
+
+class TestBatchRunner(unittest.TestCase):
+    """Test cases for BatchRunner"""
+
+    def setUp(self):
+        """Set up a fake server whose answers take different times"""
+        self.server = MagicMock()
+        self.server.context_analyzer.get_current_context.side_effect = (
+            lambda cwd=None: {'pwd': cwd}
+        )
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+        def generate(request, refresh_cache=False, cwd=None, context=None):
+            with self.lock:
+                self.active += 1
+                self.max_active = max(self.max_active, self.active)
+            # Las primeras peticiones terminan las últimas
+            time.sleep(0.05 if request.endswith('0') else 0.01)
+            with self.lock:
+                self.active -= 1
+            if request == 'fail':
+                raise RuntimeError('boom')
+            return {'command': f'echo {request} in {context["pwd"]}', 'explanation': 'Echo',
+                    'is_dangerous': False, 'source': 'cache' if request == 'cached' else 'model'}
+
+        self.server.generate_command.side_effect = generate
+        self.handler = MagicMock()
+        self.handler.is_command_dangerous.return_value = False
+
+    def _requests(self, names, cwd='/tmp'):
+        return [{'request': name, 'cwd': cwd, 'id': None} for name in names]
+
+    def test_results_in_input_order(self):
+        """Test that ordered output follows the input even if later requests finish first"""
+        runner = BatchRunner(self.server, self.handler, workers=4)
+
+        records = list(runner.run(self._requests(['r0', 'r1', 'r2', 'r3'])))
+
+        self.assertEqual([record['request'] for record in records], ['r0', 'r1', 'r2', 'r3'])
+        self.assertEqual([record['index'] for record in records], [0, 1, 2, 3])
+
+    def test_unordered_results(self):
+        """Test that unordered output yields results as they complete"""
+        runner = BatchRunner(self.server, self.handler, workers=4)
+
+        records = list(runner.run(self._requests(['r0', 'r1']), ordered=False))
+
+        self.assertEqual([record['request'] for record in records], ['r1', 'r0'])
+
+    def test_bounded_concurrency(self):
+        """Test that requests run in parallel up to the worker limit"""
+        runner = BatchRunner(self.server, self.handler, workers=3)
+
+        start = time.perf_counter()
+        list(runner.run(self._requests([f'r{i}0' for i in range(9)])))
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(self.max_active, 3)
+        self.assertLess(elapsed, 9 * 0.05)
+
+    def test_context_shared_per_directory(self):
+        """Test that the context is collected once for each directory"""
+        runner = BatchRunner(self.server, self.handler)
+        requests = self._requests(['a', 'b'], cwd='/one') + self._requests(['c'], cwd='/two')
+
+        records = list(runner.run(requests))
+
+        self.assertEqual(self.server.context_analyzer.get_current_context.call_count, 2)
+        self.assertEqual([record['command'] for record in records],
+                         ['echo a in /one', 'echo b in /one', 'echo c in /two'])
+
+    def test_mixed_languages(self):
+        """Test that concurrent requests are generated in their own language"""
+        languages = {}
+        generate = self.server.generate_command.side_effect
+
+        def generate_in_language(request, **kwargs):
+            languages[request] = current_language()
+            return generate(request, **kwargs)
+
+        self.server.generate_command.side_effect = generate_in_language
+        runner = BatchRunner(self.server, self.handler, workers=4)
+        requests = self._requests(['e0', 's0', 'e1', 's1'])
+        for item in requests:
+            item['lang'] = 'en' if item['request'].startswith('e') else 'es'
+
+        list(runner.run(requests))
+
+        self.assertEqual(languages, {'e0': 'en', 's0': 'es', 'e1': 'en', 's1': 'es'})
+
+    def test_record_fields(self):
+        """Test danger flag, cache hit, latency, id and error records"""
+        self.handler.is_command_dangerous.side_effect = lambda command: 'cached' in command
+        runner = BatchRunner(self.server, self.handler)
+        requests = self._requests(['cached', 'fail'])
+        requests[0]['id'] = 'first'
+
+        cached, failed = runner.run(requests)
+
+        self.assertEqual(cached['id'], 'first')
+        self.assertTrue(cached['cache_hit'])
+        self.assertTrue(cached['is_dangerous'])
+        self.assertGreater(cached['latency_ms'], 0)
+        self.assertNotIn('id', failed)
+        self.assertIsNone(failed['command'])
+        self.assertEqual(failed['explanation'], 'boom')
+        self.assertFalse(failed['cache_hit'])
+
+
+class TestWriteJsonl(unittest.TestCase):
+    """Test cases for write_jsonl"""
+
+    def test_write_and_count(self):
+        """Test JSONL output and summary counts"""
+        records = [
+            {'request': 'a', 'command': 'ls', 'cache_hit': True},
+            {'request': 'ñ', 'command': None, 'cache_hit': False}
+        ]
+        output = io.StringIO()
+
+        counts = write_jsonl(iter(records), output)
+
+        lines = output.getvalue().splitlines()
+        self.assertEqual([json.loads(line) for line in lines], records)
+        self.assertIn('ñ', lines[1])
+        self.assertEqual(counts, {'total': 2, 'cache_hits': 1, 'failed': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for cache module
+"""
+
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+from cmd_helper.cache import ResponseCache
+
+
+class TestResponseCache(unittest.TestCase):
+    """Test cases for ResponseCache class"""
+
+    def setUp(self):
+        """Set up a cache in a temporary directory"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = ResponseCache(cache_dir=self.temp_dir.name, ttl=3600, max_entries=3)
+        self.context = {
+            'pwd': '/home/user/project',
+            'platform': {'system': 'Linux', 'release': '6.0', 'shell': '/bin/bash'},
+            'files': [{'name': 'main.py', 'type': 'file', 'size': 10}],
+            'git_info': {'is_git_repo': False}
+        }
+        self.result = {'command': 'ls -la', 'explanation': 'List files', 'is_dangerous': False}
+
+    def tearDown(self):
+        """Remove the temporary directory"""
+        self.temp_dir.cleanup()
+
+    def _key(self, request='list files', language='en', model='gemini-2.5-flash'):
+        return self.cache.make_key(request, language, model, self.context)
+
+    def test_normalize_request(self):
+        """Test request normalization"""
+        self.assertEqual(ResponseCache.normalize_request('  List   FILES?  '), 'list files')
+        self.assertEqual(ResponseCache.normalize_request('¿Lista archivos!'), '¿lista archivos')
+
+    def test_key_ignores_formatting_differences(self):
+        """Test that equivalent requests share the same key"""
+        self.assertEqual(self._key('list files'), self._key('  List  files. '))
+
+    def test_key_depends_on_language_model_and_context(self):
+        """Test that language, model and context are part of the key"""
+        base = self._key()
+        self.assertNotEqual(base, self._key(language='es'))
+        self.assertNotEqual(base, self._key(model='other-model'))
+
+        self.context['pwd'] = '/tmp'
+        self.assertNotEqual(base, self._key())
+
+    def test_fingerprint_ignores_volatile_context(self):
+        """Test that git state and file sizes do not change the fingerprint"""
+        before = ResponseCache.context_fingerprint(self.context)
+
+        self.context['git_info'] = {'is_git_repo': True, 'branch': 'main'}
+        self.context['files'][0]['size'] = 999
+
+        self.assertEqual(before, ResponseCache.context_fingerprint(self.context))
+
+    def test_set_and_get(self):
+        """Test storing and retrieving a response"""
+        key = self._key()
+        self.assertIsNone(self.cache.get(key))
+
+        self.cache.set(key, 'list files', self.result)
+
+        self.assertEqual(self.cache.get(key), self.result)
+
+    def test_full_result_is_stored(self):
+        """Test that JSON mode fields are kept and timings and origin are not"""
+        key = self._key()
+        result = dict(self.result, danger_level='none', alternatives=['ls -l'],
+                      source='model', timings={'total_ms': 1.0}, prompt_stats={'total': 10})
+
+        self.cache.set(key, 'list files', result)
+
+        self.assertEqual(self.cache.get(key),
+                         dict(self.result, danger_level='none', alternatives=['ls -l']))
+
+    def test_expired_entries_are_not_returned(self):
+        """Test TTL expiration"""
+        key = self._key()
+        self.cache.set(key, 'list files', self.result)
+
+        with patch('cmd_helper.cache.time.time', return_value=10 ** 12):
+            self.assertIsNone(self.cache.get(key))
+
+    def test_find_request_in_any_context(self):
+        """Test the fallback lookup by request regardless of context"""
+        self.cache.set(self._key(), 'List files', self.result)
+        self.assertEqual(self.cache.find_request('list files.'), self.result)
+        self.assertIsNone(self.cache.find_request('list dirs'))
+
+        with patch('cmd_helper.cache.time.time', return_value=10 ** 12):
+            self.assertIsNone(self.cache.find_request('list files'))
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted"""
+        keys = [self._key(f'request {i}') for i in range(3)]
+        for index, key in enumerate(keys):
+            with patch('cmd_helper.cache.time.time', return_value=1_000_000 + index):
+                self.cache.set(key, f'request {index}', self.result)
+
+        # Acceder a la primera entrada la convierte en la más reciente
+        with patch('cmd_helper.cache.time.time', return_value=1_000_010):
+            self.assertIsNotNone(self.cache.get(keys[0]))
+            self.cache.set(self._key('request 3'), 'request 3', self.result)
+
+            self.assertIsNotNone(self.cache.get(keys[0]))
+            self.assertIsNone(self.cache.get(keys[1]))
+            self.assertEqual(self.cache.stats()['entries'], 3)
+
+    def test_stats_hit_rate(self):
+        """Test hit/miss accounting"""
+        key = self._key()
+        self.cache.get(key)
+        self.cache.set(key, 'list files', self.result)
+        self.cache.get(key)
+        self.cache.get(key)
+
+        stats = self.cache.stats()
+        self.assertEqual(stats['hits'], 2)
+        self.assertEqual(stats['misses'], 1)
+        self.assertAlmostEqual(stats['hit_rate'], 2 / 3)
+
+        # Un acierto por similitud convierte un fallo exacto en acierto
+        self.cache.record('similar_hits')
+        self.assertAlmostEqual(self.cache.stats()['hit_rate'], 1.0)
+
+    def test_clear(self):
+        """Test clearing the cache"""
+        key = self._key()
+        self.cache.set(key, 'list files', self.result)
+
+        self.cache.clear()
+
+        self.assertEqual(self.cache.stats(), {'entries': 0, 'hits': 0, 'similar_hits': 0,
+                                              'misses': 0, 'hit_rate': 0.0})
+
+    def test_concurrent_writers(self):
+        """Test that concurrent writers (like several terminals) do not corrupt the cache"""
+        cache = ResponseCache(cache_dir=self.temp_dir.name, ttl=3600, max_entries=1000)
+        errors = []
+
+        def writer(worker):
+            try:
+                other = ResponseCache(cache_dir=self.temp_dir.name, ttl=3600, max_entries=1000)
+                for index in range(20):
+                    key = self._key(f'worker {worker} request {index}')
+                    other.set(key, 'request', self.result)
+            except Exception as e:  # pragma: no cover - reported below
+                errors.append(e)
+
+        threads = [threading.Thread(target=writer, args=(worker,)) for worker in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(cache.stats()['entries'], 80)
+
+
+if __name__ == '__main__':
+    unittest.main()
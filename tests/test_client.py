@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for client module
+"""
+
+import os
+import socket
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+from cmd_helper import client
+
+
+class TestSocketPath(unittest.TestCase):
+    """Test cases for default_socket_path"""
+
+    def test_explicit_socket(self):
+        """Test CMD_HELPER_SOCKET"""
+        with patch.dict(os.environ, {'CMD_HELPER_SOCKET': '/tmp/custom.sock'}):
+            self.assertEqual(client.default_socket_path(), Path('/tmp/custom.sock'))
+
+    def test_runtime_dir(self):
+        """Test $XDG_RUNTIME_DIR"""
+        with patch.dict(os.environ, {'XDG_RUNTIME_DIR': '/run/user/1000'}, clear=True):
+            self.assertEqual(client.default_socket_path(),
+                             Path('/run/user/1000/cmd-helper.sock'))
+
+
+class TestClient(unittest.TestCase):
+    """Test cases for the cmdhc entry point"""
+
+    def setUp(self):
+        """Point the client at a socket that does not exist"""
+        patcher = patch.dict(os.environ, {'CMD_HELPER_SOCKET': '/nonexistent/cmdh.sock'})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch('cmd_helper.client._run_in_process', return_value=0)
+    @patch('cmd_helper.client.ensure_daemon', return_value=False)
+    def test_fallback_when_daemon_unavailable(self, mock_ensure, mock_in_process):
+        """Test that requests run in-process if the daemon cannot be started"""
+        self.assertEqual(client.main(['list files']), 0)
+
+        mock_ensure.assert_called_once()
+        mock_in_process.assert_called_once()
+
+    @patch('cmd_helper.client._run_in_process', return_value=0)
+    @patch('cmd_helper.client.ensure_daemon')
+    def test_no_daemon_flag(self, mock_ensure, mock_in_process):
+        """Test --no-daemon"""
+        client.main(['--no-daemon', 'list files'])
+
+        mock_ensure.assert_not_called()
+        mock_in_process.assert_called_once()
+
+    @patch('builtins.input', return_value='y')
+    @patch('cmd_helper.client.subprocess.run')
+    @patch('cmd_helper.client.send_message')
+    @patch('cmd_helper.client.ensure_daemon', return_value=True)
+    def test_executes_confirmed_command(self, _, mock_send, mock_run, mock_input):
+        """Test that the daemon's answer is confirmed and executed locally"""
+        mock_send.return_value = {'ok': True, 'result': {
+            'command': 'ls -la', 'explanation': 'List files', 'source': 'model',
+            'requires_confirmation': False, 'timings': {}
+        }}
+        mock_run.return_value.returncode = 0
+
+        self.assertEqual(client.main(['--lang', 'en', 'list files']), 0)
+
+        message = mock_send.call_args[0][0]
+        self.assertEqual(message['request'], 'list files')
+        self.assertEqual(message['lang'], 'en')
+        self.assertEqual(message['cwd'], os.getcwd())
+        mock_run.assert_called_once_with('ls -la', shell=True, check=False)
+        mock_input.assert_called_once()
+
+    @patch('builtins.input', return_value='y')
+    @patch('cmd_helper.client.subprocess.run')
+    @patch('cmd_helper.client.send_message')
+    @patch('cmd_helper.client.ensure_daemon', return_value=True)
+    def test_dangerous_command_needs_strong_confirmation(self, _, mock_send, mock_run, __):
+        """Test that dangerous commands require typing YES"""
+        mock_send.return_value = {'ok': True, 'result': {
+            'command': 'rm -rf build', 'explanation': '', 'source': 'model',
+            'requires_confirmation': True, 'timings': {}
+        }}
+
+        client.main(['--lang', 'en', 'delete build'])
+
+        mock_run.assert_not_called()
+
+    @patch('cmd_helper.client._run_in_process', return_value=0)
+    @patch('cmd_helper.client.send_message', side_effect=ConnectionRefusedError)
+    @patch('cmd_helper.client.ensure_daemon', return_value=True)
+    def test_fallback_when_daemon_dies(self, _, __, mock_in_process):
+        """Test the fallback when the daemon disappears mid-request"""
+        client.main(['list files'])
+
+        mock_in_process.assert_called_once()
+
+    @patch('cmd_helper.client._run_in_process', return_value=0)
+    @patch('cmd_helper.client.send_message', side_effect=socket.timeout)
+    @patch('cmd_helper.client.ensure_daemon', return_value={'ok': True, 'reply_timeout': 42.5})
+    def test_fallback_when_daemon_hangs(self, _, mock_send, mock_in_process):
+        """Test that a daemon that stops answering is waited for a finite time"""
+        client.main(['list files'])
+
+        self.assertEqual(mock_send.call_args.kwargs['timeout'], 42.5)
+        mock_in_process.assert_called_once()
+
+    @patch('cmd_helper.client.send_message')
+    @patch('cmd_helper.client.ensure_daemon', return_value=True)
+    def test_daemon_error(self, _, mock_send):
+        """Test that daemon errors are reported"""
+        mock_send.return_value = {'ok': False, 'error': 'boom'}
+
+        self.assertEqual(client.main(['list files']), 1)
+
+
+class TestClientStartup(unittest.TestCase):
+    """The thin client must not import the model SDK or third-party packages"""
+
+    def test_client_imports_only_stdlib(self):
+        """Test that importing the client keeps third-party modules unloaded"""
+        # Se compara con los módulos previos: algunos .pth cargan el espacio de nombres google
+        code = (
+            "import sys; before = set(sys.modules); import cmd_helper.client; "
+            "print(any(m.split('.')[0] in ('google', 'click', 'colorama', 'dotenv') "
+            "for m in set(sys.modules) - before))"
+        )
+        output = subprocess.run([sys.executable, '-c', code], capture_output=True,
+                                text=True, check=True).stdout
+
+        self.assertEqual(output.strip(), 'False')
+
+
+if __name__ == '__main__':
+    unittest.main()
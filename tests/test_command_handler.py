@@ -3,9 +3,11 @@
 Tests for command_handler module
 """
 
+import os
+import sys
+import time
 import unittest
-import subprocess
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch
 from cmd_helper.command_handler import CommandHandler
 
 
@@ -65,6 +67,14 @@ class TestCommandHandler(unittest.TestCase):
             with self.subTest(command=cmd):
                 self.assertTrue(self.handler.is_command_dangerous(cmd))
 
+    def test_is_command_dangerous_shell_aware(self):
+        """Flags are matched in any order and inside substitutions; host names are not commands"""
+        self.assertTrue(self.handler.is_command_dangerous("rm -fr build"))
+        self.assertTrue(self.handler.is_command_dangerous("rm --recursive --force build"))
+        self.assertTrue(self.handler.is_command_dangerous("echo $(rm -rf /)"))
+        self.assertFalse(self.handler.is_command_dangerous("sudo systemctl -H rm-01 restart nginx"))
+        self.assertEqual(self.handler.danger_reason("sudo rm x"), 'sudo-rm')
+
     @patch('builtins.input', return_value='y')
     def test_confirm_execution_yes(self, mock_input):
         """Test command confirmation with yes response"""
@@ -89,71 +99,105 @@ class TestCommandHandler(unittest.TestCase):
         result = self.handler.confirm_execution("rm -rf /tmp/test", "Delete files")
         self.assertFalse(result)
 
-    @patch('subprocess.run')
-    def test_execute_command_success(self, mock_run):
+    @patch('builtins.print')
+    @patch('builtins.input', return_value='y')
+    def test_confirm_execution_command_already_shown(self, mock_input, mock_print):
+        """Test that show_command=False does not print the command again"""
+        self.handler.confirm_execution("ls -la", "List files", show_command=False)
+
+        output = " ".join(str(call.args[0]) for call in mock_print.call_args_list)
+        self.assertNotIn("ls -la", output)
+        self.assertIn("List files", output)
+
+    def _python(self, code):
+        """Comando de shell que ejecuta código Python"""
+        return f'"{sys.executable}" -c "{code}"'
+
+    @patch('builtins.print')
+    def test_execute_command_success(self, _):
         """Test successful command execution"""
-        # Mock successful subprocess result
-        mock_result = MagicMock()
-        mock_result.stdout = "file1.txt\nfile2.txt"
-        mock_result.stderr = ""
-        mock_result.returncode = 0
-        mock_run.return_value = mock_result
-
-        result = self.handler.execute_command("ls")
-        
+        result = self.handler.execute_command(
+            self._python("print('file1.txt'); print('file2.txt')")
+        )
+
         self.assertIsNotNone(result)
-        self.assertEqual(result['stdout'], "file1.txt\nfile2.txt")
+        self.assertEqual(result['stdout'].splitlines(), ["file1.txt", "file2.txt"])
         self.assertEqual(result['return_code'], 0)
         self.assertTrue(result['success'])
+        self.assertFalse(result['truncated'])
 
-    @patch('subprocess.run')
-    def test_execute_command_with_error(self, mock_run):
+    @patch('builtins.print')
+    def test_execute_command_with_error(self, _):
         """Test command execution with error"""
-        # Mock failed subprocess result
-        mock_result = MagicMock()
-        mock_result.stdout = ""
-        mock_result.stderr = "Command not found"
-        mock_result.returncode = 1
-        mock_run.return_value = mock_result
-
-        result = self.handler.execute_command("invalid_command")
-        
+        result = self.handler.execute_command(
+            self._python("import sys; sys.stderr.write('Command not found'); sys.exit(1)")
+        )
+
         self.assertIsNotNone(result)
         self.assertEqual(result['stderr'], "Command not found")
         self.assertEqual(result['return_code'], 1)
         self.assertFalse(result['success'])
 
-    @patch('subprocess.run')
-    def test_execute_command_timeout(self, mock_run):
+    @patch('builtins.print')
+    def test_execute_command_timeout(self, _):
         """Test command execution timeout"""
-        mock_run.side_effect = subprocess.TimeoutExpired(
-            cmd="sleep 60", timeout=30
-        )
+        start = time.perf_counter()
+        result = self.handler.execute_command(self._python("import time; time.sleep(60)"),
+                                              timeout=0.3)
 
-        result = self.handler.execute_command("sleep 60")
-        
         self.assertIsNotNone(result)
         self.assertIn('timeout', result.get('error', '').lower())
+        self.assertIsNone(result['return_code'])
+        self.assertLess(time.perf_counter() - start, 5)
+
+    @patch('builtins.print')
+    def test_execute_command_unicode_error_handling(self, _):
+        """Test command execution with invalid UTF-8 output"""
+        result = self.handler.execute_command(
+            self._python("import sys; sys.stdout.buffer.write(b'Valid output \\xff\\xfe end')")
+        )
 
-    @patch('subprocess.run')
-    def test_execute_command_unicode_error_handling(self, mock_run):
-        """Test command execution with unicode error handling"""
-        # Mock subprocess result with encoding issues
-        mock_result = MagicMock()
-        mock_result.stdout = "Valid output with some � replaced chars"
-        mock_result.stderr = ""
-        mock_result.returncode = 0
-        mock_run.return_value = mock_result
-
-        result = self.handler.execute_command("head /opt/binary_file")
-        
         self.assertIsNotNone(result)
         self.assertIn("Valid output", result['stdout'])
+        self.assertIn("\ufffd", result['stdout'])
 
-        result = self.handler.execute_command("head /opt/binary_file")
-        
-        self.assertIsNotNone(result)
-        self.assertIn("Valid output", result['stdout'])
+    @patch('builtins.print')
+    def test_execute_command_bounded_output(self, _):
+        """Test that only the head and tail of a large output are kept"""
+        self.handler.config.OUTPUT_HEAD_BYTES = 100
+        self.handler.config.OUTPUT_TAIL_BYTES = 100
+
+        result = self.handler.execute_command(
+            self._python("import sys; sys.stdout.write('a' * 100 + 'b' * 100000 + 'c' * 100)")
+        )
+
+        self.assertTrue(result['truncated'])
+        self.assertTrue(result['stdout'].startswith('a' * 100))
+        self.assertTrue(result['stdout'].endswith('c' * 100))
+        self.assertIn('100000', result['stdout'])
+        self.assertLess(len(result['stdout']), 400)
+
+    @patch('builtins.print')
+    def test_execute_command_spool_output(self, _):
+        """Test that the full output can be saved to a temporary file"""
+        self.handler.config.OUTPUT_HEAD_BYTES = 10
+        self.handler.config.OUTPUT_TAIL_BYTES = 10
+
+        result = self.handler.execute_command(self._python("print('x' * 5000)"),
+                                              spool_output=True)
+
+        self.addCleanup(os.unlink, result['output_file'])
+        with open(result['output_file'], encoding='utf-8') as output:
+            self.assertEqual(output.read().strip(), 'x' * 5000)
+
+    @patch('builtins.print')
+    def test_execute_command_missing_shell(self, _):
+        """Test that errors starting the process are reported"""
+        with patch('cmd_helper.execution.subprocess.Popen', side_effect=OSError("no shell")):
+            result = self.handler.execute_command("ls")
+
+        self.assertFalse(result['success'])
+        self.assertEqual(result['error'], "no shell")
 
     def test_dangerous_patterns_coverage(self):
         """Test coverage of dangerous command patterns"""
@@ -6,6 +6,9 @@ Tests for config module
 import unittest
 import os
 import importlib
+import tempfile
+import warnings
+from pathlib import Path
 from unittest.mock import patch, mock_open
 from cmd_helper import config
 
@@ -17,6 +20,10 @@ class TestConfig(unittest.TestCase):
         """Set up test fixtures"""
         self.config = config.Config()
 
+    def tearDown(self):
+        """Forget config files loaded by a test"""
+        importlib.reload(config)
+
     def test_config_initialization(self):
         """Test basic config initialization"""
         self.assertIsNotNone(self.config)
@@ -62,13 +69,9 @@ class TestConfig(unittest.TestCase):
         self.assertEqual(test_config.LANGUAGE, 'en')
 
     @patch.dict(os.environ, {}, clear=True)
-    @patch('cmd_helper.config.load_dotenv')
     @patch('cmd_helper.config.Path.exists', return_value=False)
-    def test_missing_api_key_handled_gracefully(self, mock_exists, mock_load_dotenv):
+    def test_missing_api_key_handled_gracefully(self, mock_exists):
         """Test that missing API key is handled gracefully"""
-        # Mock to prevent any dotenv loading
-        mock_load_dotenv.return_value = None
-        
         importlib.reload(config)
         test_config = config.Config()
         # Should be None when not set
@@ -81,6 +84,105 @@ class TestConfig(unittest.TestCase):
         test_config = config.Config()
         self.assertEqual(test_config.GEMINI_API_KEY, 'valid_key')
 
+    @patch.dict(os.environ, {}, clear=True)
+    def test_env_files_loaded_lazily(self):
+        """Test that .env files are only read when a setting is accessed"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            env_file = Path(temp_dir) / '.env'
+            env_file.write_text('GEMINI_API_KEY=file_api_key\n', encoding='utf-8')
+
+            with patch('cmd_helper.config.Path.cwd', return_value=Path(temp_dir)):
+                importlib.reload(config)
+                self.assertFalse(config._ENV_LOADED)
+
+                test_config = config.Config()
+                self.assertEqual(test_config.GEMINI_API_KEY, 'file_api_key')
+                self.assertTrue(config._ENV_LOADED)
+
+    @patch.dict(os.environ, {'CMD_HELPER_MAX_TOKENS': '500'}, clear=True)
+    def test_environment_overrides_file(self):
+        """Test that the environment wins over the config file, which is not exported"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            env_file = Path(temp_dir) / '.env'
+            env_file.write_text('CMD_HELPER_MAX_TOKENS=800\nCMD_HELPER_MODEL=gemini-pro\n',
+                                encoding='utf-8')
+
+            with patch('cmd_helper.config.Path.cwd', return_value=Path(temp_dir)):
+                importlib.reload(config)
+                test_config = config.Config()
+                self.assertEqual(test_config.MAX_TOKENS, 500)
+                self.assertEqual(test_config.MODEL_NAME, 'gemini-pro')
+                self.assertNotIn('CMD_HELPER_MODEL', os.environ)
+
+    @patch.dict(os.environ, {}, clear=True)
+    def test_reload_when_file_changes(self):
+        """Test that reload_config re-reads the config file only when it changed"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            env_file = Path(temp_dir) / '.env'
+            env_file.write_text('CMD_HELPER_TEMPERATURE=0.3\n', encoding='utf-8')
+
+            with patch('cmd_helper.config.Path.cwd', return_value=Path(temp_dir)):
+                importlib.reload(config)
+                test_config = config.get_config()
+                self.assertEqual(test_config.TEMPERATURE, 0.3)
+                self.assertFalse(config.reload_config())
+
+                env_file.write_text('CMD_HELPER_TEMPERATURE=0.7\n', encoding='utf-8')
+                os.utime(env_file, ns=(0, env_file.stat().st_mtime_ns + 10 ** 9))
+                self.assertTrue(config.env_files_changed())
+                self.assertTrue(config.reload_config())
+                self.assertEqual(test_config.TEMPERATURE, 0.7)
+
+                env_file.unlink()
+                self.assertTrue(config.reload_config())
+                self.assertEqual(test_config.TEMPERATURE, 0.1)
+
+    def test_invalid_values_use_defaults(self):
+        """Test that malformed or out-of-range values fall back to the default"""
+        invalid = {'CMD_HELPER_MAX_TOKENS': '0', 'CMD_HELPER_TEMPERATURE': 'hot',
+                   'CMD_HELPER_LANG': 'fr', 'CMD_HELPER_BATCH_WORKERS': '-2',
+                   'CMD_HELPER_CACHE_TTL': '-1'}
+        with patch.dict(os.environ, invalid), warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            self.assertEqual(self.config.MAX_TOKENS, 1000)
+            self.assertEqual(self.config.TEMPERATURE, 0.1)
+            self.assertEqual(self.config.LANGUAGE, 'auto')
+            self.assertEqual(self.config.BATCH_WORKERS, 8)
+            self.assertEqual(self.config.CACHE_TTL, 7 * 24 * 3600)
+
+    def test_invalid_values_warn_once(self):
+        """Test that a rejected value is reported once, naming the variable and the value"""
+        with patch.dict(os.environ, {'CMD_HELPER_MAX_RETRIES': 'many'}), \
+                patch.object(config, '_WARNED', set()), \
+                warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            for _ in range(3):
+                self.assertEqual(self.config.MAX_RETRIES, 2)
+
+        self.assertEqual(len(caught), 1)
+        self.assertIn("CMD_HELPER_MAX_RETRIES='many'", str(caught[0].message))
+
+    def test_typed_values(self):
+        """Test that valid values are converted to the setting type"""
+        with patch.dict(os.environ, {'CMD_HELPER_MAX_TOKENS': '2048',
+                                     'CMD_HELPER_TEMPERATURE': '0.5'}):
+            self.assertEqual(self.config.MAX_TOKENS, 2048)
+            self.assertEqual(self.config.TEMPERATURE, 0.5)
+
+    def test_instance_overrides(self):
+        """Test that settings can be fixed for one injected instance"""
+        test_config = config.Config(MODEL_NAME='test-model', CACHE_TTL=5)
+
+        self.assertEqual(test_config.MODEL_NAME, 'test-model')
+        self.assertEqual(test_config.CACHE_TTL, 5)
+        self.assertEqual(config.Config().MODEL_NAME, 'gemini-2.5-flash')
+        with self.assertRaises(TypeError):
+            config.Config(UNKNOWN_SETTING=1)
+
+    def test_shared_config(self):
+        """Test that get_config returns one shared instance"""
+        self.assertIs(config.get_config(), config.get_config())
+
     def test_temperature_bounds(self):
         """Test temperature is within valid bounds"""
         self.assertGreaterEqual(self.config.TEMPERATURE, 0.0)
@@ -3,11 +3,15 @@
 Tests for context_analyzer module
 """
 
+import asyncio
 import unittest
 import os
 import platform
+import tempfile
+import time
 from unittest.mock import patch, MagicMock
-from cmd_helper.context_analyzer import ContextAnalyzer
+from cmd_helper import context_analyzer
+from cmd_helper.context_analyzer import ContextAnalyzer, SessionContext, prefetch_context
 
 
 class TestContextAnalyzer(unittest.TestCase):
@@ -154,5 +158,207 @@ class TestContextAnalyzer(unittest.TestCase):
                 self.assertIn(file_info['type'], ['file', 'dir'])
 
 
+
+class TestConcurrentCollection(unittest.TestCase):
+    """Test cases for the concurrent context collectors"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.analyzer = ContextAnalyzer()
+        self.addCleanup(setattr, context_analyzer, '_PREFETCHED', None)
+
+    def _slow(self, value, delay=0.2):
+        def collector(*args, **kwargs):
+            time.sleep(delay)
+            return value
+        return collector
+
+    def test_collectors_run_concurrently(self):
+        """Test that slow collectors overlap instead of adding up"""
+        with patch.object(self.analyzer, '_get_directory_listing', self._slow([])), \
+                patch.object(self.analyzer, '_get_git_info', self._slow({'is_git_repo': False})), \
+                patch.object(self.analyzer, '_get_recent_commands', self._slow([])):
+            start = time.perf_counter()
+            self.analyzer.get_current_context()
+            elapsed = time.perf_counter() - start
+
+        self.assertLess(elapsed, 0.45)
+
+    def test_collector_timeout_uses_default(self):
+        """Test that a collector exceeding its timeout does not block the request"""
+        self.analyzer.COLLECTOR_TIMEOUTS = {'files': 0.05, 'git_info': 0.05,
+                                            'recent_commands': 0.05}
+        self.analyzer.GIT_INFO_MARGIN = 0
+        with patch.object(self.analyzer, '_get_git_info', self._slow({'branch': 'x'}, 1)), \
+                patch.dict(os.environ, {'CMD_HELPER_GIT_STATUS_TIMEOUT': '0'}):
+            start = time.perf_counter()
+            context = self.analyzer.get_current_context()
+            elapsed = time.perf_counter() - start
+
+        self.assertEqual(context['git_info'], {'is_git_repo': False})
+        self.assertLess(elapsed, 0.5)
+
+    def test_git_budget_follows_status_timeout(self):
+        """Test that a long git status budget extends the git collector timeout"""
+        with patch.dict(os.environ, {'CMD_HELPER_GIT_STATUS_TIMEOUT': '3'}):
+            timeouts = self.analyzer.collector_timeouts()
+
+        self.assertEqual(timeouts['git_info'], 3 + ContextAnalyzer.GIT_INFO_MARGIN)
+        self.assertEqual(timeouts['files'], ContextAnalyzer.COLLECTOR_TIMEOUTS['files'])
+
+    def test_late_git_status_keeps_branch(self):
+        """Test that the branch read from HEAD survives a git collector timeout"""
+        self.analyzer.COLLECTOR_TIMEOUTS = dict(ContextAnalyzer.COLLECTOR_TIMEOUTS, git_info=0.05)
+        self.analyzer.GIT_INFO_MARGIN = 0
+
+        def slow_git(cwd=None, head_info=None):
+            head_info.update({'branch': 'main', 'has_changes': None, 'is_git_repo': True})
+            time.sleep(1)
+            return dict(head_info, has_changes=True)
+
+        with patch.object(self.analyzer, '_get_git_info', slow_git), \
+                patch.dict(os.environ, {'CMD_HELPER_GIT_STATUS_TIMEOUT': '0'}):
+            context = self.analyzer.get_current_context()
+
+        self.assertEqual(context['git_info'],
+                         {'branch': 'main', 'has_changes': None, 'is_git_repo': True})
+
+    def test_collector_errors_use_default(self):
+        """Test that an unexpected collector error degrades to the default value"""
+        with patch.object(self.analyzer, '_get_recent_commands', side_effect=RuntimeError):
+            context = self.analyzer.get_current_context()
+
+        self.assertEqual(context['recent_commands'], [])
+
+    def test_context_key_order(self):
+        """Test that the prompt keeps a stable key order"""
+        context = self.analyzer.get_current_context()
+
+        self.assertEqual(list(context), ['pwd', 'platform', 'files', 'git_info', 'env_vars',
+                                         'recent_commands'])
+
+    def test_prefetched_context_is_reused(self):
+        """Test that get_current_context consumes a prefetched context"""
+        cwd = os.getcwd()
+        pending = prefetch_context()
+
+        with patch.object(ContextAnalyzer, 'start_collection') as mock_start:
+            context = ContextAnalyzer().get_current_context()
+
+        mock_start.assert_not_called()
+        self.assertEqual(context['pwd'], cwd)
+        self.assertIsNone(context_analyzer._PREFETCHED)
+        self.assertEqual(context, pending.result())
+
+    def test_prefetch_ignored_for_other_directory(self):
+        """Test that a prefetched context is not used for another directory"""
+        prefetch_context()
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            context = self.analyzer.get_current_context(cwd=temp_dir)
+
+        self.assertEqual(context['pwd'], temp_dir)
+
+    @patch('cmd_helper.context_analyzer.read_git_info', return_value={'is_git_repo': False})
+    def test_git_info_uses_status_budget(self, mock_read):
+        """Test that the git collector uses the configured git status budget"""
+        with patch.dict(os.environ, {'CMD_HELPER_GIT_STATUS_TIMEOUT': '0.25'}):
+            self.analyzer._get_git_info(cwd='/repo')
+
+        mock_read.assert_called_once_with('/repo', 0.25, None)
+
+
+class TestAsyncCollection(unittest.TestCase):
+    """Test cases for aget_current_context"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.analyzer = ContextAnalyzer()
+
+    def test_same_keys_as_sync_context(self):
+        """Test that the async context has the same sections in the same order"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            open(os.path.join(temp_dir, 'notes.txt'), 'w', encoding='utf-8').close()
+
+            context = asyncio.run(self.analyzer.aget_current_context(cwd=temp_dir, environ={}))
+
+        self.assertEqual(list(context), ['pwd', 'platform', 'files', 'git_info', 'env_vars',
+                                         'recent_commands'])
+        self.assertEqual(context['pwd'], temp_dir)
+        self.assertEqual([entry['name'] for entry in context['files']], ['notes.txt'])
+
+    def test_collector_timeout_uses_default(self):
+        """Test that a slow collector does not delay the async context"""
+        self.analyzer.COLLECTOR_TIMEOUTS = {'files': 0.05, 'git_info': 0.05,
+                                            'recent_commands': 0.05}
+        self.analyzer.GIT_INFO_MARGIN = 0
+
+        def slow_listing(*args, **kwargs):
+            time.sleep(0.5)
+            return [{'name': 'late'}]
+
+        with patch.object(self.analyzer, '_get_directory_listing', slow_listing):
+            start = time.perf_counter()
+            context = asyncio.run(self.analyzer.aget_current_context())
+            elapsed = time.perf_counter() - start
+
+        self.assertEqual(context['files'], [])
+        self.assertLess(elapsed, 0.4)
+
+    def test_collector_errors_use_default(self):
+        """Test that a failing async collector degrades to its default"""
+        with patch('cmd_helper.context_analyzer.aread_git_info', side_effect=RuntimeError):
+            context = asyncio.run(self.analyzer.aget_current_context())
+
+        self.assertEqual(context['git_info'], {'is_git_repo': False})
+
+
+class TestSessionContext(unittest.TestCase):
+    """Test cases for the interactive session context"""
+
+    def setUp(self):
+        """Set up a session context on a temporary directory"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.analyzer = ContextAnalyzer()
+        self.session = SessionContext(self.analyzer)
+
+    def test_unchanged_sections_are_reused(self):
+        """Test that the listing is reused while the directory does not change"""
+        with patch.object(self.analyzer, '_get_directory_listing',
+                          wraps=self.analyzer._get_directory_listing) as listing, \
+                patch.object(self.analyzer, '_get_git_info',
+                             return_value={'is_git_repo': False}) as git_info:
+            first = self.session.get(self.temp_dir.name)
+            second = self.session.get(self.temp_dir.name)
+
+        self.assertEqual(listing.call_count, 1)
+        self.assertEqual(git_info.call_count, 2)
+        self.assertEqual(first, second)
+
+    def test_changed_directory_is_collected_again(self):
+        """Test that new entries invalidate the cached listing"""
+        self.session.get(self.temp_dir.name)
+        path = os.path.join(self.temp_dir.name, 'new.txt')
+        open(path, 'w', encoding='utf-8').close()
+        # Fecha distinta aunque el sistema de archivos tenga poca resolución
+        os.utime(self.temp_dir.name, ns=(0, 0))
+
+        context = self.session.get(self.temp_dir.name)
+
+        self.assertEqual([entry['name'] for entry in context['files']], ['new.txt'])
+
+    def test_defaults_are_not_cached(self):
+        """Test that a collector that timed out is retried on the next request"""
+        with patch.object(self.analyzer, '_get_directory_listing', side_effect=RuntimeError):
+            self.assertEqual(self.session.get(self.temp_dir.name)['files'], [])
+        with patch.object(self.analyzer, '_get_directory_listing',
+                          return_value=[{'name': 'a'}]) as listing:
+            context = self.session.get(self.temp_dir.name)
+
+        listing.assert_called_once()
+        self.assertEqual(context['files'], [{'name': 'a'}])
+
+
 if __name__ == '__main__':
     unittest.main()
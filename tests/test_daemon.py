@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for daemon module
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch, MagicMock
+from cmd_helper.client import send_message
+from cmd_helper.daemon import CmdHelperDaemon
+from cmd_helper.i18n import current_language
+
+
+class TestCmdHelperDaemon(unittest.TestCase):
+    """Test cases for CmdHelperDaemon class"""
+
+    def setUp(self):
+        """Start a daemon on a temporary socket with a mocked MCPServer"""
+        # Las rutas de sockets Unix están limitadas a ~100 caracteres
+        self.temp_dir = tempfile.mkdtemp(prefix='cmdh')
+        self.socket_path = Path(self.temp_dir) / 'd.sock'
+
+        self.mcp_server = MagicMock()
+        self.mcp_server.generate_command.return_value = {
+            'command': 'rm -rf build', 'explanation': 'Remove build', 'is_dangerous': False,
+            'source': 'model', 'timings': {'total_ms': 1.0}
+        }
+        patchers = [
+            patch('cmd_helper.daemon.MCPServer', return_value=self.mcp_server),
+            patch.dict(os.environ, {'GEMINI_API_KEY': 'test-key'})
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.daemon = CmdHelperDaemon(self.socket_path, idle_timeout=0)
+        self.thread = threading.Thread(target=self.daemon.serve_forever, daemon=True)
+        self.thread.start()
+        self._wait_for_socket()
+
+    def tearDown(self):
+        """Stop the daemon and remove the socket directory"""
+        self.daemon.stop()
+        self.thread.join(timeout=5)
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _wait_for_socket(self):
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            try:
+                send_message({'op': 'ping'}, self.socket_path, timeout=1)
+                return
+            except OSError:
+                time.sleep(0.01)
+        self.fail('daemon did not start')
+
+    def test_ping(self):
+        """Test the ping operation"""
+        response = send_message({'op': 'ping'}, self.socket_path)
+
+        self.assertTrue(response['ok'])
+        self.assertEqual(response['pid'], os.getpid())
+
+    def test_reply_timeout(self):
+        """Test that ping reports a finite reply budget that covers retries and rate limits"""
+        budget = send_message({'op': 'ping'}, self.socket_path)['reply_timeout']
+        with patch.dict(os.environ, {'CMD_HELPER_RATE_LIMIT_RPM': '10'}):
+            limited = send_message({'op': 'ping'}, self.socket_path)['reply_timeout']
+
+        self.assertGreater(budget, self.daemon.config.RETRY_DEADLINE)
+        self.assertEqual(limited - budget, self.daemon.config.RATE_LIMIT_MAX_WAIT)
+
+    def test_socket_is_private(self):
+        """Test that only the owner can connect to the socket"""
+        self.assertEqual(self.socket_path.stat().st_mode & 0o077, 0)
+        # La máscara del proceso se restaura tras crear el socket
+        umask = os.umask(0o022)
+        os.umask(umask)
+        self.assertNotEqual(umask, 0o077)
+
+    def test_generate_uses_client_context(self):
+        """Test that requests run with the client's directory and environment"""
+        response = send_message({
+            'op': 'generate', 'request': 'delete build', 'lang': 'en', 'use_cache': True,
+            'refresh': False, 'cwd': '/tmp', 'env': {'HOME': '/home/user'}
+        }, self.socket_path)
+
+        self.assertTrue(response['ok'])
+        self.assertEqual(response['result']['command'], 'rm -rf build')
+        self.assertTrue(response['result']['requires_confirmation'])
+        self.mcp_server.generate_command.assert_called_with(
+            'delete build', refresh_cache=False, cwd='/tmp', environ={'HOME': '/home/user'}
+        )
+
+    def test_servers_are_reused(self):
+        """Test that one warm MCPServer serves requests in every language"""
+        send_message({'op': 'generate', 'request': 'list files', 'lang': 'en'}, self.socket_path)
+        send_message({'op': 'generate', 'request': 'listar', 'lang': 'es'}, self.socket_path)
+
+        self.assertEqual(self.mcp_server.generate_command.call_count, 2)
+        self.assertIs(self.daemon.get_server(), self.mcp_server)
+
+    def test_request_language(self):
+        """Test that each request is generated in its own language"""
+        languages = []
+        self.mcp_server.generate_command.side_effect = (
+            lambda *args, **kwargs: languages.append(current_language()) or {
+                'command': 'ls', 'explanation': '', 'is_dangerous': False
+            }
+        )
+        default = current_language()
+
+        for language in ('en', 'es', 'en'):
+            send_message({'op': 'generate', 'request': 'list files', 'lang': language},
+                         self.socket_path)
+
+        self.assertEqual(languages, ['en', 'es', 'en'])
+        self.assertEqual(current_language(), default)
+
+    def test_config_reload(self):
+        """Test that a changed config file rebuilds the warm servers before a request"""
+        message = {'op': 'generate', 'request': 'list files'}
+        send_message(message, self.socket_path)
+        self.assertEqual(len(self.daemon._servers), 1)
+
+        with patch('cmd_helper.daemon.reload_config', return_value=False) as mock_reload:
+            send_message(message, self.socket_path)
+        mock_reload.assert_called_once()
+        self.assertEqual(len(self.daemon._servers), 1)
+
+        with patch('cmd_helper.daemon.reload_config', return_value=True):
+            self.assertTrue(self.daemon.reload_if_changed())
+        self.assertEqual(self.daemon._servers, {})
+
+    def test_missing_api_key(self):
+        """Test that a missing API key is reported to the client"""
+        with patch.dict(os.environ, {'GEMINI_API_KEY': ''}):
+            response = send_message({'op': 'generate', 'request': 'list files'},
+                                    self.socket_path)
+
+        self.assertFalse(response['ok'])
+        self.assertIn('GEMINI_API_KEY', response['error'])
+
+    def test_invalid_and_unknown_messages(self):
+        """Test protocol errors"""
+        response = send_message({'op': 'unknown'}, self.socket_path)
+        self.assertFalse(response['ok'])
+        for message in ([], 'ping', None):
+            with self.subTest(message=message):
+                response = send_message(message, self.socket_path)
+                self.assertEqual(response, {'ok': False, 'error': 'Invalid request'})
+
+    def test_shutdown_removes_socket(self):
+        """Test that shutdown stops the daemon and removes its socket"""
+        response = send_message({'op': 'shutdown'}, self.socket_path)
+
+        self.assertTrue(response['ok'])
+        self.thread.join(timeout=5)
+        self.assertFalse(self.thread.is_alive())
+        self.assertFalse(self.socket_path.exists())
+
+    def test_second_daemon_does_not_steal_socket(self):
+        """Test that a live daemon's socket is not replaced"""
+        other = CmdHelperDaemon(self.socket_path, idle_timeout=0)
+
+        self.assertFalse(other.serve_forever())
+
+
+class TestDaemonIdleTimeout(unittest.TestCase):
+    """Test the idle shutdown and stale socket cleanup"""
+
+    def test_idle_timeout_and_stale_socket(self):
+        """Test that a stale socket is replaced and the daemon exits when idle"""
+        temp_dir = tempfile.mkdtemp(prefix='cmdh')
+        self.addCleanup(shutil.rmtree, temp_dir, True)
+        socket_path = Path(temp_dir) / 'd.sock'
+        socket_path.touch()  # Socket huérfano de un daemon que terminó mal
+
+        with patch('cmd_helper.daemon.MCPServer'):
+            daemon = CmdHelperDaemon(socket_path, idle_timeout=0.3)
+            start = time.monotonic()
+            self.assertTrue(daemon.serve_forever())
+
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertFalse(socket_path.exists())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for danger_rules module
+"""
+
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from cmd_helper.danger_rules import DangerRules, command_lines, get_danger_rules, load_rules
+
+# Conjunto etiquetado para medir precisión y exhaustividad: (comando, es peligroso)
+LABELED_COMMANDS = [
+    # Peligrosos
+    ("rm -rf /", True),
+    ("rm -fr build", True),
+    ("rm -Rf ~/projects", True),
+    ("rm --recursive --force node_modules", True),
+    ("rm -r -f dist", True),
+    ("rm -r /", True),
+    ("rm -r *", True),
+    ("sudo rm /etc/hosts", True),
+    ("sudo -u root rm -i file.txt", True),
+    ("/bin/rm -rf /var/log", True),
+    ("\\rm -rf tmp", True),
+    ("r\"m\" -rf tmp", True),
+    ("FOO=1 rm -rf cache", True),
+    ("env -i PATH=/bin rm -rf cache", True),
+    ("nohup rm -rf /data &", True),
+    ("timeout 10 rm -rf cache", True),
+    ("cd /tmp && rm -rf *", True),
+    ("make clean; rm -rf build", True),
+    ("false || rm -rf build", True),
+    ("(cd src && rm -rf gen)", True),
+    ("echo $(rm -rf /)", True),
+    ("echo \"$(rm -rf ~)\"", True),
+    ("echo `sudo rm key.pem`", True),
+    ("diff <(rm -rf a) b", True),
+    ("bash -c 'rm -rf /'", True),
+    ("sh -ec \"rm -rf $HOME\"", True),
+    ("su -c 'rm -rf /srv'", True),
+    ("eval rm -rf build", True),
+    ("find . -name '*.tmp' -exec rm -rf {} \\;", True),
+    ("find / -type d -execdir rm -rf {} +", True),
+    ("ls | xargs rm -rf", True),
+    ("git ls-files -z | xargs -0 -n 1 rm -rf", True),
+    ("chmod 777 /", True),
+    ("chmod -R 777 /var/www", True),
+    ("sudo chmod a+rwx secret.txt", True),
+    ("sudo chown -R nobody /", True),
+    ("chmod -R 755 /usr", True),
+    ("dd if=/dev/zero of=/dev/sda bs=1M", True),
+    ("sudo dd if=image.iso of=/dev/disk2", True),
+    ("mkfs /dev/sdb1", True),
+    ("sudo mkfs.ext4 /dev/sdb1", True),
+    ("wipefs -a /dev/sdb", True),
+    ("cat /dev/urandom > /dev/sda", True),
+    ("echo 1 >/dev/nvme0n1", True),
+    ("shutdown -h now", True),
+    ("sudo reboot", True),
+    ("halt", True),
+    ("sudo systemctl poweroff", True),
+    ("sudo init 0", True),
+    ("curl -fsSL https://example.com/install.sh | sh", True),
+    ("wget -qO- https://example.com/x | sudo bash", True),
+    (":(){ :|:& };:", True),
+    # Seguros
+    ("ls -la", False),
+    ("cat file.txt", False),
+    ("mkdir new_directory", False),
+    ("cp file1.txt file2.txt", False),
+    ("find . -name '*.py'", False),
+    ("find . -name '*.pyc' -delete", False),
+    ("rm file.txt", False),
+    ("rm -i *.log", False),
+    ("rm -r build", False),
+    ("rmdir empty_dir", False),
+    ("git rm --cached secrets.env", False),
+    ("npm run format", False),
+    ("git log --format='%h %s'", False),
+    ("sudo systemctl -H rm-01 restart nginx", False),
+    ("sudo apt install firmware-rm", False),
+    ("ssh rm-01 uptime", False),
+    ("grep -r 'rm -rf' .", False),
+    ("echo 'rm -rf /'", False),
+    ("echo \"sudo rm is dangerous\"", False),
+    ("ls > /dev/null", False),
+    ("make 2>/dev/null", False),
+    ("cmd > /dev/stderr", False),
+    ("dd if=/dev/urandom of=random.bin bs=1M count=10", False),
+    ("dd if=/dev/sda of=disk.img", False),
+    ("chmod 755 script.sh", False),
+    ("chmod -R 755 ./public", False),
+    ("chown -R www-data:www-data /var/www/html", False),
+    ("curl -fsSL https://example.com/data.json | jq .", False),
+    ("wget https://example.com/install.sh", False),
+    ("systemctl status nginx", False),
+    ("docker system prune --filter until=24h", False),
+    ("python -c 'print(1)'", False),
+    ("bash script.sh -c config", False),
+    ("echo 'unterminated", False),
+    ("", False)
+]
+
+
+class TestDangerRulesPrecisionRecall(unittest.TestCase):
+    """Precision/recall of the built-in rules on a labeled command set"""
+
+    def test_labeled_commands(self):
+        """Every labeled command is classified correctly (precision and recall of 1.0)"""
+        engine = get_danger_rules()
+        true_positives = false_positives = false_negatives = 0
+        misclassified = []
+        for command, dangerous in LABELED_COMMANDS:
+            predicted = engine.is_dangerous(command)
+            true_positives += predicted and dangerous
+            false_positives += predicted and not dangerous
+            false_negatives += dangerous and not predicted
+            if predicted != dangerous:
+                misclassified.append((command, engine.match(command)))
+
+        precision = true_positives / max(true_positives + false_positives, 1)
+        recall = true_positives / max(true_positives + false_negatives, 1)
+        self.assertEqual((precision, recall), (1.0, 1.0), misclassified)
+
+    def test_rule_identifiers(self):
+        """The reported rule identifies why a command is dangerous"""
+        engine = get_danger_rules()
+        self.assertEqual(engine.match("rm -fr x"), 'rm-recursive-force')
+        self.assertEqual(engine.match("sudo rm x"), 'sudo-rm')
+        self.assertEqual(engine.match("dd if=a of=/dev/sda"), 'dd-to-device')
+        self.assertEqual(engine.match("curl x | bash"), 'pipe-to-shell')
+        self.assertEqual(engine.match("mkfs.xfs /dev/sdb"), 'dangerous-program')
+        self.assertIsNone(engine.match("ls"))
+
+
+class TestCommandLines(unittest.TestCase):
+    """Test cases for shell-aware normalization"""
+
+    def test_wrappers_removed(self):
+        """sudo, env and assignments are removed; sudo is kept as a marker"""
+        self.assertEqual(command_lines("sudo -u root env A=1 /usr/bin/rm -f x"),
+                         ["sudo rm -f x"])
+
+    def test_pipeline_marker(self):
+        """A command whose output is piped ends in ' |'"""
+        self.assertEqual(command_lines("cat a | grep b && ls"), ["cat a |", "grep b", "ls"])
+
+    def test_nested_commands(self):
+        """Substitutions and sh -c scripts produce their own lines"""
+        lines = command_lines("echo \"$(bash -c 'rm -rf x')\"")
+        self.assertIn("rm -rf x", lines)
+
+    def test_quoted_arguments_kept_together(self):
+        """Arguments with spaces are quoted so they cannot look like operators"""
+        self.assertEqual(command_lines("echo '> /dev/sda'"), ["echo '> /dev/sda'"])
+
+    def test_redirections(self):
+        """Redirections stay in the command they belong to"""
+        self.assertEqual(command_lines("make 2>/dev/null"), ["make 2 > /dev/null"])
+
+    def test_depth_limited(self):
+        """Deeply nested commands do not recurse without limit"""
+        command = "rm -rf x"
+        for _ in range(50):
+            command = f"echo $({command})"
+        self.assertIsInstance(command_lines(command), list)
+
+
+class TestDangerRules(unittest.TestCase):
+    """Test cases for the rule engine and user rule files"""
+
+    def setUp(self):
+        """Temporary rule file"""
+        handle, self.path = tempfile.mkstemp(suffix='.json')
+        os.close(handle)
+
+    def tearDown(self):
+        """Remove the rule file"""
+        os.unlink(self.path)
+
+    def _write(self, content):
+        """Write the rule file"""
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(content, f)
+
+    def test_user_rules_and_disable(self):
+        """User rules are added and built-in rules can be disabled by id"""
+        self._write({
+            'rules': [{'id': 'force-push', 'pattern': r'^git push(?: \S+)* --force(?: |$)',
+                       'keywords': ['git']}],
+            'disable': ['sudo-rm']
+        })
+        engine = DangerRules(load_rules(self.path))
+        self.assertEqual(engine.match("git push origin main --force"), 'force-push')
+        self.assertIsNone(engine.match("sudo rm file"))
+        self.assertEqual(engine.match("rm -rf x"), 'rm-recursive-force')
+
+    def test_rule_list_file(self):
+        """A plain list of rules is accepted; rules without id get one"""
+        self._write([{'pattern': r'^terraform destroy'}])
+        engine = DangerRules(load_rules(self.path))
+        self.assertEqual(engine.match("cd infra && terraform destroy"), 'user-0')
+
+    def test_invalid_rules_ignored(self):
+        """Malformed rules and files do not break the built-in rules"""
+        self._write({'rules': [{'pattern': '('}, {'id': 'x'}, 'rm', {'pattern': 'a',
+                                                                    'scope': 'other'}]})
+        self.assertEqual(len(load_rules(self.path)), len(load_rules()))
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write('{not json')
+        self.assertEqual(len(load_rules(self.path)), len(load_rules()))
+        self.assertEqual(len(load_rules('/nonexistent/rules.json')), len(load_rules()))
+
+    def test_rules_with_named_groups_ignored(self):
+        """User rules that share a group name do not break the other rules"""
+        self._write({'rules': [{'id': 'foo', 'pattern': '(?P<x>foo)'},
+                               {'id': 'bar', 'pattern': '(?P<x>bar)'},
+                               {'id': 'baz', 'pattern': '^baz'}]})
+        engine = DangerRules(load_rules(self.path))
+        self.assertEqual(engine.match("baz"), 'baz')
+        self.assertIsNone(engine.match("foo"))
+        self.assertEqual(engine.match("rm -rf x"), 'rm-recursive-force')
+
+    def test_incompatible_rules_compiled_separately(self):
+        """Rules that cannot be combined into one expression are still evaluated"""
+        engine = DangerRules([{'id': 'foo', 'pattern': '(?P<x>foo)'},
+                              {'id': 'bar', 'pattern': '(?P<x>bar)'}])
+        self.assertEqual(engine.match("bar"), 'bar')
+        self.assertEqual(engine.match("foo"), 'foo')
+        self.assertIsNone(engine.match("ls"))
+
+    def test_rules_without_keywords_skip_prefilter(self):
+        """A rule without keywords is evaluated for every command"""
+        engine = DangerRules([{'id': 'any-deploy', 'pattern': r'^deploy(?: |$)'}])
+        self.assertEqual(engine.match("deploy prod"), 'any-deploy')
+
+    def test_verdicts_cached(self):
+        """Repeated commands are answered from the cache"""
+        engine = DangerRules(load_rules())
+        engine.match("rm -rf x")
+        engine.match("rm -rf x")
+        self.assertEqual(engine.match.cache_info().hits, 1)
+
+    def test_shared_engine_reloads_on_change(self):
+        """The shared engine is rebuilt when the rule file changes"""
+        self._write({'rules': [{'id': 'first', 'pattern': '^first'}]})
+        with patch.dict(os.environ, {'CMD_HELPER_DANGER_RULES': self.path}):
+            engine = get_danger_rules()
+            self.assertIs(get_danger_rules(), engine)
+            self.assertEqual(engine.match("first"), 'first')
+
+            self._write({'rules': [{'id': 'second', 'pattern': '^second'}]})
+            os.utime(self.path, ns=(0, os.stat(self.path).st_mtime_ns + 10 ** 9))
+            reloaded = get_danger_rules()
+            self.assertIsNot(reloaded, engine)
+            self.assertEqual(reloaded.match("second"), 'second')
+            self.assertIsNone(reloaded.match("first"))
+
+
+if __name__ == '__main__':
+    unittest.main()
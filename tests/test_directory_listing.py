@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for directory_listing module
+"""
+
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from cmd_helper.directory_listing import scan_directory, request_words
+
+
+class TestScanDirectory(unittest.TestCase):
+    """Test cases for scan_directory"""
+
+    def setUp(self):
+        """Create a temporary directory"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.temp_dir.name)
+
+    def tearDown(self):
+        """Remove the temporary directory"""
+        self.temp_dir.cleanup()
+
+    def _create(self, name, age_days=30, content=b''):
+        path = self.path / name
+        path.write_bytes(content)
+        mtime = time.time() - age_days * 24 * 3600
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def test_request_words(self):
+        """Test that short words and stopwords are ignored"""
+        self.assertEqual(request_words('compress the log files in my folder'),
+                         frozenset({'compress', 'log'}))
+        self.assertEqual(request_words(None), frozenset())
+
+    def test_entry_structure(self):
+        """Test the entry fields"""
+        self._create('data.csv', content=b'12345')
+        (self.path / 'src').mkdir()
+
+        listing = {entry['name']: entry for entry in scan_directory(self.path)}
+
+        self.assertEqual(listing['data.csv'], {'name': 'data.csv', 'type': 'file', 'size': 5})
+        self.assertEqual(listing['src'], {'name': 'src', 'type': 'dir', 'size': None})
+
+    def test_hidden_and_excluded_entries(self):
+        """Test that hidden files and excluded directories are skipped"""
+        self._create('.secret')
+        self._create('.env')
+        (self.path / 'node_modules').mkdir()
+        self._create('main.py')
+
+        names = {entry['name'] for entry in scan_directory(self.path, excluded=['node_modules'])}
+
+        self.assertEqual(names, {'.env', 'main.py'})
+
+    def test_ranking(self):
+        """Test that manifests, request matches and recent files come first"""
+        for i in range(20):
+            self._create(f'old{i}.txt')
+        self._create('recent.txt', age_days=0)
+        self._create('server.log')
+        self._create('package.json')
+
+        listing = scan_directory(self.path, max_files=3, user_request='restart the server')
+
+        self.assertEqual([entry['name'] for entry in listing],
+                         ['package.json', 'server.log', 'recent.txt'])
+
+    def test_small_directories_have_no_summary(self):
+        """Test that small directories are listed without summary"""
+        self._create('a.txt')
+
+        listing = scan_directory(self.path)
+
+        self.assertFalse(any('summary' in entry for entry in listing))
+
+    def test_huge_directory_summary(self):
+        """Test the summary for directories above the threshold"""
+        for i in range(30):
+            self._create(f'report{i}.csv', content=b'ab')
+        for i in range(10):
+            self._create(f'notes{i}')
+        self._create('latest.log', age_days=0, content=b'abc')
+        (self.path / 'archive').mkdir()
+
+        listing = scan_directory(self.path, summary_threshold=10, summary_sample=5)
+
+        self.assertEqual(len(listing), 6)
+        self.assertEqual(listing[0]['name'], 'latest.log')
+        summary = listing[-1]['summary']
+        self.assertEqual(summary['entries'], 42)
+        self.assertEqual(summary['directories'], 1)
+        self.assertEqual(summary['files'], 41)
+        self.assertEqual(summary['total_size'], 63)
+        self.assertEqual(summary['extensions'], {'.csv': 30, '(none)': 10, '.log': 1})
+        self.assertEqual(summary['newest'][0], 'latest.log')
+        self.assertNotIn('partial', summary)
+
+    def test_stat_budget_marks_partial_summary(self):
+        """Test that an exhausted stat budget is reported"""
+        for i in range(300):
+            self._create(f'file{i}.txt')
+        self._create('Makefile')
+
+        listing = scan_directory(self.path, summary_threshold=10, stat_budget=0)
+
+        summary = listing[-1]['summary']
+        self.assertTrue(summary['partial'])
+        self.assertEqual(summary['entries'], 301)
+        # Las entradas relevantes por nombre se listan aunque no se haya hecho stat
+        self.assertEqual(listing[0]['name'], 'Makefile')
+
+    def test_missing_directory(self):
+        """Test that errors reach the caller"""
+        with self.assertRaises(OSError):
+            scan_directory(self.path / 'missing')
+
+
+if __name__ == '__main__':
+    unittest.main()
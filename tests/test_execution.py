@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for execution module
+"""
+
+import io
+import sys
+import time
+import unittest
+from cmd_helper.execution import OutputBuffer, StreamingExecution
+
+
+def _python(code):
+    """Comando de shell que ejecuta código Python"""
+    return f'"{sys.executable}" -c "{code}"'
+
+
+class TestOutputBuffer(unittest.TestCase):
+    """Test cases for OutputBuffer"""
+
+    def test_small_output_is_kept(self):
+        """Test that output below the limits is kept entirely"""
+        buffer = OutputBuffer(10, 10)
+        buffer.write(b'hello ')
+        buffer.write(b'world')
+
+        self.assertEqual(buffer.omitted, 0)
+        self.assertEqual(buffer.text('[{bytes}]'), 'hello world')
+
+    def test_head_and_tail(self):
+        """Test that the middle of a large output is dropped"""
+        buffer = OutputBuffer(4, 4)
+        for _ in range(1000):
+            buffer.write(b'0123456789')
+
+        self.assertEqual(buffer.total, 10000)
+        self.assertEqual(buffer.omitted, 9992)
+        self.assertEqual(buffer.text('[{bytes}]'), '0123[9992]6789')
+        self.assertLessEqual(len(buffer.tail), 8 + 10)
+
+    def test_without_tail(self):
+        """Test a buffer that only keeps the head"""
+        buffer = OutputBuffer(3, 0)
+        buffer.write(b'abcdef')
+
+        self.assertEqual(buffer.text('…'), 'abc…')
+
+
+class TestStreamingExecution(unittest.TestCase):
+    """Test cases for StreamingExecution"""
+
+    def test_output_is_streamed(self):
+        """Test that stdout and stderr reach their streams and the buffers"""
+        first_output = []
+        execution = StreamingExecution(
+            _python("import sys; print('out'); sys.stderr.write('err')"),
+            on_first_output=lambda: first_output.append(True)
+        )
+        stdout, stderr = io.StringIO(), io.StringIO()
+
+        return_code, output_file = execution.run(stdout=stdout, stderr=stderr)
+
+        self.assertEqual(return_code, 0)
+        self.assertIsNone(output_file)
+        self.assertEqual(stdout.getvalue().strip(), 'out')
+        self.assertEqual(stderr.getvalue(), 'err')
+        self.assertEqual(execution.stderr.text(''), 'err')
+        self.assertEqual(first_output, [True])
+
+    def test_output_arrives_before_exit(self):
+        """Test that output is shown while the command is still running"""
+        stdout = io.StringIO()
+        execution = StreamingExecution(
+            _python("import time; print('first', flush=True); time.sleep(0.5)")
+        )
+        seen_at = []
+        execution.on_first_output = lambda: seen_at.append(time.perf_counter())
+
+        start = time.perf_counter()
+        execution.run(stdout=stdout, stderr=io.StringIO())
+
+        self.assertLess(seen_at[0] - start, 0.4)
+
+    def test_timeout_kills_the_process_tree(self):
+        """Test that a timeout also stops processes started by the shell"""
+        execution = StreamingExecution(
+            f"{_python('import time; time.sleep(30)')}; echo after"
+        )
+
+        start = time.perf_counter()
+        return_code, _ = execution.run(timeout=0.2, stdout=io.StringIO(), stderr=io.StringIO())
+
+        self.assertIsNone(return_code)
+        self.assertLess(time.perf_counter() - start, 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
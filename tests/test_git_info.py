@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for git_info module
+"""
+
+import asyncio
+import shutil
+import subprocess
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+from cmd_helper.git_info import (find_repository, read_head, has_changes, read_git_info,
+                                  ahas_changes, aread_git_info)
+
+
+class TestHeadReader(unittest.TestCase):
+    """Test cases for reading repository metadata without git"""
+
+    def setUp(self):
+        """Create a fake repository layout"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name).resolve()
+        self.git_dir = self.root / '.git'
+        self.git_dir.mkdir()
+        (self.git_dir / 'HEAD').write_text('ref: refs/heads/feature/login\n', encoding='utf-8')
+
+    def tearDown(self):
+        """Remove the temporary directory"""
+        self.temp_dir.cleanup()
+
+    def test_find_repository_from_subdirectory(self):
+        """Test that the repository root is found from a nested directory"""
+        nested = self.root / 'src' / 'app'
+        nested.mkdir(parents=True)
+
+        self.assertEqual(find_repository(nested), (self.root, self.git_dir))
+
+    def test_find_repository_outside(self):
+        """Test directories outside any repository"""
+        with tempfile.TemporaryDirectory() as other:
+            with patch('pathlib.Path.parents', new=()):
+                self.assertIsNone(find_repository(other))
+
+    def test_branch(self):
+        """Test reading the current branch"""
+        self.assertEqual(read_head(self.git_dir), ('feature/login', None))
+
+    def test_detached_head(self):
+        """Test reading a detached HEAD"""
+        (self.git_dir / 'HEAD').write_text('3f2a9c1d0b7e6f5a4b3c2d1e0f9a8b7c6d5e4f3a\n',
+                                           encoding='utf-8')
+
+        self.assertEqual(read_head(self.git_dir), ('', '3f2a9c1d0b7e'))
+
+    def test_missing_head(self):
+        """Test unreadable HEAD files"""
+        (self.git_dir / 'HEAD').unlink()
+
+        self.assertIsNone(read_head(self.git_dir))
+
+    def test_linked_worktree(self):
+        """Test worktrees whose .git is a gitdir file"""
+        worktree_git_dir = self.git_dir / 'worktrees' / 'hotfix'
+        worktree_git_dir.mkdir(parents=True)
+        (worktree_git_dir / 'HEAD').write_text('ref: refs/heads/hotfix\n', encoding='utf-8')
+        worktree = self.root / 'hotfix-worktree'
+        worktree.mkdir()
+        (worktree / '.git').write_text(f'gitdir: {worktree_git_dir}\n', encoding='utf-8')
+
+        found = find_repository(worktree)
+
+        self.assertEqual(found, (worktree, worktree_git_dir))
+        self.assertEqual(read_head(found[1]), ('hotfix', None))
+
+    def test_relative_gitdir_file(self):
+        """Test submodules whose gitdir is relative"""
+        module_git_dir = self.git_dir / 'modules' / 'lib'
+        module_git_dir.mkdir(parents=True)
+        submodule = self.root / 'lib'
+        submodule.mkdir()
+        (submodule / '.git').write_text('gitdir: ../.git/modules/lib\n', encoding='utf-8')
+
+        self.assertEqual(find_repository(submodule)[1].resolve(), module_git_dir)
+
+    @patch('cmd_helper.git_info.has_changes', return_value=None)
+    def test_read_git_info(self, _):
+        """Test the context structure"""
+        head_info = {}
+        info = read_git_info(self.root, 0.5, head_info)
+
+        self.assertEqual(info, {'branch': 'feature/login', 'has_changes': None,
+                                'is_git_repo': True, 'root': str(self.root)})
+        self.assertEqual(head_info, info)
+
+
+@unittest.skipIf(shutil.which('git') is None, 'git is not installed')
+class TestHasChanges(unittest.TestCase):
+    """Test cases for the bounded dirty check"""
+
+    def setUp(self):
+        """Create a real repository with one commit"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+        self._git('init', '-q')
+        (self.root / 'tracked.txt').write_text('one\n', encoding='utf-8')
+        self._git('add', 'tracked.txt')
+        self._git('-c', 'user.name=Test', '-c', 'user.email=test@example.com',
+                  'commit', '-q', '-m', 'initial')
+
+    def tearDown(self):
+        """Remove the temporary directory"""
+        self.temp_dir.cleanup()
+
+    def _git(self, *args):
+        subprocess.run(['git', *args], cwd=self.root, check=True, capture_output=True)
+
+    def test_clean_repository(self):
+        """Test a clean work tree"""
+        self.assertFalse(has_changes(self.root, 5))
+
+    def test_untracked_files_are_ignored(self):
+        """Test that untracked files do not make the repository dirty"""
+        (self.root / 'new.txt').write_text('new\n', encoding='utf-8')
+
+        self.assertFalse(has_changes(self.root, 5))
+
+    def test_modified_file(self):
+        """Test a modified tracked file"""
+        (self.root / 'tracked.txt').write_text('two\n', encoding='utf-8')
+
+        self.assertTrue(has_changes(self.root, 5))
+
+    def test_timeout_reports_unknown(self):
+        """Test that a slow git status is reported as unknown"""
+        with patch('cmd_helper.git_info.subprocess.run',
+                   side_effect=subprocess.TimeoutExpired('git', 0.1)):
+            self.assertIsNone(has_changes(self.root, 0.1))
+
+    def test_git_not_installed(self):
+        """Test that a missing git binary is reported as unknown"""
+        with patch('cmd_helper.git_info.subprocess.run', side_effect=FileNotFoundError):
+            self.assertIsNone(has_changes(self.root, 5))
+
+    def test_async_status(self):
+        """Test the asyncio dirty check against the same repository"""
+        self.assertFalse(asyncio.run(ahas_changes(self.root, 5)))
+        (self.root / 'tracked.txt').write_text('two\n', encoding='utf-8')
+        self.assertTrue(asyncio.run(ahas_changes(self.root, 5)))
+
+    def test_async_timeout_reports_unknown(self):
+        """Test that the asyncio dirty check gives up after its timeout"""
+        self.assertIsNone(asyncio.run(ahas_changes(self.root, 0)))
+
+    def test_async_git_info(self):
+        """Test that the asyncio reader returns the same info as the sync one"""
+        self.assertEqual(asyncio.run(aread_git_info(self.root, 5)), read_git_info(self.root, 5))
+
+
+if __name__ == '__main__':
+    unittest.main()
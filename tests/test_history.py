@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for history module
+"""
+
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+from cmd_helper import history
+from cmd_helper.history import (history_file, read_tail, read_recent_commands, parse_bash,
+                                parse_zsh, parse_fish)
+
+
+class TestHistoryFile(unittest.TestCase):
+    """Test cases for history file detection"""
+
+    def test_bash_default(self):
+        """Test the default bash history"""
+        self.assertEqual(history_file({'HOME': '/home/u', 'SHELL': '/bin/bash'}),
+                         (Path('/home/u/.bash_history'), 'bash'))
+
+    def test_zsh_with_histfile(self):
+        """Test that $HISTFILE takes precedence"""
+        environ = {'HOME': '/home/u', 'SHELL': '/usr/bin/zsh', 'HISTFILE': '/tmp/zhist'}
+        self.assertEqual(history_file(environ), (Path('/tmp/zhist'), 'zsh'))
+
+    def test_zsh_default(self):
+        """Test the default zsh history"""
+        self.assertEqual(history_file({'HOME': '/home/u', 'SHELL': '/bin/zsh'}),
+                         (Path('/home/u/.zsh_history'), 'zsh'))
+
+    def test_fish(self):
+        """Test the fish history location"""
+        self.assertEqual(history_file({'HOME': '/home/u', 'SHELL': '/usr/bin/fish'}),
+                         (Path('/home/u/.local/share/fish/fish_history'), 'fish'))
+        self.assertEqual(
+            history_file({'HOME': '/home/u', 'SHELL': 'fish', 'XDG_DATA_HOME': '/data'}),
+            (Path('/data/fish/fish_history'), 'fish')
+        )
+
+
+class TestParsers(unittest.TestCase):
+    """Test cases for the history format parsers"""
+
+    def test_bash_with_timestamps(self):
+        """Test bash history with HISTTIMEFORMAT timestamps"""
+        text = "#1700000000\nls -la\n#1700000010\ngit status\n\n"
+        self.assertEqual(parse_bash(text), ['ls -la', 'git status'])
+
+    def test_zsh_extended(self):
+        """Test zsh EXTENDED_HISTORY entries"""
+        text = ": 1700000000:0;ls -la\n: 1700000005:2;git commit -m 'a;b'\nplain\n"
+        self.assertEqual(parse_zsh(text), ['ls -la', "git commit -m 'a;b'", 'plain'])
+
+    def test_zsh_multiline(self):
+        """Test zsh multi-line commands"""
+        text = ": 1700000000:0;for f in *; do\\\necho $f\\\ndone\n: 1700000001:0;pwd\n"
+        self.assertEqual(parse_zsh(text), ['for f in *; do\necho $f\ndone', 'pwd'])
+
+    def test_zsh_metafied_bytes(self):
+        """Test that zsh metafied bytes are decoded"""
+        # 'ñ' en UTF-8 es c3 b1; zsh escribe b1 como 0x83 (b1 ^ 32)
+        data = b': 1700000000:0;echo ' + b'\xc3\x83' + bytes([0xb1 ^ 32]) + b'\n'
+        self.assertEqual(history._unmetafy(data).decode('utf-8'),
+                         ': 1700000000:0;echo ñ\n')
+
+    def test_fish(self):
+        """Test fish history entries"""
+        text = ("- cmd: ls -la\n  when: 1700000000\n"
+                "- cmd: echo a\\nb\n  when: 1700000001\n  paths:\n    - /tmp\n")
+        self.assertEqual(parse_fish(text), ['ls -la', 'echo a\nb'])
+
+
+class TestReadRecentCommands(unittest.TestCase):
+    """Test cases for reading the tail of the history file"""
+
+    def setUp(self):
+        """Create a temporary home directory"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.home = Path(self.temp_dir.name)
+        self.environ = {'HOME': str(self.home), 'SHELL': '/bin/bash'}
+
+    def tearDown(self):
+        """Remove the temporary directory"""
+        self.temp_dir.cleanup()
+
+    def test_last_commands(self):
+        """Test that only the last commands are returned"""
+        lines = [f'echo {i}' for i in range(100)]
+        (self.home / '.bash_history').write_text('\n'.join(lines) + '\n', encoding='utf-8')
+
+        self.assertEqual(read_recent_commands(self.environ, limit=10), lines[-10:])
+
+    def test_missing_file(self):
+        """Test that a missing history file yields no commands"""
+        self.assertEqual(read_recent_commands(self.environ), [])
+
+    def test_reads_only_the_tail(self):
+        """Test that large files are not read completely"""
+        history_path = self.home / '.bash_history'
+        with open(history_path, 'w', encoding='utf-8') as f:
+            for i in range(200000):
+                f.write(f'echo command number {i}\n')
+
+        with patch('cmd_helper.history.read_tail', wraps=read_tail) as mock_read:
+            commands = read_recent_commands(self.environ, limit=10)
+
+        self.assertEqual(commands[-1], 'echo command number 199999')
+        self.assertEqual(len(commands), 10)
+        self.assertLessEqual(mock_read.call_args[0][1], 64 * 1024)
+
+    def test_partial_first_line_dropped(self):
+        """Test that a line cut by the read window is discarded"""
+        path = self.home / 'history'
+        path.write_bytes(b'first long line\nsecond\nthird\n')
+
+        data, complete = read_tail(path, 12)
+
+        self.assertEqual(data, b'third\n')
+        self.assertFalse(complete)
+
+    def test_window_grows_for_long_commands(self):
+        """Test that the window grows when few commands fit in it"""
+        long_command = 'echo ' + 'x' * 40000
+        (self.home / '.bash_history').write_text(
+            '\n'.join([long_command] * 5) + '\nls\n', encoding='utf-8'
+        )
+
+        commands = read_recent_commands(self.environ, limit=3)
+
+        self.assertEqual(commands, [long_command, long_command, 'ls'])
+
+    def test_invalid_utf8(self):
+        """Test that undecodable bytes do not break the reader"""
+        (self.home / '.bash_history').write_bytes(b'echo \xff\nls\n')
+
+        self.assertEqual(read_recent_commands(self.environ), ['echo �', 'ls'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for i18n module
+"""
+
+import asyncio
+import json
+import marshal
+import os
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+from cmd_helper import i18n
+from cmd_helper.i18n import (Translator, available_languages, current_language, flatten,
+                             get_catalog, load_catalog, t, use_language)
+
+
+class TestCatalog(unittest.TestCase):
+    """Test cases for flattened and compiled catalogs"""
+
+    def setUp(self):
+        """Temporary catalog and compiled directory"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+        self.source = self.root / 'xx.json'
+        self.compiled_dir = self.root / 'compiled'
+        self._write({'messages': {'hello': 'Hola', 'nested': {'deep': 'Profundo'}}})
+
+    def tearDown(self):
+        """Remove the temporary directory"""
+        self.temp_dir.cleanup()
+
+    def _write(self, content, mtime_ns=None):
+        """Write the JSON catalog (optionally with a given mtime)"""
+        self.source.write_text(json.dumps(content), encoding='utf-8')
+        if mtime_ns is not None:
+            os.utime(self.source, ns=(mtime_ns, mtime_ns))
+
+    def test_flatten(self):
+        """Nested sections become dotted keys"""
+        self.assertEqual(flatten({'a': {'b': 'x', 'c': {'d': 'y'}}, 'e': 'z'}),
+                         {'a.b': 'x', 'a.c.d': 'y', 'e': 'z'})
+
+    def test_compiled_catalog_reused(self):
+        """The second load reads the compiled catalog without parsing JSON"""
+        first = load_catalog(self.source, self.compiled_dir)
+        self.assertEqual(first['messages.nested.deep'], 'Profundo')
+        self.assertEqual(len(list(self.compiled_dir.iterdir())), 1)
+
+        with patch.object(i18n.json, 'load', side_effect=AssertionError('JSON parsed')):
+            self.assertEqual(load_catalog(self.source, self.compiled_dir), first)
+
+    def test_compiled_catalog_invalidated(self):
+        """A changed source file is parsed again"""
+        self._write({'messages': {'hello': 'Hola'}}, mtime_ns=10 ** 18)
+        load_catalog(self.source, self.compiled_dir)
+
+        self._write({'messages': {'hello': 'Buenas'}}, mtime_ns=2 * 10 ** 18)
+        self.assertEqual(load_catalog(self.source, self.compiled_dir)['messages.hello'], 'Buenas')
+
+    def test_corrupt_compiled_catalog(self):
+        """A corrupt compiled file is ignored and rewritten"""
+        load_catalog(self.source, self.compiled_dir)
+        compiled = next(self.compiled_dir.iterdir())
+        compiled.write_bytes(b'\x00garbage')
+
+        self.assertEqual(load_catalog(self.source, self.compiled_dir)['messages.hello'], 'Hola')
+        with open(compiled, 'rb') as f:
+            self.assertEqual(marshal.load(f)[1]['messages.hello'], 'Hola')
+
+    def test_unwritable_compiled_dir(self):
+        """Without a writable compiled directory the JSON is still loaded"""
+        blocker = self.root / 'file'
+        blocker.write_text('')
+        self.assertEqual(load_catalog(self.source, blocker / 'sub')['messages.hello'], 'Hola')
+
+
+    def test_default_compiled_dir_in_user_cache(self):
+        """Compiled catalogs go to the user cache directory, not next to the locale files"""
+        cache_dir = self.root / 'cache'
+        with patch.dict(os.environ, {'CMD_HELPER_CACHE_DIR': str(cache_dir)}):
+            load_catalog(self.source)
+        self.assertEqual(len(list((cache_dir / 'locales').iterdir())), 1)
+        self.assertEqual(sorted(path.name for path in self.root.iterdir()), ['cache', 'xx.json'])
+
+        with patch.dict(os.environ, {'XDG_CACHE_HOME': str(self.root / 'xdg')}):
+            os.environ.pop('CMD_HELPER_CACHE_DIR', None)
+            self.assertEqual(i18n.default_compiled_dir(),
+                             self.root / 'xdg' / 'cmd-helper' / 'locales')
+
+class TestTranslator(unittest.TestCase):
+    """Test cases for Translator and language detection"""
+
+    def test_lookup(self):
+        """Dotted keys are resolved; unknown keys return the default or the key"""
+        translator = Translator('en')
+        self.assertEqual(translator.get('commands.alternatives'), 'Alternatives:')
+        self.assertEqual(translator.get('missing.key'), 'missing.key')
+        self.assertEqual(translator.get('missing.key', 'Default'), 'Default')
+        self.assertEqual(translator.get('commands'), 'commands')
+
+    def test_catalogs_have_same_keys(self):
+        """Every language defines the same keys"""
+        catalogs = [Translator(language).translations for language in available_languages()]
+        for catalog in catalogs[1:]:
+            self.assertEqual(set(catalog), set(catalogs[0]))
+
+    def test_unknown_language_falls_back_to_spanish(self):
+        """An unknown language uses the Spanish catalog"""
+        translator = Translator('xx')
+        self.assertEqual(translator.language, 'es')
+        self.assertEqual(translator.get('commands.alternatives'), 'Alternativas:')
+
+    def test_detection_does_not_load_catalogs(self):
+        """Detecting the system language only lists the locale files"""
+        with patch.object(i18n, 'load_catalog') as mock_load, \
+                patch.object(i18n.locale, 'getdefaultlocale', return_value=('en_GB', 'UTF-8')):
+            self.assertEqual(i18n.detect_system_language(), 'en')
+        mock_load.assert_not_called()
+
+    def test_get_translator_loads_one_catalog(self):
+        """The global translator loads exactly one catalog"""
+        with patch.object(i18n, '_TRANSLATOR', None), patch.dict(i18n._CATALOGS, clear=True), \
+                patch.object(i18n, 'load_catalog', wraps=i18n.load_catalog) as mock_load, \
+                patch.object(i18n.locale, 'getdefaultlocale', return_value=('en_US', 'UTF-8')):
+            translator = i18n.get_translator()
+            self.assertEqual(translator.language, 'en')
+        mock_load.assert_called_once()
+
+
+class TestContextLanguage(unittest.TestCase):
+    """Test cases for the per-request language"""
+
+    def test_use_language(self):
+        """t() follows the language of the block and restores it afterwards"""
+        default = current_language()
+        with use_language('en'):
+            self.assertEqual(t('commands.alternatives'), 'Alternatives:')
+            with use_language('es'):
+                self.assertEqual(t('commands.alternatives'), 'Alternativas:')
+            self.assertEqual(current_language(), 'en')
+        self.assertEqual(current_language(), default)
+
+    def test_auto_and_unknown_languages(self):
+        """'auto' keeps the active language and unknown languages use Spanish"""
+        with use_language('en'):
+            with use_language('auto') as language:
+                self.assertEqual(language, 'en')
+            with use_language('xx') as language:
+                self.assertEqual(language, 'es')
+
+    def test_catalogs_loaded_once_and_immutable(self):
+        """Every translator shares one read-only catalog per language"""
+        self.assertIs(Translator('en').translations, get_catalog('en'))
+        with self.assertRaises(TypeError):
+            get_catalog('en')['commands.alternatives'] = 'x'
+
+    def test_threads_do_not_interfere(self):
+        """Concurrent threads translate in their own language"""
+        barrier = threading.Barrier(8)
+        results = {}
+
+        def worker(index):
+            language = 'en' if index % 2 else 'es'
+            with use_language(language):
+                barrier.wait()
+                results[index] = [t('commands.alternatives') for _ in range(200)]
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for index, values in results.items():
+            expected = 'Alternatives:' if index % 2 else 'Alternativas:'
+            self.assertEqual(set(values), {expected})
+
+    def test_asyncio_tasks_do_not_interfere(self):
+        """Each asyncio task keeps its own language across awaits"""
+        async def translate(language):
+            with use_language(language):
+                await asyncio.sleep(0.01)
+                return t('commands.alternatives')
+
+        async def main():
+            return await asyncio.gather(translate('en'), translate('es'))
+
+        self.assertEqual(asyncio.run(main()), ['Alternatives:', 'Alternativas:'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for intents module
+"""
+
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from cmd_helper.intents import (BUILTIN_INTENTS, IntentMatcher, get_intent_matcher, load_intents,
+                                normalize_request)
+
+# Peticiones habituales en los dos idiomas: (petición, comando esperado)
+COMMON_REQUESTS = [
+    ("list files", "ls -la"),
+    ("Show me all the files in this folder", "ls -la"),
+    ("lista los archivos", "ls -la"),
+    ("list python files", "find . -type f -name '*.py'"),
+    ("find all .log files here", "find . -type f -name '*.log'"),
+    ("lista los archivos de python", "find . -type f -name '*.py'"),
+    ("busca los archivos markdown en esta carpeta", "find . -type f -name '*.md'"),
+    ("find files named backup.tar", "find . -name backup.tar"),
+    ("encuentra los archivos llamados notes.txt", "find . -name notes.txt"),
+    ("show the largest files", "du -ah . | sort -rh | head -n 20"),
+    ("archivos más grandes de esta carpeta", "du -ah . | sort -rh | head -n 20"),
+    ("disk usage of this folder", "du -sh ."),
+    ("uso de disco de esta carpeta", "du -sh ."),
+    ("¿Cuánto ocupa este directorio?", "du -sh ."),
+    ("how much free disk space is left", "df -h"),
+    ("espacio libre en disco", "df -h"),
+    ("show git log", "git log --oneline -n 20"),
+    ("show the last 5 commits", "git log --oneline -n 5"),
+    ("muestra el historial de git", "git log --oneline -n 20"),
+    ("últimos 3 commits", "git log --oneline -n 3"),
+    ("git status", "git status"),
+    ("qué archivos han cambiado", "git status"),
+    ("which branch am I on?", "git branch --show-current"),
+    ("¿en qué rama estoy?", "git branch --show-current"),
+    ("where am I", "pwd"),
+    ("¿Dónde estoy?", "pwd"),
+    ("list running processes", "ps aux"),
+    ("procesos en ejecución", "ps aux"),
+    ("what is using port 8080", "lsof -i :8080"),
+    ("qué proceso usa el puerto 5432", "lsof -i :5432"),
+    ("count lines in README.md", "wc -l -- README.md"),
+    ("cuenta las líneas de 'My Notes.txt'", "wc -l -- 'My Notes.txt'"),
+    ("show the contents of setup.py", "cat -- setup.py"),
+    ("search for \"TODO fix\" in the files", "grep -rn -- 'TODO fix' ."),
+    ("busca main en este directorio", "grep -rn -- main ."),
+    ("please list files", "ls -la"),
+    ("lista los archivos por favor", "ls -la"),
+]
+
+# Peticiones que deben ir al modelo
+MODEL_REQUESTS = [
+    "list big files",
+    "compress this folder into a tar.gz",
+    "list python files modified yesterday and delete them",
+    "count lines in my notes.txt",
+    "show the last 5000 commits",
+    "what is using port 99999",
+    "borra los archivos temporales",
+    "count lines in *.py",
+    "show contents of $HOME/.bashrc",
+    "find files named *.bak",
+]
+
+
+class TestIntentMatcher(unittest.TestCase):
+    """Test cases for the built-in intents"""
+
+    def setUp(self):
+        self.matcher = IntentMatcher(BUILTIN_INTENTS, system='Linux')
+
+    def test_common_requests(self):
+        """Common requests in Spanish and English are answered locally"""
+        for request, command in COMMON_REQUESTS:
+            with self.subTest(request=request):
+                answer = self.matcher.match(request)
+                self.assertIsNotNone(answer)
+                self.assertEqual(answer['command'], command)
+
+    def test_other_requests_go_to_the_model(self):
+        """Longer, ambiguous or out-of-range requests are not matched"""
+        for request in MODEL_REQUESTS:
+            with self.subTest(request=request):
+                self.assertIsNone(self.matcher.match(request))
+
+    def test_parameters_are_quoted(self):
+        """Text parameters cannot inject shell syntax"""
+        answer = self.matcher.match("show the contents of $(rm -rf ~)")
+        self.assertIsNone(answer)
+        answer = self.matcher.match("show the contents of 'a; rm -rf ~'")
+        self.assertEqual(answer['command'], "cat -- 'a; rm -rf ~'")
+        self.assertIsNone(self.matcher.match("find files named `reboot`"))
+        answer = self.matcher.match("search for `reboot` in the files")
+        self.assertEqual(answer['command'], "grep -rn -- '`reboot`' .")
+
+    def test_paths_expanded_like_the_shell(self):
+        """A leading ~ is expanded; variables and globs are left to the model"""
+        with patch.dict(os.environ, {'HOME': '/home/ana'}):
+            answer = self.matcher.match("count lines in ~/notes.txt")
+            self.assertEqual(answer['command'], "wc -l -- /home/ana/notes.txt")
+        self.assertIsNone(self.matcher.match("show contents of $HOME/.bashrc"))
+        self.assertIsNone(self.matcher.match("count lines in *.py"))
+        self.assertIsNone(self.matcher.match("cuenta las líneas de '[ab].txt'"))
+
+    def test_explanation_language(self):
+        """The explanation follows the request language and includes the parameters"""
+        answer = self.matcher.match("list python files", 'es')
+        self.assertEqual(answer['intent'], 'list-files-by-type')
+        self.assertIn('.py', answer['explanation'])
+        self.assertTrue(answer['explanation'].startswith('Busca'))
+        self.assertTrue(self.matcher.match("list python files", 'en')['explanation']
+                        .startswith('Finds'))
+
+    def test_platforms(self):
+        """Commands follow the operating system; POSIX intents do not apply on Windows"""
+        self.assertEqual(self.matcher.match("free memory")['command'], 'free -h')
+        mac = IntentMatcher(BUILTIN_INTENTS, system='Darwin')
+        self.assertEqual(mac.match("free memory")['command'], 'vm_stat')
+        windows = IntentMatcher(BUILTIN_INTENTS, system='Windows')
+        self.assertIsNone(windows.match("list files"))
+
+    def test_normalize_request(self):
+        """Spacing, punctuation and courtesy words are ignored; case is kept"""
+        self.assertEqual(normalize_request("  ¿Puedes  mostrar README.md? "), "mostrar README.md")
+        self.assertEqual(normalize_request("list files please."), "list files")
+
+
+class TestLoadIntents(unittest.TestCase):
+    """Test cases for user intent files"""
+
+    def setUp(self):
+        """Temporary intent file"""
+        handle, self.path = tempfile.mkstemp(suffix='.json')
+        os.close(handle)
+
+    def tearDown(self):
+        """Remove the intent file"""
+        os.unlink(self.path)
+
+    def _write(self, content):
+        """Write the intent file"""
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(content, f)
+
+    def test_user_intents_and_disable(self):
+        """User intents are tried first and built-in intents can be disabled by id"""
+        self._write({
+            'intents': [{'id': 'k8s-pods',
+                         'patterns': [r'(?:list|lista) (?:los )?pods(?: (?:in|en) (?P<ns>\S+))?'],
+                         'command': 'kubectl get pods -n {ns}',
+                         'defaults': {'ns': 'default'},
+                         'explanation': {'en': 'Lists the pods in {ns}',
+                                         'es': 'Lista los pods de {ns}'}},
+                        {'id': 'my-ls', 'patterns': 'list files', 'command': 'ls -lah'}],
+            'disable': ['git-status']
+        })
+        matcher = IntentMatcher(load_intents(self.path), system='Windows')
+
+        answer = matcher.match("lista los pods en kube-system", 'es')
+        self.assertEqual(answer['command'], 'kubectl get pods -n kube-system')
+        self.assertEqual(answer['explanation'], 'Lista los pods de kube-system')
+        self.assertEqual(matcher.match("list pods")['command'], 'kubectl get pods -n default')
+        # Las intenciones de usuario valen en cualquier sistema y van antes que las incluidas
+        self.assertEqual(matcher.match("list files")['command'], 'ls -lah')
+        self.assertIsNone(IntentMatcher(load_intents(self.path), system='Linux')
+                          .match("git status"))
+
+    def test_intent_list_file(self):
+        """A plain list of intents is accepted; intents without id get one"""
+        self._write([{'patterns': ['deploy (?P<env>staging|prod)'],
+                      'command': './deploy.sh {env}', 'platforms': ['Linux']}])
+        answer = IntentMatcher(load_intents(self.path), system='Linux').match("deploy prod")
+        self.assertEqual((answer['intent'], answer['command']), ('user-0', './deploy.sh prod'))
+        self.assertIsNone(IntentMatcher(load_intents(self.path), system='Darwin')
+                          .match("deploy prod"))
+
+    def test_invalid_intents_ignored(self):
+        """Malformed intents and files do not break the built-in intents"""
+        self._write({'intents': [{'patterns': ['('], 'command': 'x'},
+                                 {'patterns': ['a'], 'command': 'echo {missing}'},
+                                 {'patterns': [], 'command': 'x'},
+                                 {'patterns': ['a'], 'command': 3},
+                                 'ls']})
+        self.assertEqual(len(load_intents(self.path)), len(load_intents()))
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write('{not json')
+        self.assertEqual(len(load_intents(self.path)), len(load_intents()))
+        self.assertEqual(len(load_intents('/nonexistent/intents.json')), len(load_intents()))
+
+    def test_malformed_fields_ignored(self):
+        """Wrong types and positional or empty fields do not break matching"""
+        builtin = len(load_intents())
+        for content in ({'intents': [{'patterns': ['a'], 'command': 'x', 'defaults': ['a']}]},
+                        {'intents': [{'patterns': ['a'], 'command': 'x', 'platforms': 'Linux'}]},
+                        {'intents': [{'patterns': ['a'], 'command': 'x',
+                                      'explanation': 'says {}'}]},
+                        {'intents': [{'patterns': ['a'], 'command': 'echo {0}'}]},
+                        {'intents': [{'patterns': ['(?P<x>a)'], 'command': 'echo {x.real}'}]},
+                        {'intents': {'patterns': ['a']}, 'disable': 1},
+                        {'disable': [1, None]}):
+            with self.subTest(content=content):
+                self._write(content)
+                intents = load_intents(self.path)
+                self.assertEqual(len(intents), builtin)
+                self.assertEqual(IntentMatcher(intents, system='Linux').match("list files")
+                                 ['command'], 'ls -la')
+
+    def test_unformattable_template_skipped(self):
+        """A template that fails to format does not answer and does not raise"""
+        matcher = IntentMatcher([{'id': 'bad', 'patterns': ['(?P<n>\\d+) things'],
+                                  'command': 'echo {n:d}', 'platforms': None}], system='Linux')
+        self.assertIsNone(matcher.match("3 things"))
+
+    def test_shared_matcher_reloads_on_change(self):
+        """The shared matcher is rebuilt when the intent file changes"""
+        self._write([{'id': 'first', 'patterns': ['first'], 'command': 'echo 1'}])
+        with patch.dict(os.environ, {'CMD_HELPER_INTENTS': self.path}):
+            matcher = get_intent_matcher()
+            self.assertIs(get_intent_matcher(), matcher)
+            self.assertEqual(matcher.match("first")['intent'], 'first')
+
+            self._write([{'id': 'second', 'patterns': ['second'], 'command': 'echo 2'}])
+            os.utime(self.path, ns=(0, os.stat(self.path).st_mtime_ns + 10 ** 9))
+            reloaded = get_intent_matcher()
+            self.assertIsNot(reloaded, matcher)
+            self.assertEqual(reloaded.match("second")['intent'], 'second')
+            self.assertIsNone(reloaded.match("first"))
+
+
+if __name__ == '__main__':
+    unittest.main()
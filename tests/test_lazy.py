@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for lazy module
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch, MagicMock
+from cmd_helper import lazy
+from cmd_helper.lazy import lazy_import, init_colorama
+
+
+class TestLazyImport(unittest.TestCase):
+    """Test cases for lazy_import"""
+
+    def setUp(self):
+        """Create a throwaway module that records when it is executed"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        module_path = Path(self.temp_dir.name) / 'cmdh_lazy_probe.py'
+        module_path.write_text(
+            "import os\nos.environ['CMDH_LAZY_PROBE'] = '1'\nVALUE = 42\n", encoding='utf-8'
+        )
+        sys.path.insert(0, self.temp_dir.name)
+
+    def tearDown(self):
+        """Remove the throwaway module"""
+        sys.path.remove(self.temp_dir.name)
+        sys.modules.pop('cmdh_lazy_probe', None)
+        os.environ.pop('CMDH_LAZY_PROBE', None)
+        self.temp_dir.cleanup()
+
+    def test_module_not_executed_until_attribute_access(self):
+        """Test that the module body only runs on first attribute access"""
+        module = lazy_import('cmdh_lazy_probe')
+
+        self.assertNotIn('CMDH_LAZY_PROBE', os.environ)
+        self.assertEqual(module.VALUE, 42)
+        self.assertEqual(os.environ.get('CMDH_LAZY_PROBE'), '1')
+
+    def test_returns_already_imported_module(self):
+        """Test that modules already in sys.modules are returned as-is"""
+        import json
+
+        self.assertIs(lazy_import('json'), json)
+        self.assertIs(lazy_import('cmdh_lazy_probe'), lazy_import('cmdh_lazy_probe'))
+
+    def test_missing_module_raises_import_error(self):
+        """Test that unknown modules fail at lazy_import time"""
+        with self.assertRaises(ImportError):
+            lazy_import('cmdh_module_that_does_not_exist')
+
+
+class TestInitColorama(unittest.TestCase):
+    """Test cases for init_colorama"""
+
+    @patch.object(lazy, '_COLORAMA_READY', False)
+    @patch('cmd_helper.lazy.lazy_import')
+    def test_init_runs_once(self, mock_lazy_import):
+        """Test that colorama.init is only called once per process"""
+        mock_colorama = MagicMock()
+        mock_lazy_import.return_value = mock_colorama
+
+        self.assertIs(init_colorama(), mock_colorama)
+        init_colorama()
+
+        mock_colorama.init.assert_called_once_with(autoreset=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
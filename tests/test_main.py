@@ -3,8 +3,12 @@
 Tests for main module
 """
 
+import json
+import os
 import unittest
+import subprocess
 import sys
+from pathlib import Path
 from unittest.mock import patch, MagicMock
 from click.testing import CliRunner
 from cmd_helper.main import main, CmdHelper
@@ -51,6 +55,141 @@ class TestMain(unittest.TestCase):
         # Accept both English and Spanish output
         self.assertTrue('Usage:' in result.output or 'Uso:' in result.output)
 
+    @patch('cmd_helper.main.CmdHelper')
+    def test_main_cache_flags(self, mock_app_class):
+        """Test that cache and timing flags are passed to CmdHelper"""
+        self.runner.invoke(main, ['--no-cache', '--refresh', '--timings', 'list files'])
+
+        mock_app_class.assert_called_once_with(
+            use_cache=False, refresh_cache=True, show_timings=True, stream=False,
+            show_prompt_stats=False
+        )
+
+    @patch('cmd_helper.context_analyzer.prefetch_context')
+    @patch('cmd_helper.main.CmdHelper')
+    def test_main_prefetches_context(self, mock_app_class, mock_prefetch):
+        """Test that context collection starts before the model client is created"""
+        calls = []
+        mock_prefetch.side_effect = lambda **kwargs: calls.append('prefetch')
+        mock_app_class.side_effect = lambda **kwargs: calls.append('app') or MagicMock()
+
+        self.runner.invoke(main, ['list files'])
+
+        self.assertEqual(calls, ['prefetch', 'app'])
+
+    @patch('cmd_helper.shell.InteractiveSession')
+    @patch('cmd_helper.context_analyzer.prefetch_context')
+    @patch('cmd_helper.main.CmdHelper')
+    def test_main_interactive_does_not_prefetch(self, mock_app_class, mock_prefetch,
+                                                mock_session_class):
+        """Test that the interactive session's first request is not collected twice"""
+        self.runner.invoke(main, ['-i', 'list files'])
+
+        mock_prefetch.assert_not_called()
+        mock_session_class.return_value.run.assert_called_once_with(first_request='list files')
+
+    @patch('cmd_helper.main.CmdHelper')
+    def test_main_stream_flag(self, mock_app_class):
+        """Test that --stream enables streaming generation"""
+        self.runner.invoke(main, ['--stream', 'list files'])
+
+        self.assertTrue(mock_app_class.call_args.kwargs['stream'])
+
+    @patch('cmd_helper.main.CmdHelper')
+    def test_main_show_prompt_stats_flag(self, mock_app_class):
+        """Test that --show-prompt-stats is passed to CmdHelper"""
+        self.runner.invoke(main, ['--show-prompt-stats', 'list files'])
+
+        self.assertTrue(mock_app_class.call_args.kwargs['show_prompt_stats'])
+
+    @patch('cmd_helper.main.CmdHelper')
+    def test_main_explicit_generate_command(self, mock_app_class):
+        """Test that `cmdh generate REQUEST` is the same as `cmdh REQUEST`"""
+        mock_app_class.return_value.validate_setup.return_value = True
+
+        self.runner.invoke(main, ['generate', '--timings', 'list files'])
+
+        mock_app_class.return_value.process_request.assert_called_once_with('list files')
+        self.assertTrue(mock_app_class.call_args.kwargs['show_timings'])
+
+    @patch('cmd_helper.batch.BatchRunner')
+    @patch('cmd_helper.main.CmdHelper')
+    def test_main_batch(self, mock_app_class, mock_runner_class):
+        """Test that `cmdh batch` reads stdin and writes JSONL"""
+        mock_app = mock_app_class.return_value
+        mock_app.validate_setup.return_value = True
+        mock_app.config.BATCH_WORKERS = 8
+        mock_runner_class.return_value.run.return_value = iter([
+            {'index': 0, 'request': 'list files', 'command': 'ls', 'cache_hit': False}
+        ])
+
+        result = self.runner.invoke(main, ['batch', '--workers', '2', '--unordered', '--no-cache'],
+                                    input='list files\n\n')
+
+        self.assertEqual(result.exit_code, 0)
+        mock_app_class.assert_called_once_with(use_cache=False)
+        self.assertEqual(mock_runner_class.call_args.kwargs['workers'], 2)
+        requests = mock_runner_class.return_value.run.call_args.args[0]
+        self.assertEqual([item['request'] for item in requests], ['list files'])
+        self.assertFalse(mock_runner_class.return_value.run.call_args.kwargs['ordered'])
+        self.assertEqual(json.loads(result.stdout.splitlines()[0])['command'], 'ls')
+
+    @patch('cmd_helper.shell.InteractiveSession')
+    @patch('cmd_helper.main.CmdHelper')
+    def test_main_shell(self, mock_app_class, mock_session_class):
+        """Test that `cmdh shell` and `cmdh -i` start an interactive session"""
+        mock_app_class.return_value.validate_setup.return_value = True
+
+        self.runner.invoke(main, ['shell', '--timings'])
+        self.runner.invoke(main, ['-i', 'list files'])
+
+        self.assertEqual(mock_session_class.call_count, 2)
+        self.assertTrue(mock_app_class.call_args_list[0].kwargs['show_timings'])
+        runs = mock_session_class.return_value.run.call_args_list
+        self.assertEqual([run.kwargs['first_request'] for run in runs], [None, 'list files'])
+        mock_app_class.return_value.process_request.assert_not_called()
+
+    @patch('cmd_helper.cache.ResponseCache')
+    def test_main_cache_stats(self, mock_cache_class):
+        """Test --cache-stats output"""
+        mock_cache_class.return_value.stats.return_value = {
+            'entries': 3, 'hits': 1, 'similar_hits': 0, 'misses': 1, 'hit_rate': 0.5
+        }
+
+        result = self.runner.invoke(main, ['--lang', 'en', '--cache-stats'])
+
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn('50%', result.output)
+
+    @patch('cmd_helper.backends.rate_limiter')
+    def test_main_quota(self, mock_limiter):
+        """Test the shared quota status command"""
+        mock_limiter.return_value.enabled = True
+        mock_limiter.return_value.status.return_value = [{
+            'scope': 'gemini:gemini-2.5-flash', 'requests': 12, 'tokens': 3400, 'rpm': 15,
+            'tpm': 0, 'available_requests': 3.0, 'available_tokens': None, 'waiting': 2,
+            'paused': 4.2
+        }]
+
+        result = self.runner.invoke(main, ['quota', '--lang', 'en'])
+
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn('gemini:gemini-2.5-flash: 12/15 requests and 3400/unlimited tokens',
+                      result.output)
+        self.assertIn('2 waiting (paused 5 s', result.output)
+
+    def test_main_quota_disabled(self):
+        """Test that the quota command does not create the shared database when it is off"""
+        with patch.dict(os.environ, {'CMD_HELPER_RATE_LIMIT_RPM': '0',
+                                     'CMD_HELPER_RATE_LIMIT_TPM': '0'}):
+            result = self.runner.invoke(main, ['quota', '--lang', 'en'])
+
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(result.output.count('\n'), 1)
+        self.assertIn('No shared quota configured', result.output)
+        cache_dir = os.environ['CMD_HELPER_CACHE_DIR']
+        self.assertFalse(os.path.exists(os.path.join(cache_dir, 'ratelimit.sqlite3')))
+
     @patch('cmd_helper.main.CmdHelper')
     def test_main_exception_handling(self, mock_app_class):
         """Test main function exception handling"""
@@ -69,12 +208,12 @@ class TestCmdHelper(unittest.TestCase):
 
     def setUp(self):
         """Set up test fixtures"""
-        with patch('cmd_helper.main.MCPServer'):
-            with patch('cmd_helper.main.CommandHandler'):
+        with patch('cmd_helper.mcp_server.MCPServer'):
+            with patch('cmd_helper.command_handler.CommandHandler'):
                 self.app = CmdHelper()
 
-    @patch('cmd_helper.main.MCPServer')
-    @patch('cmd_helper.main.CommandHandler')
+    @patch('cmd_helper.mcp_server.MCPServer')
+    @patch('cmd_helper.command_handler.CommandHandler')
     def test_app_initialization(self, mock_handler_class, mock_server_class):
         """Test CmdHelper initialization"""
         app = CmdHelper()
@@ -174,6 +313,79 @@ class TestCmdHelper(unittest.TestCase):
                 
                 mock_execute.assert_called_once_with('invalid_command')
 
+    @patch('builtins.print')
+    def test_process_request_reports_cache_hit(self, mock_print):
+        """Test that cache hits and timings are reported in the output"""
+        self.app.show_timings = True
+        self.app.mcp_server.generate_command.return_value = {
+            'command': None,
+            'explanation': '',
+            'is_dangerous': False,
+            'source': 'cache',
+            'timings': {'context_ms': 1.5, 'cache_ms': 0.4, 'total_ms': 2.1}
+        }
+
+        self.app.process_request("list files")
+
+        output = " ".join(str(call.args[0]) for call in mock_print.call_args_list)
+        self.assertIn('2.1 ms', output)
+        self.assertIn('cache 0.4 ms', output)
+
+    @patch('builtins.print')
+    def test_process_request_reports_local_intent(self, mock_print):
+        """Test that answers from a local intent name the intent that answered"""
+        self.app.mcp_server.generate_command.return_value = {
+            'command': None,
+            'explanation': '',
+            'is_dangerous': False,
+            'source': 'rules',
+            'intent': 'list-files',
+            'timings': {'rules_ms': 0.1, 'total_ms': 0.1}
+        }
+
+        self.app.process_request("list files")
+
+        output = " ".join(str(call.args[0]) for call in mock_print.call_args_list)
+        self.assertIn('list-files, 0.1 ms', output)
+
+    @patch('builtins.print')
+    def test_process_request_reports_prompt_stats(self, mock_print):
+        """Test that prompt token stats are shown with --show-prompt-stats"""
+        self.app.show_prompt_stats = True
+        self.app.mcp_server.generate_command.return_value = {
+            'command': None,
+            'explanation': '',
+            'is_dangerous': False,
+            'source': 'model',
+            'prompt_stats': {'sections': {'pwd': 5, 'files': 120}, 'total': 480,
+                             'budget': 1500, 'condensed': ['env_vars'], 'dropped': []}
+        }
+
+        self.app.process_request("list files")
+
+        output = " ".join(str(call.args[0]) for call in mock_print.call_args_list)
+        self.assertIn('480/1500', output)
+        self.assertIn('files 120', output)
+        self.assertIn('env_vars', output)
+
+    @patch('builtins.print')
+    def test_process_request_streaming_shows_command_once(self, mock_print):
+        """Test that a streamed command is not shown again when confirming"""
+        self.app.stream = True
+
+        def generate(user_input, refresh_cache=False, on_command=None, context=None):
+            on_command('ls -la')
+            return {'command': 'ls -la', 'explanation': 'List files', 'is_dangerous': False}
+
+        self.app.mcp_server.generate_command.side_effect = generate
+        with patch.object(self.app.command_handler, 'confirm_execution',
+                          return_value=False) as mock_confirm:
+            self.app.process_request("list files")
+
+        self.app.command_handler.show_command.assert_called_once_with('ls -la')
+        mock_confirm.assert_called_once_with('ls -la', 'List files', show_command=False,
+                                             alternatives=None)
+
     @patch('builtins.print')
     def test_process_request_exception_handling(self, mock_print):
         """Test request processing exception handling"""
@@ -187,5 +399,53 @@ class TestCmdHelper(unittest.TestCase):
             self.fail("process_request should handle exceptions gracefully")
 
 
+class TestStartupImportTime(unittest.TestCase):
+    """Regression tests for the `cmdh --version` startup path"""
+
+    # Presupuesto de importación para --version (antes ~1s con el SDK de Gemini)
+    IMPORT_BUDGET_US = 250_000
+    HEAVY_MODULES = ('google.generativeai', 'grpc', 'google.protobuf', 'colorama', 'dotenv',
+                     'asyncio', 'sqlite3', 'ssl', 'concurrent.futures')
+
+    def _run_with_importtime(self, *args):
+        """Run cmd_helper.main under -X importtime and parse its report"""
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-m', 'cmd_helper.main', *args],
+            capture_output=True,
+            text=True,
+            cwd=Path(__file__).resolve().parent.parent,
+            check=False
+        )
+        imports = []
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            _, cumulative, raw_name = line[len('import time:'):].split('|')
+            # La indentación del nombre indica la profundidad en el árbol de imports
+            depth = (len(raw_name) - len(raw_name.lstrip()) - 1) // 2
+            imports.append((raw_name.strip(), int(cumulative), depth))
+        return result, imports
+
+    def test_version_does_not_import_heavy_modules(self):
+        """--version must not import provider SDKs, colorama or dotenv"""
+        result, imports = self._run_with_importtime('--version')
+
+        self.assertEqual(result.returncode, 0)
+        self.assertIn('1.0.0', result.stdout)
+        for name, _, _ in imports:
+            with self.subTest(module=name):
+                self.assertFalse(name.startswith(self.HEAVY_MODULES))
+
+    def test_version_import_time_budget(self):
+        """--version imports must stay within a fixed time budget"""
+        _, imports = self._run_with_importtime('--version')
+
+        # Solo los módulos de primer nivel: su tiempo acumulado incluye a sus hijos
+        top_level = [cumulative for name, cumulative, depth in imports
+                     if depth == 0 and name.split('.')[0] in ('cmd_helper', 'click')]
+        self.assertTrue(top_level)
+        self.assertLess(sum(top_level), self.IMPORT_BUDGET_US)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -3,9 +3,18 @@
 Tests for mcp_server module
 """
 
+import asyncio
+import json
+import os
+import sqlite3
+import tempfile
 import unittest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, AsyncMock, MagicMock
+from cmd_helper.cache import ResponseCache
+from cmd_helper.config import Config
+from cmd_helper.i18n import use_language
 from cmd_helper.mcp_server import MCPServer
+from cmd_helper.similarity import SimilarityIndex
 
 
 class TestMCPServer(unittest.TestCase):
@@ -13,8 +22,8 @@ class TestMCPServer(unittest.TestCase):
 
     def setUp(self):
         """Set up test fixtures"""
-        with patch('cmd_helper.mcp_server.genai.configure'):
-            with patch('cmd_helper.mcp_server.genai.GenerativeModel'):
+        with patch('cmd_helper.backends.gemini.genai.configure'):
+            with patch('cmd_helper.backends.gemini.genai.GenerativeModel'):
                 self.server = MCPServer()
 
     def test_parse_response_structured_format(self):
@@ -84,88 +93,7 @@ Este comando lista archivos y filtra por python"""
         self.assertIn('error', result['explanation'].lower())
         self.assertFalse(result['is_dangerous'])
 
-    def test_extract_structured_data(self):
-        """Test structured data extraction"""
-        lines = [
-            "COMANDO: pwd",
-            "EXPLICACIÓN: Muestra directorio actual", 
-            "PELIGRO: NO"
-        ]
-        
-        result = self.server._extract_structured_data(lines)
-        
-        self.assertEqual(result['command'], 'pwd')
-        self.assertEqual(result['explanation'], 'Muestra directorio actual')
-        self.assertFalse(result['is_dangerous'])
-
-    def test_process_command_line(self):
-        """Test command line processing"""
-        result = {'command': None, 'explanation': '', 'is_dangerous': False}
-        
-        self.server._process_command_line("COMANDO: echo hello", result)
-        self.assertEqual(result['command'], 'echo hello')
-        
-        self.server._process_command_line("COMMAND: ls -l", result)
-        self.assertEqual(result['command'], 'ls -l')
-
-    def test_process_explanation_line(self):
-        """Test explanation line processing"""
-        result = {'command': None, 'explanation': '', 'is_dangerous': False}
-        
-        self.server._process_explanation_line("EXPLICACIÓN: Test explanation", result)
-        self.assertEqual(result['explanation'], 'Test explanation')
-        
-        self.server._process_explanation_line("EXPLANATION: English explanation", result)
-        self.assertEqual(result['explanation'], 'English explanation')
-
-    def test_process_danger_line(self):
-        """Test danger line processing"""
-        result = {'command': None, 'explanation': '', 'is_dangerous': False}
-        
-        self.server._process_danger_line("PELIGRO: SI", result)
-        self.assertTrue(result['is_dangerous'])
-        
-        result['is_dangerous'] = False
-        self.server._process_danger_line("DANGER: YES", result)
-        self.assertTrue(result['is_dangerous'])
-        
-        result['is_dangerous'] = False
-        self.server._process_danger_line("PELIGRO: NO", result)
-        self.assertFalse(result['is_dangerous'])
-
-    def test_is_dangerous_response(self):
-        """Test dangerous response detection"""
-        self.assertTrue(self.server._is_dangerous_response("YES"))
-        self.assertTrue(self.server._is_dangerous_response("SI"))
-        self.assertTrue(self.server._is_dangerous_response("yes"))
-        self.assertTrue(self.server._is_dangerous_response("si"))
-        self.assertFalse(self.server._is_dangerous_response("NO"))
-        self.assertFalse(self.server._is_dangerous_response("no"))
-
-    def test_extract_fallback_command(self):
-        """Test fallback command extraction"""
-        lines = [
-            "# This is a comment",
-            "",
-            "ls -la",
-            "more content"
-        ]
-        
-        result = self.server._extract_fallback_command(lines)
-        self.assertEqual(result, "ls -la")
-
-    def test_extract_fallback_command_no_valid_command(self):
-        """Test fallback extraction with no valid command"""
-        lines = [
-            "# Only comments",
-            "",
-            "# Another comment"
-        ]
-        
-        result = self.server._extract_fallback_command(lines)
-        self.assertIsNone(result)
-
-    @patch('cmd_helper.mcp_server.genai.GenerativeModel')
+    @patch('cmd_helper.backends.gemini.genai.GenerativeModel')
     def test_generate_command_success(self, mock_model_class):
         """Test successful command generation"""
         # Mock the model and response
@@ -177,14 +105,14 @@ Este comando lista archivos y filtra por python"""
         mock_response.candidates = [MagicMock()]
         mock_model.generate_content.return_value = mock_response
         
-        with patch('cmd_helper.mcp_server.genai.configure'):
+        with patch('cmd_helper.backends.gemini.genai.configure'):
             server = MCPServer()
             result = server.generate_command("listar archivos")
         
         self.assertEqual(result['command'], 'ls')
         self.assertFalse(result['is_dangerous'])
 
-    @patch('cmd_helper.mcp_server.genai.GenerativeModel')
+    @patch('cmd_helper.backends.gemini.genai.GenerativeModel')
     def test_generate_command_safety_filter(self, mock_model_class):
         """Test command generation with safety filter block"""
         mock_model = MagicMock()
@@ -194,7 +122,7 @@ Este comando lista archivos y filtra por python"""
         mock_response.candidates = []  # Empty candidates = blocked by safety filter
         mock_model.generate_content.return_value = mock_response
         
-        with patch('cmd_helper.mcp_server.genai.configure'):
+        with patch('cmd_helper.backends.gemini.genai.configure'):
             server = MCPServer()
             result = server.generate_command("comando peligroso")
         
@@ -203,7 +131,7 @@ Este comando lista archivos y filtra por python"""
         explanation_lower = result['explanation'].lower()
         self.assertTrue('safety' in explanation_lower or 'seguridad' in explanation_lower)
 
-    @patch('cmd_helper.mcp_server.genai.GenerativeModel')
+    @patch('cmd_helper.backends.gemini.genai.GenerativeModel')
     def test_generate_command_finish_reason_safety(self, mock_model_class):
         """Test command generation with safety finish reason"""
         mock_model = MagicMock()
@@ -216,20 +144,20 @@ Este comando lista archivos y filtra por python"""
         mock_response.candidates = [mock_candidate]
         mock_model.generate_content.return_value = mock_response
         
-        with patch('cmd_helper.mcp_server.genai.configure'):
+        with patch('cmd_helper.backends.gemini.genai.configure'):
             server = MCPServer()
             result = server.generate_command("comando peligroso")
         
         self.assertIsNone(result['command'])
 
-    @patch('cmd_helper.mcp_server.genai.GenerativeModel')
+    @patch('cmd_helper.backends.gemini.genai.GenerativeModel')
     def test_generate_command_exception(self, mock_model_class):
         """Test command generation with exception"""
         mock_model = MagicMock()
         mock_model_class.return_value = mock_model
         mock_model.generate_content.side_effect = Exception("API Error")
         
-        with patch('cmd_helper.mcp_server.genai.configure'):
+        with patch('cmd_helper.backends.gemini.genai.configure'):
             server = MCPServer()
             result = server.generate_command("test command")
         
@@ -237,5 +165,527 @@ Este comando lista archivos y filtra por python"""
         self.assertIn('error', result['explanation'].lower())
 
 
+class TestMCPServerCache(unittest.TestCase):
+    """Test cases for the response cache integration in MCPServer"""
+
+    def setUp(self):
+        """Set up a server with a mocked model"""
+        with patch('cmd_helper.backends.gemini.genai.configure'):
+            with patch('cmd_helper.backends.gemini.genai.GenerativeModel') as mock_model_class:
+                self.mock_model = MagicMock()
+                mock_model_class.return_value = self.mock_model
+                self.server = MCPServer()
+
+        mock_response = MagicMock()
+        mock_response.text = "COMMAND: ls\nEXPLANATION: List files\nDANGER: NO"
+        mock_response.candidates = [MagicMock()]
+        self.mock_model.generate_content.return_value = mock_response
+
+    def test_second_request_served_from_cache(self):
+        """Test that repeating a request skips the model"""
+        first = self.server.generate_command("list files")
+        second = self.server.generate_command("List files ")
+
+        self.assertEqual(first['source'], 'model')
+        self.assertEqual(second['source'], 'cache')
+        self.assertEqual(second['command'], 'ls')
+        self.assertIn('total_ms', second['timings'])
+        self.mock_model.generate_content.assert_called_once()
+
+    def test_prompt_stats_only_for_model_answers(self):
+        """Test that prompt stats describe the compact prompt sent to the model"""
+        first = self.server.generate_command("list files")
+        second = self.server.generate_command("list files")
+
+        prompt = self.mock_model.generate_content.call_args.args[0]
+        self.assertNotIn('\n  ', prompt)
+        self.assertIn('pwd', first['prompt_stats']['sections'])
+        self.assertEqual(first['prompt_stats']['budget'], self.server.config.PROMPT_TOKEN_BUDGET)
+        self.assertNotIn('prompt_stats', second)
+
+    def test_refresh_bypasses_cache(self):
+        """Test that refresh_cache always queries the model"""
+        self.server.generate_command("list files")
+        result = self.server.generate_command("list files", refresh_cache=True)
+
+        self.assertEqual(result['source'], 'model')
+        self.assertEqual(self.mock_model.generate_content.call_count, 2)
+
+    def test_cache_disabled(self):
+        """Test that use_cache=False never stores responses"""
+        self.server.cache = None
+
+        self.server.generate_command("list files")
+        result = self.server.generate_command("list files")
+
+        self.assertEqual(result['source'], 'model')
+        self.assertEqual(self.mock_model.generate_content.call_count, 2)
+
+    def test_failed_responses_not_cached(self):
+        """Test that responses without a command are not cached"""
+        self.mock_model.generate_content.return_value.candidates = []
+
+        self.server.generate_command("list files")
+        self.server.generate_command("list files")
+
+        self.assertEqual(self.mock_model.generate_content.call_count, 2)
+
+    def test_cache_errors_do_not_block_requests(self):
+        """Test that a broken cache falls back to the model"""
+        with patch.object(self.server.cache, 'get', side_effect=sqlite3.OperationalError):
+            result = self.server.generate_command("list files")
+
+        self.assertEqual(result['command'], 'ls')
+
+
+class TestMCPServerStreaming(unittest.TestCase):
+    """Test cases for streaming generation"""
+
+    def setUp(self):
+        """Set up a server whose model streams its answer in small chunks"""
+        with patch('cmd_helper.backends.gemini.genai.configure'):
+            with patch('cmd_helper.backends.gemini.genai.GenerativeModel') as mock_model_class:
+                self.mock_model = MagicMock()
+                mock_model_class.return_value = self.mock_model
+                self.server = MCPServer(use_cache=False)
+
+        self.events = []
+        text = 'COMMAND: find . -name "*.log"\nEXPLANATION: Find log files\nDANGER: NO'
+        pieces = [text[i:i + 7] for i in range(0, len(text), 7)]
+        self.stream = MagicMock()
+        self.stream.__iter__.side_effect = lambda: iter(self._chunks(pieces))
+        self.stream.candidates = [MagicMock(finish_reason=1)]
+        self.mock_model.generate_content.return_value = self.stream
+
+    def _chunks(self, pieces):
+        for piece in pieces:
+            self.events.append(('chunk', piece))
+            yield MagicMock(text=piece)
+
+    def test_command_emitted_before_explanation(self):
+        """Test that the command is shown as soon as its line is complete"""
+        result = self.server.generate_command(
+            "find logs", on_command=lambda command: self.events.append(('command', command))
+        )
+
+        command_event = self.events.index(('command', 'find . -name "*.log"'))
+        streamed = "".join(piece for kind, piece in self.events[:command_event]
+                           if kind == 'chunk')
+        self.assertNotIn('EXPLANATION', streamed.split('\n', 1)[0])
+        self.assertNotIn('DANGER', streamed)
+        self.assertEqual(result['command'], 'find . -name "*.log"')
+        self.assertEqual(result['explanation'], 'Find log files')
+        self.assertIn('first_command_ms', result['timings'])
+        self.assertLessEqual(result['timings']['first_command_ms'],
+                             result['timings']['total_ms'])
+        self.assertTrue(self.mock_model.generate_content.call_args.kwargs['stream'])
+
+    def test_command_emitted_once(self):
+        """Test that on_command is called exactly once"""
+        on_command = MagicMock()
+
+        self.server.generate_command("find logs", on_command=on_command)
+
+        on_command.assert_called_once_with('find . -name "*.log"')
+
+    def test_fenced_command_emitted_when_complete(self):
+        """Test that a multi-line command in a code block is emitted only once it is closed"""
+        text = 'COMMAND:\n```bash\nfor f in *.log; do\n  gzip "$f"\ndone\n```\nEXPLANATION: x'
+        pieces = [text[i:i + 5] for i in range(0, len(text), 5)]
+        self.stream.__iter__.side_effect = lambda: iter(self._chunks(pieces))
+        on_command = MagicMock()
+
+        result = self.server.generate_command("compress logs", on_command=on_command)
+
+        on_command.assert_called_once_with('for f in *.log; do\n  gzip "$f"\ndone')
+        self.assertEqual(result['command'], 'for f in *.log; do\n  gzip "$f"\ndone')
+
+    def test_blocked_stream(self):
+        """Test that blocked streamed responses are reported"""
+        self.stream.__iter__.side_effect = lambda: iter([])
+        self.stream.candidates = []
+        on_command = MagicMock()
+
+        result = self.server.generate_command("find logs", on_command=on_command)
+
+        self.assertIsNone(result['command'])
+        on_command.assert_not_called()
+
+    def test_without_callback_no_streaming(self):
+        """Test that the default path does not request a stream"""
+        self.stream.text = 'COMMAND: ls'
+
+        result = self.server.generate_command("list files")
+
+        self.assertEqual(result['command'], 'ls')
+        self.assertNotIn('stream', self.mock_model.generate_content.call_args.kwargs)
+        self.assertNotIn('first_command_ms', result['timings'])
+
+
+class TestMCPServerJsonOutput(unittest.TestCase):
+    """Test cases for the schema-validated JSON output mode"""
+
+    def setUp(self):
+        """Set up a server in JSON mode"""
+        with patch('cmd_helper.backends.gemini.genai.configure'):
+            with patch('cmd_helper.backends.gemini.genai.GenerativeModel') as mock_model_class:
+                self.mock_model = MagicMock()
+                mock_model_class.return_value = self.mock_model
+                self.server = MCPServer(use_cache=False, language='en', json_output=True)
+
+    def _answer(self, text):
+        """Model answer with the given text"""
+        response = MagicMock(text=text)
+        response.candidates = [MagicMock(finish_reason=1)]
+        self.mock_model.generate_content.return_value = response
+
+    def test_generation_config_has_schema(self):
+        """Test that JSON mode asks the model for JSON matching the schema"""
+        config = self.server.backend.backend.generation_config(self.server._response_schema())
+
+        self.assertEqual(config.response_mime_type, 'application/json')
+        self.assertIn('danger', str(config.response_schema))
+        self.assertIn('JSON', self.server.system_prompt)
+
+    def test_text_mode_by_default(self):
+        """Test that JSON mode is off unless configured"""
+        with patch('cmd_helper.backends.gemini.genai.configure'):
+            with patch('cmd_helper.backends.gemini.genai.GenerativeModel'):
+                server = MCPServer(use_cache=False)
+
+        self.assertFalse(server.json_output)
+        self.assertIsNone(server._response_schema())
+        self.assertIsNone(server.backend.backend.generation_config().response_mime_type)
+
+    def test_json_answer(self):
+        """Test that a valid JSON answer fills the result, alternatives included"""
+        self._answer('{"command": "rm -rf build", "explanation": "Deletes build", '
+                     '"danger": "high", "alternatives": ["rm -ri build"]}')
+
+        result = self.server.generate_command("delete build")
+
+        self.assertEqual(result['command'], 'rm -rf build')
+        self.assertTrue(result['is_dangerous'])
+        self.assertEqual(result['danger_level'], 'high')
+        self.assertEqual(result['alternatives'], ['rm -ri build'])
+
+    def test_invalid_json_falls_back_to_text(self):
+        """Test that an answer that does not match the schema uses the text parser"""
+        self._answer('COMMAND: ls -la\nEXPLANATION: List files\nDANGER: NO')
+
+        result = self.server.generate_command("list files")
+
+        self.assertEqual(result['command'], 'ls -la')
+        self.assertNotIn('danger_level', result)
+
+    def test_streamed_command(self):
+        """Test that the command is emitted as soon as its JSON string is complete"""
+        text = '{"command": "du -sh *", "explanation": "Sizes", "danger": "none"}'
+        events = []
+
+        def chunks():
+            for i in range(0, len(text), 4):
+                events.append(text[i:i + 4])
+                yield MagicMock(text=text[i:i + 4])
+
+        stream = MagicMock()
+        stream.__iter__.side_effect = chunks
+        stream.candidates = [MagicMock(finish_reason=1)]
+        self.mock_model.generate_content.return_value = stream
+
+        result = self.server.generate_command("sizes", on_command=events.append)
+
+        self.assertIn('du -sh *', events)
+        self.assertNotIn('Sizes', ''.join(events[:events.index('du -sh *')]))
+        self.assertEqual(result['command'], 'du -sh *')
+
+
+class TestMCPServerAsync(unittest.TestCase):
+    """Test cases for agenerate_command"""
+
+    CONTEXT = {'pwd': '/tmp', 'platform': {'system': 'Linux'}, 'files': []}
+
+    def setUp(self):
+        """Set up a server with a mocked async model"""
+        with patch('cmd_helper.backends.gemini.genai.configure'):
+            with patch('cmd_helper.backends.gemini.genai.GenerativeModel') as mock_model_class:
+                self.mock_model = MagicMock()
+                mock_model_class.return_value = self.mock_model
+                self.server = MCPServer()
+        self.server.cache = None
+
+        self.response = MagicMock()
+        self.response.text = "COMMAND: ls\nEXPLANATION: List files\nDANGER: NO"
+        self.response.candidates = [MagicMock()]
+        self.active = 0
+        self.max_active = 0
+
+        async def generate_content_async(prompt, generation_config=None):
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            await asyncio.sleep(0.05)
+            self.active -= 1
+            return self.response
+
+        self.mock_model.generate_content_async = AsyncMock(side_effect=generate_content_async)
+
+    def test_generate(self):
+        """Test an async generation with the shared parser"""
+        result = asyncio.run(self.server.agenerate_command("list files", context=self.CONTEXT))
+
+        self.assertEqual(result['command'], 'ls')
+        self.assertEqual(result['source'], 'model')
+        self.assertIn('model_ms', result['timings'])
+        self.assertIn('pwd', result['prompt_stats']['sections'])
+        self.mock_model.generate_content.assert_not_called()
+
+    def test_collects_context_asynchronously(self):
+        """Test that the async context collector is used when no context is given"""
+        with patch.object(self.server.context_analyzer, 'aget_current_context',
+                          AsyncMock(return_value=self.CONTEXT)) as mock_context:
+            asyncio.run(self.server.agenerate_command("list files", cwd='/tmp'))
+
+        mock_context.assert_awaited_once_with(cwd='/tmp', environ=None,
+                                              user_request="list files")
+
+    def test_concurrency_limit(self):
+        """Test that concurrent generations respect async_concurrency"""
+        self.server.async_concurrency = 3
+
+        async def run_many():
+            return await asyncio.gather(*(
+                self.server.agenerate_command(f"request {i}", context=self.CONTEXT)
+                for i in range(12)
+            ))
+
+        results = asyncio.run(run_many())
+
+        self.assertEqual(len(results), 12)
+        self.assertEqual(self.max_active, 3)
+
+    def test_timeout(self):
+        """Test that a per-call timeout returns an error result"""
+        result = asyncio.run(self.server.agenerate_command(
+            "list files", context=self.CONTEXT, timeout=0.01
+        ))
+
+        self.assertIsNone(result['command'])
+        self.assertEqual(result['source'], 'timeout')
+        self.assertIn('0.01', result['explanation'])
+
+    def test_cancellation_propagates(self):
+        """Test that cancelling the task cancels the generation"""
+        async def cancel_soon():
+            task = asyncio.ensure_future(
+                self.server.agenerate_command("list files", context=self.CONTEXT)
+            )
+            await asyncio.sleep(0.01)
+            task.cancel()
+            await task
+
+        with self.assertRaises(asyncio.CancelledError):
+            asyncio.run(cancel_soon())
+
+    def test_model_errors(self):
+        """Test that model errors are reported like in the sync path"""
+        self.mock_model.generate_content_async = AsyncMock(side_effect=Exception("API Error"))
+
+        result = asyncio.run(self.server.agenerate_command("list files", context=self.CONTEXT))
+
+        self.assertIsNone(result['command'])
+        self.assertIn('API Error', result['explanation'])
+
+    def test_cache_shared_with_sync_path(self):
+        """Test that an answer cached by the sync path is reused by the async one"""
+        with tempfile.TemporaryDirectory() as cache_dir:
+            self.server.cache = ResponseCache(cache_dir)
+            self.server.similarity_index = SimilarityIndex(self.server.cache)
+            self.mock_model.generate_content.return_value = self.response
+
+            self.server.generate_command("list files", context=self.CONTEXT)
+            result = asyncio.run(self.server.agenerate_command("list files", context=self.CONTEXT))
+
+        self.assertEqual(result['source'], 'cache')
+        self.mock_model.generate_content_async.assert_not_called()
+
+    def test_concurrent_languages(self):
+        """Test that concurrent tasks keep their own language for prompt and cache"""
+        with tempfile.TemporaryDirectory() as cache_dir:
+            self.server.cache = ResponseCache(cache_dir)
+            self.server.similarity_index = SimilarityIndex(self.server.cache)
+
+            async def generate(language):
+                with use_language(language):
+                    return await self.server.agenerate_command("list files",
+                                                               context=self.CONTEXT)
+
+            async def main():
+                return await asyncio.gather(generate('en'), generate('es'))
+
+            asyncio.run(main())
+            cached = asyncio.run(generate('en'))
+
+        prompts = [call.args[0] for call in self.mock_model.generate_content_async.call_args_list]
+        self.assertEqual(sorted(prompt.startswith('You are') for prompt in prompts),
+                         [False, True])
+        self.assertEqual(cached['source'], 'cache')
+
+
+class TestMCPServerLanguage(unittest.TestCase):
+    """Test cases for the per-request language"""
+
+    def setUp(self):
+        """Set up a Spanish server with a mocked model"""
+        with patch('cmd_helper.backends.gemini.genai.configure'):
+            with patch('cmd_helper.backends.gemini.genai.GenerativeModel') as mock_model_class:
+                self.mock_model = MagicMock()
+                mock_model_class.return_value = self.mock_model
+                self.server = MCPServer(use_cache=False, language='es')
+        response = MagicMock(text="COMMAND: ls\nEXPLANATION: List files\nDANGER: NO")
+        response.candidates = [MagicMock()]
+        self.mock_model.generate_content.return_value = response
+
+    def _prompt(self):
+        """Prompt of the last model call"""
+        return self.mock_model.generate_content.call_args.args[0]
+
+    def test_prompt_selected_per_request(self):
+        """Test that the system prompt follows the active language of each request"""
+        self.server.generate_command("list files")
+        self.assertTrue(self._prompt().startswith('Eres'))
+
+        with use_language('en'):
+            self.server.generate_command("list files")
+            self.assertIn('You are', self.server.system_prompt)
+        self.assertTrue(self._prompt().startswith('You are'))
+
+        self.assertEqual(self.server.language, 'es')
+        self.assertIn('Eres', self.server.system_prompt)
+
+    def test_messages_in_request_language(self):
+        """Test that error messages use the language of the request"""
+        self.mock_model.generate_content.side_effect = Exception("API Error")
+
+        with use_language('en'):
+            english = self.server.generate_command("list files")['explanation']
+        with use_language('es'):
+            spanish = self.server.generate_command("list files")['explanation']
+
+        self.assertNotEqual(english.replace('API Error', ''), spanish.replace('API Error', ''))
+
+
+class TestMCPServerFakeBackend(unittest.TestCase):
+    """Test cases for the whole pipeline offline with the fake backend"""
+
+    def _server(self, **settings):
+        """Server with the fake backend and a fresh cache"""
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        config = Config(BACKEND='fake', FAKE_LATENCY='fixed:0', CACHE_DIR=cache_dir.name,
+                        **settings)
+        return MCPServer(language='en', config=config)
+
+    def test_generate_and_cache(self):
+        """Test that the answer is parsed and cached under the fake model id"""
+        server = self._server()
+
+        result = server.generate_command("show disk space")
+        cached = server.generate_command("show disk space")
+
+        self.assertEqual(result['command'], 'df -h')
+        self.assertEqual(result['source'], 'model')
+        self.assertEqual(cached['source'], 'cache')
+        self.assertEqual(server.backend.backend.calls, 1)
+        self.assertTrue(server.backend.model_id.startswith('fake:'))
+
+    def test_stream_and_json(self):
+        """Test streaming in text mode and JSON mode"""
+        for json_output in (False, True):
+            with self.subTest(json_output=json_output):
+                server = self._server(JSON_OUTPUT=json_output)
+                commands = []
+
+                result = server.generate_command("list files", on_command=commands.append)
+
+                self.assertEqual(commands, ['ls -la'])
+                self.assertEqual(result['command'], 'ls -la')
+
+    def test_backend_error(self):
+        """Test that backend errors become error results"""
+        server = self._server(FAKE_ERROR_RATE=1.0, MAX_RETRIES=0)
+
+        result = server.generate_command("list files")
+        async_result = asyncio.run(server.agenerate_command("list files"))
+
+        self.assertIsNone(result['command'])
+        self.assertIn('Fake backend error', result['explanation'])
+        self.assertIsNone(async_result['command'])
+
+    def test_fallback_when_unavailable(self):
+        """Test that an unavailable model falls back to the same request in another context"""
+        server = self._server(MAX_RETRIES=0, BREAKER_THRESHOLD=1)
+        server.generate_command("show disk space")
+        fake = server.backend.backend
+
+        fake.inject_faults(1)
+        with tempfile.TemporaryDirectory() as other_dir:
+            fallback = server.generate_command("show disk space", cwd=other_dir)
+            unavailable = server.generate_command("list files", cwd=other_dir)
+
+        self.assertEqual((fallback['source'], fallback['command']), ('fallback', 'df -h'))
+        self.assertIsNone(unavailable['command'])
+        self.assertIn('unavailable', unavailable['explanation'])
+        self.assertEqual(fake.calls, 2)
+
+
+
+class TestMCPServerLocalIntents(unittest.TestCase):
+    """Test cases for requests answered by local intents before the model"""
+
+    def _server(self, **settings):
+        """Server with the fake backend, local intents and a fresh cache"""
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        config = Config(BACKEND='fake', FAKE_LATENCY='fixed:0', CACHE_DIR=cache_dir.name,
+                        LOCAL_INTENTS=True, **settings)
+        return MCPServer(language='en', config=config)
+
+    def test_answered_without_model(self):
+        """Test that a common request skips context, cache and model"""
+        server = self._server()
+
+        result = server.generate_command("list python files")
+        async_result = asyncio.run(server.agenerate_command("lista los archivos de python"))
+
+        for answer in (result, async_result):
+            self.assertEqual(answer['command'], "find . -type f -name '*.py'")
+            self.assertEqual((answer['source'], answer['intent']), ('rules', 'list-files-by-type'))
+            self.assertFalse(answer['is_dangerous'])
+            self.assertNotIn('context_ms', answer['timings'])
+            self.assertIn('rules_ms', answer['timings'])
+        self.assertEqual(server.backend.backend.calls, 0)
+        self.assertEqual(server.cache.stats()['entries'], 0)
+
+    def test_other_requests_and_disabled(self):
+        """Test that unmatched requests, or all with intents disabled, go to the model"""
+        server = self._server()
+        self.assertEqual(server.generate_command("compress the logs")['source'], 'model')
+
+        server = MCPServer(language='en', config=server.config, use_intents=False)
+        self.assertEqual(server.generate_command("list files")['source'], 'model')
+
+    def test_same_danger_checks(self):
+        """Test that user intents go through the danger rules"""
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+            json.dump([{'id': 'clean', 'patterns': ['clean (?P<path>\\S+)'],
+                        'command': 'rm -rf {path}'}], f)
+        self.addCleanup(os.unlink, f.name)
+        server = self._server(INTENTS_FILE=f.name)
+
+        result = server.generate_command("clean build")
+
+        self.assertEqual((result['command'], result['intent']), ('rm -rf build', 'clean'))
+        self.assertTrue(result['is_dangerous'])
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for prompt_builder module
+"""
+
+import json
+import unittest
+from cmd_helper.prompt_builder import build_prompt, compact_json, estimate_tokens
+
+
+def _context_json(prompt):
+    """Extrae el objeto JSON del contexto de un prompt"""
+    return json.loads(prompt.split('\n')[1])
+
+
+class TestPromptBuilder(unittest.TestCase):
+    """Test cases for build_prompt"""
+
+    def setUp(self):
+        """Set up a context similar to the one collected by ContextAnalyzer"""
+        self.context = {
+            'pwd': '/home/user/project',
+            'platform': {'system': 'Linux', 'release': '6.1', 'shell': '/bin/bash'},
+            'files': [{'name': f'module{i}.py', 'type': 'file', 'size': 2048} for i in range(50)]
+                     + [{'name': 'src', 'type': 'dir', 'size': None}],
+            'git_info': {'branch': 'main', 'has_changes': False, 'is_git_repo': True},
+            'env_vars': {
+                'PATH': ':'.join(f'/opt/tool{i}/bin' for i in range(30)) + ':/opt/tool0/bin',
+                'HOME': '/home/user'
+            },
+            'recent_commands': [f'git commit -m "change {i}"' for i in range(10)]
+        }
+
+    def test_estimate_tokens(self):
+        """Test the token estimate"""
+        self.assertEqual(estimate_tokens(''), 0)
+        self.assertEqual(estimate_tokens('abcd'), 1)
+        self.assertEqual(estimate_tokens('abcde'), 2)
+
+    def test_compact_json(self):
+        """Test that JSON has no whitespace and keeps non-ASCII text"""
+        self.assertEqual(compact_json({'a': [1, 2], 'b': 'ñ'}), '{"a":[1,2],"b":"ñ"}')
+
+    def test_large_budget_keeps_everything(self):
+        """Test that all sections are sent when they fit"""
+        prompt, stats = build_prompt('SYSTEM', self.context, 'list files', 100000)
+
+        context = _context_json(prompt)
+        self.assertEqual(list(context), list(self.context))
+        self.assertEqual(len(context['files']), 51)
+        self.assertIn('module0.py 2.0K', context['files'])
+        self.assertIn('src/', context['files'])
+        self.assertEqual(stats['dropped'], [])
+        self.assertEqual(stats['condensed'], [])
+        self.assertTrue(prompt.startswith('SYSTEM\n'))
+        self.assertTrue(prompt.endswith('list files'))
+
+    def test_path_is_always_condensed(self):
+        """Test that PATH is deduplicated and truncated"""
+        prompt, _ = build_prompt('SYSTEM', self.context, 'list files', 100000)
+
+        path = _context_json(prompt)['env_vars']['PATH'].split(':')
+        self.assertEqual(len(path), 9)
+        self.assertEqual(path[-1], '…(+22)')
+
+    def test_compact_prompt_is_smaller_than_indented_json(self):
+        """Test the size reduction against the previous indented serialization"""
+        prompt, _ = build_prompt('', self.context, '', 100000)
+
+        self.assertLess(len(prompt), len(json.dumps(self.context, indent=2)) / 2)
+
+    def test_sections_are_condensed_before_dropped(self):
+        """Test that a tight budget condenses low priority sections first"""
+        _, full_stats = build_prompt('SYSTEM', self.context, 'list files', 100000)
+        budget = full_stats['total'] - 20
+
+        prompt, stats = build_prompt('SYSTEM', self.context, 'list files', budget)
+
+        self.assertLessEqual(stats['total'], budget)
+        self.assertEqual(stats['condensed'], ['env_vars'])
+        self.assertEqual(stats['dropped'], [])
+        self.assertNotIn('PATH', _context_json(prompt)['env_vars'])
+
+    def test_tiny_budget_keeps_required_sections(self):
+        """Test that pwd and platform survive any budget"""
+        prompt, stats = build_prompt('SYSTEM', self.context, 'list files', 1)
+
+        context = _context_json(prompt)
+        self.assertEqual(list(context), ['pwd', 'platform'])
+        self.assertEqual(stats['dropped'], ['env_vars', 'recent_commands', 'git_info', 'files'])
+        self.assertEqual(list(stats['sections']), ['pwd', 'platform'])
+
+    def test_stats_match_prompt(self):
+        """Test that section stats add up to the reported total"""
+        prompt, stats = build_prompt('SYSTEM', self.context, 'list files', 300)
+
+        self.assertLessEqual(stats['total'], 300)
+        self.assertLessEqual(abs(stats['total'] - estimate_tokens(prompt)), 3)
+        self.assertEqual(stats['budget'], 300)
+
+    def test_summary_and_errors_are_kept(self):
+        """Test that listing summaries and errors are not converted to text"""
+        self.context['files'] = [{'name': 'a.txt', 'type': 'file', 'size': 10},
+                                 {'summary': {'entries': 5000}}]
+
+        prompt, _ = build_prompt('SYSTEM', self.context, 'list files', 100000)
+
+        self.assertEqual(_context_json(prompt)['files'],
+                         ['a.txt 10B', {'summary': {'entries': 5000}}])
+
+    def test_empty_sections(self):
+        """Test that empty or missing collector results are sent unchanged"""
+        self.context['files'] = []
+        self.context['recent_commands'] = []
+
+        prompt, _ = build_prompt('SYSTEM', self.context, 'list files', 100000)
+
+        context = _context_json(prompt)
+        self.assertEqual(context['files'], [])
+        self.assertEqual(context['recent_commands'], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for response_parser module
+"""
+
+import random
+import unittest
+from cmd_helper.response_parser import (ParsedResponse, is_affirmative, json_command,
+                                        parse_json_response, parse_response)
+
+COMMANDS = [
+    'ls -la', 'find . -name "*.py" -type f', 'du -sh * | sort -h', 'grep -rn "TODO:" src',
+    'tar czf backup.tgz ~/docs', "awk -F: '{print $1}' /etc/passwd", 'echo "COMMAND: x"',
+    'git log --format="%h %s" -n 5', 'rm -rf build_', 'python3 -m http.server 8000'
+]
+EXPLANATIONS = ['Lista archivos con detalles', 'Finds Python files', 'Shows sizes: sorted',
+                'Busca TODO en el código']
+
+
+def _labels(language):
+    """Etiquetas del formato en el idioma indicado"""
+    if language == 'es':
+        return 'COMANDO', 'EXPLICACIÓN', 'PELIGRO', 'SI', 'NO'
+    return 'COMMAND', 'EXPLANATION', 'DANGER', 'YES', 'NO'
+
+
+def _render(rng, command, explanation, dangerous):
+    """Respuesta con el formato pedido y decoración markdown aleatoria"""
+    command_label, explanation_label, danger_label, yes, no = _labels(rng.choice(['es', 'en']))
+    style = rng.choice(['plain', 'bold', 'bold-label', 'bullet', 'numbered', 'heading'])
+    prefix = {'bullet': '- ', 'numbered': '1. ', 'heading': '### '}.get(style, '')
+
+    def label(name):
+        if style == 'bold':
+            return f"{prefix}**{name}:** "
+        if style == 'bold-label':
+            return f"{prefix}**{name}**: "
+        return f"{prefix}{name}: "
+
+    if '\n' in command or rng.random() < 0.3:
+        command_part = f"{label(command_label).rstrip()}\n```{rng.choice(['bash', 'sh', ''])}\n" \
+                       f"{command}\n```"
+    elif rng.random() < 0.5:
+        command_part = f"{label(command_label)}`{command}`"
+    else:
+        command_part = f"{label(command_label)}{command}"
+
+    danger = f"{yes} - {explanation}" if dangerous else no
+    lines = [
+        rng.choice(['', 'Here you go:\n', 'Claro, aquí tienes:\n\n']) + command_part,
+        f"{label(explanation_label)}{explanation}",
+        f"{label(danger_label)}{danger}"
+    ]
+    return ('\n' if rng.random() < 0.5 else '\n\n').join(lines) + rng.choice(['', '\n', '\n\n'])
+
+
+class TestParseResponse(unittest.TestCase):
+    """Test cases for the single-pass response parser"""
+
+    def test_structured_format(self):
+        """Spanish structured format"""
+        parsed = parse_response("COMANDO: pwd\nEXPLICACIÓN: Muestra directorio actual\nPELIGRO: NO")
+
+        self.assertIsInstance(parsed, ParsedResponse)
+        self.assertEqual(parsed.command, 'pwd')
+        self.assertEqual(parsed.explanation, 'Muestra directorio actual')
+        self.assertFalse(parsed.is_dangerous)
+        self.assertTrue(parsed.structured)
+
+    def test_labels_in_both_languages(self):
+        """Command labels are recognized in both languages"""
+        self.assertEqual(parse_response("COMANDO: echo hello").command, 'echo hello')
+        self.assertEqual(parse_response("COMMAND: ls -l").command, 'ls -l')
+        self.assertEqual(parse_response("EXPLICACIÓN: Test explanation").explanation,
+                         'Test explanation')
+        self.assertEqual(parse_response("EXPLANATION: English explanation").explanation,
+                         'English explanation')
+
+    def test_danger_line(self):
+        """The danger flag follows the DANGER/PELIGRO value"""
+        self.assertTrue(parse_response("PELIGRO: SI").is_dangerous)
+        self.assertTrue(parse_response("DANGER: YES").is_dangerous)
+        self.assertTrue(parse_response("PELIGRO: Sí, borra datos").is_dangerous)
+        self.assertFalse(parse_response("PELIGRO: NO").is_dangerous)
+        self.assertFalse(parse_response("PELIGRO: SIN riesgo").is_dangerous)
+
+    def test_is_affirmative(self):
+        """YES/SI in any case is affirmative"""
+        for text in ('YES', 'SI', 'yes', 'si', '**YES**', 'Sí'):
+            with self.subTest(text=text):
+                self.assertTrue(is_affirmative(text))
+        for text in ('NO', 'no', '', 'Nothing', 'SIN'):
+            with self.subTest(text=text):
+                self.assertFalse(is_affirmative(text))
+
+    def test_markdown_noise(self):
+        """Bold labels, bullets and inline code are removed"""
+        parsed = parse_response("- **COMMAND:** `du -sh *`\n- **EXPLANATION**: Sizes\n"
+                                "- **DANGER:** **NO**")
+
+        self.assertEqual(parsed.command, 'du -sh *')
+        self.assertEqual(parsed.explanation, 'Sizes')
+        self.assertFalse(parsed.is_dangerous)
+
+    def test_fenced_multiline_command(self):
+        """A command label followed by a code block takes the whole block"""
+        parsed = parse_response("COMMAND:\n```bash\nfor f in *.log; do\n  gzip \"$f\"\ndone\n```\n"
+                                "EXPLANATION: Compress logs\nDANGER: NO")
+
+        self.assertEqual(parsed.command, 'for f in *.log; do\n  gzip "$f"\ndone')
+        self.assertEqual(parsed.explanation, 'Compress logs')
+        self.assertTrue(parsed.structured)
+
+    def test_unclosed_block(self):
+        """An unclosed code block is complete only when the response is"""
+        text = "COMMAND:\n```bash\nls -la\necho done"
+        self.assertEqual(parse_response(text).command, 'ls -la\necho done')
+        self.assertFalse(parse_response(text, partial=True).structured)
+
+    def test_first_label_wins(self):
+        """Repeated labels keep their first value"""
+        parsed = parse_response("COMMAND: ls\nCOMMAND: rm -rf /\nDANGER: NO\nDANGER: YES")
+        self.assertEqual(parsed.command, 'ls')
+        self.assertFalse(parsed.is_dangerous)
+
+    def test_fallback_code_block(self):
+        """Without labels the first code block is the command"""
+        parsed = parse_response("Run this:\n\n```sh\ndf -h\n```\nIt shows free space.")
+        self.assertEqual(parsed.command, 'df -h')
+        self.assertFalse(parsed.structured)
+
+    def test_fallback_command_line(self):
+        """Without labels a command-looking line is preferred over prose"""
+        parsed = parse_response("Aquí tienes el comando que necesitas:\n\n"
+                                "ls -la | grep python\n\n"
+                                "Este comando lista archivos y filtra por python")
+        self.assertEqual(parsed.command, 'ls -la | grep python')
+
+    def test_fallback_any_line(self):
+        """Comments and blank lines are skipped"""
+        self.assertEqual(parse_response("# This is a comment\n\nls -la\nmore content").command,
+                         'ls -la')
+        self.assertEqual(parse_response("# comment\n\nuptime").command, 'uptime')
+
+    def test_no_command(self):
+        """Responses without any candidate give no command"""
+        self.assertIsNone(parse_response("# Only comments\n\n# Another comment").command)
+        self.assertIsNone(parse_response("").command)
+
+    def test_as_result(self):
+        """as_result returns the dictionary used by MCPServer"""
+        result = parse_response("COMMAND: ls\nDANGER: YES").as_result()
+        self.assertEqual(result, {'command': 'ls', 'explanation': '', 'is_dangerous': True})
+
+
+class TestParseJsonResponse(unittest.TestCase):
+    """Test cases for the JSON output mode"""
+
+    def test_valid_answer(self):
+        """A valid object is parsed with its danger level and alternatives"""
+        parsed = parse_json_response('{"command": "ls -la", "explanation": "Lists files", '
+                                     '"danger": "none", "alternatives": ["ls -l", "ls -la"]}')
+
+        self.assertEqual(parsed.command, 'ls -la')
+        self.assertEqual(parsed.explanation, 'Lists files')
+        self.assertFalse(parsed.is_dangerous)
+        self.assertEqual(parsed.danger_level, 'none')
+        self.assertEqual(parsed.alternatives, ('ls -l',))
+        self.assertTrue(parsed.structured)
+
+    def test_danger_levels(self):
+        """Only the highest danger level marks the command as dangerous"""
+        for level, dangerous in (('none', False), ('low', False), ('high', True)):
+            with self.subTest(level=level):
+                parsed = parse_json_response(
+                    f'{{"command": "x", "explanation": "", "danger": "{level}"}}')
+                self.assertEqual(parsed.is_dangerous, dangerous)
+
+    def test_fenced_json(self):
+        """JSON wrapped in a code block is accepted"""
+        parsed = parse_json_response('```json\n{"command": "pwd", "explanation": "", '
+                                     '"danger": "low"}\n```')
+        self.assertEqual(parsed.command, 'pwd')
+
+    def test_empty_command(self):
+        """An empty command means the model could not suggest one"""
+        parsed = parse_json_response('{"command": " ", "explanation": "No", "danger": "none"}')
+        self.assertIsNone(parsed.command)
+
+    def test_schema_violations(self):
+        """Answers that are not JSON or do not match the schema give None"""
+        for text in ('COMMAND: ls', '[]', '{"command": "ls"}',
+                     '{"command": 1, "explanation": "", "danger": "none"}',
+                     '{"command": "ls", "explanation": "", "danger": "maybe"}',
+                     '{"command": "ls", "explanation": "", "danger": "none", '
+                     '"alternatives": "ls -l"}',
+                     '{"command": "ls", "explanation": "", "danger": "none", '
+                     '"alternatives": [1]}'):
+            with self.subTest(text=text):
+                self.assertIsNone(parse_json_response(text))
+
+    def test_as_result_extras(self):
+        """as_result includes the JSON-only fields when present"""
+        result = parse_json_response('{"command": "ls", "explanation": "", "danger": "low", '
+                                     '"alternatives": ["dir"]}').as_result()
+        self.assertEqual(result['danger_level'], 'low')
+        self.assertEqual(result['alternatives'], ['dir'])
+
+    def test_json_command(self):
+        """The streamed command is available once its string is complete"""
+        text = '{"command": "echo \\"a b\\"", "explanation": "Prints"}'
+        self.assertIsNone(json_command(text[:text.index('b')]))
+        self.assertEqual(json_command(text[:text.index(', "explanation')]), 'echo "a b"')
+        self.assertIsNone(json_command('{"command": "", '))
+
+
+class TestParseResponseProperties(unittest.TestCase):
+    """Property tests over randomly generated responses"""
+
+    def test_round_trip(self):
+        """Any rendering of the format is parsed back to its fields"""
+        rng = random.Random(1234)
+        commands = COMMANDS + ['for f in *.txt; do\n  wc -l "$f"\ndone']
+        for _ in range(2000):
+            command = rng.choice(commands)
+            explanation = rng.choice(EXPLANATIONS)
+            dangerous = rng.random() < 0.5
+            text = _render(rng, command, explanation, dangerous)
+            with self.subTest(text=text):
+                parsed = parse_response(text)
+                self.assertEqual(parsed.command, command)
+                self.assertEqual(parsed.explanation, explanation)
+                self.assertEqual(parsed.is_dangerous, dangerous)
+                self.assertTrue(parsed.structured)
+
+    def test_streamed_prefixes(self):
+        """A structured command from a prefix is always the final command"""
+        rng = random.Random(99)
+        for _ in range(300):
+            text = _render(rng, rng.choice(COMMANDS), rng.choice(EXPLANATIONS), False)
+            final = parse_response(text).command
+            for end in range(len(text)):
+                prefix = text[:text.rfind('\n', 0, end) + 1]
+                parsed = parse_response(prefix, partial=True)
+                if parsed.structured:
+                    self.assertEqual(parsed.command, final, text)
+
+    def test_random_text_never_fails(self):
+        """Arbitrary text never raises and any command comes from the input"""
+        rng = random.Random(7)
+        alphabet = 'abc ls|>:`*#_-\n\tCOMANDO:DANGER:```~~~ÍíSIYES'
+        for _ in range(3000):
+            text = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 120)))
+            parsed = parse_response(text)
+            self.assertIsInstance(parsed.is_dangerous, bool)
+            if parsed.command is not None:
+                self.assertTrue(parsed.command.strip())
+                self.assertIn(parsed.command.split('\n')[0].strip(), text)
+
+
+if __name__ == '__main__':
+    unittest.main()
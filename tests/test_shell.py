@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for shell module
+"""
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch, MagicMock
+from cmd_helper.shell import InteractiveSession, refine_request
+
+
+class TestInteractiveSession(unittest.TestCase):
+    """Test cases for InteractiveSession"""
+
+    def setUp(self):
+        """Set up a session with a mocked CmdHelper"""
+        self.app = MagicMock()
+        self.app.process_request.return_value = {'command': 'ls -la', 'explanation': 'List'}
+        self.session = InteractiveSession(self.app)
+        self.session.context = MagicMock()
+        self.session.context.get.return_value = {'pwd': '/tmp'}
+        cwd = os.getcwd()
+        self.addCleanup(os.chdir, cwd)
+
+    def test_request_uses_session_context(self):
+        """Test that requests are processed with the session context"""
+        self.assertTrue(self.session.handle('list files'))
+
+        self.app.process_request.assert_called_once_with('list files', context={'pwd': '/tmp'})
+        self.assertEqual(self.session.previous, ('list files', 'ls -la'))
+
+    def test_exit_commands(self):
+        """Test that exit and quit end the session"""
+        self.assertFalse(self.session.handle('exit'))
+        self.assertFalse(self.session.handle(' quit '))
+        self.app.process_request.assert_not_called()
+
+    def test_empty_line(self):
+        """Test that empty lines are ignored"""
+        self.assertTrue(self.session.handle('   '))
+        self.app.process_request.assert_not_called()
+
+    @patch('builtins.print')
+    def test_refinement(self, _):
+        """Test that '+' refines the previous answer"""
+        self.session.handle('list files')
+        self.app.process_request.return_value = {'command': 'ls -laS', 'explanation': ''}
+
+        self.session.handle('+ sorted by size')
+
+        request = self.app.process_request.call_args.args[0]
+        self.assertEqual(request, refine_request('list files', 'ls -la', 'sorted by size'))
+        self.assertEqual(self.session.previous, (request, 'ls -laS'))
+
+    @patch('builtins.print')
+    def test_refinement_without_previous(self, mock_print):
+        """Test that a refinement needs a previous command"""
+        self.session.handle('+ sorted by size')
+
+        self.app.process_request.assert_not_called()
+        mock_print.assert_called_once()
+
+    def test_failed_request_keeps_previous(self):
+        """Test that answers without command are not refined"""
+        self.session.handle('list files')
+        self.app.process_request.return_value = {'command': None, 'explanation': 'No'}
+
+        self.session.handle('something impossible')
+
+        self.assertEqual(self.session.previous, ('list files', 'ls -la'))
+
+    def test_cd(self):
+        """Test the built-in cd"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            self.session.handle(f'cd {temp_dir}')
+
+            self.assertEqual(os.path.realpath(os.getcwd()), os.path.realpath(temp_dir))
+            self.assertTrue(self.session.prompt().endswith(f'{os.path.basename(temp_dir)}> '))
+        self.app.process_request.assert_not_called()
+
+    @patch('builtins.print')
+    def test_cd_error(self, mock_print):
+        """Test that cd to a missing directory is reported"""
+        cwd = os.getcwd()
+
+        self.session.handle('cd /does/not/exist')
+
+        self.assertEqual(os.getcwd(), cwd)
+        mock_print.assert_called_once()
+
+    @patch('builtins.print')
+    def test_run_until_eof(self, _):
+        """Test the loop with a first request, a typed request and Ctrl-D"""
+        with patch('builtins.input', side_effect=['show disk usage', EOFError]):
+            self.session.run(first_request='list files')
+
+        requests = [call.args[0] for call in self.app.process_request.call_args_list]
+        self.assertEqual(requests, ['list files', 'show disk usage'])
+
+    @patch('builtins.print')
+    def test_ctrl_c_cancels_only_the_request(self, _):
+        """Test that Ctrl-C during a request keeps the session open"""
+        self.app.process_request.side_effect = [KeyboardInterrupt, {'command': None}]
+        with patch('builtins.input', side_effect=['first', 'second', 'exit']):
+            self.session.run()
+
+        self.assertEqual(self.app.process_request.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
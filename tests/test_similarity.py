@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for similarity module
+"""
+
+import tempfile
+import time
+import unittest
+from cmd_helper.cache import ResponseCache
+from cmd_helper.similarity import SimilarityIndex, shingles, jaccard, parameters
+
+
+class TestShingles(unittest.TestCase):
+    """Test cases for the shingle helpers"""
+
+    def test_shingles_contain_char_ngrams_and_tokens(self):
+        """Test shingle generation"""
+        grams = shingles('list files')
+
+        self.assertIn(' li', grams)
+        self.assertIn('les', grams)
+        self.assertIn('#list', grams)
+        self.assertIn('#files', grams)
+
+    def test_empty_request(self):
+        """Test that empty requests have no shingles"""
+        self.assertEqual(shingles('   '), frozenset())
+
+    def test_jaccard(self):
+        """Test Jaccard similarity"""
+        self.assertEqual(jaccard({'a', 'b'}, {'a', 'b'}), 1.0)
+        self.assertEqual(jaccard({'a', 'b'}, {'c'}), 0.0)
+        self.assertAlmostEqual(jaccard({'a', 'b', 'c'}, {'a', 'b', 'd'}), 0.5)
+        self.assertEqual(jaccard(set(), {'a'}), 0.0)
+
+    def test_parameters(self):
+        """Test parameter token extraction"""
+        self.assertEqual(parameters('find files larger than 100mb in /tmp'),
+                         frozenset({'100mb', '/tmp'}))
+        self.assertEqual(parameters('list python files'), frozenset())
+
+
+class TestSimilarityIndex(unittest.TestCase):
+    """Test cases for SimilarityIndex class"""
+
+    def setUp(self):
+        """Set up a cache and index in a temporary directory"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = ResponseCache(cache_dir=self.temp_dir.name, ttl=3600, max_entries=100)
+        self.index = SimilarityIndex(self.cache, threshold=0.7)
+        self.scope = SimilarityIndex.make_scope('en', 'gemini-2.5-flash', '/project')
+        self.result = {'command': 'find . -name "*.py"', 'explanation': 'Find Python files',
+                       'is_dangerous': False}
+
+    def tearDown(self):
+        """Remove the temporary directory"""
+        self.temp_dir.cleanup()
+
+    def _store(self, key, request, scope=None):
+        self.cache.set(key, request, self.result)
+        self.index.add(key, request, scope or self.scope)
+
+    def test_lookup_finds_paraphrase(self):
+        """Test that a close paraphrase returns the stored answer"""
+        self._store('k1', 'list python files')
+
+        match = self.index.lookup('list all python files', self.scope)
+
+        self.assertIsNotNone(match)
+        payload, matched_request, similarity = match
+        self.assertEqual(payload, self.result)
+        self.assertEqual(matched_request, 'list python files')
+        self.assertGreaterEqual(similarity, 0.7)
+
+    def test_lookup_picks_best_match(self):
+        """Test that the most similar stored request wins"""
+        self._store('k1', 'list python files in this folder')
+        self._store('k2', 'list python files')
+
+        _, matched_request, _ = self.index.lookup('list the python files', self.scope)
+
+        self.assertEqual(matched_request, 'list python files')
+
+    def test_lookup_below_threshold(self):
+        """Test that unrelated requests do not match"""
+        self._store('k1', 'list python files')
+
+        self.assertIsNone(self.index.lookup('show git log', self.scope))
+        self.assertIsNone(self.index.lookup('delete python files', self.scope))
+
+    def test_lookup_requires_same_parameters(self):
+        """Test that numbers and paths must match exactly"""
+        self._store('k1', 'find files larger than 100MB')
+
+        self.assertIsNone(self.index.lookup('find files larger than 10MB', self.scope))
+        self.assertIsNotNone(self.index.lookup('find the files larger than 100MB', self.scope))
+
+    def test_lookup_respects_scope(self):
+        """Test that requests from another directory or language are not reused"""
+        self._store('k1', 'list python files')
+        other_scope = SimilarityIndex.make_scope('es', 'gemini-2.5-flash', '/project')
+
+        self.assertIsNone(self.index.lookup('list all python files', other_scope))
+
+    def test_lookup_ignores_evicted_responses(self):
+        """Test that entries whose cached response is gone are skipped"""
+        self._store('k1', 'list python files')
+        self.cache.clear()
+
+        self.assertIsNone(self.index.lookup('list all python files', self.scope))
+
+    def test_lookup_falls_back_when_best_expired(self):
+        """Test that an expired best match gives way to the next one and leaves the index"""
+        self._store('k1', 'list python files')
+        self._store('k2', 'list all the python files')
+        with self.cache.transaction() as connection:
+            connection.execute('UPDATE responses SET created_at = 0 WHERE key = ?', ('k2',))
+
+        _, matched_request, _ = self.index.lookup('list all python files', self.scope)
+
+        self.assertEqual(matched_request, 'list python files')
+        with self.cache.transaction() as connection:
+            keys = [row[0] for row in connection.execute('SELECT key FROM similar_requests')]
+            grams = connection.execute(
+                'SELECT COUNT(*) FROM similar_grams g '
+                'JOIN similar_requests r ON r.id = g.request_id'
+            ).fetchone()[0]
+            total = connection.execute('SELECT COUNT(*) FROM similar_grams').fetchone()[0]
+            orphan_df = connection.execute(
+                'SELECT COUNT(*) FROM gram_df d WHERE df != '
+                '(SELECT COUNT(*) FROM similar_grams g WHERE g.gram = d.gram)'
+            ).fetchone()[0]
+        self.assertEqual(keys, ['k1'])
+        self.assertEqual(grams, total)
+        self.assertEqual(orphan_df, 0)
+
+    def test_disabled_threshold(self):
+        """Test that a threshold above 1 disables fuzzy matching"""
+        self._store('k1', 'list python files')
+        self.index.threshold = 1.5
+
+        self.assertIsNone(self.index.lookup('list python files', self.scope))
+
+    def test_lookup_scales_to_many_requests(self):
+        """Test that lookups stay fast with thousands of stored requests"""
+        verbs = ['list', 'show', 'find', 'count', 'delete', 'compress', 'copy', 'move']
+        objects = ['python', 'log', 'json', 'image', 'backup', 'config', 'test', 'temp']
+        entries = [
+            (f'key{i}', f'{verbs[i % 8]} {objects[(i // 8) % 8]} files in folder{i}', self.result)
+            for i in range(5000)
+        ]
+        self.cache.max_entries = 10000
+        self.cache.set_many(entries)
+        self.index.add_many((key, request, self.scope) for key, request, _ in entries)
+
+        start = time.perf_counter()
+        for i in range(0, 5000, 100):
+            match = self.index.lookup(
+                f'{verbs[i % 8]} the {objects[(i // 8) % 8]} files in folder{i}', self.scope
+            )
+            self.assertEqual(match[1], entries[i][1])
+        elapsed_ms = (time.perf_counter() - start) * 1000 / 50
+
+        # El objetivo es < 10 ms (ver benchmarks/bench_similarity.py); margen para CI
+        self.assertLess(elapsed_ms, 50)
+
+
+if __name__ == '__main__':
+    unittest.main()